@@ -5,39 +5,70 @@ Handles AI interactions for floor plan analysis, design generation, and chat
 
 import os
 import json
-import base64
 import asyncio
-from typing import Dict, List, Optional, Any
+from contextlib import aclosing
+from typing import AsyncIterator, Dict, List, Optional, Any
 from datetime import datetime
 
 # Import Azure OpenAI service
 from azure_openai_service import create_azure_openai_service
+from async_bridge import run_sync
+from image_preprocessing import create_image_preprocessor, probe_image
+from response_cache import ResponseCache, cache_status, make_cache_key
+from structured_logging import get_logger, setup_logging
+from tracing import start_span
+
+logger = get_logger("ai_service")
 
 class AIService:
     """AI Service for interior design assistance"""
     
-    def __init__(self, api_key: Optional[str] = None, use_azure_ad: bool = None):
+    def __init__(self, api_key: Optional[str] = None, use_azure_ad: bool = None, cache: Optional[ResponseCache] = None):
         """Initialize AI Service with Azure OpenAI"""
         # Initialize new Azure OpenAI service
         self.azure_service = create_azure_openai_service(use_azure_ad=use_azure_ad)
         
+        # Optional cache for repeatable GPT responses
+        self.cache = cache
+        
+        # Uploads are downscaled and recompressed before they go to GPT-4 Vision
+        self.image_preprocessor = create_image_preprocessor()
+        
         # Legacy configuration for backward compatibility
         self.azure_api_key = api_key or os.getenv("AZURE_OPENAI_API_KEY") or "YOUR_AZURE_OPENAI_API_KEY_HERE"
         
         # Show service info
         service_info = self.azure_service.get_service_info()
-        print(f"✅ Azure OpenAI Service initialized")
-        print(f"   Endpoint: {service_info['endpoint']}")
-        print(f"   Authentication: {'Azure AD' if service_info['use_azure_ad'] else 'API Key'}")
-        print(f"   API Version: {service_info['api_version']}")
-        print(f"   DALL-E Model: {service_info['dalle_deployment']}")
+        logger.info("Azure OpenAI Service initialized", extra={
+            "endpoint": service_info["endpoint"],
+            "authentication": "Azure AD" if service_info["use_azure_ad"] else "API Key",
+            "api_version": service_info["api_version"],
+            "dalle_deployment": service_info["dalle_deployment"]
+        })
+
+    async def analyze_floor_plan(self, image_data: bytes, filename: str, use_cache: bool = True) -> Dict:
+        """
+        Анализ планировки квартиры с помощью ИИ
+        
+        Не изображение или слишком большое изображение отклоняется
+        ImageValidationError ещё до декодирования и запроса к модели.
+        """
+        with start_span("ai_service.analyze_floor_plan", {"image.bytes": len(image_data)}) as span:
+            image = probe_image(image_data, self.image_preprocessor.max_pixels)
+            span.set_attributes({"image.format": image.format, "image.width": image.width, "image.height": image.height})
+            analysis = await self._request_floor_plan_analysis(image_data, use_cache)
+            span.set_attributes({
+                "cache.outcome": cache_status.get() if self.cache else "disabled",
+                "result.fallback": analysis is None
+            })
+            if analysis is None:
+                with start_span("ai_service.mock_fallback"):
+                    return self._mock_analysis()
+            return analysis
 
-    async def analyze_floor_plan(self, image_data: bytes, filename: str) -> Dict:
-        """Анализ планировки квартиры с помощью ИИ"""
+    async def _request_floor_plan_analysis(self, image_data: bytes, use_cache: bool = True) -> Optional[Dict]:
+        """Анализ планировки через кэш и GPT (None при ошибке)"""
         try:
-            # Конвертируем изображение в base64
-            image_base64 = base64.b64encode(image_data).decode('utf-8')
-            
             # Prompt для анализа планировки
             prompt = """
             Проанализируй этот план квартиры и верни JSON с:
@@ -58,38 +89,70 @@ class AIService:
             }
             """
             
-            # Use new Azure OpenAI service
-            response = await self._analyze_with_new_service(prompt, image_base64)
+            # Одинаковые планировки анализируются один раз
+            cache_key = make_cache_key(
+                "floor_plan", self.azure_service.deployment_name, prompt, image_bytes=image_data
+            )
+            response = await self._cached(
+                cache_key,
+                lambda: self._analyze_with_new_service(prompt, image_data),
+                use_cache
+            )
                 
             return response
             
         except Exception as e:
-            print(f"AI Analysis error: {e}")
-            return self._mock_analysis()
+            logger.exception("AI analysis error")
+            return None
 
-    async def _analyze_with_new_service(self, prompt: str, image_base64: str) -> Dict:
-        """Анализ с помощью нового Azure OpenAI сервиса"""
+    async def _analyze_with_new_service(self, prompt: str, image_data: bytes) -> Optional[Dict]:
+        """Анализ с помощью нового Azure OpenAI сервиса (None при ошибке)"""
         try:
-            result = await self.azure_service.analyze_image(image_base64, prompt)
+            # Уменьшаем и пережимаем изображение до того, что модель реально использует
+            with start_span("image.preprocess", {"image.bytes": len(image_data)}) as span:
+                image = await asyncio.to_thread(self.image_preprocessor.prepare, image_data)
+                span.set_attributes({
+                    "image.output_bytes": len(image.data),
+                    "image.output_mime_type": image.mime_type,
+                    "image.width": image.width,
+                    "image.height": image.height,
+                    "gen_ai.request.image_detail": image.detail,
+                    "gen_ai.request.image_tokens": image.tokens
+                })
+            
+            result = await self.azure_service.analyze_image(
+                image.base64, prompt, mime_type=image.mime_type, detail=image.detail
+            )
             
             if result["success"]:
                 # Парсим JSON из ответа
-                try:
-                    return json.loads(result["analysis"])
-                except:
-                    # Если не JSON, возвращаем мок анализ
-                    print("📝 Response is not JSON, using mock analysis")
-                    return self._mock_analysis()
+                with start_span("ai_service.parse_json", {"response.chars": len(result["analysis"] or "")}) as span:
+                    try:
+                        return json.loads(result["analysis"])
+                    except:
+                        # Если не JSON, возвращаем мок анализ
+                        span.set_error("response is not JSON")
+                        logger.info("Analysis response is not JSON, using mock analysis")
+                        return None
             else:
-                print(f"❌ Analysis failed: {result['error']}")
-                return self._mock_analysis()
+                logger.warning("Analysis failed", extra={"error": result["error"]})
+                return None
                 
         except Exception as e:
-            print(f"❌ New service error: {e}")
-            return self._mock_analysis()
+            logger.exception("Analysis service error")
+            return None
+
+    async def _cached(self, key: str, compute, use_cache: bool = True) -> Optional[Dict]:
+        """Read-through кэш для ответов GPT; None от compute не кэшируется"""
+        if self.cache is None:
+            return await compute()
+        return await self.cache.get_or_compute(key, compute, bypass=not use_cache)
 
-    async def generate_design_suggestions(self, room_type: str, style: str, budget: int) -> Dict:
+    async def generate_design_suggestions(self, room_type: str, style: str, budget: int, use_cache: bool = True) -> Dict:
         """Генерация дизайн предложений"""
+        room_type = room_type.strip().lower()
+        style = style.strip().lower()
+        
         prompt = f"""
         Создай дизайн-предложения для {room_type} в стиле {style} с бюджетом {budget} рублей.
         
@@ -110,6 +173,17 @@ class AIService:
         }}
         """
         
+        cache_key = make_cache_key(
+            "design_suggestions",
+            self.azure_service.deployment_name,
+            prompt,
+            params={"room_type": room_type, "style": style, "budget": budget, "max_tokens": 10000}
+        )
+        suggestions = await self._cached(cache_key, lambda: self._request_design_suggestions(prompt), use_cache)
+        return suggestions or self._mock_design_suggestions()
+
+    async def _request_design_suggestions(self, prompt: str) -> Optional[Dict]:
+        """Запрос дизайн предложений у GPT (None при ошибке)"""
         try:
             result = await self.azure_service.chat_completion([
                 {"role": "user", "content": prompt}
@@ -119,30 +193,51 @@ class AIService:
                 try:
                     return json.loads(result["content"])
                 except:
-                    print("📝 Response is not JSON, using mock suggestions")
-                    return self._mock_design_suggestions()
+                    logger.info("Design suggestions response is not JSON, using mock suggestions")
+                    return None
             else:
-                print(f"❌ Design suggestions failed: {result['error']}")
-                return self._mock_design_suggestions()
+                logger.warning("Design suggestions failed", extra={"error": result["error"]})
+                return None
         except Exception as e:
-            print(f"Design suggestions error: {e}")
-            return self._mock_design_suggestions()
+            logger.exception("Design suggestions error")
+            return None
 
     def chat_completion(self, message: str, context: Optional[Dict] = None, conversation_id: Optional[str] = None) -> str:
-        """Chat completion method for backward compatibility (sync version)"""
+        """Chat completion method for backward compatibility (sync version, scripts only)"""
         try:
-            # Run async method in sync context
-            loop = asyncio.new_event_loop()
-            asyncio.set_event_loop(loop)
-            response = loop.run_until_complete(self.chat_with_ai(message, context))
-            loop.close()
-            return response
+            return run_sync(self.chat_with_ai(message, context))
         except Exception as e:
-            print(f"Chat completion error: {e}")
+            logger.exception("Chat completion error")
             return "Извините, сейчас я не могу ответить. Попробуйте позже."
 
     async def chat_with_ai(self, message: str, context: Optional[Dict] = None) -> str:
         """Чат с ИИ помощником по дизайну"""
+        try:
+            messages = self._build_chat_messages(message, context)
+            
+            result = await self.azure_service.chat_completion(messages, max_tokens=1000)
+            
+            if result["success"]:
+                return result["content"]
+            else:
+                logger.warning("Chat AI failed", extra={"error": result["error"]})
+                return "Извините, сейчас я не могу ответить. Попробуйте позже."
+                
+        except Exception as e:
+            logger.exception("Chat AI error")
+            return "Извините, сейчас я не могу ответить. Попробуйте позже."
+
+    async def stream_chat_with_ai(self, message: str, context: Optional[Dict] = None) -> AsyncIterator[str]:
+        """Потоковый чат с ИИ помощником: отдает токены по мере генерации"""
+        messages = self._build_chat_messages(message, context)
+        
+        # aclosing: закрытие этого генератора должно сразу закрыть upstream-поток
+        async with aclosing(self.azure_service.stream_chat_completion(messages, max_tokens=1000)) as tokens:
+            async for token in tokens:
+                yield token
+
+    def _build_chat_messages(self, message: str, context: Optional[Dict] = None) -> List[Dict]:
+        """Сборка сообщений для чата с системным промптом и контекстом"""
         system_prompt = """
         Ты - эксперт по дизайну интерьера и недвижимости. 
         Помогай пользователям с вопросами о:
@@ -155,28 +250,16 @@ class AIService:
         Отвечай практично, с конкретными советами и примерами.
         """
         
-        try:
-            messages = [{"role": "system", "content": system_prompt}]
-            
-            if context:
-                messages.append({
-                    "role": "user", 
-                    "content": f"Контекст: {json.dumps(context, ensure_ascii=False)}"
-                })
-            
-            messages.append({"role": "user", "content": message})
-            
-            result = await self.azure_service.chat_completion(messages, max_tokens=1000)
-            
-            if result["success"]:
-                return result["content"]
-            else:
-                print(f"❌ Chat AI failed: {result['error']}")
-                return "Извините, сейчас я не могу ответить. Попробуйте позже."
-                
-        except Exception as e:
-            print(f"Chat AI error: {e}")
-            return "Извините, сейчас я не могу ответить. Попробуйте позже."
+        messages = [{"role": "system", "content": system_prompt}]
+        
+        if context:
+            messages.append({
+                "role": "user", 
+                "content": f"Контекст: {json.dumps(context, ensure_ascii=False)}"
+            })
+        
+        messages.append({"role": "user", "content": message})
+        return messages
 
     def _mock_analysis(self) -> Dict:
         """Мок анализ для демо"""
@@ -263,6 +346,7 @@ async def chat_interior_assistant(message: str, context: Optional[Dict] = None)
 
 # Example usage
 if __name__ == "__main__":
+    setup_logging(log_format="text")
     print("🤖 RED AI Service - Interior Design Assistant")
     print("=" * 50)
     
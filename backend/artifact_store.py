@@ -0,0 +1,184 @@
+"""
+Artifact Store for RED AI
+Content-addressed storage for generated images, served as raw bytes instead of base64 data URLs
+"""
+
+import os
+import re
+import hashlib
+import mimetypes
+import tempfile
+from pathlib import Path
+from typing import Any, Dict, Iterator, Optional, Tuple
+
+from structured_logging import get_logger
+
+logger = get_logger("artifact_store")
+
+ARTIFACT_ID_PATTERN = re.compile(r"^[0-9a-f]{64}\.[a-z0-9]+$")
+
+# mimetypes maps image/jpeg to .jpe on some platforms
+EXTENSIONS = {"image/png": "png", "image/jpeg": "jpg", "image/webp": "webp", "image/gif": "gif"}
+
+class ArtifactStore:
+    """Base class for artifact storage backends"""
+
+    name = "base"
+
+    def __init__(self, base_url: str = "/api/artifacts"):
+        self.base_url = base_url.rstrip("/")
+
+    def put(self, data: bytes, content_type: str = "image/png") -> Dict[str, Any]:
+        """Store bytes under their SHA-256 digest; storing the same bytes twice is a no-op"""
+        raise NotImplementedError
+
+    def open(self, artifact_id: str, start: int = 0, end: Optional[int] = None) -> Iterator[bytes]:
+        """Iterate over the bytes of an artifact from start to end (inclusive)"""
+        raise NotImplementedError
+
+    def stat(self, artifact_id: str) -> Optional[Dict[str, Any]]:
+        """Size, content type and ETag of an artifact, or None if it does not exist"""
+        raise NotImplementedError
+
+    def url_for(self, artifact_id: str) -> str:
+        return f"{self.base_url}/{artifact_id}"
+
+    @staticmethod
+    def make_id(data: bytes, content_type: str) -> str:
+        digest = hashlib.sha256(data).hexdigest()
+        extension = EXTENSIONS.get(content_type) or (mimetypes.guess_extension(content_type) or ".bin").lstrip(".")
+        return f"{digest}.{extension}"
+
+    @staticmethod
+    def is_valid_id(artifact_id: str) -> bool:
+        return bool(ARTIFACT_ID_PATTERN.match(artifact_id))
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {"backend": self.name, "base_url": self.base_url}
+
+class LocalArtifactStore(ArtifactStore):
+    """Artifacts on local disk, sharded by the first two digest characters"""
+
+    name = "local"
+    chunk_size = 64 * 1024
+
+    def __init__(self, root: str, base_url: str = "/api/artifacts"):
+        super().__init__(base_url)
+        self.root = Path(root)
+        self.root.mkdir(parents=True, exist_ok=True)
+
+    def _path(self, artifact_id: str) -> Path:
+        return self.root / artifact_id[:2] / artifact_id
+
+    def put(self, data: bytes, content_type: str = "image/png") -> Dict[str, Any]:
+        artifact_id = self.make_id(data, content_type)
+        path = self._path(artifact_id)
+
+        if not path.exists():
+            path.parent.mkdir(parents=True, exist_ok=True)
+            # Write to a temp file and rename so readers never see a partial artifact
+            fd, tmp_path = tempfile.mkstemp(dir=path.parent, prefix=".tmp-")
+            try:
+                with os.fdopen(fd, "wb") as tmp:
+                    tmp.write(data)
+                os.replace(tmp_path, path)
+            except Exception:
+                os.unlink(tmp_path)
+                raise
+
+        return {
+            "id": artifact_id,
+            "url": self.url_for(artifact_id),
+            "content_type": content_type,
+            "size": len(data)
+        }
+
+    def stat(self, artifact_id: str) -> Optional[Dict[str, Any]]:
+        if not self.is_valid_id(artifact_id):
+            return None
+        path = self._path(artifact_id)
+        if not path.is_file():
+            return None
+        return {
+            "id": artifact_id,
+            "size": path.stat().st_size,
+            "content_type": mimetypes.guess_type(artifact_id)[0] or "application/octet-stream",
+            # Content-addressed, so the digest is a strong validator
+            "etag": f'"{artifact_id.split(".")[0]}"'
+        }
+
+    def open(self, artifact_id: str, start: int = 0, end: Optional[int] = None) -> Iterator[bytes]:
+        path = self._path(artifact_id)
+        with open(path, "rb") as f:
+            f.seek(start)
+            remaining = (end - start + 1) if end is not None else None
+            while remaining is None or remaining > 0:
+                chunk = f.read(self.chunk_size if remaining is None else min(self.chunk_size, remaining))
+                if not chunk:
+                    break
+                if remaining is not None:
+                    remaining -= len(chunk)
+                yield chunk
+
+    def get_stats(self) -> Dict[str, Any]:
+        stats = super().get_stats()
+        stats["root"] = str(self.root)
+        return stats
+
+def parse_range(header: Optional[str], size: int) -> Optional[Tuple[int, int]]:
+    """
+    Parse a single-range "bytes=" header into an inclusive (start, end)
+
+    Returns None when there is no usable Range header; raises ValueError
+    when the range cannot be satisfied for an artifact of this size.
+    """
+    if not header or not header.startswith("bytes=") or "," in header:
+        return None
+
+    first, _, last = header[len("bytes="):].strip().partition("-")
+    try:
+        if first:
+            start = int(first)
+            end = int(last) if last else size - 1
+        else:
+            # Suffix range: the final N bytes
+            start = max(0, size - int(last))
+            end = size - 1
+    except ValueError:
+        return None
+
+    if start >= size or start > end:
+        raise ValueError(f"Range {header} not satisfiable for {size} bytes")
+    return start, min(end, size - 1)
+
+def etag_matches(header: Optional[str], etag: str) -> bool:
+    """
+    Whether an If-None-Match header matches the ETag
+
+    The header is "*" or a comma-separated list of entity tags; weak tags
+    (W/"...") match their strong counterpart, as If-None-Match uses weak
+    comparison.
+    """
+    if not header:
+        return False
+    tags = [tag.strip() for tag in header.split(",")]
+    if "*" in tags:
+        return True
+    return any((tag[2:] if tag.startswith("W/") else tag) == etag for tag in tags)
+
+# Factory function
+def create_artifact_store(
+    backend: Optional[str] = None,
+    root: Optional[str] = None,
+    base_url: Optional[str] = None
+) -> ArtifactStore:
+    """Create artifact store from arguments or environment variables"""
+    backend = (backend or os.getenv("ARTIFACT_BACKEND", "local")).lower()
+    root = root or os.getenv("ARTIFACT_DIR", os.getenv("GENERATED_IMAGES_DIR", "generated-images"))
+    base_url = base_url or os.getenv("ARTIFACT_BASE_URL", "/api/artifacts")
+
+    if backend != "local":
+        logger.warning("Unknown artifact backend, falling back to local disk", extra={"backend": backend})
+
+    logger.info("Artifact store: local disk", extra={"root": root})
+    return LocalArtifactStore(root, base_url)
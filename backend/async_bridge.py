@@ -0,0 +1,42 @@
+"""
+Async bridge for RED AI
+Runs coroutines from synchronous code (scripts, CLI helpers) on one background event loop
+"""
+
+import asyncio
+import threading
+from typing import Any, Coroutine, Optional, TypeVar
+
+T = TypeVar("T")
+
+_loop: Optional[asyncio.AbstractEventLoop] = None
+_loop_thread: Optional[threading.Thread] = None
+_loop_lock = threading.Lock()
+
+def _get_background_loop() -> asyncio.AbstractEventLoop:
+    """Start the background event loop on first use"""
+    global _loop, _loop_thread
+
+    with _loop_lock:
+        if _loop is None or _loop.is_closed():
+            _loop = asyncio.new_event_loop()
+            _loop_thread = threading.Thread(
+                target=_loop.run_forever,
+                name="red-ai-async-bridge",
+                daemon=True
+            )
+            _loop_thread.start()
+
+        return _loop
+
+def run_sync(coro: Coroutine[Any, Any, T], timeout: Optional[float] = None) -> T:
+    """
+    Run a coroutine to completion from synchronous code
+
+    Safe to call from any number of threads: every call is scheduled on the
+    same long-lived loop, so connection pools created there stay usable
+    between calls. Async code must await the coroutine directly instead.
+    """
+    loop = _get_background_loop()
+    future = asyncio.run_coroutine_threadsafe(coro, loop)
+    return future.result(timeout)
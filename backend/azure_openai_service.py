@@ -6,31 +6,92 @@ Handles Azure OpenAI API interactions with authentication and error handling
 import os
 import json
 import asyncio
-from typing import Dict, List, Optional, Any
+from typing import AsyncIterator, Dict, List, Optional, Any
 from datetime import datetime
 
+import anyio
+import httpx
+import openai
+
+from azure_pool import AzureClientPool, PoolMember, load_pool_config
+from metrics import UpstreamCall, record_images, record_usage
+from quota_manager import QuotaExceededError, create_quota_manager, estimate_chat_tokens
+from resilience import CircuitBreaker, CircuitOpenError, classify_error, create_retry_policy, retry_after_seconds
+from response_cache import make_cache_key
+from image_preprocessing import sniff_mime_type
+from single_flight import get_single_flight
+from structured_logging import get_logger, setup_logging
+from tracing import KIND_CLIENT, start_span
+
+logger = get_logger("azure_openai")
+
 # Import Azure settings
 try:
     from azure_settings import get_azure_config
     AZURE_CONFIG = get_azure_config()
 except ImportError:
-    print("⚠️  azure_settings.py not found. Using environment variables only.")
+    logger.info("azure_settings.py not found, using environment variables only")
     AZURE_CONFIG = None
 
 # Azure OpenAI imports
 try:
-    from openai import AzureOpenAI
-    from azure.identity import DefaultAzureCredential, get_bearer_token_provider
+    from openai import AsyncAzureOpenAI
+    from azure.identity.aio import DefaultAzureCredential, get_bearer_token_provider
     AZURE_AD_AVAILABLE = True
 except ImportError:
-    print("⚠️  Azure AD authentication not available. Using API key authentication only.")
-    from openai import AzureOpenAI
+    logger.info("Azure AD authentication not available, using API key authentication only")
+    from openai import AsyncAzureOpenAI
     AZURE_AD_AVAILABLE = False
 
+# Connection pool limits for the shared HTTP client
+AZURE_MAX_CONNECTIONS = int(os.getenv("AZURE_OPENAI_MAX_CONNECTIONS", "100"))
+AZURE_MAX_KEEPALIVE_CONNECTIONS = int(os.getenv("AZURE_OPENAI_MAX_KEEPALIVE_CONNECTIONS", "20"))
+AZURE_REQUEST_TIMEOUT = float(os.getenv("AZURE_OPENAI_TIMEOUT", "120"))
+
+# Upstream failures that say something about the pool member rather than the request
+MEMBER_FAILURES = (
+    openai.APIConnectionError,  # includes timeouts
+    openai.InternalServerError,
+    openai.AuthenticationError,
+    openai.PermissionDeniedError
+)
+
+_shared_http_client: Optional[httpx.AsyncClient] = None
+
+def create_http_client(transport: Optional[httpx.AsyncBaseTransport] = None) -> httpx.AsyncClient:
+    """Create a pooled async HTTP client for Azure OpenAI requests"""
+    return httpx.AsyncClient(
+        limits=httpx.Limits(
+            max_connections=AZURE_MAX_CONNECTIONS,
+            max_keepalive_connections=AZURE_MAX_KEEPALIVE_CONNECTIONS
+        ),
+        timeout=httpx.Timeout(AZURE_REQUEST_TIMEOUT, connect=10.0),
+        transport=transport
+    )
+
+def get_shared_http_client() -> httpx.AsyncClient:
+    """Get the process-wide HTTP client shared by all Azure OpenAI services"""
+    global _shared_http_client
+    if _shared_http_client is None or _shared_http_client.is_closed:
+        _shared_http_client = create_http_client()
+    return _shared_http_client
+
+async def close_shared_http_client():
+    """Close the shared HTTP client (call on application shutdown)"""
+    global _shared_http_client
+    if _shared_http_client is not None and not _shared_http_client.is_closed:
+        await _shared_http_client.aclose()
+    _shared_http_client = None
+
 class AzureOpenAIService:
     """Azure OpenAI service with AD and API key authentication"""
     
-    def __init__(self, use_azure_ad: bool = False):
+    def __init__(
+        self,
+        use_azure_ad: bool = False,
+        http_client: Optional[httpx.AsyncClient] = None,
+        pool: Optional[AzureClientPool] = None
+    ):
         """Initialize Azure OpenAI service"""
         # Use Azure config if available, otherwise fall back to environment variables
         if AZURE_CONFIG:
@@ -39,7 +100,7 @@ class AzureOpenAIService:
             self.deployment_name = AZURE_CONFIG["gpt_deployment"]
             self.dalle_deployment = AZURE_CONFIG["dalle_deployment"]
             self.azure_keys = [AZURE_CONFIG["api_key"], AZURE_CONFIG["backup_key"]]
-            print("✅ Loading Azure configuration from azure_settings.py")
+            logger.info("Loading Azure configuration from azure_settings.py")
         else:
             self.endpoint = os.getenv("AZURE_OPENAI_ENDPOINT", "https://neuroflow-hub.openai.azure.com")
             self.api_version = os.getenv("OPENAI_API_VERSION", "2024-04-01-preview")
@@ -56,19 +117,32 @@ class AzureOpenAIService:
         self.config_valid = self._validate_configuration()
         
         self.use_azure_ad = use_azure_ad and AZURE_AD_AVAILABLE
+        self.http_client = http_client or get_shared_http_client()
         self.client = None
         
-        if self.config_valid:
-            self.client = self._initialize_client()
-        else:
-            print("❌ Azure OpenAI configuration invalid. Service will not be available.")
+        # Identical concurrent requests share one upstream call
+        self.single_flight = get_single_flight("azure_openai")
+        
+        # Transient failures are retried here, on whichever member is picked next
+        self.retry = create_retry_policy()
+        
+        # Requests are spread over every configured key and endpoint
+        self.pool = pool
+        if self.pool is None and self.config_valid:
+            self.pool = self._create_pool()
+        
+        if self.pool is not None and self.pool.members:
+            # Kept for callers that used the single client directly
+            self.client = self.pool.members[0].client
+        elif not self.config_valid:
+            logger.error("Azure OpenAI configuration invalid, service will not be available")
     
     def _validate_configuration(self) -> bool:
         """Validate Azure OpenAI configuration"""
         # Use the correct API keys for Azure OpenAI
         if not self.azure_keys[0]:
             self.azure_keys[0] = "YOUR_AZURE_OPENAI_PRIMARY_KEY_HERE"
-            print("✅ Using Azure OpenAI API key")
+            logger.warning("AZURE_OPENAI_API_KEY not set, using the placeholder key")
         
         if not self.azure_keys[1]:
             self.azure_keys[1] = "YOUR_AZURE_OPENAI_SECONDARY_KEY_HERE"
@@ -89,66 +163,121 @@ class AzureOpenAIService:
             "hasDeployment": has_deployment
         }
         
-        print(f"Azure OpenAI Configuration: {json.dumps(config_status, indent=2)}")
+        logger.info("Azure OpenAI configuration", extra=config_status)
         
         if not all(config_status.values()):
-            print("❌ Missing Azure OpenAI configuration:")
-            if not has_api_key:
-                print("   - AZURE_OPENAI_API_KEY not set")
-            if not has_endpoint:
-                print("   - AZURE_OPENAI_ENDPOINT not set")
-            if not has_api_version:
-                print("   - OPENAI_API_VERSION not set")
-            if not has_deployment:
-                print("   - AZURE_OPENAI_DEPLOYMENT_NAME not set")
+            missing = [
+                name for name, present in (
+                    ("AZURE_OPENAI_API_KEY", has_api_key),
+                    ("AZURE_OPENAI_ENDPOINT", has_endpoint),
+                    ("OPENAI_API_VERSION", has_api_version),
+                    ("AZURE_OPENAI_DEPLOYMENT_NAME", has_deployment)
+                ) if not present
+            ]
+            logger.error("Missing Azure OpenAI configuration", extra={"missing": missing})
             return False
         
         return True
         
-    def _initialize_client(self) -> Optional[AzureOpenAI]:
+    def _create_pool(self) -> AzureClientPool:
+        """
+        Build the client pool from AZURE_OPENAI_POOL, or from the primary and
+        backup keys on the configured endpoint when no pool is defined
+        """
+        members_config = load_pool_config()
+        if not members_config:
+            members_config = [{"name": "primary", "api_key": self.azure_keys[0]}]
+            # Both keys of one resource share its quota, so they share one budget below
+            has_backup_key = self.azure_keys[1] and not self.azure_keys[1].startswith("YOUR_")
+            if has_backup_key and not self.use_azure_ad:
+                members_config.append({"name": "backup", "api_key": self.azure_keys[1]})
+        
+        failure_threshold = int(os.getenv("AZURE_BREAKER_FAILURES", "5"))
+        recovery_timeout = float(os.getenv("AZURE_BREAKER_RECOVERY", "30"))
+        quotas = {}
+        members = []
+        for index, config in enumerate(members_config):
+            name = config.get("name", f"member-{index}")
+            endpoint = config.get("endpoint", self.endpoint)
+            chat_deployment = config.get("chat_deployment", self.deployment_name)
+            image_deployment = config.get("image_deployment", self.dalle_deployment)
+            
+            client = self._initialize_client(endpoint, config.get("api_key", ""))
+            if client is None:
+                continue
+            
+            # Quota belongs to the Azure resource, whichever key is used
+            if endpoint not in quotas:
+                quotas[endpoint] = create_quota_manager(
+                    chat_deployment,
+                    image_deployment,
+                    tokens_per_minute=config.get("tpm"),
+                    requests_per_minute=config.get("rpm"),
+                    image_requests_per_minute=config.get("dalle_rpm")
+                )
+            
+            members.append(PoolMember(
+                name=name,
+                client=client,
+                endpoint=endpoint,
+                chat_deployment=chat_deployment,
+                image_deployment=image_deployment,
+                quota=quotas[endpoint],
+                breaker=CircuitBreaker(f"Azure OpenAI {name}", failure_threshold, recovery_timeout),
+                weight=int(config.get("weight", 1))
+            ))
+        
+        logger.info("Azure OpenAI pool", extra={"members": [member.name for member in members]})
+        return AzureClientPool(members, os.getenv("AZURE_POOL_STRATEGY", "least_outstanding"))
+    
+    def _initialize_client(self, endpoint: str, api_key: str) -> Optional[AsyncAzureOpenAI]:
         """Initialize Azure OpenAI client with AD or API key authentication"""
         
         if not self.config_valid:
             return None
             
         if self.use_azure_ad and AZURE_AD_AVAILABLE:
-            print("🔐 Initializing Azure OpenAI with Azure AD authentication...")
+            logger.info("Initializing Azure OpenAI with Azure AD authentication")
             try:
                 token_provider = get_bearer_token_provider(
                     DefaultAzureCredential(), 
                     "https://cognitiveservices.azure.com/.default"
                 )
                 
-                client = AzureOpenAI(
+                client = AsyncAzureOpenAI(
                     api_version=self.api_version,
-                    azure_endpoint=self.endpoint,
-                    azure_ad_token_provider=token_provider
+                    azure_endpoint=endpoint,
+                    azure_ad_token_provider=token_provider,
+                    http_client=self.http_client,
+                    # Retries go through _call so they can move to another member
+                    max_retries=0
                 )
                 
-                print("✅ Azure AD authentication successful")
+                logger.info("Azure AD authentication successful")
                 return client
                 
             except Exception as e:
-                print(f"❌ Azure AD authentication failed: {e}")
-                print("🔄 Falling back to API key authentication...")
+                logger.warning("Azure AD authentication failed, falling back to API key", extra={"error": str(e)})
                 
         # Fallback to API key authentication
-        if not self.azure_keys[0]:
-            print("❌ No API key available for authentication")
+        if not api_key:
+            logger.error("No API key available for authentication")
             return None
             
-        print("🔑 Initializing Azure OpenAI with API key authentication...")
+        logger.debug("Initializing Azure OpenAI with API key authentication", extra={"endpoint": endpoint})
         try:
-            client = AzureOpenAI(
-                api_key=self.azure_keys[0],
+            client = AsyncAzureOpenAI(
+                api_key=api_key,
                 api_version=self.api_version,
-                azure_endpoint=self.endpoint
+                azure_endpoint=endpoint,
+                http_client=self.http_client,
+                max_retries=0
             )
             
-            print("✅ API key authentication successful")
+            logger.debug("API key authentication successful", extra={"endpoint": endpoint})
             return client
         except Exception as e:
-            print(f"❌ Failed to initialize Azure OpenAI client: {e}")
+            logger.error("Failed to initialize Azure OpenAI client", extra={"endpoint": endpoint, "error": str(e)})
             return None
     
     def is_configured(self) -> bool:
@@ -157,6 +286,11 @@ class AzureOpenAIService:
     
     async def generate_image(self, prompt: str, style: str = "vivid", quality: str = "standard") -> Dict:
         """Generate image using DALL-E 3 with Azure OpenAI"""
+        key = self._request_key("image", self.dalle_deployment, prompt, {"style": style, "quality": quality})
+        return await self.single_flight.do(key, lambda: self._generate_image(prompt, style, quality))
+    
+    async def _generate_image(self, prompt: str, style: str, quality: str) -> Dict:
+        """Call the DALL-E 3 deployment"""
         if not self.is_configured():
             return {
                 "success": False,
@@ -164,30 +298,27 @@ class AzureOpenAIService:
             }
             
         try:
-            print(f"🎨 Generating image with DALL-E 3...")
-            print(f"📝 Prompt: {prompt[:100]}...")
+            logger.debug("Generating image", extra={"deployment": self.dalle_deployment, "prompt_chars": len(prompt)})
             
-            result = self.client.images.generate(
-                model=self.dalle_deployment,
+            result = await self._call("image", 0, lambda client, deployment: client.images.with_raw_response.generate(
+                model=deployment,
                 prompt=prompt,
                 n=1,
                 style=style,  # "vivid" or "natural"
                 quality=quality,  # "standard" or "hd"
                 size="1024x1024",
                 response_format="url"  # or "b64_json"
-            )
+            ))
             
-            # Parse response
-            response_data = json.loads(result.model_dump_json())
-            image_url = response_data['data'][0]['url']
+            image_data = result.data[0]
+            image_url = image_data.url
             
-            print(f"✅ Image generated successfully!")
-            print(f"🔗 Image URL: {image_url[:50]}...")
+            logger.debug("Image generated", extra={"deployment": self.dalle_deployment})
             
             return {
                 "success": True,
                 "image_url": image_url,
-                "revised_prompt": response_data['data'][0].get('revised_prompt', ''),
+                "revised_prompt": image_data.revised_prompt or "",
                 "style": style,
                 "quality": quality,
                 "model": self.dalle_deployment
@@ -195,7 +326,7 @@ class AzureOpenAIService:
             
         except Exception as e:
             error_msg = str(e)
-            print(f"❌ Image generation failed: {e}")
+            logger.warning("Image generation failed", extra={"error": error_msg, "error_type": type(e).__name__})
             
             # Check for common authentication errors
             if "401" in error_msg or "Access denied" in error_msg:
@@ -204,6 +335,10 @@ class AzureOpenAIService:
                 error_msg = "Access forbidden. Please check your Azure OpenAI permissions and quotas."
             elif "429" in error_msg:
                 error_msg = "Rate limit exceeded. Please try again later or check your quota."
+            elif isinstance(e, QuotaExceededError):
+                error_msg = f"Service is at capacity. Please try again in {e.retry_after:.0f} seconds."
+            elif isinstance(e, CircuitOpenError):
+                error_msg = f"Azure OpenAI is temporarily unavailable. Please try again in {e.retry_after:.0f} seconds."
             
             return {
                 "success": False,
@@ -211,8 +346,35 @@ class AzureOpenAIService:
                 "model": self.dalle_deployment
             }
     
-    async def analyze_image(self, image_base64: str, prompt: str) -> Dict:
-        """Analyze image using GPT-4 Vision"""
+    async def analyze_image(
+        self, image_base64: str, prompt: str,
+        mime_type: Optional[str] = None, detail: str = "high"
+    ) -> Dict:
+        """
+        Analyze image using GPT-4 Vision
+
+        The MIME type is sniffed from the data when not given. Callers with
+        raw uploads should run them through ImagePreprocessor first, which
+        also picks the detail level.
+        """
+        mime_type = mime_type or sniff_mime_type(image_base64)
+        key = self._request_key(
+            "vision", self.deployment_name, prompt, {"detail": detail}, image_bytes=image_base64.encode("ascii")
+        )
+        with start_span("azure_openai.analyze_image", {
+            "gen_ai.system": "azure_openai",
+            "gen_ai.request.model": self.deployment_name,
+            "gen_ai.request.image_detail": detail,
+            "payload.base64_chars": len(image_base64)
+        }) as span:
+            result = await self.single_flight.do(key, lambda: self._analyze_image(image_base64, prompt, mime_type, detail))
+            span.set_attribute("gen_ai.usage.total_tokens", result.get("tokens_used"))
+            if not result["success"]:
+                span.set_error(result["error"])
+            return result
+    
+    async def _analyze_image(self, image_base64: str, prompt: str, mime_type: str, detail: str) -> Dict:
+        """Call the GPT-4 Vision deployment"""
         if not self.is_configured():
             return {
                 "success": False,
@@ -220,32 +382,36 @@ class AzureOpenAIService:
             }
             
         try:
-            print(f"👁️ Analyzing image with GPT-4 Vision...")
-            
-            response = self.client.chat.completions.create(
-                model=self.deployment_name,
-                messages=[
-                    {
-                        "role": "user",
-                        "content": [
-                            {"type": "text", "text": prompt},
-                            {
-                                "type": "image_url",
-                                "image_url": {
-                                    "url": f"data:image/jpeg;base64,{image_base64}",
-                                    "detail": "high"
-                                }
+            logger.debug("Analyzing image", extra={"deployment": self.deployment_name, "image_chars": len(image_base64)})
+            
+            messages = [
+                {
+                    "role": "user",
+                    "content": [
+                        {"type": "text", "text": prompt},
+                        {
+                            "type": "image_url",
+                            "image_url": {
+                                "url": f"data:{mime_type};base64,{image_base64}",
+                                "detail": detail
                             }
-                        ]
-                    }
-                ],
-                max_tokens=1000
+                        }
+                    ]
+                }
+            ]
+            response = await self._call(
+                "chat",
+                estimate_chat_tokens(messages, 1000),
+                lambda client, deployment: client.chat.completions.with_raw_response.create(
+                    model=deployment,
+                    messages=messages,
+                    max_tokens=1000
+                )
             )
             
             content = response.choices[0].message.content
             
-            print(f"✅ Image analysis completed")
-            print(f"📊 Analysis: {content[:200]}...")
+            logger.debug("Image analysis completed", extra={"response_chars": len(content or "")})
             
             return {
                 "success": True,
@@ -255,7 +421,7 @@ class AzureOpenAIService:
             
         except Exception as e:
             error_msg = str(e)
-            print(f"❌ Image analysis failed: {e}")
+            logger.warning("Image analysis failed", extra={"error": error_msg, "error_type": type(e).__name__})
             
             # Check for common authentication errors
             if "401" in error_msg or "Access denied" in error_msg:
@@ -264,6 +430,10 @@ class AzureOpenAIService:
                 error_msg = "Access forbidden. Please check your Azure OpenAI permissions and quotas."
             elif "429" in error_msg:
                 error_msg = "Rate limit exceeded. Please try again later or check your quota."
+            elif isinstance(e, QuotaExceededError):
+                error_msg = f"Service is at capacity. Please try again in {e.retry_after:.0f} seconds."
+            elif isinstance(e, CircuitOpenError):
+                error_msg = f"Azure OpenAI is temporarily unavailable. Please try again in {e.retry_after:.0f} seconds."
             
             return {
                 "success": False,
@@ -272,6 +442,13 @@ class AzureOpenAIService:
     
     async def chat_completion(self, messages: List[Dict], max_tokens: int = 1000) -> Dict:
         """Generate chat completion using GPT-4"""
+        key = self._request_key(
+            "chat", self.deployment_name, json.dumps(messages, ensure_ascii=False), {"max_tokens": max_tokens}
+        )
+        return await self.single_flight.do(key, lambda: self._chat_completion(messages, max_tokens))
+    
+    async def _chat_completion(self, messages: List[Dict], max_tokens: int) -> Dict:
+        """Call the GPT-4 chat deployment"""
         if not self.is_configured():
             return {
                 "success": False,
@@ -279,19 +456,22 @@ class AzureOpenAIService:
             }
             
         try:
-            print(f"💬 Generating chat completion...")
-            
-            response = self.client.chat.completions.create(
-                model=self.deployment_name,
-                messages=messages,
-                max_tokens=max_tokens,
-                temperature=0.7
+            logger.debug("Generating chat completion", extra={"deployment": self.deployment_name, "messages": len(messages)})
+            
+            response = await self._call(
+                "chat",
+                estimate_chat_tokens(messages, max_tokens),
+                lambda client, deployment: client.chat.completions.with_raw_response.create(
+                    model=deployment,
+                    messages=messages,
+                    max_tokens=max_tokens,
+                    temperature=0.7
+                )
             )
             
             content = response.choices[0].message.content
             
-            print(f"✅ Chat completion generated")
-            print(f"💬 Response: {content[:200]}...")
+            logger.debug("Chat completion generated", extra={"response_chars": len(content or "")})
             
             return {
                 "success": True,
@@ -301,7 +481,7 @@ class AzureOpenAIService:
             
         except Exception as e:
             error_msg = str(e)
-            print(f"❌ Chat completion failed: {e}")
+            logger.warning("Chat completion failed", extra={"error": error_msg, "error_type": type(e).__name__})
             
             # Check for common authentication errors
             if "401" in error_msg or "Access denied" in error_msg:
@@ -310,30 +490,142 @@ class AzureOpenAIService:
                 error_msg = "Access forbidden. Please check your Azure OpenAI permissions and quotas."
             elif "429" in error_msg:
                 error_msg = "Rate limit exceeded. Please try again later or check your quota."
+            elif isinstance(e, QuotaExceededError):
+                error_msg = f"Service is at capacity. Please try again in {e.retry_after:.0f} seconds."
+            elif isinstance(e, CircuitOpenError):
+                error_msg = f"Azure OpenAI is temporarily unavailable. Please try again in {e.retry_after:.0f} seconds."
             
             return {
                 "success": False,
                 "error": error_msg
             }
     
-    def switch_to_backup_key(self):
-        """Switch to backup API key in case of rate limiting"""
-        if len(self.azure_keys) > 1 and self.azure_keys[1] and not self.use_azure_ad:
-            print("🔄 Switching to backup API key...")
-            backup_key = self.azure_keys[1]
-            
-            try:
-                self.client = AzureOpenAI(
-                    api_key=backup_key,
-                    api_version=self.api_version,
-                    azure_endpoint=self.endpoint
-                )
+    async def stream_chat_completion(self, messages: List[Dict], max_tokens: int = 1000) -> AsyncIterator[str]:
+        """
+        Stream chat completion tokens from GPT-4 as they arrive
+
+        The upstream response is only read as fast as the caller consumes
+        tokens, and closing the iterator (client disconnect, cancellation)
+        closes the upstream connection so generation stops.
+        """
+        if not self.is_configured():
+            raise RuntimeError("Azure OpenAI service not configured properly")
+        
+        logger.debug("Streaming chat completion", extra={"deployment": self.deployment_name, "messages": len(messages)})
+        
+        stream = await self._call(
+            "chat",
+            estimate_chat_tokens(messages, max_tokens),
+            lambda client, deployment: client.chat.completions.with_raw_response.create(
+                model=deployment,
+                messages=messages,
+                max_tokens=max_tokens,
+                temperature=0.7,
+                stream=True
+            )
+        )
+        
+        try:
+            async for chunk in stream:
+                # Azure sends content filter results as chunks without choices
+                if not chunk.choices:
+                    continue
                 
-                print("✅ Switched to backup key")
-            except Exception as e:
-                print(f"❌ Failed to switch to backup key: {e}")
-        else:
-            print("❌ No backup key available")
+                token = chunk.choices[0].delta.content
+                if token:
+                    yield token
+        finally:
+            # Runs on cancellation too, so shield the close from it
+            with anyio.CancelScope(shield=True):
+                await stream.close()
+    
+    async def _call(self, kind: str, tokens: int, create):
+        """
+        Run an upstream call on a pool member that is healthy and has quota for it
+
+        `create(client, deployment)` makes a with_raw_response call so the
+        remaining quota can be read from the response headers. A 429 pauses
+        the member's deployment for the Retry-After period; connection,
+        server and auth errors count against the member's circuit breaker.
+        Transient failures are retried with backoff, each retry picking a
+        member afresh.
+        """
+        if self.pool is None:
+            raise RuntimeError("Azure OpenAI service not configured properly")
+        return await self.retry.run(lambda: self._call_once(kind, tokens, create), classify=self._classify)
+    
+    @staticmethod
+    def _classify(error: BaseException):
+        # The throttled member's quota already waits out a 429's Retry-After,
+        # and another member may be able to take the retry straight away
+        retryable, _ = classify_error(error)
+        return retryable, None
+    
+    async def _call_once(self, kind: str, tokens: int, create):
+        with start_span("azure_openai.request", {
+            "gen_ai.system": "azure_openai",
+            "gen_ai.operation.name": kind,
+            "quota.estimated_tokens": tokens
+        }, KIND_CLIENT) as span:
+            # The span includes the wait for quota admission
+            member = await self.pool.acquire(kind, tokens)
+            deployment = member.deployment(kind)
+            span.set_attributes({"gen_ai.request.model": deployment, "azure.pool_member": member.name})
+            healthy = None
+            try:
+                # For streams this times the wait for the response headers
+                with UpstreamCall("azure_openai", deployment):
+                    raw = await create(member.client, deployment)
+            except openai.RateLimitError as e:
+                healthy = True
+                member.quota.throttled(deployment, retry_after_seconds(e.response.headers))
+                raise
+            except MEMBER_FAILURES:
+                healthy = False
+                raise
+            except openai.APIStatusError:
+                # Other 4xx are about the request itself
+                healthy = True
+                raise
+            else:
+                healthy = True
+                member.quota.record(deployment, raw.headers)
+                response = raw.parse()
+                usage = getattr(response, "usage", None)
+                record_usage("azure_openai", deployment, usage)
+                span.set_attributes({
+                    "http.response.status_code": getattr(raw, "status_code", None),
+                    "gen_ai.usage.input_tokens": getattr(usage, "prompt_tokens", None),
+                    "gen_ai.usage.output_tokens": getattr(usage, "completion_tokens", None)
+                })
+                if kind == "image":
+                    record_images("azure_openai", len(response.data or []))
+                return response
+            finally:
+                self.pool.release(member, healthy)
+    
+    def _request_key(
+        self, kind: str, deployment: str, prompt: str,
+        params: Optional[Dict] = None, image_bytes: Optional[bytes] = None
+    ) -> str:
+        """Normalized key for coalescing identical requests to this endpoint"""
+        params = dict(params or {}, endpoint=self.endpoint)
+        return make_cache_key(kind, deployment, prompt, params, image_bytes)
+    
+    def switch_to_backup_key(self):
+        """
+        Take the primary key out of rotation until its circuit half-opens
+
+        Kept for compatibility; the pool now moves traffic off failing
+        or throttled members on its own.
+        """
+        primary = self.pool.members[0] if self.pool and len(self.pool.members) > 1 else None
+        if primary is None:
+            logger.warning("No backup key available")
+            return
+        
+        logger.info("Taking pool member out of rotation", extra={"member": primary.name})
+        primary.breaker.trip()
     
     def get_service_info(self) -> Dict:
         """Get service configuration info"""
@@ -347,46 +639,50 @@ class AzureOpenAIService:
             "configured": self.is_configured(),
             "has_api_key": bool(self.azure_keys[0]),
             "has_endpoint": bool(self.endpoint),
-            "config_valid": self.config_valid
+            "config_valid": self.config_valid,
+            "pool": self.pool.get_stats() if self.pool else None,
+            "retry": self.retry.get_stats()
         }
 
 # Factory function to create service instance
-def create_azure_openai_service(use_azure_ad: bool = None) -> AzureOpenAIService:
+def create_azure_openai_service(
+    use_azure_ad: bool = None,
+    http_client: Optional[httpx.AsyncClient] = None,
+    pool: Optional[AzureClientPool] = None
+) -> AzureOpenAIService:
     """Create Azure OpenAI service instance"""
     if use_azure_ad is None:
         use_azure_ad = os.getenv("USE_AZURE_AD", "false").lower() == "true"
     
-    return AzureOpenAIService(use_azure_ad=use_azure_ad)
+    return AzureOpenAIService(use_azure_ad=use_azure_ad, http_client=http_client, pool=pool)
 
 # Global function for backward compatibility
 def generate_image_with_azure_dalle(prompt: str, style: str = "vivid", quality: str = "standard") -> Optional[str]:
     """Generate image with Azure DALL-E (backward compatibility function)"""
-    try:
-        service = create_azure_openai_service()
-        
-        if not service.is_configured():
-            print("❌ Azure OpenAI service not configured")
-            return None
+    
+    async def _generate() -> Dict:
+        # Pooled connections are bound to the loop that opened them, so this
+        # one-off loop gets its own client instead of the shared one
+        async with create_http_client() as http_client:
+            service = create_azure_openai_service(http_client=http_client)
             
+            if not service.is_configured():
+                return {"success": False, "error": "Azure OpenAI service not configured"}
+            
+            return await service.generate_image(prompt, style, quality)
+    
+    try:
         # This is a sync wrapper for the async function
-        import asyncio
-        
-        try:
-            loop = asyncio.get_event_loop()
-        except RuntimeError:
-            loop = asyncio.new_event_loop()
-            asyncio.set_event_loop(loop)
-        
-        result = loop.run_until_complete(service.generate_image(prompt, style, quality))
+        result = asyncio.run(_generate())
         
         if result.get("success"):
             return result.get("image_url")
         else:
-            print(f"❌ Image generation failed: {result.get('error')}")
+            logger.warning("Image generation failed", extra={"error": result.get("error")})
             return None
             
     except Exception as e:
-        print(f"❌ Error in generate_image_with_azure_dalle: {e}")
+        logger.exception("Error in generate_image_with_azure_dalle")
         return None
 
 # ====================
@@ -475,9 +771,11 @@ async def test_azure_openai_service():
     except Exception as e:
         print(f"❌ Test failed: {e}")
     
+    await close_shared_http_client()
     print(f"\n✅ Testing completed!")
 
 if __name__ == "__main__":
+    setup_logging(log_format="text")
     print("🚀 Azure OpenAI Service for RED AI")
     print("=" * 50)
     
@@ -0,0 +1,157 @@
+"""
+Azure OpenAI client pool for RED AI
+Spreads requests over several API keys and regional endpoints, each with its
+own deployments, quota budget and circuit breaker
+"""
+
+import os
+import json
+from typing import Any, Dict, List, Optional
+
+from quota_manager import QuotaExceededError, QuotaManager
+from resilience import CircuitBreaker, CircuitOpenError
+
+class PoolMember:
+    """One key/endpoint pair and the client that uses it"""
+
+    def __init__(
+        self,
+        name: str,
+        client: Any,
+        endpoint: str,
+        chat_deployment: str,
+        image_deployment: str,
+        quota: QuotaManager,
+        breaker: CircuitBreaker,
+        weight: int = 1
+    ):
+        self.name = name
+        self.client = client
+        self.endpoint = endpoint
+        self.deployments = {"chat": chat_deployment, "image": image_deployment}
+        self.quota = quota
+        self.breaker = breaker
+        self.weight = max(1, weight)
+        self.outstanding = 0
+        self.current_weight = 0
+        self.requests = 0
+
+    def deployment(self, kind: str) -> str:
+        return self.deployments[kind]
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            "endpoint": self.endpoint,
+            "deployments": self.deployments,
+            "weight": self.weight,
+            "outstanding": self.outstanding,
+            "requests": self.requests,
+            "circuit": self.breaker.get_stats()
+        }
+
+class AzureClientPool:
+    """
+    Picks a member for each request
+
+    Strategies:
+    - least_outstanding: fewest in-flight requests per unit of weight
+    - weighted_round_robin: smooth weighted round-robin, as in nginx
+
+    Members whose circuit is open are skipped until it half-opens. Members
+    that would make the request wait for quota, including those paused
+    after a 429, come after those that can send it straight away.
+    """
+
+    STRATEGIES = ("least_outstanding", "weighted_round_robin")
+
+    def __init__(self, members: List[PoolMember], strategy: str = "least_outstanding"):
+        if strategy not in self.STRATEGIES:
+            raise ValueError(f"Unknown pool strategy: {strategy}")
+        self.members = members
+        self.strategy = strategy
+        self._turn = 0
+
+    def _preference(self, candidates: List[PoolMember]) -> List[PoolMember]:
+        if self.strategy == "weighted_round_robin":
+            total = sum(member.weight for member in candidates)
+            for member in candidates:
+                member.current_weight += member.weight
+            ordered = sorted(candidates, key=lambda member: -member.current_weight)
+            ordered[0].current_weight -= total
+            return ordered
+
+        # Rotating the starting point spreads ties across members
+        self._turn = (self._turn + 1) % len(candidates)
+        rotated = candidates[self._turn:] + candidates[:self._turn]
+        return sorted(rotated, key=lambda member: member.outstanding / member.weight)
+
+    async def acquire(self, kind: str, tokens: int = 0) -> PoolMember:
+        """
+        Reserve a member for one request and charge its quota
+
+        Raises CircuitOpenError when every member's circuit is open and
+        QuotaExceededError when no open member can admit the request in time.
+        """
+        candidates = [member for member in self.members if member.breaker.state != CircuitBreaker.OPEN]
+        if not candidates:
+            retry_after = min((member.breaker.retry_after() for member in self.members), default=0.0)
+            raise CircuitOpenError("Azure OpenAI", retry_after)
+
+        ordered = self._preference(candidates)
+        # Stable sort keeps the strategy's order among members with the same wait
+        ordered.sort(key=lambda member: member.quota.wait_time(member.deployment(kind), tokens) > 0)
+
+        shed: Optional[QuotaExceededError] = None
+        for member in ordered:
+            if not member.breaker.allow_request():
+                continue
+            # Set only when this request took the half-open probe slot
+            probe = member.breaker.probe_started
+            try:
+                await member.quota.acquire(member.deployment(kind), tokens)
+            except QuotaExceededError as e:
+                # A shed request never reaches the endpoint, so it must not use up the probe
+                member.breaker.release_probe(probe)
+                if shed is None or e.retry_after < shed.retry_after:
+                    shed = e
+                continue
+            except BaseException:
+                member.breaker.release_probe(probe)
+                raise
+            member.outstanding += 1
+            member.requests += 1
+            return member
+
+        if shed is not None:
+            raise shed
+        raise CircuitOpenError("Azure OpenAI", min(member.breaker.retry_after() for member in candidates))
+
+    def release(self, member: PoolMember, healthy: Optional[bool]):
+        """Finish a request; healthy=None (cancelled) leaves the circuit untouched"""
+        member.outstanding -= 1
+        if healthy is True:
+            member.breaker.record_success()
+        elif healthy is False:
+            member.breaker.record_failure()
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            "strategy": self.strategy,
+            "members": {member.name: member.get_stats() for member in self.members},
+            "quota": {member.name: member.quota.get_stats() for member in self.members}
+        }
+
+def load_pool_config(raw: Optional[str] = None) -> List[Dict[str, Any]]:
+    """
+    Pool members from AZURE_OPENAI_POOL, a JSON list such as
+    [{"name": "eastus", "endpoint": "https://...", "api_key": "...",
+      "chat_deployment": "gpt-4.1", "image_deployment": "dall-e-3",
+      "weight": 2, "tpm": 150000, "rpm": 900, "dalle_rpm": 6}]
+    """
+    raw = raw if raw is not None else os.getenv("AZURE_OPENAI_POOL", "")
+    if not raw.strip():
+        return []
+    members = json.loads(raw)
+    if not isinstance(members, list):
+        raise ValueError("AZURE_OPENAI_POOL must be a JSON list")
+    return members
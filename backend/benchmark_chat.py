@@ -0,0 +1,144 @@
+#!/usr/bin/env python3
+"""
+Chat latency benchmark for RED AI
+Compares the legacy chat path, the sync facade and the awaited chat pipeline
+against a fake Azure endpoint with fixed upstream latency
+"""
+
+import os
+import time
+import asyncio
+import argparse
+import warnings
+import statistics
+from typing import Awaitable, Callable, Dict, List, Optional, Tuple
+
+import httpx
+
+os.environ.setdefault("AZURE_OPENAI_API_KEY", "benchmark-key")
+os.environ.setdefault("AZURE_OPENAI_ENDPOINT", "https://fake-azure.local")
+
+from ai_service import AIService
+from azure_openai_service import AzureOpenAIService, create_http_client
+
+FALLBACK_REPLY = "Извините, сейчас я не могу ответить. Попробуйте позже."
+
+def legacy_chat_completion(service: AIService, message: str, context: Optional[Dict] = None) -> str:
+    """Former AIService.chat_completion, which /api/ai/chat called from its async handler"""
+    try:
+        # Run async method in sync context
+        loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(loop)
+        response = loop.run_until_complete(service.chat_with_ai(message, context))
+        loop.close()
+        return response
+    except Exception as e:
+        print(f"Chat completion error: {e}")
+        return FALLBACK_REPLY
+
+def create_fake_azure_transport(delay: float) -> httpx.MockTransport:
+    """Fake Azure chat completions endpoint that answers after a fixed delay"""
+    async def handle(request: httpx.Request) -> httpx.Response:
+        await asyncio.sleep(delay)
+        return httpx.Response(200, json={
+            "id": "chatcmpl-benchmark",
+            "object": "chat.completion",
+            "created": 0,
+            "model": "gpt-4.1",
+            "choices": [{
+                "index": 0,
+                "message": {"role": "assistant", "content": "ok"},
+                "finish_reason": "stop"
+            }],
+            "usage": {"prompt_tokens": 10, "completion_tokens": 1, "total_tokens": 11}
+        })
+
+    return httpx.MockTransport(handle)
+
+def percentile(samples: List[float], pct: float) -> float:
+    """Nearest-rank percentile"""
+    ordered = sorted(samples)
+    index = max(0, min(len(ordered) - 1, round(pct / 100 * len(ordered)) - 1))
+    return ordered[index]
+
+async def run_sessions(
+    handler: Callable[[str], Awaitable[str]],
+    sessions: int,
+    messages_per_session: int
+) -> Tuple[List[float], int]:
+    """Run concurrent chat sessions; per-message latencies and the number of fallback replies"""
+    latencies: List[float] = []
+    failures = 0
+    started = time.perf_counter()
+
+    async def session(session_id: int):
+        # Every session sends its first message at the same moment; later
+        # messages arrive as soon as the previous reply lands. Measuring from
+        # arrival (not from when the coroutine got scheduled) includes the
+        # time spent waiting behind a blocked event loop.
+        nonlocal failures
+        arrived = started
+        for turn in range(messages_per_session):
+            reply = await handler(f"Сессия {session_id}, вопрос {turn}")
+            failures += reply == FALLBACK_REPLY
+            finished = time.perf_counter()
+            latencies.append(finished - arrived)
+            arrived = finished
+
+    await asyncio.gather(*(session(i) for i in range(sessions)))
+    return latencies, failures
+
+async def benchmark(sessions: int, messages_per_session: int, delay: float) -> Dict[str, Tuple[List[float], int]]:
+    """Measure the three chat paths"""
+    service = AIService()
+    service.azure_service = AzureOpenAIService(
+        http_client=create_http_client(transport=create_fake_azure_transport(delay))
+    )
+
+    # Before: the async handler called the legacy sync wrapper. Its nested
+    # run_until_complete raises inside a running loop, so it answers with the
+    # fallback reply; the failures column shows it
+    async def legacy_handler(message: str) -> str:
+        return legacy_chat_completion(service, message)
+
+    # The current sync facade (run_sync) called from the handler: blocks the loop
+    async def blocking_handler(message: str) -> str:
+        return service.chat_completion(message)
+
+    async def awaited_handler(message: str) -> str:
+        return await service.chat_with_ai(message)
+
+    with warnings.catch_warnings():
+        # The legacy wrapper leaves its chat_with_ai coroutine unawaited on every call
+        warnings.simplefilter("ignore", RuntimeWarning)
+        legacy = await run_sessions(legacy_handler, sessions, messages_per_session)
+
+    return {
+        "before (legacy loop)": legacy,
+        "sync facade (run_sync)": await run_sessions(blocking_handler, sessions, messages_per_session),
+        "after (awaited)": await run_sessions(awaited_handler, sessions, messages_per_session)
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark /api/ai/chat latency")
+    parser.add_argument("--sessions", type=int, default=50, help="Concurrent chat sessions")
+    parser.add_argument("--messages", type=int, default=2, help="Messages per session")
+    parser.add_argument("--delay", type=float, default=0.1, help="Fake upstream latency in seconds")
+    args = parser.parse_args()
+
+    results = asyncio.run(benchmark(args.sessions, args.messages, args.delay))
+
+    print(f"\n📊 {args.sessions} concurrent sessions, {args.messages} messages each, "
+          f"{args.delay * 1000:.0f} ms upstream latency")
+    print(f"{'path':<26}{'p50 (ms)':>12}{'p99 (ms)':>12}{'mean (ms)':>12}{'failed':>10}")
+    for name, (latencies, failures) in results.items():
+        print(
+            f"{name:<26}"
+            f"{percentile(latencies, 50) * 1000:>12.1f}"
+            f"{percentile(latencies, 99) * 1000:>12.1f}"
+            f"{statistics.mean(latencies) * 1000:>12.1f}"
+            f"{failures:>10}"
+        )
+
+if __name__ == "__main__":
+    main()
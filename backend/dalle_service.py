@@ -10,8 +10,9 @@ import json
 import base64
 import logging
 from datetime import datetime
-from typing import Dict, List, Optional, Any
-from flask import Flask, request, jsonify
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import Dict, Iterator, List, Optional, Any
+from flask import Flask, Response, request, jsonify, stream_with_context
 from flask_cors import CORS
 import openai
 from openai import OpenAI
@@ -49,11 +50,21 @@ except Exception as e:
 # Generation history storage (in production, use a proper database)
 generation_history: List[Dict[str, Any]] = []
 
+# Maximum number of DALL·E requests in flight at once (shared by all requests)
+DALLE_MAX_CONCURRENCY = int(os.getenv('DALLE_MAX_CONCURRENCY', '4'))
+
 class DalleGenerator:
     """DALL·E 3 Image Generator"""
     
-    def __init__(self, openai_client: OpenAI):
+    def __init__(self, openai_client: OpenAI, max_concurrency: int = DALLE_MAX_CONCURRENCY):
         self.client = openai_client
+        self.max_concurrency = max(1, max_concurrency)
+        # DALL·E 3 only supports n=1, so each image is its own request;
+        # the pool runs them side by side and caps total upstream load
+        self.executor = ThreadPoolExecutor(
+            max_workers=self.max_concurrency,
+            thread_name_prefix="dalle"
+        )
         
     def generate_images(
         self,
@@ -77,82 +88,28 @@ class DalleGenerator:
             Dictionary with generated images and metadata
         """
         try:
-            # Validate inputs
-            if not prompt or len(prompt.strip()) == 0:
-                raise ValueError("Prompt is required")
-                
-            if image_count < 1 or image_count > 4:
-                raise ValueError("Image count must be between 1 and 4")
-                
-            if quality not in ["standard", "hd"]:
-                raise ValueError("Quality must be 'standard' or 'hd'")
-                
-            if style not in ["vivid", "natural"]:
-                raise ValueError("Style must be 'vivid' or 'natural'")
+            self._validate_request(prompt, image_count, quality, style)
             
             # Enhance prompt
             enhanced_prompt = self._enhance_prompt(prompt, reference_image)
             
-            # Generate images
-            generated_images = []
-            
-            for i in range(image_count):
-                try:
-                    logger.info(f"Generating image {i + 1}/{image_count}")
-                    
-                    response = self.client.images.generate(
-                        model="dall-e-3",
-                        prompt=enhanced_prompt,
-                        n=1,  # DALL·E 3 only supports n=1
-                        size="1024x1024",
-                        quality=quality,
-                        style=style,
-                        response_format="url"
-                    )
-                    
-                    if response.data and response.data[0] and response.data[0].url:
-                        image_url = response.data[0].url
-                        generated_images.append({
-                            "url": image_url,
-                            "revised_prompt": getattr(response.data[0], 'revised_prompt', enhanced_prompt),
-                            "index": i
-                        })
-                        logger.info(f"Successfully generated image {i + 1}")
-                    else:
-                        logger.error(f"Failed to generate image {i + 1}")
-                        
-                except Exception as img_error:
-                    logger.error(f"Error generating image {i + 1}: {img_error}")
-                    continue
+            # Generate images concurrently, then restore request order
+            generated_images = sorted(
+                self.iter_images(enhanced_prompt, image_count, quality, style),
+                key=lambda image: image["index"]
+            )
             
             if not generated_images:
                 raise Exception("Failed to generate any images")
             
-            # Create generation record
-            generation_id = str(uuid.uuid4())
-            generation_record = {
-                "id": generation_id,
-                "timestamp": datetime.utcnow().isoformat(),
-                "original_prompt": prompt,
-                "enhanced_prompt": enhanced_prompt,
-                "image_count": image_count,
-                "generated_count": len(generated_images),
-                "images": generated_images,
-                "quality": quality,
-                "style": style,
-                "has_reference_image": bool(reference_image)
-            }
-            
-            # Store in history
-            generation_history.append(generation_record)
-            
-            # Keep only last 100 generations
-            if len(generation_history) > 100:
-                generation_history.pop(0)
+            generation_record = self._record_generation(
+                prompt, enhanced_prompt, image_count, generated_images,
+                quality, style, bool(reference_image)
+            )
             
             return {
                 "success": True,
-                "generation_id": generation_id,
+                "generation_id": generation_record["id"],
                 "images": [img["url"] for img in generated_images],
                 "generation": generation_record,
                 "metadata": {
@@ -174,6 +131,117 @@ class DalleGenerator:
                 "error_type": type(e).__name__
             }
     
+    def iter_images(
+        self,
+        enhanced_prompt: str,
+        image_count: int,
+        quality: str,
+        style: str
+    ) -> Iterator[Dict[str, Any]]:
+        """
+        Dispatch all generations at once and yield each image as it completes
+        
+        Failed generations are logged and skipped. Closing the iterator early
+        cancels the generations that have not started yet.
+        """
+        futures = [
+            self.executor.submit(self._generate_single, enhanced_prompt, quality, style, i, image_count)
+            for i in range(image_count)
+        ]
+        
+        try:
+            for future in as_completed(futures):
+                image = future.result()
+                if image:
+                    yield image
+        finally:
+            for future in futures:
+                future.cancel()
+    
+    def _generate_single(
+        self,
+        enhanced_prompt: str,
+        quality: str,
+        style: str,
+        index: int,
+        image_count: int
+    ) -> Optional[Dict[str, Any]]:
+        """Generate one image; returns None on failure"""
+        try:
+            logger.info(f"Generating image {index + 1}/{image_count}")
+            
+            response = self.client.images.generate(
+                model="dall-e-3",
+                prompt=enhanced_prompt,
+                n=1,  # DALL·E 3 only supports n=1
+                size="1024x1024",
+                quality=quality,
+                style=style,
+                response_format="url"
+            )
+            
+            if response.data and response.data[0] and response.data[0].url:
+                logger.info(f"Successfully generated image {index + 1}")
+                return {
+                    "url": response.data[0].url,
+                    "revised_prompt": getattr(response.data[0], 'revised_prompt', enhanced_prompt),
+                    "index": index
+                }
+            
+            logger.error(f"Failed to generate image {index + 1}")
+            return None
+            
+        except Exception as img_error:
+            logger.error(f"Error generating image {index + 1}: {img_error}")
+            return None
+    
+    def _validate_request(self, prompt: str, image_count: int, quality: str, style: str):
+        """Validate generation parameters"""
+        if not prompt or len(prompt.strip()) == 0:
+            raise ValueError("Prompt is required")
+            
+        if image_count < 1 or image_count > 4:
+            raise ValueError("Image count must be between 1 and 4")
+            
+        if quality not in ["standard", "hd"]:
+            raise ValueError("Quality must be 'standard' or 'hd'")
+            
+        if style not in ["vivid", "natural"]:
+            raise ValueError("Style must be 'vivid' or 'natural'")
+    
+    def _record_generation(
+        self,
+        prompt: str,
+        enhanced_prompt: str,
+        image_count: int,
+        generated_images: List[Dict[str, Any]],
+        quality: str,
+        style: str,
+        has_reference_image: bool
+    ) -> Dict[str, Any]:
+        """Create a generation record and store it in history"""
+        generation_record = {
+            "id": str(uuid.uuid4()),
+            "timestamp": datetime.utcnow().isoformat(),
+            "original_prompt": prompt,
+            "enhanced_prompt": enhanced_prompt,
+            "image_count": image_count,
+            "generated_count": len(generated_images),
+            "images": generated_images,
+            "quality": quality,
+            "style": style,
+            "has_reference_image": has_reference_image
+        }
+        
+        # Store in history
+        generation_history.append(generation_record)
+        
+        # Keep only last 100 generations
+        if len(generation_history) > 100:
+            generation_history.pop(0)
+        
+        return generation_record
+    
     def _enhance_prompt(self, prompt: str, reference_image: Optional[str] = None) -> str:
         """Enhance the user prompt for better results"""
         enhanced = prompt.strip()
@@ -186,6 +254,38 @@ class DalleGenerator:
         
         return enhanced
 
+def parse_generation_request(data: Any) -> Dict[str, Any]:
+    """
+    Generation parameters from a request body
+    
+    imageCount may be a JSON integer or a numeric string. Raises ValueError
+    for malformed input, so it is answered with 400 instead of failing later.
+    """
+    if not isinstance(data, dict):
+        raise ValueError("Request body must be a JSON object")
+    
+    prompt = data.get('prompt', '')
+    if not isinstance(prompt, str):
+        raise ValueError("Prompt must be a string")
+    
+    image_count = data.get('imageCount', 1)
+    if isinstance(image_count, bool) or not isinstance(image_count, (int, float, str)):
+        raise ValueError("Image count must be an integer")
+    if isinstance(image_count, float) and not image_count.is_integer():
+        raise ValueError("Image count must be an integer")
+    try:
+        image_count = int(image_count)
+    except ValueError:
+        raise ValueError("Image count must be an integer")
+    
+    return {
+        "prompt": prompt.strip(),
+        "image_count": image_count,
+        "quality": data.get('quality', 'standard'),
+        "style": data.get('style', 'vivid'),
+        "reference_image": data.get('referenceImage')
+    }
+
 # Global generator instance
 generator = None
 if client:
@@ -216,11 +316,12 @@ def generate_images_endpoint():
         if not data:
             return jsonify({"error": "No JSON data provided"}), 400
         
-        prompt = data.get('prompt', '').strip()
-        image_count = data.get('imageCount', 1)
-        quality = data.get('quality', 'standard')
-        style = data.get('style', 'vivid')
-        reference_image = data.get('referenceImage')
+        try:
+            params = parse_generation_request(data)
+        except ValueError as e:
+            return jsonify({"error": str(e)}), 400
+        prompt, image_count = params["prompt"], params["image_count"]
+        quality, style, reference_image = params["quality"], params["style"], params["reference_image"]
         
         # Validate required fields
         if not prompt:
@@ -252,6 +353,50 @@ def generate_images_endpoint():
             "details": str(e)
         }), 500
 
+@app.route('/generate/stream', methods=['POST'])
+def generate_images_stream_endpoint():
+    """Generate images using DALL·E 3, streaming each image as NDJSON when it is ready"""
+    if not generator:
+        return jsonify({
+            "error": "OpenAI client not configured",
+            "details": "OPENAI_API_KEY environment variable not set"
+        }), 500
+    
+    data = request.get_json()
+    if not data:
+        return jsonify({"error": "No JSON data provided"}), 400
+    
+    try:
+        params = parse_generation_request(data)
+        prompt, image_count = params["prompt"], params["image_count"]
+        quality, style, reference_image = params["quality"], params["style"], params["reference_image"]
+        generator._validate_request(prompt, image_count, quality, style)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    
+    logger.info(f"Streaming generation request: {prompt[:50]}... (count: {image_count}, quality: {quality}, style: {style})")
+    
+    enhanced_prompt = generator._enhance_prompt(prompt, reference_image)
+    
+    def events():
+        generated_images = []
+        for image in generator.iter_images(enhanced_prompt, image_count, quality, style):
+            generated_images.append(image)
+            yield json.dumps({"type": "image", "image": image}) + "\n"
+        
+        if not generated_images:
+            yield json.dumps({"type": "error", "error": "Failed to generate any images"}) + "\n"
+            return
+        
+        generated_images.sort(key=lambda image: image["index"])
+        generation_record = generator._record_generation(
+            prompt, enhanced_prompt, image_count, generated_images,
+            quality, style, bool(reference_image)
+        )
+        yield json.dumps({"type": "complete", "generation": generation_record}) + "\n"
+    
+    return Response(stream_with_context(events()), mimetype='application/x-ndjson')
+
 @app.route('/history', methods=['GET'])
 def get_generation_history():
     """Get generation history"""
@@ -358,6 +503,7 @@ def not_found(error):
         "available_endpoints": [
             "/health",
             "/generate",
+            "/generate/stream",
             "/history",
             "/regenerate/<generation_id>",
             "/stats"
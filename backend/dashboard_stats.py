@@ -0,0 +1,290 @@
+"""
+Dashboard statistics for RED AI
+Counters maintained on every repository write, so stats reads are O(1),
+plus a reconciliation pass that rebuilds them from the stored data
+"""
+
+import asyncio
+import threading
+from collections import Counter, defaultdict
+from datetime import date, datetime, timedelta
+from typing import Any, Dict, List, Optional, Tuple
+
+from sqlalchemy import select, update
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import sessionmaker
+
+from repositories import DashboardCounterRecord, Repositories
+from structured_logging import get_logger
+
+logger = get_logger("dashboard_stats")
+
+# (value, version) of one counter; version 0 means the counter does not exist yet
+Versioned = Tuple[int, int]
+
+def task_counters(task) -> Counter:
+    return Counter(tasks=1, tasks_completed=int(task.completed))
+
+def client_counters(client) -> Counter:
+    return Counter(clients=1, projects=client.projects_count)
+
+def design_counters(design) -> Counter:
+    # Daily rollup, summed into week-over-week growth
+    return Counter({"designs": 1, f"designs:{design.created_at.date().isoformat()}": 1})
+
+class CounterStore:
+    """Named integer counters per tenant, each with a version bumped on every change"""
+
+    def add(self, tenant: str, delta: Counter):
+        raise NotImplementedError
+
+    def read(self, tenant: str, names: List[str]) -> Dict[str, int]:
+        raise NotImplementedError
+
+    def read_all(self) -> Dict[str, Dict[str, Versioned]]:
+        raise NotImplementedError
+
+    def compare_and_set(self, tenant: str, name: str, version: int, value: int) -> bool:
+        """Set a counter only if its version is still `version`; False if it changed meanwhile"""
+        raise NotImplementedError
+
+    def tenants(self) -> int:
+        raise NotImplementedError
+
+class InMemoryCounterStore(CounterStore):
+    """Counters of this process only; used with the in-memory repositories"""
+
+    def __init__(self):
+        self._counters: Dict[str, Dict[str, List[int]]] = defaultdict(dict)
+        # Writes arrive from FastAPI's threadpool
+        self._lock = threading.Lock()
+
+    def add(self, tenant: str, delta: Counter):
+        with self._lock:
+            counters = self._counters[tenant]
+            for name, value in delta.items():
+                counter = counters.setdefault(name, [0, 0])
+                counter[0] += value
+                counter[1] += 1
+
+    def read(self, tenant: str, names: List[str]) -> Dict[str, int]:
+        with self._lock:
+            counters = self._counters.get(tenant, {})
+            return {name: counters[name][0] for name in names if name in counters}
+
+    def read_all(self) -> Dict[str, Dict[str, Versioned]]:
+        with self._lock:
+            return {
+                tenant: {name: (value, version) for name, (value, version) in counters.items()}
+                for tenant, counters in self._counters.items()
+            }
+
+    def compare_and_set(self, tenant: str, name: str, version: int, value: int) -> bool:
+        with self._lock:
+            counter = self._counters[tenant].get(name, [0, 0])
+            if counter[1] != version:
+                return False
+            self._counters[tenant][name] = [value, version + 1]
+            return True
+
+    def tenants(self) -> int:
+        with self._lock:
+            return len(self._counters)
+
+class SQLCounterStore(CounterStore):
+    """
+    Counters in the dashboard_counters table, shared by every worker process
+
+    Each process adds the deltas of its own writes with an atomic
+    `value = value + delta`, so the stats are current in all of them.
+    """
+
+    def __init__(self, session_factory: sessionmaker):
+        self.session_factory = session_factory
+
+    def add(self, tenant: str, delta: Counter):
+        record = DashboardCounterRecord
+        for _ in range(2):
+            with self.session_factory() as session:
+                for name, value in delta.items():
+                    updated = session.execute(
+                        update(record)
+                        .where(record.tenant_id == tenant, record.name == name)
+                        .values(value=record.value + value, version=record.version + 1)
+                    )
+                    if updated.rowcount == 0:
+                        session.add(record(tenant_id=tenant, name=name, value=value, version=1))
+                try:
+                    session.commit()
+                    return
+                except IntegrityError:
+                    # Another process inserted the same counter first: add to its row instead
+                    session.rollback()
+        raise RuntimeError(f"Could not update dashboard counters for tenant {tenant}")
+
+    def read(self, tenant: str, names: List[str]) -> Dict[str, int]:
+        record = DashboardCounterRecord
+        query = select(record.name, record.value).where(record.tenant_id == tenant, record.name.in_(names))
+        with self.session_factory() as session:
+            return {name: value for name, value in session.execute(query)}
+
+    def read_all(self) -> Dict[str, Dict[str, Versioned]]:
+        record = DashboardCounterRecord
+        counters: Dict[str, Dict[str, Versioned]] = defaultdict(dict)
+        with self.session_factory() as session:
+            for tenant, name, value, version in session.execute(
+                select(record.tenant_id, record.name, record.value, record.version)
+            ):
+                counters[tenant][name] = (value, version)
+        return counters
+
+    def compare_and_set(self, tenant: str, name: str, version: int, value: int) -> bool:
+        record = DashboardCounterRecord
+        with self.session_factory() as session:
+            if version == 0:
+                session.add(record(tenant_id=tenant, name=name, value=value, version=1))
+            else:
+                updated = session.execute(
+                    update(record)
+                    .where(record.tenant_id == tenant, record.name == name, record.version == version)
+                    .values(value=value, version=version + 1)
+                )
+                if updated.rowcount == 0:
+                    return False
+            try:
+                session.commit()
+            except IntegrityError:
+                session.rollback()
+                return False
+        return True
+
+    def tenants(self) -> int:
+        with self.session_factory() as session:
+            return len(list(session.scalars(select(DashboardCounterRecord.tenant_id).distinct())))
+
+def create_counter_store(repositories: Repositories) -> CounterStore:
+    """Counters in the repositories' database when there is one, otherwise in this process"""
+    if repositories.session_factory is not None:
+        return SQLCounterStore(repositories.session_factory)
+    return InMemoryCounterStore()
+
+class DashboardStatsAggregator:
+    """Per-tenant counters kept in step with the dashboard repositories"""
+
+    def __init__(
+        self,
+        repositories: Repositories,
+        reconcile_interval: float = 300.0,
+        store: Optional[CounterStore] = None
+    ):
+        self.repositories = repositories
+        self.reconcile_interval = reconcile_interval
+        self.contributions = {
+            "tasks": task_counters,
+            "clients": client_counters,
+            "designs": design_counters
+        }
+        self.store = store or create_counter_store(repositories)
+        self._task: Optional[asyncio.Task] = None
+        self.last_reconciled: Optional[str] = None
+        self.last_drift: Dict[str, Dict[str, int]] = {}
+        self.last_deferred = 0
+
+        for name, contribution in self.contributions.items():
+            getattr(repositories, name).subscribe(self._listener(contribution))
+
+    def _listener(self, contribution):
+        def on_change(tenant: str, old, new):
+            delta = Counter()
+            if new is not None:
+                delta.update(contribution(new))
+            if old is not None:
+                delta.subtract(contribution(old))
+            delta = Counter({key: value for key, value in delta.items() if value})
+            if delta:
+                self.store.add(tenant, delta)
+        return on_change
+
+    def snapshot(self, tenant: str, today: Optional[date] = None) -> Dict[str, Any]:
+        """Current aggregates for a tenant; constant time regardless of data size"""
+        today = today or date.today()
+        days = [f"designs:{(today - timedelta(days=day)).isoformat()}" for day in range(14)]
+        counters = self.store.read(tenant, ["tasks", "tasks_completed", "clients", "projects", "designs", *days])
+
+        this_week = sum(counters.get(day, 0) for day in days[:7])
+        last_week = sum(counters.get(day, 0) for day in days[7:])
+        return {
+            "tasks": counters.get("tasks", 0),
+            "tasks_completed": counters.get("tasks_completed", 0),
+            "clients": counters.get("clients", 0),
+            "projects": counters.get("projects", 0),
+            "designs": counters.get("designs", 0),
+            "designs_this_week": this_week,
+            "weekly_growth": round((this_week - last_week) / last_week * 100, 1) if last_week else 0.0
+        }
+
+    def reconcile(self) -> Dict[str, Dict[str, int]]:
+        """
+        Rebuild every tenant's counters from a full scan and return the drift found
+
+        Blocking; run it in a worker thread. Counter versions are read before
+        the scan and each correction is a compare-and-set on that version, so
+        a counter written while the scan ran (by any process) is left alone
+        and rechecked on the next pass instead of losing the write.
+        """
+        before = self.store.read_all()
+        rebuilt: Dict[str, Counter] = defaultdict(Counter)
+        for name, contribution in self.contributions.items():
+            repository = getattr(self.repositories, name)
+            for tenant in repository.tenants():
+                for item in repository.scan(tenant):
+                    rebuilt[tenant].update(contribution(item))
+
+        drift: Dict[str, Dict[str, int]] = {}
+        deferred = 0
+        for tenant in set(rebuilt) | set(before):
+            expected, stored = rebuilt.get(tenant, Counter()), before.get(tenant, {})
+            for key in set(expected) | set(stored):
+                value, version = stored.get(key, (0, 0))
+                if expected.get(key, 0) == value:
+                    continue
+                if self.store.compare_and_set(tenant, key, version, expected.get(key, 0)):
+                    drift.setdefault(tenant, {})[key] = expected.get(key, 0) - value
+                else:
+                    deferred += 1
+
+        self.last_reconciled = datetime.now().isoformat()
+        self.last_drift = drift
+        self.last_deferred = deferred
+        if drift:
+            logger.warning("Dashboard stats drift corrected", extra={"tenants": len(drift), "deferred": deferred})
+        return drift
+
+    def start(self):
+        """Start periodic reconciliation; must be called from a running event loop"""
+        if self._task is None:
+            self._task = asyncio.create_task(self._reconcile_periodically())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+
+    async def _reconcile_periodically(self):
+        while True:
+            await asyncio.sleep(self.reconcile_interval)
+            try:
+                await asyncio.to_thread(self.reconcile)
+            except Exception:
+                logger.exception("Dashboard stats reconciliation failed")
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            "store": "sql" if isinstance(self.store, SQLCounterStore) else "memory",
+            "tenants": self.store.tenants(),
+            "reconcile_interval_seconds": self.reconcile_interval,
+            "last_reconciled": self.last_reconciled,
+            "last_drift": self.last_drift,
+            "last_deferred": self.last_deferred
+        }
@@ -0,0 +1,39 @@
+"""
+Database setup for RED AI
+SQLAlchemy engine and session factory for SQLite or PostgreSQL
+"""
+
+import os
+from typing import Optional
+
+from sqlalchemy import create_engine
+from sqlalchemy.engine import Engine
+from sqlalchemy.orm import declarative_base, sessionmaker
+from sqlalchemy.pool import StaticPool
+
+# Base class for ORM records
+Base = declarative_base()
+
+def create_db_engine(database_url: Optional[str] = None) -> Engine:
+    """Create engine from argument or DATABASE_URL"""
+    database_url = database_url or os.getenv("DATABASE_URL", "sqlite:///./red_ai.db")
+
+    if database_url.startswith("sqlite"):
+        # In-memory SQLite lives in a single connection, so every session must share it
+        in_memory = database_url in ("sqlite://", "sqlite:///:memory:")
+        return create_engine(
+            database_url,
+            connect_args={"check_same_thread": False},
+            poolclass=StaticPool if in_memory else None
+        )
+
+    return create_engine(
+        database_url,
+        pool_pre_ping=True,
+        pool_recycle=300,
+        pool_size=10,
+        max_overflow=20
+    )
+
+def create_session_factory(engine: Engine) -> sessionmaker:
+    return sessionmaker(autocommit=False, autoflush=False, expire_on_commit=False, bind=engine)
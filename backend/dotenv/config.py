@@ -4,7 +4,7 @@ Loads environment variables and provides configuration classes
 """
 
 import os
-from typing import List
+from typing import Dict, List
 from dotenv import load_dotenv
 
 # Load environment variables from .env file
@@ -40,13 +40,40 @@ class Settings:
     
     # Database Configuration
     DATABASE_URL: str = os.getenv("DATABASE_URL", "sqlite:///./red_ai.db")
+    REPOSITORY_BACKEND: str = os.getenv("REPOSITORY_BACKEND", "sql")  # sql (DATABASE_URL), memory
+    # Demo data for the default tenant; on by default only for the per-process memory backend
+    SEED_DEMO_DATA: bool = os.getenv(
+        "SEED_DEMO_DATA", "true" if REPOSITORY_BACKEND.lower() == "memory" else "false"
+    ).lower() == "true"
+    STATS_RECONCILE_INTERVAL: float = float(os.getenv("STATS_RECONCILE_INTERVAL", "300"))
+    # Dashboard tenants: comma-separated api_key:tenant pairs; requests without a key use the default tenant
+    TENANT_API_KEYS: Dict[str, str] = dict(
+        pair.strip().split(":", 1) for pair in os.getenv("TENANT_API_KEYS", "").split(",") if ":" in pair
+    )
     
     # Redis Configuration
     REDIS_URL: str = os.getenv("REDIS_URL", "redis://localhost:6379")
     
+    # AI Response Cache Configuration
+    CACHE_BACKEND: str = os.getenv("CACHE_BACKEND", "memory")  # memory, redis, none
+    CACHE_TTL_SECONDS: int = int(os.getenv("CACHE_TTL_SECONDS", "3600"))
+    CACHE_MAX_ENTRIES: int = int(os.getenv("CACHE_MAX_ENTRIES", "1024"))
+    
+    # Image Generation Job Queue Configuration
+    JOB_QUEUE_BACKEND: str = os.getenv("JOB_QUEUE_BACKEND", "memory")  # memory, redis
+    JOB_WORKERS: int = int(os.getenv("JOB_WORKERS", "4"))
+    JOB_MAX_PENDING_PER_USER: int = int(os.getenv("JOB_MAX_PENDING_PER_USER", "20"))
+    JOB_RESULT_TTL_SECONDS: int = int(os.getenv("JOB_RESULT_TTL_SECONDS", "3600"))
+    
+    # Generated Image Artifact Configuration
+    ARTIFACT_BACKEND: str = os.getenv("ARTIFACT_BACKEND", "local")
+    ARTIFACT_DIR: str = os.getenv("ARTIFACT_DIR", os.getenv("GENERATED_IMAGES_DIR", "generated-images"))
+    ARTIFACT_BASE_URL: str = os.getenv("ARTIFACT_BASE_URL", "/api/artifacts")
+    
     # Logging Configuration
     LOG_LEVEL: str = os.getenv("LOG_LEVEL", "INFO")
     LOG_FILE: str = os.getenv("LOG_FILE", "red_ai.log")
+    LOG_FORMAT: str = os.getenv("LOG_FORMAT", "json")
     
     # File Upload Configuration
     MAX_FILE_SIZE: int = int(os.getenv("MAX_FILE_SIZE", "10485760"))  # 10MB
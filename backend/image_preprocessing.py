@@ -0,0 +1,202 @@
+"""
+Image preprocessing for RED AI vision requests
+Checks uploads from their header before decoding them, then fixes EXIF
+orientation, downscales to the resolution GPT-4 Vision actually tiles and
+recompresses to a byte budget, so a phone photo goes upstream as a few
+hundred kilobytes instead of megabytes of base64
+"""
+
+import io
+import os
+import math
+import base64
+from typing import Tuple
+
+from PIL import Image, ImageOps, UnidentifiedImageError
+
+# Formats accepted from clients; MPO is what many phone cameras write as .jpg
+MIME_TYPES = {
+    "JPEG": "image/jpeg",
+    "MPO": "image/jpeg",
+    "PNG": "image/png",
+    "WEBP": "image/webp",
+    "GIF": "image/gif",
+    "BMP": "image/bmp",
+    "TIFF": "image/tiff"
+}
+# Formats the vision API takes as they are
+PASSTHROUGH_FORMATS = {"JPEG", "PNG"}
+# Drawings and scans, which usually compress better as PNG than as JPEG
+GRAPHIC_FORMATS = {"PNG", "GIF", "BMP", "TIFF"}
+
+# How GPT-4 Vision sees an image: high detail fits it in 2048x2048, scales the
+# short side down to 768 and bills 170 tokens per 512px tile on top of 85;
+# low detail looks at a 512x512 version for 85 tokens
+HIGH_DETAIL_MAX_SIDE = 2048
+HIGH_DETAIL_SHORT_SIDE = 768
+LOW_DETAIL_SIDE = 512
+TILE_SIDE = 512
+BASE_TOKENS = 85
+TILE_TOKENS = 170
+
+EXIF_ORIENTATION = 0x0112
+ROTATED_ORIENTATIONS = {5, 6, 7, 8}
+
+class ImageValidationError(ValueError):
+    """Upload is not an image we can send to a vision deployment"""
+
+def target_size(width: int, height: int, detail: str) -> Tuple[int, int]:
+    """Largest size that still adds information at the given detail level"""
+    if detail == "low":
+        scale = min(1.0, LOW_DETAIL_SIDE / max(width, height))
+    else:
+        scale = min(1.0, HIGH_DETAIL_MAX_SIDE / max(width, height), HIGH_DETAIL_SHORT_SIDE / min(width, height))
+    return max(1, round(width * scale)), max(1, round(height * scale))
+
+def vision_tokens(width: int, height: int, detail: str) -> int:
+    """Image tokens a vision request is billed for an image of this size"""
+    if detail == "low":
+        return BASE_TOKENS
+    width, height = target_size(width, height, "high")
+    return BASE_TOKENS + TILE_TOKENS * math.ceil(width / TILE_SIDE) * math.ceil(height / TILE_SIDE)
+
+def sniff_mime_type(image_base64: str, default: str = "image/jpeg") -> str:
+    """MIME type from the magic bytes at the start of base64 image data"""
+    for prefix, mime_type in (("/9j/", "image/jpeg"), ("iVBORw0KGgo", "image/png"), ("R0lGOD", "image/gif"), ("UklGR", "image/webp")):
+        if image_base64.startswith(prefix):
+            return mime_type
+    return default
+
+def probe_image(data: bytes, max_pixels: int = 50_000_000) -> Image.Image:
+    """
+    Open an upload without decoding its pixels
+
+    Pillow reads only the header here, so a non-image, an unsupported format
+    or a decompression bomb is rejected before any pixel memory is used.
+    """
+    if not data:
+        raise ImageValidationError("Image is empty")
+    try:
+        image = Image.open(io.BytesIO(data))
+    except Image.DecompressionBombError:
+        raise ImageValidationError("Image dimensions are too large")
+    except (UnidentifiedImageError, OSError):
+        raise ImageValidationError("File is not a supported image")
+    if image.format not in MIME_TYPES:
+        raise ImageValidationError(f"Unsupported image format: {image.format}")
+    width, height = image.size
+    if width * height > max_pixels:
+        raise ImageValidationError(f"Image dimensions are too large: {width}x{height}")
+    return image
+
+class PreparedImage:
+    """Image bytes ready for a vision request, with the detail level to ask for"""
+
+    def __init__(self, data: bytes, mime_type: str, width: int, height: int, detail: str, original_bytes: int):
+        self.data = data
+        self.mime_type = mime_type
+        self.width = width
+        self.height = height
+        self.detail = detail
+        self.original_bytes = original_bytes
+
+    @property
+    def base64(self) -> str:
+        return base64.b64encode(self.data).decode("ascii")
+
+    @property
+    def tokens(self) -> int:
+        return vision_tokens(self.width, self.height, self.detail)
+
+class ImagePreprocessor:
+    """
+    Turns an upload into the smallest image that loses nothing for the model
+
+    detail="auto" asks for low detail when the image fits in one low-detail
+    view anyway, high detail otherwise. JPEG input is decoded at a reduced
+    scale straight from the DCT when the target is much smaller. Images that
+    are already small enough and upright are passed through untouched.
+    """
+
+    def __init__(
+        self,
+        max_bytes: int = 500_000,
+        detail: str = "auto",
+        max_pixels: int = 50_000_000,
+        jpeg_qualities: Tuple[int, ...] = (85, 75, 65, 50)
+    ):
+        self.max_bytes = max_bytes
+        self.detail = detail
+        self.max_pixels = max_pixels
+        self.jpeg_qualities = jpeg_qualities
+
+    def choose_detail(self, width: int, height: int) -> str:
+        if self.detail in ("low", "high"):
+            return self.detail
+        return "low" if max(width, height) <= LOW_DETAIL_SIDE else "high"
+
+    def prepare(self, data: bytes) -> PreparedImage:
+        """Validate, orient, downscale and recompress; CPU-bound, run it off the event loop"""
+        image = probe_image(data, self.max_pixels)
+        source_format = image.format
+        orientation = image.getexif().get(EXIF_ORIENTATION, 1)
+        width, height = image.size
+        if orientation in ROTATED_ORIENTATIONS:
+            width, height = height, width
+
+        detail = self.choose_detail(width, height)
+        size = target_size(width, height, detail)
+
+        if (
+            size == (width, height) and orientation == 1
+            and source_format in PASSTHROUGH_FORMATS and len(data) <= self.max_bytes
+        ):
+            return PreparedImage(data, MIME_TYPES[source_format], width, height, detail, len(data))
+
+        if source_format in ("JPEG", "MPO"):
+            # Decode at 1/2, 1/4 or 1/8 scale when that is still at least the target
+            draft_size = (size[1], size[0]) if orientation in ROTATED_ORIENTATIONS else size
+            image.draft("RGB", draft_size)
+        image = ImageOps.exif_transpose(image)
+
+        while True:
+            if image.size != size:
+                image = image.resize(size, Image.LANCZOS, reducing_gap=3.0)
+            encoded, mime_type = self._encode(image, source_format in GRAPHIC_FORMATS)
+            if len(encoded) <= self.max_bytes or max(size) <= LOW_DETAIL_SIDE:
+                return PreparedImage(encoded, mime_type, size[0], size[1], detail, len(data))
+            # Even the lowest quality is over budget: give up resolution instead
+            size = (max(1, round(size[0] * 0.75)), max(1, round(size[1] * 0.75)))
+
+    def _encode(self, image: Image.Image, prefer_png: bool) -> Tuple[bytes, str]:
+        if prefer_png:
+            png = _save(image if image.mode in ("RGB", "RGBA", "L", "LA", "P") else image.convert("RGBA"), "PNG")
+            if len(png) <= self.max_bytes:
+                return png, "image/png"
+
+        if image.mode in ("RGBA", "LA", "P"):
+            # JPEG has no alpha: flatten transparent areas onto white
+            rgba = image.convert("RGBA")
+            image = Image.new("RGB", rgba.size, (255, 255, 255))
+            image.paste(rgba, mask=rgba.getchannel("A"))
+        elif image.mode not in ("RGB", "L"):
+            image = image.convert("RGB")
+
+        for quality in self.jpeg_qualities:
+            jpeg = _save(image, "JPEG", quality=quality, optimize=True)
+            if len(jpeg) <= self.max_bytes:
+                break
+        return jpeg, "image/jpeg"
+
+def _save(image: Image.Image, image_format: str, **options) -> bytes:
+    output = io.BytesIO()
+    image.save(output, image_format, **options)
+    return output.getvalue()
+
+def create_image_preprocessor() -> ImagePreprocessor:
+    """Preprocessor from VISION_MAX_IMAGE_BYTES, VISION_DETAIL (auto, low or high) and VISION_MAX_PIXELS"""
+    return ImagePreprocessor(
+        max_bytes=int(os.getenv("VISION_MAX_IMAGE_BYTES", "500000")),
+        detail=os.getenv("VISION_DETAIL", "auto").lower(),
+        max_pixels=int(os.getenv("VISION_MAX_PIXELS", "50000000"))
+    )
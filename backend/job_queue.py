@@ -0,0 +1,590 @@
+"""
+Job Queue for RED AI
+Background image generation jobs with a bounded worker pool, per-user fairness,
+status polling and optional completion webhooks
+"""
+
+import os
+import json
+import time
+import uuid
+import socket
+import asyncio
+import ipaddress
+from collections import OrderedDict, deque
+from datetime import datetime
+from typing import Any, Awaitable, Callable, Deque, Dict, Iterable, List, Optional, Set, Tuple
+from urllib.parse import urlsplit, urlunsplit
+
+import httpx
+
+from structured_logging import get_logger, redact_url
+
+try:
+    import redis.asyncio as redis_asyncio
+    REDIS_AVAILABLE = True
+except ImportError:
+    REDIS_AVAILABLE = False
+
+logger = get_logger("job_queue")
+
+# Handler for one job kind: receives the job params, returns a {"success": ...} result dict
+JobHandler = Callable[[Dict[str, Any]], Awaitable[Dict[str, Any]]]
+
+class QueueFullError(Exception):
+    """Raised when a user already has the maximum number of pending jobs"""
+
+class WebhookURLError(ValueError):
+    """Webhook URL that must not be called: not https, or pointing into a private network"""
+
+def _public_address(address: str) -> bool:
+    ip = ipaddress.ip_address(address)
+    if isinstance(ip, ipaddress.IPv6Address) and ip.ipv4_mapped:
+        ip = ip.ipv4_mapped
+    return ip.is_global and not ip.is_multicast
+
+async def resolve_webhook(url: str, allowed_hosts: Iterable[str] = ()) -> Tuple[str, Dict[str, str], Dict[str, Any]]:
+    """
+    Check a webhook URL and pin the address it is delivered to
+
+    Only https URLs are accepted. Hosts in allowed_hosts are trusted as they
+    are; any other host must resolve to public addresses only, so a job
+    cannot make the server call localhost, the cloud metadata endpoint or
+    internal services. Returns the URL to request with the host replaced
+    by the checked address, plus the Host header and TLS server name that
+    keep the request going to the original host, so a second DNS lookup
+    cannot point it somewhere else.
+    """
+    parts = urlsplit(url)
+    if parts.scheme != "https" or not parts.hostname:
+        raise WebhookURLError("webhook_url must be an https URL")
+    host = parts.hostname.lower()
+    if host in allowed_hosts:
+        return url, {}, {}
+
+    try:
+        infos = await asyncio.get_running_loop().getaddrinfo(host, parts.port or 443, type=socket.SOCK_STREAM)
+    except socket.gaierror:
+        raise WebhookURLError(f"webhook_url host '{host}' does not resolve")
+    addresses = [info[4][0] for info in infos]
+    if not addresses or not all(_public_address(address) for address in addresses):
+        raise WebhookURLError("webhook_url must point to a public address")
+
+    address = addresses[0]
+    netloc = f"[{address}]" if ":" in address else address
+    if parts.port:
+        netloc += f":{parts.port}"
+    pinned = urlunsplit(parts._replace(netloc=netloc))
+    return pinned, {"Host": parts.netloc.rsplit("@", 1)[-1]}, {"sni_hostname": host}
+
+class JobBackend:
+    """
+    Base class for job storage and queueing backends
+
+    A dequeued job id is leased to its worker for lease_seconds. The worker
+    renews the lease while the job runs and acks it once the job is
+    finished; a lease that runs out (the worker crashed) puts the job back
+    at the front of its user's queue.
+    """
+
+    name = "base"
+    lease_seconds = 60.0
+
+    async def save(self, job: Dict[str, Any]) -> None:
+        raise NotImplementedError
+
+    async def get(self, job_id: str) -> Optional[Dict[str, Any]]:
+        raise NotImplementedError
+
+    async def enqueue(self, job: Dict[str, Any]) -> None:
+        raise NotImplementedError
+
+    async def dequeue(self) -> Optional[str]:
+        """Next job id, taking users in round-robin order; may return None when idle"""
+        raise NotImplementedError
+
+    async def renew(self, job_id: str) -> None:
+        """Extend the lease of a running job"""
+        raise NotImplementedError
+
+    async def ack(self, job_id: str) -> None:
+        """Release the lease of a job that no longer needs a worker"""
+        raise NotImplementedError
+
+    async def pending_count(self, user: str) -> int:
+        raise NotImplementedError
+
+    async def close(self) -> None:
+        pass
+
+    async def get_stats(self) -> Dict[str, Any]:
+        return {"backend": self.name}
+
+class InMemoryJobBackend(JobBackend):
+    """Process-local queue: one FIFO per user, users served round-robin"""
+
+    name = "memory"
+
+    def __init__(self, result_ttl: int = 3600, lease_seconds: float = 60.0):
+        self.result_ttl = result_ttl
+        self.lease_seconds = lease_seconds
+        self._jobs: Dict[str, Dict[str, Any]] = {}
+        self._queues: "OrderedDict[str, Deque[str]]" = OrderedDict()
+        # Lease deadline (monotonic) of every dequeued job that is not acked yet
+        self._leases: Dict[str, float] = {}
+        # (monotonic finish time, job id) in finishing order, so pruning pops from the front
+        self._finished: Deque[Tuple[float, str]] = deque()
+        self._ready = asyncio.Condition()
+
+    async def save(self, job: Dict[str, Any]) -> None:
+        self._jobs[job["id"]] = job
+        if job.get("finished_at"):
+            self._finished.append((time.monotonic(), job["id"]))
+        self._prune()
+
+    async def get(self, job_id: str) -> Optional[Dict[str, Any]]:
+        return self._jobs.get(job_id)
+
+    async def enqueue(self, job: Dict[str, Any]) -> None:
+        async with self._ready:
+            self._queues.setdefault(job["user"], deque()).append(job["id"])
+            self._ready.notify()
+
+    async def dequeue(self) -> Optional[str]:
+        async with self._ready:
+            while True:
+                self._requeue_expired()
+                if self._queues:
+                    break
+                # Wake up when the earliest lease runs out, if no job is enqueued before
+                timeout = min(self._leases.values()) - time.monotonic() if self._leases else None
+                try:
+                    await asyncio.wait_for(self._ready.wait(), timeout)
+                except asyncio.TimeoutError:
+                    pass
+
+            # Take one job from the user at the front, then move them to the back
+            user, queue = self._queues.popitem(last=False)
+            job_id = queue.popleft()
+            if queue:
+                self._queues[user] = queue
+            self._leases[job_id] = time.monotonic() + self.lease_seconds
+            return job_id
+
+    async def renew(self, job_id: str) -> None:
+        if job_id in self._leases:
+            self._leases[job_id] = time.monotonic() + self.lease_seconds
+
+    async def ack(self, job_id: str) -> None:
+        self._leases.pop(job_id, None)
+
+    async def pending_count(self, user: str) -> int:
+        return len(self._queues.get(user, ()))
+
+    def _requeue_expired(self):
+        """Put jobs whose lease ran out back at the front of their user's queue"""
+        now = time.monotonic()
+        for job_id, deadline in list(self._leases.items()):
+            if deadline > now:
+                continue
+            del self._leases[job_id]
+            job = self._jobs.get(job_id)
+            if job is not None:
+                self._queues.setdefault(job["user"], deque()).appendleft(job_id)
+
+    def _prune(self):
+        """Drop finished jobs older than the result TTL"""
+        cutoff = time.monotonic() - self.result_ttl
+        while self._finished and self._finished[0][0] < cutoff:
+            _, job_id = self._finished.popleft()
+            self._jobs.pop(job_id, None)
+
+    async def get_stats(self) -> Dict[str, Any]:
+        return {
+            "backend": self.name,
+            "jobs": len(self._jobs),
+            "queued": sum(len(queue) for queue in self._queues.values()),
+            "queued_users": len(self._queues),
+            "leased": len(self._leases)
+        }
+
+class RedisJobBackend(JobBackend):
+    """
+    Shared queue in Redis, so several API workers can submit and process jobs
+
+    Each user has a list of job ids; a ring list of users with queued jobs is
+    rotated on every dequeue. Enqueue and dequeue run as Lua scripts so a
+    user is never dropped from the ring while they still have jobs.
+    Dequeued ids move into a sorted set scored by lease deadline (Redis
+    server time), and every dequeue first requeues the ids whose lease ran
+    out. Job records expire result_ttl after they finish; queued and
+    running jobs never expire.
+    """
+
+    name = "redis"
+
+    ENQUEUE_SCRIPT = """
+    redis.call('RPUSH', ARGV[1] .. ARGV[2], ARGV[3])
+    if not redis.call('LPOS', KEYS[1], ARGV[2]) then
+        redis.call('RPUSH', KEYS[1], ARGV[2])
+    end
+    """
+
+    DEQUEUE_SCRIPT = """
+    local time = redis.call('TIME')
+    local now = tonumber(time[1]) + tonumber(time[2]) / 1000000
+    local expired = redis.call('ZRANGEBYSCORE', KEYS[2], '-inf', now, 'LIMIT', 0, 100)
+    for _, job_id in ipairs(expired) do
+        redis.call('ZREM', KEYS[2], job_id)
+        local raw = redis.call('GET', ARGV[2] .. job_id)
+        if raw then
+            local user = cjson.decode(raw)['user']
+            redis.call('LPUSH', ARGV[1] .. user, job_id)
+            if not redis.call('LPOS', KEYS[1], user) then
+                redis.call('LPUSH', KEYS[1], user)
+            end
+        end
+    end
+
+    local users = redis.call('LLEN', KEYS[1])
+    for i = 1, users do
+        local user = redis.call('LMOVE', KEYS[1], KEYS[1], 'LEFT', 'RIGHT')
+        local job_id = redis.call('LPOP', ARGV[1] .. user)
+        if redis.call('LLEN', ARGV[1] .. user) == 0 then
+            redis.call('LREM', KEYS[1], 0, user)
+        end
+        if job_id then
+            redis.call('ZADD', KEYS[2], now + tonumber(ARGV[3]), job_id)
+            return job_id
+        end
+    end
+    return false
+    """
+
+    # Only a lease that still exists is extended: an expired one may already be requeued
+    RENEW_SCRIPT = """
+    local time = redis.call('TIME')
+    local now = tonumber(time[1]) + tonumber(time[2]) / 1000000
+    return redis.call('ZADD', KEYS[1], 'XX', 'CH', now + tonumber(ARGV[2]), ARGV[1])
+    """
+
+    # Users in the ring and the total length of their queues, read in one step
+    STATS_SCRIPT = """
+    local users = redis.call('LRANGE', KEYS[1], 0, -1)
+    local queued = 0
+    for _, user in ipairs(users) do
+        queued = queued + redis.call('LLEN', ARGV[1] .. user)
+    end
+    return {#users, queued, redis.call('ZCARD', KEYS[2])}
+    """
+
+    def __init__(
+        self,
+        redis_url: str,
+        result_ttl: int = 3600,
+        poll_interval: float = 0.5,
+        prefix: str = "redai:jobs:",
+        lease_seconds: float = 60.0
+    ):
+        self.result_ttl = result_ttl
+        self.poll_interval = poll_interval
+        self.prefix = prefix
+        self.lease_seconds = lease_seconds
+        self.ring_key = prefix + "users"
+        self.queue_prefix = prefix + "queue:"
+        self.job_prefix = prefix + "job:"
+        self.leases_key = prefix + "leases"
+        self.client = redis_asyncio.from_url(redis_url, decode_responses=True)
+        self._enqueue = self.client.register_script(self.ENQUEUE_SCRIPT)
+        self._dequeue = self.client.register_script(self.DEQUEUE_SCRIPT)
+        self._renew = self.client.register_script(self.RENEW_SCRIPT)
+        self._stats = self.client.register_script(self.STATS_SCRIPT)
+
+    async def save(self, job: Dict[str, Any]) -> None:
+        # A waiting or running job must outlive any TTL; only finished results expire
+        ttl = self.result_ttl if job.get("finished_at") else None
+        await self.client.set(self.job_prefix + job["id"], json.dumps(job, ensure_ascii=False), ex=ttl)
+
+    async def get(self, job_id: str) -> Optional[Dict[str, Any]]:
+        raw = await self.client.get(self.job_prefix + job_id)
+        return json.loads(raw) if raw is not None else None
+
+    async def enqueue(self, job: Dict[str, Any]) -> None:
+        await self._enqueue(keys=[self.ring_key], args=[self.queue_prefix, job["user"], job["id"]])
+
+    async def dequeue(self) -> Optional[str]:
+        job_id = await self._dequeue(
+            keys=[self.ring_key, self.leases_key],
+            args=[self.queue_prefix, self.job_prefix, self.lease_seconds]
+        )
+        if not job_id:
+            await asyncio.sleep(self.poll_interval)
+            return None
+        return job_id
+
+    async def renew(self, job_id: str) -> None:
+        await self._renew(keys=[self.leases_key], args=[job_id, self.lease_seconds])
+
+    async def ack(self, job_id: str) -> None:
+        await self.client.zrem(self.leases_key, job_id)
+
+    async def pending_count(self, user: str) -> int:
+        return await self.client.llen(self.queue_prefix + user)
+
+    async def close(self) -> None:
+        await self.client.aclose()
+
+    async def get_stats(self) -> Dict[str, Any]:
+        users, queued, leased = await self._stats(keys=[self.ring_key, self.leases_key], args=[self.queue_prefix])
+        return {"backend": self.name, "queued": queued, "queued_users": users, "leased": leased}
+
+class JobQueue:
+    """Runs submitted jobs on a fixed number of workers"""
+
+    def __init__(
+        self,
+        backend: JobBackend,
+        handlers: Dict[str, JobHandler],
+        workers: int = 4,
+        max_pending_per_user: int = 20,
+        webhook_attempts: int = 3,
+        webhook_client: Optional[httpx.AsyncClient] = None,
+        webhook_allowed_hosts: Iterable[str] = (),
+        max_error_backoff: float = 30.0,
+        max_attempts: int = 3
+    ):
+        self.backend = backend
+        self.handlers = handlers
+        self.workers = workers
+        self.max_pending_per_user = max_pending_per_user
+        self.webhook_attempts = webhook_attempts
+        # Redirects are not followed: a public receiver could bounce the POST inward
+        self.webhook_client = webhook_client or httpx.AsyncClient(timeout=10, follow_redirects=False)
+        self.webhook_allowed_hosts = {host.lower() for host in webhook_allowed_hosts}
+        self.max_error_backoff = max_error_backoff
+        self.max_attempts = max_attempts
+        self._tasks: List[asyncio.Task] = []
+        self._webhooks: Set[asyncio.Task] = set()
+        self.completed = 0
+        self.failed = 0
+        self.worker_errors = 0
+
+    async def submit(
+        self,
+        kind: str,
+        params: Dict[str, Any],
+        user: str,
+        webhook_url: Optional[str] = None
+    ) -> Dict[str, Any]:
+        """Queue a job and return its record immediately"""
+        if kind not in self.handlers:
+            raise ValueError(f"Unknown job kind '{kind}'")
+
+        if webhook_url:
+            await resolve_webhook(webhook_url, self.webhook_allowed_hosts)
+
+        if await self.backend.pending_count(user) >= self.max_pending_per_user:
+            raise QueueFullError(f"Too many pending jobs (limit {self.max_pending_per_user})")
+
+        job = {
+            "id": uuid.uuid4().hex,
+            "kind": kind,
+            "user": user,
+            "status": "queued",
+            "params": params,
+            "webhook_url": webhook_url,
+            "created_at": datetime.now().isoformat(),
+            "started_at": None,
+            "finished_at": None,
+            "result": None,
+            "error": None,
+            "attempts": 0
+        }
+        await self.backend.save(job)
+        await self.backend.enqueue(job)
+        return job
+
+    async def get(self, job_id: str) -> Optional[Dict[str, Any]]:
+        return await self.backend.get(job_id)
+
+    def start(self):
+        """Start the worker pool; must be called from a running event loop"""
+        if self._tasks:
+            return
+        self._tasks = [asyncio.create_task(self._worker()) for _ in range(self.workers)]
+        logger.info("Job queue started", extra={"workers": self.workers, "backend": self.backend.name})
+
+    async def stop(self):
+        for task in [*self._tasks, *self._webhooks]:
+            task.cancel()
+        await asyncio.gather(*self._tasks, *self._webhooks, return_exceptions=True)
+        self._tasks = []
+        await self.webhook_client.aclose()
+        await self.backend.close()
+
+    async def _worker(self):
+        """
+        Take jobs until cancelled
+
+        A failing backend or job bookkeeping error is logged and retried
+        with exponential backoff instead of ending the worker.
+        """
+        errors = 0
+        while True:
+            try:
+                job_id = await self.backend.dequeue()
+                if job_id is None:
+                    continue
+                job = await self.backend.get(job_id)
+                if job is None or job["status"] in ("succeeded", "failed"):
+                    await self.backend.ack(job_id)
+                    continue
+                if job.get("attempts", 0) >= self.max_attempts:
+                    # Its lease ran out that many times: the job keeps taking workers down
+                    logger.error("Job abandoned after worker crashes", extra={"job_id": job_id, "attempts": job["attempts"]})
+                    await self._finish(job, {"success": False, "error": "Job was interrupted too many times"})
+                    continue
+                await self._run(job)
+                errors = 0
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                errors += 1
+                self.worker_errors += 1
+                delay = min(self.max_error_backoff, 0.5 * 2 ** (errors - 1))
+                logger.exception("Job worker error", extra={"consecutive_errors": errors, "retry_in_seconds": delay})
+                await asyncio.sleep(delay)
+
+    async def _run(self, job: Dict[str, Any]):
+        job["status"] = "running"
+        job["started_at"] = datetime.now().isoformat()
+        job["attempts"] = job.get("attempts", 0) + 1
+        await self.backend.save(job)
+
+        heartbeat = asyncio.create_task(self._keep_leased(job["id"]))
+        try:
+            result = await self.handlers[job["kind"]](job["params"])
+        except asyncio.CancelledError:
+            job.update(status="failed", error="Interrupted by server shutdown", finished_at=datetime.now().isoformat())
+            await self.backend.save(job)
+            await self.backend.ack(job["id"])
+            raise
+        except Exception as e:
+            logger.exception("Job failed", extra={"job_id": job["id"], "kind": job["kind"]})
+            result = {"success": False, "error": str(e)}
+        finally:
+            heartbeat.cancel()
+
+        await self._finish(job, result)
+
+    async def _keep_leased(self, job_id: str):
+        """Renew the job's lease while its handler runs"""
+        while True:
+            await asyncio.sleep(self.backend.lease_seconds / 3)
+            try:
+                await self.backend.renew(job_id)
+            except Exception:
+                logger.exception("Job lease renewal failed", extra={"job_id": job_id})
+
+    async def _finish(self, job: Dict[str, Any], result: Dict[str, Any]):
+        """Store the job's outcome, release its lease and send the webhook"""
+        if result.get("success"):
+            job["status"] = "succeeded"
+            job["result"] = result
+            self.completed += 1
+        else:
+            job["status"] = "failed"
+            job["error"] = result.get("error", "Unknown error")
+            self.failed += 1
+        job["finished_at"] = datetime.now().isoformat()
+        await self.backend.save(job)
+        await self.backend.ack(job["id"])
+
+        if job.get("webhook_url"):
+            # Deliver outside the worker so a slow receiver does not hold a generation slot
+            task = asyncio.create_task(self._deliver_webhook(job))
+            self._webhooks.add(task)
+            task.add_done_callback(self._webhooks.discard)
+
+    async def _deliver_webhook(self, job: Dict[str, Any]):
+        payload = public_job(job)
+        for attempt in range(1, self.webhook_attempts + 1):
+            try:
+                # Resolved again at delivery: the address may have changed since submit
+                url, headers, extensions = await resolve_webhook(job["webhook_url"], self.webhook_allowed_hosts)
+                response = await self.webhook_client.post(url, json=payload, headers=headers, extensions=extensions)
+                if response.status_code < 400:
+                    return
+                error = f"HTTP {response.status_code}"
+            except WebhookURLError as e:
+                logger.warning("Webhook not delivered", extra={"job_id": job["id"], "error": str(e)})
+                return
+            except httpx.HTTPError as e:
+                error = str(e) or e.__class__.__name__
+            logger.warning("Webhook delivery failed", extra={
+                "job_id": job["id"], "attempt": attempt, "max_attempts": self.webhook_attempts, "error": error
+            })
+            if attempt < self.webhook_attempts:
+                await asyncio.sleep(2 ** (attempt - 1))
+
+    async def get_stats(self) -> Dict[str, Any]:
+        stats = await self.backend.get_stats()
+        alive = sum(not task.done() for task in self._tasks)
+        stats.update({
+            "workers": self.workers,
+            "workers_alive": alive,
+            "running": alive > 0,
+            "worker_errors": self.worker_errors,
+            "completed": self.completed,
+            "failed": self.failed
+        })
+        return stats
+
+def public_job(job: Dict[str, Any]) -> Dict[str, Any]:
+    """Job fields returned to clients and webhooks"""
+    return {
+        "job_id": job["id"],
+        "kind": job["kind"],
+        "status": job["status"],
+        "created_at": job["created_at"],
+        "started_at": job["started_at"],
+        "finished_at": job["finished_at"],
+        "result": job["result"],
+        "error": job["error"]
+    }
+
+# Factory function
+def create_job_queue(
+    handlers: Dict[str, JobHandler],
+    backend: Optional[str] = None,
+    workers: Optional[int] = None,
+    max_pending_per_user: Optional[int] = None,
+    result_ttl: Optional[int] = None,
+    redis_url: Optional[str] = None
+) -> JobQueue:
+    """Create job queue from arguments or environment variables"""
+    backend = (backend or os.getenv("JOB_QUEUE_BACKEND", "memory")).lower()
+    workers = workers if workers is not None else int(os.getenv("JOB_WORKERS", "4"))
+    max_pending_per_user = (
+        max_pending_per_user if max_pending_per_user is not None
+        else int(os.getenv("JOB_MAX_PENDING_PER_USER", "20"))
+    )
+    result_ttl = result_ttl if result_ttl is not None else int(os.getenv("JOB_RESULT_TTL_SECONDS", "3600"))
+    redis_url = redis_url or os.getenv("REDIS_URL", "redis://localhost:6379")
+    webhook_allowed_hosts = [
+        host.strip() for host in os.getenv("JOB_WEBHOOK_ALLOWED_HOSTS", "").split(",") if host.strip()
+    ]
+    lease_seconds = float(os.getenv("JOB_LEASE_SECONDS", "60"))
+
+    job_backend: JobBackend = InMemoryJobBackend(result_ttl, lease_seconds)
+    if backend == "redis":
+        if REDIS_AVAILABLE:
+            logger.info("Job queue: Redis", extra={"redis_url": redact_url(redis_url)})
+            job_backend = RedisJobBackend(redis_url, result_ttl, lease_seconds=lease_seconds)
+        else:
+            logger.warning("redis package not installed, falling back to in-process job queue")
+
+    return JobQueue(
+        job_backend, handlers, workers, max_pending_per_user,
+        webhook_allowed_hosts=webhook_allowed_hosts
+    )
@@ -4,13 +4,16 @@ Interactive dashboard for AI-powered interior design assistant
 """
 
 import os
-from typing import List, Dict, Any, Optional
+import asyncio
+import secrets
+from contextlib import aclosing, suppress
+from typing import AsyncIterator, List, Dict, Any, Optional
 from datetime import datetime, timedelta
-from fastapi import FastAPI, HTTPException, UploadFile, File, Depends, BackgroundTasks
+from fastapi import FastAPI, HTTPException, UploadFile, File, Depends, BackgroundTasks, Header, Query, Request, Response, WebSocket, WebSocketDisconnect
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import JSONResponse
+from fastapi.responses import JSONResponse, PlainTextResponse, StreamingResponse
 from fastapi.staticfiles import StaticFiles
-from pydantic import BaseModel, Field
+from pydantic import BaseModel, Field, ValidationError
 import base64
 import json
 import uvicorn
@@ -18,8 +21,18 @@ from pathlib import Path
 
 # Import our services
 from ai_service import AIService
-from azure_openai_service import create_azure_openai_service, generate_image_with_azure_dalle  # Import the new service and missing function
+from azure_openai_service import create_azure_openai_service, generate_image_with_azure_dalle, close_shared_http_client  # Import the new service and missing function
 from stable_diffusion_service import create_stable_diffusion_service
+from artifact_store import create_artifact_store, etag_matches, parse_range
+from job_queue import create_job_queue, public_job, QueueFullError, WebhookURLError
+from repositories import create_repositories, DEFAULT_TENANT, Page, Repository
+from dashboard_stats import DashboardStatsAggregator
+from response_cache import create_response_cache, cache_status
+from single_flight import get_single_flight_stats
+from metrics import CONTENT_TYPE_LATEST, MetricsMiddleware, register_cache_stats, render_metrics, set_queue_stats
+from structured_logging import RequestLoggingMiddleware, create_route_sampler, get_logger, get_logging_stats, setup_logging, shutdown_logging
+from profiler import ProfilerBusyError, ProfilingMiddleware, ProfilingService, create_profiling_service
+from tracing import TracingMiddleware, get_tracing_stats, setup_tracing, shutdown_tracing, start_span
 from dotenv import load_dotenv
 import sys
 import os
@@ -38,6 +51,11 @@ import os
 sys.path.append(os.path.join(os.path.dirname(__file__), 'dotenv'))
 from config import settings
 
+# Structured logs go through a queue to a background writer thread
+setup_logging(level=settings.LOG_LEVEL, log_format=settings.LOG_FORMAT)
+logger = get_logger("api")
+setup_tracing()
+
 # ==================== MODELS ====================
 
 class DailyTask(BaseModel):
@@ -124,6 +142,7 @@ class ChatRequest(BaseModel):
 class AzureImageGenerationRequest(BaseModel):
     """Azure DALL-E image generation request"""
     prompt: str
+    webhook_url: Optional[str] = None  # job endpoints only: POSTed the finished job
 
 class StableDiffusionRequest(BaseModel):
     """Stable Diffusion image generation request"""
@@ -134,10 +153,37 @@ class StableDiffusionRequest(BaseModel):
     steps: int = 20
     guidance_scale: float = 7.5
     style: str = "realistic"
+    response_format: str = Field("url", pattern="^(url|binary)$")  # binary streams the image bytes
+    webhook_url: Optional[str] = None  # job endpoints only: POSTed the finished job
+
+# Batch request models; each batch is applied in one transaction
+MAX_BATCH_SIZE = 500
+
+class TaskPatch(BaseModel):
+    """Partial task update; null or omitted fields are left unchanged"""
+    id: str
+    title: Optional[str] = None
+    description: Optional[str] = None
+    completed: Optional[bool] = None
+    priority: Optional[str] = None
+    due_date: Optional[datetime] = None
+    category: Optional[str] = None
+
+class BatchTaskUpdateRequest(BaseModel):
+    """Patches for many tasks"""
+    updates: List[TaskPatch] = Field(..., min_length=1, max_length=MAX_BATCH_SIZE)
+
+class BatchIdsRequest(BaseModel):
+    """Ids of the items a batch action applies to"""
+    ids: List[str] = Field(..., min_length=1, max_length=MAX_BATCH_SIZE)
+
+class BatchFavoriteRequest(BatchIdsRequest):
+    """Favorite status for many designs"""
+    is_favorite: Optional[bool] = None  # None toggles each design
 
 # ==================== MOCK DATA ====================
 
-# Mock data for demonstration
+# Demo data, seeded into the default tenant when SEED_DEMO_DATA is set and its tables are empty
 mock_tasks = [
     DailyTask(
         id="1",
@@ -251,31 +297,285 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    # Readable by browser clients on other origins
+    expose_headers=["X-Next-Cursor", "X-Cache", "X-Trace-Id", "X-Profile-Id"],
 )
 
+# One sampled, structured log record per request
+app.add_middleware(RequestLoggingMiddleware, sampler=create_route_sampler())
+
+# Request latency by route for the Prometheus scrape on /metrics
+app.add_middleware(MetricsMiddleware)
+
+# Per-request profiling on X-Profile; not installed unless profiling is enabled
+profiling = create_profiling_service()
+if profiling is not None:
+    app.add_middleware(ProfilingMiddleware, profiling=profiling)
+
+# Outermost, so request logs and every stage below carry the trace id
+app.add_middleware(TracingMiddleware)
+
+# Initialize dashboard storage
+repositories = create_repositories(
+    DailyTask,
+    FavoriteClient,
+    DesignPreview,
+    InteractionHistory,
+    backend=settings.REPOSITORY_BACKEND,
+    database_url=settings.DATABASE_URL
+)
+if settings.SEED_DEMO_DATA:
+    repositories.seed(
+        DEFAULT_TENANT,
+        tasks=mock_tasks,
+        clients=mock_clients,
+        designs=mock_designs,
+        interactions=mock_interactions
+    )
+
+# Dashboard counters follow every repository write; reconciliation corrects drift
+dashboard_stats = DashboardStatsAggregator(repositories, reconcile_interval=settings.STATS_RECONCILE_INTERVAL)
+dashboard_stats.reconcile()
+
+# Initialize AI response cache
+response_cache = create_response_cache(
+    backend=settings.CACHE_BACKEND,
+    ttl=settings.CACHE_TTL_SECONDS,
+    max_entries=settings.CACHE_MAX_ENTRIES,
+    redis_url=settings.REDIS_URL
+)
+register_cache_stats(response_cache.get_stats)
+
 # Initialize AI service
-ai_service = AIService()
+ai_service = AIService(cache=response_cache)
 
 # Initialize Azure OpenAI service for additional functionality
 azure_service = create_azure_openai_service()
 
+# Initialize generated image store
+artifact_store = create_artifact_store(
+    backend=settings.ARTIFACT_BACKEND,
+    root=settings.ARTIFACT_DIR,
+    base_url=settings.ARTIFACT_BASE_URL
+)
+
 # Initialize Stable Diffusion service
-sd_service = create_stable_diffusion_service()
+sd_service = create_stable_diffusion_service(artifact_store=artifact_store)
+
+async def run_azure_image_job(params: Dict[str, Any]) -> Dict[str, Any]:
+    return await azure_service.generate_image(params["prompt"])
+
+async def run_sd_image_job(params: Dict[str, Any]) -> Dict[str, Any]:
+    return await sd_service.generate_image(**params)
+
+# Initialize background image generation jobs
+job_queue = create_job_queue(
+    handlers={"azure_image": run_azure_image_job, "sd_image": run_sd_image_job},
+    backend=settings.JOB_QUEUE_BACKEND,
+    workers=settings.JOB_WORKERS,
+    max_pending_per_user=settings.JOB_MAX_PENDING_PER_USER,
+    result_ttl=settings.JOB_RESULT_TTL_SECONDS,
+    redis_url=settings.REDIS_URL
+)
+
+@app.on_event("startup")
+async def start_provider_health_checks():
+    """Probe image providers in the background instead of at import time"""
+    sd_service.start_health_checks()
+
+@app.on_event("startup")
+async def start_job_workers():
+    job_queue.start()
+
+@app.on_event("startup")
+async def start_stats_reconciliation():
+    dashboard_stats.start()
+
+@app.on_event("shutdown")
+async def shutdown_ai_clients():
+    """Close pooled upstream connections"""
+    await job_queue.stop()
+    await dashboard_stats.stop()
+    await close_shared_http_client()
+    await sd_service.aclose()
+    await response_cache.close()
+    shutdown_tracing()
+    shutdown_logging()
 
 # ==================== UTILITY FUNCTIONS ====================
 
-def get_dashboard_stats() -> DashboardStats:
-    """Generate dashboard statistics"""
+def get_tenant(x_tenant_id: Optional[str] = Header(None), x_api_key: Optional[str] = Header(None)) -> str:
+    """
+    Tenant whose dashboard data a request works on
+
+    The tenant comes from the API key (TENANT_API_KEYS), never from the
+    client alone: X-Tenant-Id is only checked against the key's tenant, and
+    requests without a key get the default tenant.
+    """
+    if x_api_key is None:
+        if x_tenant_id not in (None, DEFAULT_TENANT):
+            raise HTTPException(status_code=401, detail="API key required for tenant access")
+        return DEFAULT_TENANT
+
+    tenant = next(
+        (tenant for key, tenant in settings.TENANT_API_KEYS.items() if secrets.compare_digest(key.encode(), x_api_key.encode())),
+        None
+    )
+    if tenant is None:
+        raise HTTPException(status_code=401, detail="Invalid API key")
+    if x_tenant_id is not None and x_tenant_id != tenant:
+        raise HTTPException(status_code=403, detail="API key is not valid for this tenant")
+    return tenant
+
+MAX_PAGE_SIZE = 200
+
+class ListParams:
+    """Pagination, sorting and field selection shared by dashboard list endpoints"""
+
+    def __init__(
+        self,
+        limit: int = Query(50, ge=1, le=MAX_PAGE_SIZE),
+        cursor: Optional[str] = Query(None, description="X-Next-Cursor from the previous page"),
+        sort: Optional[str] = Query(None, description="Sort field, prefixed with - for descending"),
+        fields: Optional[str] = Query(None, description="Comma-separated fields to return; id is always included")
+    ):
+        self.limit = limit
+        self.cursor = cursor
+        self.sort = sort
+        self.fields = {field.strip() for field in fields.split(",") if field.strip()} if fields else None
+
+def naive_local(value: Optional[datetime]) -> Optional[datetime]:
+    """Stored timestamps are naive local time; convert timezone-aware query values to match"""
+    if value is None or value.tzinfo is None:
+        return value
+    return value.astimezone().replace(tzinfo=None)
+
+def projection(model, params: ListParams) -> Optional[set]:
+    """Fields to include in each item, or None for all of them"""
+    if not params.fields:
+        return None
+    unknown = params.fields - set(model.model_fields)
+    if unknown:
+        raise HTTPException(status_code=400, detail=f"Unknown fields: {', '.join(sorted(unknown))}")
+    return params.fields | {"id"}
+
+def list_page(repository: Repository, tenant: str, params: ListParams, **filters) -> JSONResponse:
+    """Fetch one page and return it as a JSON list with the next cursor in X-Next-Cursor"""
+    include = projection(repository.model, params)
+    for bound in ("created_after", "created_before"):
+        if bound in filters:
+            filters[bound] = naive_local(filters[bound])
+
+    try:
+        page: Page = repository.page(tenant, limit=params.limit, cursor=params.cursor, sort=params.sort, **filters)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    headers = {"X-Next-Cursor": page.next_cursor} if page.next_cursor else {}
+    return JSONResponse(
+        content=[item.model_dump(mode="json", include=include) for item in page.items],
+        headers=headers
+    )
+
+def batch_results(results: Dict[str, Optional[BaseModel]], key: str, missing: str) -> Dict[str, Any]:
+    """Per-item outcome of a batch write, in request order"""
+    items = [
+        {"id": item_id, "success": True, key: item} if item is not None
+        else {"id": item_id, "success": False, "error": missing}
+        for item_id, item in results.items()
+    ]
+    succeeded = sum(item["success"] for item in items)
+    return {"succeeded": succeeded, "failed": len(items) - succeeded, "results": items}
+
+def get_dashboard_stats(tenant: str = DEFAULT_TENANT) -> DashboardStats:
+    """Generate dashboard statistics from the incrementally maintained counters"""
+    counters = dashboard_stats.snapshot(tenant)
     return DashboardStats(
-        total_projects=len(mock_designs) + 15,
+        total_projects=counters["projects"],
+        # Project status and billing are not stored yet
         active_projects=8,
         completed_projects=12,
-        total_clients=len(mock_clients) + 25,
-        favorite_clients=len(mock_clients),
-        designs_generated=len(mock_designs) + 45,
-        tasks_completed=sum(1 for task in mock_tasks if task.completed),
+        total_clients=counters["clients"],
+        favorite_clients=counters["clients"],
+        designs_generated=counters["designs"],
+        tasks_completed=counters["tasks_completed"],
         monthly_revenue=45750.00,
-        weekly_growth=12.5
+        weekly_growth=counters["weekly_growth"]
+    )
+
+def cache_bypass_requested(request: Request) -> bool:
+    """Check whether the client asked to skip the AI response cache"""
+    if request.headers.get("x-cache-bypass", "").lower() in ("1", "true", "yes"):
+        return True
+    return "no-cache" in request.headers.get("cache-control", "").lower()
+
+def set_cache_header(response: Response):
+    """Expose the cache outcome of this request as X-Cache"""
+    status = cache_status.get()
+    if status:
+        response.headers["X-Cache"] = status.upper()
+
+def artifact_response(artifact_id: str, request: Request) -> Response:
+    """Stream a stored artifact with ETag revalidation and single-range support"""
+    info = artifact_store.stat(artifact_id)
+    if info is None:
+        raise HTTPException(status_code=404, detail="Artifact not found")
+
+    headers = {
+        "ETag": info["etag"],
+        "Accept-Ranges": "bytes",
+        # Content-addressed: the bytes behind an id never change
+        "Cache-Control": "public, max-age=31536000, immutable"
+    }
+
+    if etag_matches(request.headers.get("if-none-match"), info["etag"]):
+        return Response(status_code=304, headers=headers)
+
+    size = info["size"]
+    try:
+        byte_range = parse_range(request.headers.get("range"), size)
+    except ValueError:
+        return Response(status_code=416, headers={**headers, "Content-Range": f"bytes */{size}"})
+
+    if byte_range is None:
+        headers["Content-Length"] = str(size)
+        return StreamingResponse(artifact_store.open(artifact_id), media_type=info["content_type"], headers=headers)
+
+    start, end = byte_range
+    headers["Content-Range"] = f"bytes {start}-{end}/{size}"
+    headers["Content-Length"] = str(end - start + 1)
+    return StreamingResponse(
+        artifact_store.open(artifact_id, start, end),
+        status_code=206,
+        media_type=info["content_type"],
+        headers=headers
+    )
+
+def job_owner(request: Request) -> str:
+    """
+    Identify who submitted a job, for per-user queue fairness and the pending-job cap
+
+    Keyed on the client address: this API has no authenticated identity,
+    and a header the client chooses would let it pick a fresh quota per request.
+    Behind nginx that address comes from X-Forwarded-For, which uvicorn's
+    --proxy-headers applies only for the proxies in FORWARDED_ALLOW_IPS.
+    """
+    return request.client.host if request.client else "anonymous"
+
+async def submit_job(kind: str, params: Dict[str, Any], webhook_url: Optional[str], request: Request) -> JSONResponse:
+    """Queue a job and answer 202 with where to poll for it"""
+    try:
+        job = await job_queue.submit(kind, params, job_owner(request), webhook_url)
+    except QueueFullError as e:
+        raise HTTPException(status_code=429, detail=str(e))
+    except WebhookURLError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    status_url = f"/api/jobs/{job['id']}"
+    return JSONResponse(
+        status_code=202,
+        content={"job_id": job["id"], "status": job["status"], "status_url": status_url},
+        headers={"Location": status_url}
     )
 
 # ==================== HEALTH CHECK ====================
@@ -298,112 +598,282 @@ async def health_check():
                 "has_endpoint": azure_info.get("has_endpoint", False),
                 "endpoint": azure_info.get("endpoint", ""),
                 "deployment": azure_info.get("deployment_name", ""),
-                "api_version": azure_info.get("api_version", "")
+                "api_version": azure_info.get("api_version", ""),
+                "pool": azure_info.get("pool")
             },
             "stable_diffusion": {
                 "configured": sd_info.get("configured", False),
                 "available_services": sd_info.get("available_services", []),
                 "huggingface_configured": sd_info.get("huggingface_configured", False),
                 "replicate_configured": sd_info.get("replicate_configured", False),
-                "local_available": sd_info.get("local_available", False)
+                "local_available": sd_info.get("local_available", False),
+                "dispatch": sd_info.get("dispatch", {}),
+                "health": sd_info.get("health", {})
+            }
+        },
+        "storage": {"backend": repositories.backend, "stats": dashboard_stats.get_stats()},
+        "cache": response_cache.get_stats(),
+        "jobs": await job_queue.get_stats(),
+        "artifacts": artifact_store.get_stats(),
+        "single_flight": get_single_flight_stats(),
+        "logging": get_logging_stats(),
+        "tracing": get_tracing_stats(),
+        "resilience": {
+            "azure_openai": {
+                "retry": azure_info.get("retry"),
+                "circuits": {
+                    name: member["circuit"]
+                    for name, member in (azure_info.get("pool") or {}).get("members", {}).items()
+                }
+            },
+            "stable_diffusion": {
+                "retry": sd_info.get("dispatch", {}).get("retry"),
+                "circuits": sd_info.get("dispatch", {}).get("circuits", {})
             }
         }
     }
 
+@app.get("/metrics", include_in_schema=False)
+async def metrics():
+    """Prometheus metrics"""
+    set_queue_stats(await job_queue.get_stats())
+    return Response(content=render_metrics(), media_type=CONTENT_TYPE_LATEST)
+
+def require_profiling(x_admin_token: Optional[str] = Header(None)) -> ProfilingService:
+    """Profiling service for admin requests; hidden entirely when profiling is disabled"""
+    if profiling is None:
+        raise HTTPException(status_code=404, detail="Not Found")
+    if not profiling.authorized(x_admin_token):
+        raise HTTPException(status_code=403, detail="Admin token required")
+    return profiling
+
+@app.post("/api/admin/profile", include_in_schema=False, response_class=PlainTextResponse)
+async def capture_profile(
+    seconds: float = Query(10, gt=0),
+    interval_ms: Optional[float] = Query(None, gt=0),
+    include_idle: bool = False,
+    service: ProfilingService = Depends(require_profiling)
+):
+    """Sample the whole process for N seconds and return collapsed stacks"""
+    try:
+        interval = interval_ms / 1000 if interval_ms else None
+        return await service.profile(seconds, interval, include_idle)
+    except ProfilerBusyError as e:
+        raise HTTPException(status_code=409, detail=str(e))
+
+@app.get("/api/admin/profile/requests/{profile_id}", include_in_schema=False, response_class=PlainTextResponse)
+async def get_request_profile(profile_id: str, service: ProfilingService = Depends(require_profiling)):
+    """Collapsed stacks of a request sent with X-Profile: 1"""
+    stacks = service.get_request_profile(profile_id)
+    if stacks is None:
+        raise HTTPException(status_code=404, detail="Profile not found")
+    return stacks
+
 # ==================== DASHBOARD ENDPOINTS ====================
+# Plain def: repository calls may block on the database, so FastAPI runs them in its threadpool
 
 @app.get("/api/dashboard/stats", response_model=DashboardStats)
-async def get_stats():
+def get_stats(tenant: str = Depends(get_tenant)):
     """Get dashboard statistics"""
-    return get_dashboard_stats()
+    return get_dashboard_stats(tenant)
 
 @app.get("/api/dashboard/tasks", response_model=List[DailyTask])
-async def get_tasks():
-    """Get daily tasks"""
-    return mock_tasks
+def get_tasks(
+    category: Optional[str] = None,
+    priority: Optional[str] = None,
+    completed: Optional[bool] = None,
+    created_after: Optional[datetime] = None,
+    created_before: Optional[datetime] = None,
+    params: ListParams = Depends(),
+    tenant: str = Depends(get_tenant)
+):
+    """Get daily tasks, one page at a time"""
+    return list_page(
+        repositories.tasks, tenant, params,
+        category=category, priority=priority, completed=completed,
+        created_after=created_after, created_before=created_before
+    )
 
 @app.post("/api/dashboard/tasks", response_model=DailyTask)
-async def create_task(task: DailyTask):
+def create_task(task: DailyTask, tenant: str = Depends(get_tenant)):
     """Create a new daily task"""
-    task.id = str(len(mock_tasks) + 1)
     task.created_at = datetime.now()
-    mock_tasks.append(task)
-    return task
+    return repositories.tasks.add(tenant, task)
 
 @app.put("/api/dashboard/tasks/{task_id}", response_model=DailyTask)
-async def update_task(task_id: str, task_update: DailyTask):
+def update_task(task_id: str, task_update: DailyTask, tenant: str = Depends(get_tenant)):
     """Update a daily task"""
-    for i, task in enumerate(mock_tasks):
-        if task.id == task_id:
-            task_update.id = task_id
-            mock_tasks[i] = task_update
-            return task_update
-    raise HTTPException(status_code=404, detail="Task not found")
+    task = repositories.tasks.update(tenant, task_id, task_update)
+    if task is None:
+        raise HTTPException(status_code=404, detail="Task not found")
+    return task
 
 @app.delete("/api/dashboard/tasks/{task_id}")
-async def delete_task(task_id: str):
+def delete_task(task_id: str, tenant: str = Depends(get_tenant)):
     """Delete a daily task"""
-    for i, task in enumerate(mock_tasks):
-        if task.id == task_id:
-            deleted_task = mock_tasks.pop(i)
-            return {"message": "Task deleted successfully", "task": deleted_task}
-    raise HTTPException(status_code=404, detail="Task not found")
+    deleted_task = repositories.tasks.delete(tenant, task_id)
+    if deleted_task is None:
+        raise HTTPException(status_code=404, detail="Task not found")
+    return {"message": "Task deleted successfully", "task": deleted_task}
+
+@app.post("/api/dashboard/tasks/batch-update")
+def batch_update_tasks(request: BatchTaskUpdateRequest, tenant: str = Depends(get_tenant)):
+    """Apply many task patches in one transaction"""
+    patches = {patch.id: patch.model_dump(exclude_none=True, exclude={"id"}) for patch in request.updates}
+    results = repositories.tasks.update_many(tenant, {
+        task_id: lambda task, changes=changes: task.model_copy(update=changes)
+        for task_id, changes in patches.items()
+    })
+    return batch_results(results, "task", "Task not found")
+
+@app.post("/api/dashboard/tasks/batch-delete")
+def batch_delete_tasks(request: BatchIdsRequest, tenant: str = Depends(get_tenant)):
+    """Delete many tasks in one transaction"""
+    results = repositories.tasks.delete_many(tenant, list(dict.fromkeys(request.ids)))
+    return batch_results(results, "task", "Task not found")
 
 # ==================== CLIENT MANAGEMENT ====================
 
 @app.get("/api/dashboard/clients", response_model=List[FavoriteClient])
-async def get_favorite_clients():
-    """Get favorite clients"""
-    return mock_clients
+def get_favorite_clients(params: ListParams = Depends(), tenant: str = Depends(get_tenant)):
+    """Get favorite clients, one page at a time"""
+    return list_page(repositories.clients, tenant, params)
 
 @app.post("/api/dashboard/clients", response_model=FavoriteClient)
-async def add_favorite_client(client: FavoriteClient):
+def add_favorite_client(client: FavoriteClient, tenant: str = Depends(get_tenant)):
     """Add a favorite client"""
-    client.id = str(len(mock_clients) + 1)
-    mock_clients.append(client)
-    return client
+    return repositories.clients.add(tenant, client)
+
+@app.get("/api/dashboard/clients/{client_id}/interactions", response_model=List[InteractionHistory])
+def get_client_interactions(
+    client_id: str,
+    before: Optional[datetime] = Query(None, description="Only interactions strictly before this time"),
+    params: ListParams = Depends(),
+    tenant: str = Depends(get_tenant)
+):
+    """One client's interaction timeline, newest first"""
+    params.sort = params.sort or "-created_at"
+    return list_page(repositories.interactions, tenant, params, client_id=client_id, created_before=before)
 
 @app.delete("/api/dashboard/clients/{client_id}")
-async def remove_favorite_client(client_id: str):
+def remove_favorite_client(client_id: str, tenant: str = Depends(get_tenant)):
     """Remove a favorite client"""
-    for i, client in enumerate(mock_clients):
-        if client.id == client_id:
-            deleted_client = mock_clients.pop(i)
-            return {"message": "Client removed successfully", "client": deleted_client}
-    raise HTTPException(status_code=404, detail="Client not found")
+    deleted_client = repositories.clients.delete(tenant, client_id)
+    if deleted_client is None:
+        raise HTTPException(status_code=404, detail="Client not found")
+    return {"message": "Client removed successfully", "client": deleted_client}
+
+@app.post("/api/dashboard/clients/batch-delete")
+def batch_remove_favorite_clients(request: BatchIdsRequest, tenant: str = Depends(get_tenant)):
+    """Remove many favorite clients in one transaction"""
+    results = repositories.clients.delete_many(tenant, list(dict.fromkeys(request.ids)))
+    return batch_results(results, "client", "Client not found")
 
 # ==================== DESIGN GALLERY ====================
 
 @app.get("/api/dashboard/designs", response_model=List[DesignPreview])
-async def get_design_previews():
-    """Get design preview gallery"""
-    return mock_designs
+def get_design_previews(
+    style: Optional[str] = None,
+    room_type: Optional[str] = None,
+    client_id: Optional[str] = None,
+    is_favorite: Optional[bool] = None,
+    created_after: Optional[datetime] = None,
+    created_before: Optional[datetime] = None,
+    params: ListParams = Depends(),
+    tenant: str = Depends(get_tenant)
+):
+    """Get design preview gallery, one page at a time"""
+    return list_page(
+        repositories.designs, tenant, params,
+        style=style, room_type=room_type, client_id=client_id, is_favorite=is_favorite,
+        created_after=created_after, created_before=created_before
+    )
 
 @app.post("/api/dashboard/designs/{design_id}/favorite")
-async def toggle_design_favorite(design_id: str):
+def toggle_design_favorite(design_id: str, tenant: str = Depends(get_tenant)):
     """Toggle favorite status of a design"""
-    for design in mock_designs:
-        if design.id == design_id:
-            design.is_favorite = not design.is_favorite
-            return {"message": "Favorite status updated", "is_favorite": design.is_favorite}
-    raise HTTPException(status_code=404, detail="Design not found")
+    design = repositories.designs.update_many(tenant, {
+        design_id: lambda design: design.model_copy(update={"is_favorite": not design.is_favorite})
+    })[design_id]
+    if design is None:
+        raise HTTPException(status_code=404, detail="Design not found")
+
+    return {"message": "Favorite status updated", "is_favorite": design.is_favorite}
+
+@app.post("/api/dashboard/designs/batch-favorite")
+def batch_set_design_favorite(request: BatchFavoriteRequest, tenant: str = Depends(get_tenant)):
+    """Set, or toggle when is_favorite is omitted, the favorite status of many designs"""
+    def change(design: DesignPreview) -> DesignPreview:
+        is_favorite = not design.is_favorite if request.is_favorite is None else request.is_favorite
+        return design.model_copy(update={"is_favorite": is_favorite})
+
+    results = repositories.designs.update_many(tenant, {design_id: change for design_id in request.ids})
+    return batch_results(results, "design", "Design not found")
 
 @app.get("/api/dashboard/interactions", response_model=List[InteractionHistory])
-async def get_interaction_history():
-    """Get client interaction history"""
-    return mock_interactions
+def get_interaction_history(
+    client_id: Optional[str] = None,
+    created_after: Optional[datetime] = None,
+    created_before: Optional[datetime] = None,
+    params: ListParams = Depends(),
+    tenant: str = Depends(get_tenant)
+):
+    """Get client interaction history, one page at a time"""
+    return list_page(
+        repositories.interactions, tenant, params,
+        client_id=client_id, created_after=created_after, created_before=created_before
+    )
+
+@app.get("/api/dashboard/interactions/latest")
+def get_latest_interactions(
+    per_client: int = Query(3, ge=1, le=20),
+    client_ids: Optional[str] = Query(None, description="Comma-separated client ids; defaults to a page of favorite clients"),
+    params: ListParams = Depends(),
+    tenant: str = Depends(get_tenant)
+):
+    """Latest N interactions for each client, for dashboard cards"""
+    include = projection(InteractionHistory, params)
+    next_cursor = None
+    if client_ids:
+        ids = [client_id.strip() for client_id in client_ids.split(",") if client_id.strip()][:MAX_PAGE_SIZE]
+    else:
+        try:
+            clients = repositories.clients.page(tenant, limit=params.limit, cursor=params.cursor, sort=params.sort)
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+        ids = [client.id for client in clients.items]
+        next_cursor = clients.next_cursor
+
+    summary = []
+    for client_id in ids:
+        # One short range scan of the client's timeline, however long its history
+        latest = repositories.interactions.page(tenant, limit=per_client, sort="-created_at", client_id=client_id)
+        summary.append({
+            "client_id": client_id,
+            "interactions": [item.model_dump(mode="json", include=include) for item in latest.items]
+        })
+
+    headers = {"X-Next-Cursor": next_cursor} if next_cursor else {}
+    return JSONResponse(content=summary, headers=headers)
 
 # ==================== AI SERVICES ====================
 
 @app.post("/api/ai/analyze-floor-plan")
-async def analyze_floor_plan(request: FloorPlanAnalysisRequest):
+async def analyze_floor_plan(request: FloorPlanAnalysisRequest, http_request: Request, response: Response):
     """Analyze floor plan with AI"""
     try:
         # Decode base64 image
-        image_data = base64.b64decode(request.image_data)
+        with start_span("decode_image", {"payload.base64_chars": len(request.image_data)}) as span:
+            image_data = base64.b64decode(request.image_data)
+            span.set_attribute("image.bytes", len(image_data))
         
         # Use AI service for analysis
-        result = await ai_service.analyze_floor_plan(image_data, request.filename)
+        result = await ai_service.analyze_floor_plan(
+            image_data,
+            request.filename,
+            use_cache=not cache_bypass_requested(http_request)
+        )
+        set_cache_header(response)
         
         return {
             "success": True,
@@ -419,15 +889,17 @@ async def analyze_floor_plan(request: FloorPlanAnalysisRequest):
         }
 
 @app.post("/api/ai/generate-design")
-async def generate_design(request: DesignGenerationRequest):
+async def generate_design(request: DesignGenerationRequest, http_request: Request, response: Response):
     """Generate interior design with AI"""
     try:
         # Generate design suggestions
         suggestions = await ai_service.generate_design_suggestions(
             request.room_type, 
             request.style, 
-            50000  # default budget
+            50000,  # default budget
+            use_cache=not cache_bypass_requested(http_request)
         )
+        set_cache_header(response)
         
         return {
             "success": True,
@@ -448,15 +920,115 @@ async def generate_design(request: DesignGenerationRequest):
 async def chat_with_ai(request: ChatRequest):
     """Handle chat requests with the AI assistant"""
     try:
-        response = ai_service.chat_completion(
+        response = await ai_service.chat_with_ai(
             message=request.message,
-            context=request.context,
-            conversation_id=request.conversation_id
+            context=request.context
         )
         return JSONResponse(content={"reply": response})
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
+def _sse_event(data: Dict, event: Optional[str] = None) -> str:
+    """Format a Server-Sent Events message"""
+    payload = json.dumps(data, ensure_ascii=False)
+    if event:
+        return f"event: {event}\ndata: {payload}\n\n"
+    return f"data: {payload}\n\n"
+
+async def _chat_event_stream(request: ChatRequest) -> AsyncIterator[str]:
+    """Forward chat tokens as SSE messages"""
+    try:
+        async with aclosing(ai_service.stream_chat_with_ai(request.message, request.context)) as tokens:
+            async for token in tokens:
+                yield _sse_event({"delta": token})
+        yield _sse_event({"done": True}, event="done")
+    except Exception as e:
+        logger.exception("Chat stream error")
+        yield _sse_event({"error": str(e)}, event="error")
+
+@app.post("/api/ai/chat/stream")
+async def chat_with_ai_stream(request: ChatRequest):
+    """
+    Stream the AI assistant reply over Server-Sent Events
+
+    Tokens are pulled from Azure only as fast as the client reads them, and
+    Starlette cancels the stream when the client disconnects, which closes
+    the upstream request.
+    """
+    return StreamingResponse(
+        _chat_event_stream(request),
+        media_type="text/event-stream",
+        headers={
+            "Cache-Control": "no-cache",
+            "X-Accel-Buffering": "no"  # disable nginx response buffering
+        }
+    )
+
+async def _stream_chat_to_websocket(websocket: WebSocket, request: ChatRequest):
+    """Forward chat tokens to a WebSocket client"""
+    try:
+        async with aclosing(ai_service.stream_chat_with_ai(request.message, request.context)) as tokens:
+            async for token in tokens:
+                await websocket.send_json({"type": "delta", "content": token})
+        await websocket.send_json({"type": "done"})
+    except (WebSocketDisconnect, asyncio.CancelledError):
+        raise
+    except Exception as e:
+        logger.exception("Chat WebSocket stream error")
+        await websocket.send_json({"type": "error", "error": str(e)})
+
+@app.websocket("/api/ai/chat/ws")
+async def chat_with_ai_websocket(websocket: WebSocket):
+    """
+    Stream AI assistant replies over a WebSocket
+
+    The client sends ChatRequest JSON messages and receives "delta" frames
+    followed by "done". Any frame sent while a reply is streaming cancels
+    it; disconnecting cancels it and stops the upstream request.
+    """
+    await websocket.accept()
+    
+    # Receive runs alongside the stream so disconnects are noticed at once.
+    # If the reply finishes first, the pending receive carries the next frame.
+    listen_task: Optional[asyncio.Task] = None
+    
+    try:
+        while True:
+            message = await (listen_task or websocket.receive())
+            listen_task = None
+            
+            if message["type"] == "websocket.disconnect":
+                return
+            
+            try:
+                request = ChatRequest(**json.loads(message.get("text") or message.get("bytes") or ""))
+            except (ValidationError, ValueError, TypeError) as e:
+                await websocket.send_json({"type": "error", "error": f"Invalid chat request: {e}"})
+                continue
+            
+            stream_task = asyncio.create_task(_stream_chat_to_websocket(websocket, request))
+            listen_task = asyncio.create_task(websocket.receive())
+            await asyncio.wait({stream_task, listen_task}, return_when=asyncio.FIRST_COMPLETED)
+            
+            if stream_task.done():
+                stream_task.result()
+                continue
+            
+            stream_task.cancel()
+            with suppress(asyncio.CancelledError, WebSocketDisconnect):
+                await stream_task
+            
+            message = listen_task.result()
+            listen_task = None
+            if message["type"] == "websocket.disconnect":
+                return
+            await websocket.send_json({"type": "cancelled"})
+    except WebSocketDisconnect:
+        pass
+    finally:
+        if listen_task:
+            listen_task.cancel()
+
 @app.post("/api/ai/generate-image-azure")
 async def generate_image_azure(request: AzureImageGenerationRequest):
     """Generate an image using Azure DALL-E service"""
@@ -473,7 +1045,7 @@ async def generate_image_azure(request: AzureImageGenerationRequest):
             "hasDeployment": bool(azure_info.get("deployment_name"))
         }
         
-        print(f"Missing Azure OpenAI configuration: {json.dumps(config_status, indent=2)}")
+        logger.error("Missing Azure OpenAI configuration", extra=config_status)
         
         raise HTTPException(
             status_code=500, 
@@ -497,11 +1069,11 @@ async def generate_image_azure(request: AzureImageGenerationRequest):
                 detail=f"Failed to generate image: {result.get('error', 'Unknown error')}"
             )
     except Exception as e:
-        print(f"Azure image generation error: {e}")
+        logger.exception("Azure image generation error")
         raise HTTPException(status_code=500, detail=str(e))
 
 @app.post("/api/ai/generate-image-sd")
-async def generate_image_stable_diffusion(request: StableDiffusionRequest):
+async def generate_image_stable_diffusion(request: StableDiffusionRequest, http_request: Request):
     """Generate an image using Stable Diffusion XL service"""
     if not request.prompt:
         raise HTTPException(status_code=400, detail="Prompt cannot be empty.")
@@ -527,9 +1099,14 @@ async def generate_image_stable_diffusion(request: StableDiffusionRequest):
         )
         
         if result.get("success"):
+            artifact = result.get("artifact")
+            if request.response_format == "binary" and artifact:
+                return artifact_response(artifact["id"], http_request)
+            
             return JSONResponse(content={
                 "success": True,
                 "image_url": result.get("image_url"),
+                "artifact": artifact,
                 "model": result.get("model"),
                 "service": result.get("service"),
                 "prompt": result.get("prompt"),
@@ -541,9 +1118,43 @@ async def generate_image_stable_diffusion(request: StableDiffusionRequest):
                 detail=f"Failed to generate image: {result.get('error', 'Unknown error')}"
             )
     except Exception as e:
-        print(f"Stable Diffusion generation error: {e}")
+        logger.exception("Stable Diffusion generation error")
         raise HTTPException(status_code=500, detail=str(e))
 
+@app.post("/api/jobs/generate-image-azure", status_code=202)
+async def submit_azure_image_job(request: AzureImageGenerationRequest, http_request: Request):
+    """Queue an Azure DALL-E generation; poll /api/jobs/{job_id} for the result"""
+    if not request.prompt:
+        raise HTTPException(status_code=400, detail="Prompt cannot be empty.")
+    if not azure_service.is_configured():
+        raise HTTPException(status_code=500, detail="Azure OpenAI service not configured.")
+
+    return await submit_job("azure_image", {"prompt": request.prompt}, request.webhook_url, http_request)
+
+@app.post("/api/jobs/generate-image-sd", status_code=202)
+async def submit_sd_image_job(request: StableDiffusionRequest, http_request: Request):
+    """Queue a Stable Diffusion generation; poll /api/jobs/{job_id} for the result"""
+    if not request.prompt:
+        raise HTTPException(status_code=400, detail="Prompt cannot be empty.")
+    if not sd_service.is_configured():
+        raise HTTPException(status_code=500, detail="Stable Diffusion service not configured.")
+
+    params = request.model_dump(exclude={"response_format", "webhook_url"})
+    return await submit_job("sd_image", params, request.webhook_url, http_request)
+
+@app.get("/api/jobs/{job_id}")
+async def get_job(job_id: str):
+    """Status of a queued image generation job, with its result once finished"""
+    job = await job_queue.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return public_job(job)
+
+@app.get("/api/artifacts/{artifact_id}")
+async def get_artifact(artifact_id: str, request: Request):
+    """Serve a generated image as raw bytes"""
+    return artifact_response(artifact_id, request)
+
 @app.get("/api/ai/suggestions")
 async def get_design_suggestions():
     """Get AI-powered design suggestions"""
@@ -613,11 +1224,10 @@ async def get_features():
 # ==================== MAIN ====================
 
 if __name__ == "__main__":
-    print("🚀 Starting RED AI Backend Server...")
-    print(f"📊 Dashboard features: Tasks, Clients, Designs, Analytics")
-    print(f"🤖 AI services: Floor plan analysis, Design generation, Chat assistant")
-    print(f"🔧 API Documentation: http://localhost:{settings.API_PORT}/docs")
-    print(f"🎨 Features: http://localhost:{settings.API_PORT}/api/features")
+    logger.info("Starting RED AI Backend Server", extra={
+        "docs_url": f"http://localhost:{settings.API_PORT}/docs",
+        "features_url": f"http://localhost:{settings.API_PORT}/api/features"
+    })
     
     uvicorn.run(
         "main:app",
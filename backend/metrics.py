@@ -0,0 +1,168 @@
+"""
+Prometheus metrics for RED AI
+Request latency per route, upstream AI call latency per provider and deployment,
+token and image counters, cache hit ratio, job queue depth and in-flight counts,
+served on /metrics for the scrape job in docker/prometheus.yml
+"""
+
+import time
+import asyncio
+from typing import Any, Callable, Dict, Optional
+
+from prometheus_client import CONTENT_TYPE_LATEST, REGISTRY, Counter, Gauge, Histogram, generate_latest
+from prometheus_client.core import CounterMetricFamily, GaugeMetricFamily
+
+# Image generation takes tens of seconds, so the buckets reach well past the defaults
+LATENCY_BUCKETS = (0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 20, 30, 60, 120)
+
+HTTP_REQUEST_DURATION = Histogram(
+    "redai_http_request_duration_seconds",
+    "Time to serve an HTTP request, including the streamed body",
+    ["method", "route", "status"],
+    buckets=LATENCY_BUCKETS
+)
+HTTP_REQUESTS_IN_FLIGHT = Gauge(
+    "redai_http_requests_in_flight",
+    "HTTP requests being served"
+)
+UPSTREAM_REQUEST_DURATION = Histogram(
+    "redai_upstream_request_duration_seconds",
+    "Time spent in one call to an AI provider",
+    ["provider", "deployment", "outcome"],
+    buckets=LATENCY_BUCKETS
+)
+UPSTREAM_REQUESTS_IN_FLIGHT = Gauge(
+    "redai_upstream_requests_in_flight",
+    "Calls to AI providers awaiting a response",
+    ["provider"]
+)
+AI_TOKENS = Counter(
+    "redai_ai_tokens",
+    "Tokens billed by AI providers (usage.total_tokens)",
+    ["provider", "deployment"]
+)
+IMAGES_GENERATED = Counter(
+    "redai_images_generated",
+    "Images returned by image generation providers",
+    ["provider"]
+)
+JOB_QUEUE_DEPTH = Gauge(
+    "redai_job_queue_depth",
+    "Jobs waiting for a worker"
+)
+
+def _route(scope) -> str:
+    # The route template keeps label cardinality bounded; raw paths carry ids
+    route = scope.get("route")
+    return getattr(route, "path", None) or "<unmatched>"
+
+class MetricsMiddleware:
+    """ASGI middleware that times every HTTP request by route template"""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        status = 500
+        started = time.perf_counter()
+
+        async def send_with_status(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        HTTP_REQUESTS_IN_FLIGHT.inc()
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            HTTP_REQUESTS_IN_FLIGHT.dec()
+            HTTP_REQUEST_DURATION.labels(scope["method"], _route(scope), str(status)).observe(
+                time.perf_counter() - started
+            )
+
+def _outcome(error: BaseException) -> str:
+    if isinstance(error, asyncio.CancelledError):
+        return "cancelled"
+    if isinstance(error, asyncio.TimeoutError):
+        return "timeout"
+    if getattr(error, "status_code", None) == 429:
+        return "throttled"
+    return "error"
+
+class UpstreamCall:
+    """
+    Times one upstream call and counts it as in flight
+
+    Used as `with UpstreamCall(provider, deployment) as call:`. An exception
+    sets the outcome; callers whose failures come back as result dicts set
+    call.outcome themselves.
+    """
+
+    def __init__(self, provider: str, deployment: str = ""):
+        self.provider = provider
+        self.deployment = deployment
+        self.outcome = "success"
+
+    def __enter__(self) -> "UpstreamCall":
+        UPSTREAM_REQUESTS_IN_FLIGHT.labels(self.provider).inc()
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc is not None:
+            self.outcome = _outcome(exc)
+        UPSTREAM_REQUESTS_IN_FLIGHT.labels(self.provider).dec()
+        UPSTREAM_REQUEST_DURATION.labels(self.provider, self.deployment, self.outcome).observe(
+            time.perf_counter() - self.started
+        )
+
+def record_usage(provider: str, deployment: str, usage: Any):
+    """Count the tokens from an OpenAI-style `usage` object, if the response has one"""
+    total = getattr(usage, "total_tokens", None)
+    if total:
+        AI_TOKENS.labels(provider, deployment).inc(total)
+
+def record_images(provider: str, count: int = 1):
+    IMAGES_GENERATED.labels(provider).inc(count)
+
+class StatsCollector:
+    """
+    Exports counters the services already keep, read at scrape time
+
+    `stats` returns {"hits": n, "misses": n} for the response cache; the
+    hit ratio is exported as well so dashboards need no recording rule.
+    """
+
+    def __init__(self, stats: Callable[[], Dict[str, Any]]):
+        self.stats = stats
+
+    def collect(self):
+        stats = self.stats()
+        hits = CounterMetricFamily("redai_cache_hits", "Response cache hits")
+        hits.add_metric([], stats.get("hits", 0))
+        misses = CounterMetricFamily("redai_cache_misses", "Response cache misses")
+        misses.add_metric([], stats.get("misses", 0))
+        ratio = GaugeMetricFamily("redai_cache_hit_ratio", "Share of response cache lookups that hit")
+        ratio.add_metric([], stats.get("hit_ratio", 0.0))
+        return [hits, misses, ratio]
+
+_collector: Optional[StatsCollector] = None
+
+def register_cache_stats(stats: Callable[[], Dict[str, Any]]):
+    """Export the response cache counters; a later call replaces the source"""
+    global _collector
+    if _collector is None:
+        _collector = StatsCollector(stats)
+        REGISTRY.register(_collector)
+    _collector.stats = stats
+
+def set_queue_stats(stats: Dict[str, Any]):
+    JOB_QUEUE_DEPTH.set(stats.get("queued", 0))
+
+def render_metrics() -> bytes:
+    return generate_latest(REGISTRY)
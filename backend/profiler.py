@@ -0,0 +1,209 @@
+"""
+On-demand sampling profiler for RED AI
+Samples the Python stacks of every thread from a background thread and
+returns them as collapsed stacks (`thread;outer;...;inner count`), the input
+format of flamegraph.pl, speedscope and inferno. Nothing runs until a
+profile is requested, and with profiling disabled neither the endpoints nor
+the per-request middleware are installed.
+"""
+
+import os
+import sys
+import uuid
+import asyncio
+import secrets
+import threading
+from collections import Counter, OrderedDict
+from typing import Any, Dict, Optional
+
+from structured_logging import get_logger
+
+logger = get_logger("profiler")
+
+# Leaf functions of threads that are blocked, not running: the event loop
+# waiting in select(), idle pool workers, the log and span writer threads
+IDLE_FUNCTIONS = {"select", "poll", "wait", "_wait_for_tstate_lock", "accept"}
+
+class ProfilerBusyError(Exception):
+    """A whole-process profile is already running"""
+
+class SamplingProfiler:
+    """
+    Counts the stack of every thread each `interval` seconds
+
+    sys._current_frames() is read from a daemon thread, so the profiled code
+    is not instrumented; the cost is the sampling thread's share of the GIL
+    while a profile runs. Idle threads are skipped unless include_idle is set.
+    """
+
+    def __init__(self, interval: float = 0.005, include_idle: bool = False):
+        self.interval = interval
+        self.include_idle = include_idle
+        self.stacks: Counter = Counter()
+        self.samples = 0
+        self._names: Dict[Any, str] = {}
+        self._stopped = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def _frame_name(self, code) -> str:
+        name = self._names.get(code)
+        if name is None:
+            name = f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})"
+            self._names[code] = name
+        return name
+
+    def sample(self):
+        own = threading.get_ident()
+        threads = {thread.ident: thread.name for thread in threading.enumerate()}
+        for ident, frame in sys._current_frames().items():
+            if ident == own:
+                continue
+            if not self.include_idle and frame.f_code.co_name in IDLE_FUNCTIONS:
+                continue
+            frames = []
+            while frame is not None:
+                frames.append(self._frame_name(frame.f_code))
+                frame = frame.f_back
+            frames.append(threads.get(ident, str(ident)))
+            self.stacks[";".join(reversed(frames))] += 1
+        self.samples += 1
+
+    def _run(self):
+        while not self._stopped.wait(self.interval):
+            self.sample()
+
+    def start(self) -> "SamplingProfiler":
+        self._thread = threading.Thread(target=self._run, name="sampling-profiler", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self) -> "SamplingProfiler":
+        self._stopped.set()
+        if self._thread is not None:
+            self._thread.join()
+        return self
+
+    def collapsed(self) -> str:
+        """Collapsed stacks, most sampled first"""
+        return "".join(f"{stack} {count}\n" for stack, count in self.stacks.most_common())
+
+class ProfilingService:
+    """
+    Admin-only profiling: whole-process profiles for N seconds and
+    per-request profiles triggered by the X-Profile header
+
+    Per-request profiles sample every thread while the request runs, so
+    requests served concurrently show up in them too; the thread name at
+    the root of each stack tells the event loop from pool workers.
+    """
+
+    def __init__(
+        self,
+        token: str,
+        max_seconds: float = 60.0,
+        interval: float = 0.005,
+        keep_request_profiles: int = 20
+    ):
+        self.token = token
+        self.max_seconds = max_seconds
+        self.interval = interval
+        self.keep_request_profiles = keep_request_profiles
+        self.request_profiles: "OrderedDict[str, str]" = OrderedDict()
+        self._lock = asyncio.Lock()
+        self.stats = {"profiles": 0, "request_profiles": 0}
+
+    def authorized(self, token: Optional[str]) -> bool:
+        # Compared as bytes: compare_digest rejects str with non-ASCII characters
+        return bool(token) and secrets.compare_digest(
+            token.encode("utf-8", "surrogateescape"), self.token.encode("utf-8")
+        )
+
+    async def profile(self, seconds: float, interval: Optional[float] = None, include_idle: bool = False) -> str:
+        """Sample the whole process for `seconds` (capped at max_seconds)"""
+        if self._lock.locked():
+            raise ProfilerBusyError("A profile is already running")
+        async with self._lock:
+            seconds = max(0.1, min(seconds, self.max_seconds))
+            profiler = SamplingProfiler(interval or self.interval, include_idle).start()
+            try:
+                await asyncio.sleep(seconds)
+            finally:
+                # Joining the sampler thread must not block the event loop
+                await asyncio.to_thread(profiler.stop)
+            self.stats["profiles"] += 1
+            logger.info("Profile captured", extra={"seconds": seconds, "samples": profiler.samples})
+            return profiler.collapsed()
+
+    def start_request_profile(self) -> SamplingProfiler:
+        return SamplingProfiler(self.interval).start()
+
+    async def finish_request_profile(self, profile_id: str, profiler: SamplingProfiler):
+        await asyncio.to_thread(profiler.stop)
+        self.request_profiles[profile_id] = profiler.collapsed()
+        while len(self.request_profiles) > self.keep_request_profiles:
+            self.request_profiles.popitem(last=False)
+        self.stats["request_profiles"] += 1
+
+    def get_request_profile(self, profile_id: str) -> Optional[str]:
+        return self.request_profiles.get(profile_id)
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {"running": self._lock.locked(), "stored_request_profiles": len(self.request_profiles), **self.stats}
+
+def create_profiling_service() -> Optional[ProfilingService]:
+    """
+    Profiling from PROFILING_ENABLED and PROFILING_TOKEN, or None when disabled
+
+    Both are required: the token is what makes the endpoints admin-only.
+    PROFILING_MAX_SECONDS (60) caps a profile, PROFILING_INTERVAL_MS (5)
+    sets the sampling interval.
+    """
+    if os.getenv("PROFILING_ENABLED", "false").lower() != "true":
+        return None
+    token = os.getenv("PROFILING_TOKEN")
+    if not token:
+        logger.warning("PROFILING_ENABLED is set without PROFILING_TOKEN, profiling stays off")
+        return None
+    return ProfilingService(
+        token,
+        max_seconds=float(os.getenv("PROFILING_MAX_SECONDS", "60")),
+        interval=float(os.getenv("PROFILING_INTERVAL_MS", "5")) / 1000
+    )
+
+class ProfilingMiddleware:
+    """
+    ASGI middleware that profiles requests sent with `X-Profile: 1` and a
+    valid X-Admin-Token
+
+    The response carries X-Profile-Id; the collapsed stacks are fetched
+    from /api/admin/profile/requests/{id} once the request has finished.
+    """
+
+    def __init__(self, app, profiling: ProfilingService):
+        self.app = app
+        self.profiling = profiling
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        headers = dict(scope.get("headers", []))
+        if headers.get(b"x-profile") != b"1" or not self.profiling.authorized(
+            headers.get(b"x-admin-token", b"").decode("latin-1")
+        ):
+            await self.app(scope, receive, send)
+            return
+
+        profile_id = uuid.uuid4().hex
+
+        async def send_with_profile_id(message):
+            if message["type"] == "http.response.start":
+                message["headers"] = [*message.get("headers", []), (b"x-profile-id", profile_id.encode())]
+            await send(message)
+
+        profiler = self.profiling.start_request_profile()
+        try:
+            await self.app(scope, receive, send_with_profile_id)
+        finally:
+            await self.profiling.finish_request_profile(profile_id, profiler)
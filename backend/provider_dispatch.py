@@ -0,0 +1,243 @@
+"""
+Provider dispatch for RED AI
+Sequential, hedged and race-all strategies over a list of interchangeable AI providers,
+with per-provider adaptive timeouts derived from observed latency, retries of
+transient failures and a circuit breaker per provider
+"""
+
+import time
+import asyncio
+from collections import deque
+from typing import Any, Awaitable, Callable, Deque, Dict, List, Optional, Set, Tuple
+
+from metrics import UpstreamCall
+from resilience import CircuitBreaker, RetryPolicy
+from structured_logging import get_logger
+from tracing import start_span
+
+logger = get_logger("provider_dispatch")
+
+# (provider name, zero-argument coroutine factory returning a result dict)
+ProviderCall = Tuple[str, Callable[[], Awaitable[Dict]]]
+
+DISPATCH_POLICIES = ("sequential", "hedged", "race")
+
+class LatencyTracker:
+    """Sliding window of recent successful call latencies for one provider"""
+
+    def __init__(self, window: int = 50):
+        self.samples: Deque[float] = deque(maxlen=window)
+
+    def record(self, seconds: float):
+        self.samples.append(seconds)
+
+    def percentile(self, pct: float) -> Optional[float]:
+        """Nearest-rank percentile, or None before the first sample"""
+        if not self.samples:
+            return None
+        ordered = sorted(self.samples)
+        index = max(0, min(len(ordered) - 1, round(pct / 100 * len(ordered)) - 1))
+        return ordered[index]
+
+class ProviderDispatcher:
+    """Runs a provider list under one of the dispatch policies"""
+
+    def __init__(
+        self,
+        label: str = "AI",
+        policy: str = "sequential",
+        default_timeout: float = 60.0,
+        min_timeout: float = 10.0,
+        max_timeout: float = 120.0,
+        timeout_percentile: float = 95.0,
+        timeout_multiplier: float = 2.0,
+        hedge_percentile: float = 90.0,
+        hedge_delay: float = 15.0,
+        retry: Optional[RetryPolicy] = None,
+        failure_threshold: int = 5,
+        recovery_timeout: float = 30.0
+    ):
+        if policy not in DISPATCH_POLICIES:
+            raise ValueError(f"Unknown dispatch policy '{policy}'. Use one of: {', '.join(DISPATCH_POLICIES)}")
+
+        self.label = label
+        self.policy = policy
+        self.default_timeout = default_timeout
+        self.min_timeout = min_timeout
+        self.max_timeout = max_timeout
+        self.timeout_percentile = timeout_percentile
+        self.timeout_multiplier = timeout_multiplier
+        self.hedge_percentile = hedge_percentile
+        self.hedge_delay = hedge_delay
+        self.retry = retry
+        self.failure_threshold = failure_threshold
+        self.recovery_timeout = recovery_timeout
+        self.trackers: Dict[str, LatencyTracker] = {}
+        self.breakers: Dict[str, CircuitBreaker] = {}
+
+    def tracker(self, name: str) -> LatencyTracker:
+        if name not in self.trackers:
+            self.trackers[name] = LatencyTracker()
+        return self.trackers[name]
+
+    def breaker(self, name: str) -> CircuitBreaker:
+        if name not in self.breakers:
+            self.breakers[name] = CircuitBreaker(name, self.failure_threshold, self.recovery_timeout)
+        return self.breakers[name]
+
+    def timeout_for(self, name: str) -> float:
+        """Adaptive timeout: a multiple of the provider's tail latency, clamped"""
+        observed = self.tracker(name).percentile(self.timeout_percentile)
+        if observed is None:
+            return self.default_timeout
+        return min(self.max_timeout, max(self.min_timeout, observed * self.timeout_multiplier))
+
+    def hedge_delay_for(self, name: str) -> float:
+        """How long to wait on a provider before starting the next one"""
+        observed = self.tracker(name).percentile(self.hedge_percentile)
+        if observed is None:
+            return self.hedge_delay
+        return min(observed, self.timeout_for(name))
+
+    async def dispatch(self, providers: List[ProviderCall]) -> Dict:
+        """Run the providers under the configured policy; returns the winning result"""
+        if not providers:
+            return {"success": False, "error": "No providers available"}
+
+        if self.policy == "race":
+            return await self._race(providers)
+        if self.policy == "hedged":
+            return await self._hedged(providers)
+        return await self._sequential(providers)
+
+    async def _attempt(self, name: str, call: Callable[[], Awaitable[Dict]]) -> Dict:
+        """
+        Run one provider call under its adaptive timeout; never raises except on cancellation
+
+        A provider whose circuit is open fails immediately, so the policy moves
+        on without waiting. Transient errors the call raises are retried
+        within the same timeout.
+        """
+        breaker = self.breaker(name)
+        if not breaker.allow_request():
+            return {
+                "success": False,
+                "error": f"{name} skipped, circuit open for {breaker.retry_after():.0f}s",
+                "service": name
+            }
+
+        timeout = self.timeout_for(name)
+        operation = (lambda: self.retry.run(call)) if self.retry else call
+        started = time.perf_counter()
+        with start_span("provider.attempt", {"provider": name, "timeout_seconds": round(timeout, 1)}) as span, \
+                UpstreamCall(name, self.label) as upstream:
+            try:
+                result = await asyncio.wait_for(operation(), timeout)
+            except asyncio.TimeoutError:
+                upstream.outcome = "timeout"
+                span.set_error("timeout")
+                breaker.record_failure()
+                logger.warning("Provider timed out", extra={"provider": name, "timeout_seconds": round(timeout, 1)})
+                return {"success": False, "error": f"{name} timed out after {timeout:.1f}s", "service": name}
+            except Exception as e:
+                upstream.outcome = "error"
+                span.record_exception(e)
+                breaker.record_failure()
+                logger.warning("Provider failed", extra={"provider": name, "error": str(e), "error_type": type(e).__name__})
+                return {"success": False, "error": str(e), "service": name}
+
+            if not result.get("success"):
+                upstream.outcome = "error"
+                span.set_error(str(result.get("error")))
+                breaker.record_failure()
+                return result
+
+        breaker.record_success()
+        self.tracker(name).record(time.perf_counter() - started)
+        return result
+
+    async def _sequential(self, providers: List[ProviderCall]) -> Dict:
+        errors = []
+        for name, call in providers:
+            result = await self._attempt(name, call)
+            if result.get("success"):
+                return result
+            errors.append(result)
+        return self._all_failed(errors)
+
+    async def _race(self, providers: List[ProviderCall]) -> Dict:
+        pending = {asyncio.create_task(self._attempt(name, call)) for name, call in providers}
+        return await self._collect(pending, [], [])
+
+    async def _hedged(self, providers: List[ProviderCall]) -> Dict:
+        remaining = list(providers)
+        name, call = remaining.pop(0)
+        pending = {asyncio.create_task(self._attempt(name, call))}
+        return await self._collect(pending, remaining, [], hedge_after=name)
+
+    async def _collect(
+        self,
+        pending: Set[asyncio.Task],
+        remaining: List[ProviderCall],
+        errors: List[Dict],
+        hedge_after: Optional[str] = None
+    ) -> Dict:
+        """
+        Wait for the first successful attempt and cancel the rest
+
+        With hedge_after set, the next provider in remaining is started when
+        the latest one has run longer than its hedge delay, or as soon as an
+        attempt fails.
+        """
+        try:
+            while pending:
+                delay = self.hedge_delay_for(hedge_after) if (remaining and hedge_after) else None
+                done, pending = await asyncio.wait(pending, timeout=delay, return_when=asyncio.FIRST_COMPLETED)
+
+                for task in done:
+                    result = task.result()
+                    if result.get("success"):
+                        return result
+                    errors.append(result)
+
+                # Only hedged dispatch has providers in reserve: every wake-up
+                # is either a hedge timeout or a failure, so start the next one
+                if remaining:
+                    hedge_after, call = remaining.pop(0)
+                    if not done:
+                        logger.info("Hedging with next provider", extra={"provider": hedge_after})
+                    pending.add(asyncio.create_task(self._attempt(hedge_after, call)))
+
+            return self._all_failed(errors)
+        finally:
+            # Losers and abandoned attempts must not keep upstream requests open
+            for task in pending:
+                task.cancel()
+            if pending:
+                await asyncio.gather(*pending, return_exceptions=True)
+
+    def _all_failed(self, errors: List[Dict]) -> Dict:
+        return {
+            "success": False,
+            "error": f"All {self.label} services failed",
+            "attempts": [
+                {"service": error.get("service"), "error": error.get("error")}
+                for error in errors
+            ]
+        }
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            "policy": self.policy,
+            "providers": {
+                name: {
+                    "samples": len(tracker.samples),
+                    "p50_seconds": tracker.percentile(50),
+                    "p95_seconds": tracker.percentile(95),
+                    "timeout_seconds": self.timeout_for(name)
+                }
+                for name, tracker in self.trackers.items()
+            },
+            "circuits": {name: breaker.get_stats() for name, breaker in self.breakers.items()},
+            "retry": self.retry.get_stats() if self.retry else None
+        }
@@ -0,0 +1,114 @@
+"""
+Provider health probing for RED AI
+Background async checks that keep a live availability and latency table per provider
+"""
+
+import time
+import random
+import asyncio
+from datetime import datetime
+from typing import Any, Awaitable, Callable, Dict, List
+
+from structured_logging import get_logger
+
+logger = get_logger("provider_health")
+
+# Zero-argument coroutine factory; raising (or timing out) marks the provider down
+Probe = Callable[[], Awaitable[Any]]
+
+class HealthProber:
+    """Rechecks registered providers on a jittered interval"""
+
+    def __init__(self, interval: float = 30.0, jitter: float = 0.2, timeout: float = 2.0):
+        self.interval = interval
+        self.jitter = jitter
+        self.timeout = timeout
+        self.probes: Dict[str, Probe] = {}
+        self.table: Dict[str, Dict[str, Any]] = {}
+        self._tasks: List[asyncio.Task] = []
+        self._running = False
+
+    def register(self, name: str, probe: Probe):
+        """Add a provider; it counts as available until its first check says otherwise"""
+        self.probes[name] = probe
+        self.table[name] = {
+            "available": None,
+            "latency_ms": None,
+            "last_checked": None,
+            "last_error": None,
+            "consecutive_failures": 0
+        }
+
+    def is_available(self, name: str) -> bool:
+        state = self.table.get(name)
+        return state is not None and state["available"] is not False
+
+    def available(self) -> List[str]:
+        """Available providers in registration order"""
+        return [name for name in self.probes if self.is_available(name)]
+
+    async def check(self, name: str) -> bool:
+        """Probe one provider now and update its table entry"""
+        state = self.table[name]
+        started = time.perf_counter()
+        try:
+            await asyncio.wait_for(self.probes[name](), self.timeout)
+        except asyncio.TimeoutError:
+            error = f"no response within {self.timeout:.1f}s"
+        except Exception as e:
+            error = str(e) or e.__class__.__name__
+        else:
+            error = None
+
+        was_available = state["available"]
+        state["last_checked"] = datetime.now().isoformat()
+        state["last_error"] = error
+
+        if error is None:
+            state["available"] = True
+            state["latency_ms"] = round((time.perf_counter() - started) * 1000, 1)
+            state["consecutive_failures"] = 0
+            if was_available is not True:
+                logger.info("Provider available", extra={"provider": name, "latency_ms": state["latency_ms"]})
+        else:
+            state["available"] = False
+            state["consecutive_failures"] += 1
+            if was_available is not False:
+                logger.warning("Provider unavailable", extra={"provider": name, "error": error})
+
+        return state["available"]
+
+    async def check_all(self):
+        await asyncio.gather(*(self.check(name) for name in self.probes))
+
+    def start(self):
+        """Start one probing loop per provider; must be called from a running event loop"""
+        if self._tasks:
+            return
+        self._running = True
+        self._tasks = [asyncio.create_task(self._run(name)) for name in self.probes]
+
+    async def stop(self):
+        # wait_for in 3.11 can swallow a cancel that lands as the probe finishes,
+        # so the loops also check this flag
+        self._running = False
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+
+    async def _run(self, name: str):
+        while self._running:
+            await self.check(name)
+            await asyncio.sleep(self._next_delay())
+
+    def _next_delay(self) -> float:
+        # Jitter keeps probes of several workers from arriving in lockstep
+        return self.interval * random.uniform(1 - self.jitter, 1 + self.jitter)
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            "running": bool(self._tasks),
+            "interval_seconds": self.interval,
+            "providers": {name: dict(state) for name, state in self.table.items()}
+        }
@@ -0,0 +1,254 @@
+"""
+Upstream quota admission for RED AI
+Client-side token and request budgets per Azure OpenAI deployment. Requests
+wait for budget (or are shed) before dispatch instead of hitting Azure's
+TPM/RPM limits, and the budgets follow the x-ratelimit-remaining-* headers
+Azure returns on every response.
+"""
+
+import os
+import time
+import asyncio
+from typing import Any, Callable, Dict, List, Mapping, Optional
+
+from resilience import retry_after_seconds
+
+try:
+    import tiktoken
+    TOKENIZER = tiktoken.get_encoding("o200k_base")
+except Exception:
+    TOKENIZER = None
+
+# Tokens a high-detail 1024x1024 image adds to a vision prompt
+IMAGE_TOKENS = 765
+# Tokens of a low-detail image, whatever its size
+LOW_DETAIL_IMAGE_TOKENS = 85
+
+class QuotaExceededError(Exception):
+    """Request could not be admitted within the deployment's budget"""
+
+    def __init__(self, deployment: str, retry_after: float):
+        self.deployment = deployment
+        self.retry_after = retry_after
+        super().__init__(f"Azure OpenAI quota for {deployment} exhausted, retry in {retry_after:.0f}s")
+
+def estimate_tokens(text: str) -> int:
+    """Token count of a prompt; about four characters per token without tiktoken"""
+    if TOKENIZER is not None:
+        return len(TOKENIZER.encode(text))
+    return len(text) // 4 + 1
+
+def estimate_chat_tokens(messages: List[Dict], max_tokens: int = 0) -> int:
+    """
+    Tokens Azure charges a chat request against TPM at dispatch time
+
+    Azure counts the prompt plus max_tokens, not the tokens later generated.
+    """
+    total = 3
+    for message in messages:
+        total += 4
+        content = message.get("content") or ""
+        if isinstance(content, str):
+            total += estimate_tokens(content)
+            continue
+        for part in content:
+            if part.get("type") == "text":
+                total += estimate_tokens(part.get("text", ""))
+            elif part.get("type") == "image_url":
+                low = part.get("image_url", {}).get("detail") == "low"
+                total += LOW_DETAIL_IMAGE_TOKENS if low else IMAGE_TOKENS
+    return total + max_tokens
+
+class TokenBucket:
+    """Budget of `capacity` units refilled evenly over `period` seconds"""
+
+    def __init__(self, capacity: int, period: float = 60.0, clock: Callable[[], float] = time.monotonic):
+        self.capacity = capacity
+        self.rate = capacity / period
+        self.clock = clock
+        self.level = float(capacity)
+        self.updated = clock()
+
+    def _refill(self):
+        now = self.clock()
+        self.level = min(self.capacity, self.level + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def wait_time(self, amount: float) -> float:
+        """Seconds until `amount` units are available"""
+        self._refill()
+        return max(0.0, (amount - self.level) / self.rate)
+
+    def take(self, amount: float):
+        self._refill()
+        self.level -= amount
+
+    def sync(self, remaining: float):
+        """Lower the level to what the upstream reports as remaining"""
+        self._refill()
+        self.level = min(self.level, remaining)
+
+class DeploymentBudget:
+    """
+    Admission control for one deployment
+
+    Requests are admitted in arrival order. One that would wait longer
+    than max_wait, or arrive with max_queue requests already waiting, is
+    shed with QuotaExceededError instead.
+    """
+
+    def __init__(
+        self,
+        deployment: str,
+        tokens_per_minute: int = 0,
+        requests_per_minute: int = 0,
+        max_wait: float = 30.0,
+        max_queue: int = 100,
+        clock: Callable[[], float] = time.monotonic
+    ):
+        self.deployment = deployment
+        self.clock = clock
+        # A zero limit leaves that dimension unmanaged
+        self.tokens = TokenBucket(tokens_per_minute, clock=clock) if tokens_per_minute > 0 else None
+        self.requests = TokenBucket(requests_per_minute, clock=clock) if requests_per_minute > 0 else None
+        self.max_wait = max_wait
+        self.max_queue = max_queue
+        self.blocked_until = 0.0
+        self._lock = asyncio.Lock()
+        self._queued = 0
+        self._queued_tokens = 0
+        self.stats = {"admitted": 0, "queued": 0, "shed": 0, "throttled": 0}
+
+    def _wait_time(self, tokens: int, requests: int = 1) -> float:
+        wait = self.blocked_until - self.clock()
+        if self.tokens is not None:
+            wait = max(wait, self.tokens.wait_time(tokens))
+        if self.requests is not None:
+            wait = max(wait, self.requests.wait_time(requests))
+        return max(0.0, wait)
+
+    def _clamp(self, tokens: int) -> int:
+        # A prompt larger than the whole budget waits for a full bucket
+        return min(tokens, self.tokens.capacity) if self.tokens is not None else tokens
+
+    def wait_time(self, tokens: int = 0) -> float:
+        """Expected wait for a request arriving now; everything already waiting is admitted first"""
+        return self._wait_time(self._queued_tokens + self._clamp(tokens), self._queued + 1)
+
+    async def acquire(self, tokens: int = 0):
+        """Wait until the request fits in the budget, then charge it"""
+        tokens = self._clamp(tokens)
+        expected_wait = self.wait_time(tokens)
+        if self._queued >= self.max_queue or expected_wait > self.max_wait:
+            self.stats["shed"] += 1
+            raise QuotaExceededError(self.deployment, expected_wait)
+
+        if expected_wait > 0:
+            self.stats["queued"] += 1
+        self._queued += 1
+        self._queued_tokens += tokens
+        try:
+            async with self._lock:
+                while True:
+                    wait = self._wait_time(tokens)
+                    if wait <= 0:
+                        break
+                    await asyncio.sleep(wait)
+                if self.tokens is not None:
+                    self.tokens.take(tokens)
+                if self.requests is not None:
+                    self.requests.take(1)
+        finally:
+            self._queued -= 1
+            self._queued_tokens -= tokens
+        self.stats["admitted"] += 1
+
+    def record(self, headers: Mapping[str, str]):
+        """Follow the remaining quota Azure reports after a response"""
+        for bucket, name in ((self.tokens, "x-ratelimit-remaining-tokens"), (self.requests, "x-ratelimit-remaining-requests")):
+            value = headers.get(name)
+            if bucket is not None and value is not None:
+                try:
+                    bucket.sync(float(value))
+                except ValueError:
+                    pass
+
+    def throttled(self, retry_after: float):
+        """Azure answered 429: admit nothing until it says to retry"""
+        self.stats["throttled"] += 1
+        self.blocked_until = max(self.blocked_until, self.clock() + retry_after)
+        for bucket in (self.tokens, self.requests):
+            if bucket is not None:
+                bucket.sync(0)
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            **self.stats,
+            "waiting": self._queued,
+            "tokens_per_minute": self.tokens.capacity if self.tokens else None,
+            "tokens_available": int(self.tokens.level) if self.tokens else None,
+            "requests_per_minute": self.requests.capacity if self.requests else None,
+            "requests_available": int(self.requests.level) if self.requests else None,
+            "blocked_for_seconds": round(max(0.0, self.blocked_until - self.clock()), 1)
+        }
+
+class QuotaManager:
+    """Budgets for every deployment a service calls; unknown deployments are admitted freely"""
+
+    def __init__(self, budgets: Optional[Dict[str, DeploymentBudget]] = None):
+        self.budgets = budgets or {}
+
+    async def acquire(self, deployment: str, tokens: int = 0):
+        budget = self.budgets.get(deployment)
+        if budget is not None:
+            await budget.acquire(tokens)
+
+    def wait_time(self, deployment: str, tokens: int = 0) -> float:
+        budget = self.budgets.get(deployment)
+        return budget.wait_time(tokens) if budget is not None else 0.0
+
+    def record(self, deployment: str, headers: Mapping[str, str]):
+        budget = self.budgets.get(deployment)
+        if budget is not None:
+            budget.record(headers)
+
+    def throttled(self, deployment: str, retry_after: float):
+        budget = self.budgets.get(deployment)
+        if budget is not None:
+            budget.throttled(retry_after)
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {deployment: budget.get_stats() for deployment, budget in self.budgets.items()}
+
+def create_quota_manager(
+    chat_deployment: str,
+    image_deployment: str,
+    tokens_per_minute: Optional[int] = None,
+    requests_per_minute: Optional[int] = None,
+    image_requests_per_minute: Optional[int] = None
+) -> QuotaManager:
+    """
+    Create budgets from the quotas assigned to the deployments in the Azure portal
+
+    Limits not passed are read from AZURE_GPT_TPM, AZURE_GPT_RPM and AZURE_DALLE_RPM.
+    """
+    def limit(value: Optional[int], env: str) -> int:
+        return value if value is not None else int(os.getenv(env, "0"))
+
+    max_wait = float(os.getenv("AZURE_QUOTA_MAX_WAIT", "30"))
+    max_queue = int(os.getenv("AZURE_QUOTA_MAX_QUEUE", "100"))
+    return QuotaManager({
+        chat_deployment: DeploymentBudget(
+            chat_deployment,
+            tokens_per_minute=limit(tokens_per_minute, "AZURE_GPT_TPM"),
+            requests_per_minute=limit(requests_per_minute, "AZURE_GPT_RPM"),
+            max_wait=max_wait,
+            max_queue=max_queue
+        ),
+        image_deployment: DeploymentBudget(
+            image_deployment,
+            requests_per_minute=limit(image_requests_per_minute, "AZURE_DALLE_RPM"),
+            max_wait=max_wait,
+            max_queue=max_queue
+        )
+    })
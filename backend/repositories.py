@@ -0,0 +1,685 @@
+"""
+Repositories for RED AI dashboard data
+Tenant-scoped storage for tasks, clients, designs and interactions with id lookups
+and secondary indexes, backed by process memory or SQL (SQLite / PostgreSQL)
+"""
+
+import os
+import json
+import uuid
+import base64
+import threading
+from bisect import bisect_left, bisect_right, insort
+from collections import defaultdict
+from datetime import datetime
+from typing import Any, Callable, Dict, Generic, Iterator, List, Optional, Set, Tuple, Type, TypeVar
+
+from pydantic import BaseModel
+from sqlalchemy import JSON, Boolean, Column, DateTime, Index, Integer, String, Text, and_, func, or_, select
+from sqlalchemy.orm import sessionmaker
+
+from database import Base, create_db_engine, create_session_factory
+from structured_logging import get_logger
+
+logger = get_logger("repositories")
+
+DEFAULT_TENANT = "default"
+
+M = TypeVar("M", bound=BaseModel)
+
+# Called after every write with (tenant, previous item or None, new item or None)
+ChangeListener = Callable[[str, Optional[BaseModel], Optional[BaseModel]], None]
+
+# Maps the stored item to its replacement, for batch updates
+Change = Callable[[BaseModel], BaseModel]
+
+def new_id() -> str:
+    return str(uuid.uuid4())
+
+def encode_cursor(sort: str, value: Any, item_id: str) -> str:
+    """Opaque keyset cursor: the sort key and id of the last item on a page"""
+    if isinstance(value, datetime):
+        value = {"dt": value.isoformat()}
+    raw = json.dumps([sort, value, item_id], separators=(",", ":")).encode("utf-8")
+    return base64.urlsafe_b64encode(raw).decode("ascii").rstrip("=")
+
+def decode_cursor(cursor: str, sort: str) -> Tuple[Any, str]:
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        cursor_sort, value, item_id = json.loads(raw)
+        if isinstance(value, dict):
+            value = datetime.fromisoformat(value["dt"])
+    except Exception:
+        raise ValueError("Invalid cursor")
+
+    if cursor_sort != sort:
+        raise ValueError("Cursor was issued for a different sort order")
+    return value, item_id
+
+class Page(Generic[M]):
+    """One page of a listing and the cursor for the next one (None on the last page)"""
+
+    def __init__(self, items: List[M], next_cursor: Optional[str]):
+        self.items = items
+        self.next_cursor = next_cursor
+
+# ==================== SQL RECORDS ====================
+
+class TaskRecord(Base):
+    __tablename__ = "dashboard_tasks"
+
+    id = Column(String(36), primary_key=True)
+    tenant_id = Column(String(64), nullable=False)
+    title = Column(String(255), nullable=False)
+    description = Column(Text, nullable=False, default="")
+    completed = Column(Boolean, nullable=False, default=False)
+    priority = Column(String(16), nullable=False, default="medium")
+    created_at = Column(DateTime, nullable=False)
+    due_date = Column(DateTime)
+    category = Column(String(32), nullable=False, default="general")
+
+    __table_args__ = (
+        Index("ix_tasks_tenant_created", "tenant_id", "created_at", "id"),
+        Index("ix_tasks_tenant_category", "tenant_id", "category"),
+        Index("ix_tasks_tenant_priority", "tenant_id", "priority"),
+        Index("ix_tasks_tenant_completed", "tenant_id", "completed"),
+    )
+
+class ClientRecord(Base):
+    __tablename__ = "favorite_clients"
+
+    id = Column(String(36), primary_key=True)
+    tenant_id = Column(String(64), nullable=False)
+    name = Column(String(255), nullable=False)
+    email = Column(String(255), nullable=False)
+    phone = Column(String(64))
+    company = Column(String(255))
+    projects_count = Column(Integer, nullable=False, default=0)
+    last_contact = Column(DateTime)
+    avatar_url = Column(String(1024))
+    tags = Column(JSON, nullable=False, default=list)
+
+    __table_args__ = (
+        Index("ix_clients_tenant_name", "tenant_id", "name", "id"),
+    )
+
+class DesignRecord(Base):
+    __tablename__ = "design_previews"
+
+    id = Column(String(36), primary_key=True)
+    tenant_id = Column(String(64), nullable=False)
+    title = Column(String(255), nullable=False)
+    description = Column(Text, nullable=False, default="")
+    image_url = Column(String(1024), nullable=False)
+    style = Column(String(64), nullable=False)
+    room_type = Column(String(64), nullable=False)
+    created_at = Column(DateTime, nullable=False)
+    is_favorite = Column(Boolean, nullable=False, default=False)
+    client_id = Column(String(36))
+    tags = Column(JSON, nullable=False, default=list)
+
+    __table_args__ = (
+        Index("ix_designs_tenant_created", "tenant_id", "created_at", "id"),
+        Index("ix_designs_tenant_style", "tenant_id", "style"),
+        Index("ix_designs_tenant_room", "tenant_id", "room_type"),
+        Index("ix_designs_tenant_client", "tenant_id", "client_id"),
+    )
+
+class InteractionRecord(Base):
+    __tablename__ = "client_interactions"
+
+    id = Column(String(36), primary_key=True)
+    tenant_id = Column(String(64), nullable=False)
+    client_id = Column(String(36), nullable=False)
+    interaction_type = Column(String(32), nullable=False)
+    title = Column(String(255), nullable=False)
+    description = Column(Text, nullable=False, default="")
+    created_at = Column(DateTime, nullable=False)
+    outcome = Column(Text)
+    next_action = Column(Text)
+
+    __table_args__ = (
+        Index("ix_interactions_tenant_created", "tenant_id", "created_at", "id"),
+        # Per-client timeline: newest-first pages and "latest N" are index range scans
+        Index("ix_interactions_tenant_client_created", "tenant_id", "client_id", "created_at", "id"),
+    )
+
+class DashboardCounterRecord(Base):
+    """Dashboard stats counters, shared by every worker process that uses the database"""
+    __tablename__ = "dashboard_counters"
+
+    tenant_id = Column(String(64), primary_key=True)
+    name = Column(String(64), primary_key=True)
+    value = Column(Integer, nullable=False, default=0)
+    # Bumped on every change, so reconciliation can tell a counter moved during its scan
+    version = Column(Integer, nullable=False, default=0)
+
+# ==================== REPOSITORIES ====================
+
+class Repository(Generic[M]):
+    """Tenant-scoped CRUD over one pydantic model"""
+
+    def __init__(
+        self,
+        model: Type[M],
+        indexed_fields: List[str],
+        sort_fields: List[str],
+        partition_fields: Optional[List[str]] = None
+    ):
+        self.model = model
+        self.indexed_fields = indexed_fields
+        # First entry is the default order; every sort field must be non-nullable
+        self.sort_fields = sort_fields
+        # Indexed fields that also keep items in sort order per value (e.g. per-client timelines)
+        self.partition_fields = partition_fields or []
+        self.listeners: List[ChangeListener] = []
+
+    def subscribe(self, listener: ChangeListener):
+        self.listeners.append(listener)
+
+    def _notify(self, tenant: str, old: Optional[M], new: Optional[M]):
+        for listener in self.listeners:
+            listener(tenant, old, new)
+
+    def _parse_sort(self, sort: Optional[str]) -> Tuple[str, str, bool]:
+        """Normalized sort spec, field name and whether it is descending"""
+        sort = sort or self.sort_fields[0]
+        field = sort.lstrip("-")
+        if field not in self.sort_fields:
+            raise ValueError(f"{self.model.__name__} can be sorted by: {', '.join(self.sort_fields)}")
+        return sort, field, sort.startswith("-")
+
+    def _check_range(self, created_after: Optional[datetime], created_before: Optional[datetime]):
+        if (created_after or created_before) and "created_at" not in self.model.model_fields:
+            raise ValueError(f"{self.model.__name__} has no created_at to filter by")
+
+    def _check_filters(self, filters: Dict[str, Any]) -> Dict[str, Any]:
+        """Drop unset filters and reject fields without a secondary index"""
+        unknown = set(filters) - set(self.indexed_fields)
+        if unknown:
+            raise ValueError(f"{self.model.__name__} cannot be filtered by: {', '.join(sorted(unknown))}")
+        return {field: value for field, value in filters.items() if value is not None}
+
+    def get(self, tenant: str, item_id: str) -> Optional[M]:
+        raise NotImplementedError
+
+    def list(self, tenant: str, **filters) -> List[M]:
+        raise NotImplementedError
+
+    def page(
+        self,
+        tenant: str,
+        limit: int = 50,
+        cursor: Optional[str] = None,
+        sort: Optional[str] = None,
+        created_after: Optional[datetime] = None,
+        created_before: Optional[datetime] = None,
+        **filters
+    ) -> Page[M]:
+        """
+        Keyset-paginated listing
+
+        Items after the cursor in (sort field, id) order; created_after is
+        inclusive and created_before exclusive. Raises ValueError for an
+        unknown sort field or filter, or a cursor from a different sort.
+        """
+        raise NotImplementedError
+
+    def count(self, tenant: str, **filters) -> int:
+        raise NotImplementedError
+
+    def tenants(self) -> List[str]:
+        """Tenants that have at least one item"""
+        raise NotImplementedError
+
+    def scan(self, tenant: str, batch_size: int = 1000) -> Iterator[M]:
+        """Every item of a tenant, fetched page by page"""
+        cursor = None
+        while True:
+            page = self.page(tenant, limit=batch_size, cursor=cursor)
+            yield from page.items
+            cursor = page.next_cursor
+            if cursor is None:
+                return
+
+    def put(self, tenant: str, item: M) -> M:
+        """Insert or replace an item under its own id"""
+        raise NotImplementedError
+
+    def delete(self, tenant: str, item_id: str) -> Optional[M]:
+        raise NotImplementedError
+
+    def update_many(self, tenant: str, changes: Dict[str, Change]) -> Dict[str, Optional[M]]:
+        """
+        Apply a change to each listed item in one transaction
+
+        Returns the new item per id, or None for ids that do not exist
+        (those are skipped; the rest are still applied).
+        """
+        raise NotImplementedError
+
+    def delete_many(self, tenant: str, item_ids: List[str]) -> Dict[str, Optional[M]]:
+        """Delete the listed items in one transaction; None for ids that do not exist"""
+        raise NotImplementedError
+
+    def _to_page(self, selected: List[M], limit: int, sort: str, field: str) -> Page[M]:
+        """Trim the one-extra lookahead item and build the next cursor"""
+        if len(selected) <= limit:
+            return Page(selected, None)
+        last = selected[limit - 1]
+        return Page(selected[:limit], encode_cursor(sort, getattr(last, field), last.id))
+
+    def add(self, tenant: str, item: M) -> M:
+        """Insert an item under a fresh id"""
+        return self.put(tenant, item.model_copy(update={"id": new_id()}))
+
+    def update(self, tenant: str, item_id: str, item: M) -> Optional[M]:
+        """Replace an existing item in one transaction; None if it does not exist"""
+        return self.update_many(tenant, {item_id: lambda old: item})[item_id]
+
+class InMemoryRepository(Repository[M]):
+    """Hash map per tenant plus value -> ids maps for each indexed field"""
+
+    def __init__(
+        self,
+        model: Type[M],
+        indexed_fields: List[str],
+        sort_fields: List[str],
+        partition_fields: Optional[List[str]] = None
+    ):
+        super().__init__(model, indexed_fields, sort_fields, partition_fields)
+        self._items: Dict[str, Dict[str, M]] = defaultdict(dict)
+        self._indexes: Dict[str, Dict[str, Dict[Any, Set[str]]]] = defaultdict(
+            lambda: {field: defaultdict(set) for field in self.indexed_fields}
+        )
+        # Sorted (value, id) keys per sort field, for keyset pagination
+        self._sorted: Dict[str, Dict[str, List[Tuple[Any, str]]]] = defaultdict(
+            lambda: {field: [] for field in self.sort_fields}
+        )
+        # Reads and writes come from FastAPI's threadpool; every access to the maps holds it
+        self._lock = threading.RLock()
+        # The same per (partition field, value), so a single-partition page never sorts
+        self._partitions: Dict[str, Dict[Tuple[str, Any], Dict[str, List[Tuple[Any, str]]]]] = defaultdict(
+            lambda: defaultdict(lambda: {field: [] for field in self.sort_fields})
+        )
+
+    def get(self, tenant: str, item_id: str) -> Optional[M]:
+        with self._lock:
+            return self._items[tenant].get(item_id)
+
+    def _sorted_keys(self, tenant: str, item: M):
+        """Every sorted key list this item belongs in, with its key"""
+        for field in self.sort_fields:
+            key = (getattr(item, field), item.id)
+            yield self._sorted[tenant][field], key
+            for partition in self.partition_fields:
+                yield self._partitions[tenant][(partition, getattr(item, partition))][field], key
+
+    def _matching_ids(self, tenant: str, filters: Dict[str, Any]) -> Optional[Set[str]]:
+        """Intersect index postings for the filters; None means no filter. Call with the lock held"""
+        ids = None
+        for field, value in filters.items():
+            postings = self._indexes[tenant][field].get(value, set())
+            # A copy, so the result does not change under the caller once the lock is released
+            ids = set(postings) if ids is None else ids & postings
+        return ids
+
+    def list(self, tenant: str, **filters) -> List[M]:
+        filters = self._check_filters(filters)
+        with self._lock:
+            items = self._items[tenant]
+            ids = self._matching_ids(tenant, filters)
+            selected = list(items.values()) if ids is None else [items[item_id] for item_id in ids]
+        return sorted(selected, key=lambda item: (getattr(item, "created_at", None) or 0, item.id))
+
+    def page(
+        self,
+        tenant: str,
+        limit: int = 50,
+        cursor: Optional[str] = None,
+        sort: Optional[str] = None,
+        created_after: Optional[datetime] = None,
+        created_before: Optional[datetime] = None,
+        **filters
+    ) -> Page[M]:
+        sort, field, descending = self._parse_sort(sort)
+        filters = self._check_filters(filters)
+        self._check_range(created_after, created_before)
+        after = decode_cursor(cursor, sort) if cursor else None
+        with self._lock:
+            items = self._items[tenant]
+
+            partition = next(iter(filters.items())) if len(filters) == 1 else None
+            if not filters:
+                # Walk the sorted keys from the cursor: cost follows the page size
+                keys = self._sorted[tenant][field]
+            elif partition[0] in self.partition_fields:
+                keys = self._partitions[tenant].get(partition, {}).get(field, [])
+            else:
+                # Filtered: order just the matching ids
+                keys = sorted((getattr(items[item_id], field), item_id) for item_id in self._matching_ids(tenant, filters))
+
+            # Narrow to the time range and the cursor by bisection
+            low, high = 0, len(keys)
+            if field == "created_at":
+                if created_after:
+                    low = bisect_left(keys, (created_after,))
+                if created_before:
+                    high = bisect_left(keys, (created_before,))
+            if after and descending:
+                high = min(high, bisect_left(keys, after))
+            elif after:
+                low = max(low, bisect_right(keys, after))
+            positions = range(high - 1, low - 1, -1) if descending else range(low, high)
+
+            selected: List[M] = []
+            for position in positions:
+                item = items[keys[position][1]]
+                created_at = getattr(item, "created_at", None)
+                if created_after and created_at < created_after:
+                    continue
+                if created_before and created_at >= created_before:
+                    continue
+                selected.append(item)
+                if len(selected) > limit:
+                    break
+
+        return self._to_page(selected, limit, sort, field)
+
+    def count(self, tenant: str, **filters) -> int:
+        filters = self._check_filters(filters)
+        with self._lock:
+            ids = self._matching_ids(tenant, filters)
+            return len(self._items[tenant]) if ids is None else len(ids)
+
+    def tenants(self) -> List[str]:
+        with self._lock:
+            return [tenant for tenant, items in self._items.items() if items]
+
+    def put(self, tenant: str, item: M) -> M:
+        with self._lock:
+            old = self._items[tenant].get(item.id)
+            self._store(tenant, old, item)
+        self._notify(tenant, old, item)
+        return item
+
+    def delete(self, tenant: str, item_id: str) -> Optional[M]:
+        with self._lock:
+            item = self._items[tenant].pop(item_id, None)
+            self._unindex(tenant, item)
+        if item is not None:
+            self._notify(tenant, item, None)
+        return item
+
+    def update_many(self, tenant: str, changes: Dict[str, Change]) -> Dict[str, Optional[M]]:
+        results: Dict[str, Optional[M]] = {}
+        applied = []
+        with self._lock:
+            for item_id, change in changes.items():
+                old = self._items[tenant].get(item_id)
+                if old is None:
+                    results[item_id] = None
+                    continue
+                new = change(old).model_copy(update={"id": item_id})
+                self._store(tenant, old, new)
+                results[item_id] = new
+                applied.append((old, new))
+        for old, new in applied:
+            self._notify(tenant, old, new)
+        return results
+
+    def delete_many(self, tenant: str, item_ids: List[str]) -> Dict[str, Optional[M]]:
+        with self._lock:
+            results = {item_id: self._items[tenant].pop(item_id, None) for item_id in item_ids}
+            for item in results.values():
+                self._unindex(tenant, item)
+        for item in results.values():
+            if item is not None:
+                self._notify(tenant, item, None)
+        return results
+
+    def _store(self, tenant: str, old: Optional[M], item: M):
+        self._unindex(tenant, old)
+        self._items[tenant][item.id] = item
+        for field in self.indexed_fields:
+            self._indexes[tenant][field][getattr(item, field)].add(item.id)
+        for keys, key in self._sorted_keys(tenant, item):
+            insort(keys, key)
+
+    def _unindex(self, tenant: str, item: Optional[M]):
+        if item is None:
+            return
+        for field in self.indexed_fields:
+            postings = self._indexes[tenant][field][getattr(item, field)]
+            postings.discard(item.id)
+            if not postings:
+                del self._indexes[tenant][field][getattr(item, field)]
+        for keys, key in self._sorted_keys(tenant, item):
+            position = bisect_left(keys, key)
+            if position < len(keys) and keys[position] == key:
+                del keys[position]
+
+class SQLRepository(Repository[M]):
+    """Rows in one table; tenant_id plus each indexed field have composite indexes"""
+
+    def __init__(
+        self,
+        model: Type[M],
+        indexed_fields: List[str],
+        sort_fields: List[str],
+        record: Type,
+        session_factory: sessionmaker,
+        partition_fields: Optional[List[str]] = None
+    ):
+        super().__init__(model, indexed_fields, sort_fields, partition_fields)
+        self.record = record
+        self.session_factory = session_factory
+
+    def _to_model(self, row) -> M:
+        return self.model(**{field: getattr(row, field) for field in self.model.model_fields})
+
+    def _select(self, tenant: str, filters: Dict[str, Any]):
+        query = select(self.record).where(self.record.tenant_id == tenant)
+        for field, value in filters.items():
+            query = query.where(getattr(self.record, field) == value)
+        return query
+
+    def get(self, tenant: str, item_id: str) -> Optional[M]:
+        with self.session_factory() as session:
+            row = session.get(self.record, item_id)
+            if row is None or row.tenant_id != tenant:
+                return None
+            return self._to_model(row)
+
+    def list(self, tenant: str, **filters) -> List[M]:
+        query = self._select(tenant, self._check_filters(filters))
+        if hasattr(self.record, "created_at"):
+            query = query.order_by(self.record.created_at, self.record.id)
+        with self.session_factory() as session:
+            return [self._to_model(row) for row in session.scalars(query)]
+
+    def page(
+        self,
+        tenant: str,
+        limit: int = 50,
+        cursor: Optional[str] = None,
+        sort: Optional[str] = None,
+        created_after: Optional[datetime] = None,
+        created_before: Optional[datetime] = None,
+        **filters
+    ) -> Page[M]:
+        sort, field, descending = self._parse_sort(sort)
+        self._check_range(created_after, created_before)
+        query = self._select(tenant, self._check_filters(filters))
+
+        if created_after:
+            query = query.where(self.record.created_at >= created_after)
+        if created_before:
+            query = query.where(self.record.created_at < created_before)
+
+        column, id_column = getattr(self.record, field), self.record.id
+        if cursor:
+            value, item_id = decode_cursor(cursor, sort)
+            if descending:
+                query = query.where(or_(column < value, and_(column == value, id_column < item_id)))
+            else:
+                query = query.where(or_(column > value, and_(column == value, id_column > item_id)))
+
+        order = (column.desc(), id_column.desc()) if descending else (column, id_column)
+        query = query.order_by(*order).limit(limit + 1)
+
+        with self.session_factory() as session:
+            selected = [self._to_model(row) for row in session.scalars(query)]
+        return self._to_page(selected, limit, sort, field)
+
+    def count(self, tenant: str, **filters) -> int:
+        query = self._select(tenant, self._check_filters(filters))
+        with self.session_factory() as session:
+            return session.scalar(select(func.count()).select_from(query.subquery()))
+
+    def tenants(self) -> List[str]:
+        with self.session_factory() as session:
+            return list(session.scalars(select(self.record.tenant_id).distinct()))
+
+    def put(self, tenant: str, item: M) -> M:
+        with self.session_factory() as session:
+            row = session.get(self.record, item.id, with_for_update=True)
+            if row is not None and row.tenant_id != tenant:
+                # Ids are global in the table: never let one tenant overwrite another's row
+                raise ValueError(f"{self.model.__name__} {item.id} belongs to another tenant")
+            old = self._to_model(row) if row is not None else None
+            session.merge(self.record(tenant_id=tenant, **item.model_dump()))
+            session.commit()
+        self._notify(tenant, old, item)
+        return item
+
+    def delete(self, tenant: str, item_id: str) -> Optional[M]:
+        with self.session_factory() as session:
+            row = session.get(self.record, item_id)
+            if row is None or row.tenant_id != tenant:
+                return None
+            item = self._to_model(row)
+            session.delete(row)
+            session.commit()
+        self._notify(tenant, item, None)
+        return item
+
+    def _rows(self, session, tenant: str, item_ids: List[str]) -> Dict[str, Any]:
+        """The tenant's rows among item_ids, locked until the session commits"""
+        query = select(self.record).where(self.record.tenant_id == tenant, self.record.id.in_(item_ids)).with_for_update()
+        return {row.id: row for row in session.scalars(query)}
+
+    def update_many(self, tenant: str, changes: Dict[str, Change]) -> Dict[str, Optional[M]]:
+        results: Dict[str, Optional[M]] = {}
+        applied = []
+        with self.session_factory() as session:
+            rows = self._rows(session, tenant, list(changes))
+            for item_id, change in changes.items():
+                row = rows.get(item_id)
+                if row is None:
+                    results[item_id] = None
+                    continue
+                old = self._to_model(row)
+                new = change(old).model_copy(update={"id": item_id})
+                for field, value in new.model_dump().items():
+                    setattr(row, field, value)
+                results[item_id] = new
+                applied.append((old, new))
+            session.commit()
+        for old, new in applied:
+            self._notify(tenant, old, new)
+        return results
+
+    def delete_many(self, tenant: str, item_ids: List[str]) -> Dict[str, Optional[M]]:
+        with self.session_factory() as session:
+            rows = self._rows(session, tenant, item_ids)
+            results = {item_id: self._to_model(rows[item_id]) if item_id in rows else None for item_id in item_ids}
+            for row in rows.values():
+                session.delete(row)
+            session.commit()
+        for item in results.values():
+            if item is not None:
+                self._notify(tenant, item, None)
+        return results
+
+class Repositories:
+    """The dashboard repositories for one storage backend"""
+
+    def __init__(
+        self,
+        backend: str,
+        tasks: Repository,
+        clients: Repository,
+        designs: Repository,
+        interactions: Repository,
+        session_factory: Optional[sessionmaker] = None
+    ):
+        self.backend = backend
+        self.tasks = tasks
+        self.clients = clients
+        self.designs = designs
+        self.interactions = interactions
+        # Set for the SQL backend, so derived data such as stats counters can share the database
+        self.session_factory = session_factory
+
+    def seed(self, tenant: str, **items: List[BaseModel]):
+        """Insert demo items into each repository that is still empty for the tenant"""
+        for name, seed_items in items.items():
+            repository: Repository = getattr(self, name)
+            if repository.count(tenant) == 0:
+                for item in seed_items:
+                    repository.put(tenant, item)
+
+# Secondary indexes per repository
+TASK_INDEXES = ["category", "priority", "completed"]
+CLIENT_INDEXES: List[str] = []
+DESIGN_INDEXES = ["style", "room_type", "client_id", "is_favorite"]
+INTERACTION_INDEXES = ["client_id"]
+
+# Sortable fields per repository, default first
+TASK_SORTS = ["created_at", "title"]
+CLIENT_SORTS = ["name"]
+DESIGN_SORTS = ["created_at", "title"]
+INTERACTION_SORTS = ["created_at"]
+
+# Per-value timelines kept in sort order
+INTERACTION_PARTITIONS = ["client_id"]
+
+# Factory function
+def create_repositories(
+    task_model: Type[BaseModel],
+    client_model: Type[BaseModel],
+    design_model: Type[BaseModel],
+    interaction_model: Type[BaseModel],
+    backend: Optional[str] = None,
+    database_url: Optional[str] = None
+) -> Repositories:
+    """Create repositories from arguments or environment variables"""
+    backend = (backend or os.getenv("REPOSITORY_BACKEND", "sql")).lower()
+
+    if backend == "memory":
+        logger.info("Repositories: in-memory")
+        return Repositories(
+            "memory",
+            InMemoryRepository(task_model, TASK_INDEXES, TASK_SORTS),
+            InMemoryRepository(client_model, CLIENT_INDEXES, CLIENT_SORTS),
+            InMemoryRepository(design_model, DESIGN_INDEXES, DESIGN_SORTS),
+            InMemoryRepository(interaction_model, INTERACTION_INDEXES, INTERACTION_SORTS, INTERACTION_PARTITIONS)
+        )
+
+    engine = create_db_engine(database_url)
+    Base.metadata.create_all(bind=engine)
+    session_factory = create_session_factory(engine)
+    logger.info("Repositories: SQL", extra={"database_url": engine.url.render_as_string(hide_password=True)})
+
+    return Repositories(
+        "sql",
+        SQLRepository(task_model, TASK_INDEXES, TASK_SORTS, TaskRecord, session_factory),
+        SQLRepository(client_model, CLIENT_INDEXES, CLIENT_SORTS, ClientRecord, session_factory),
+        SQLRepository(design_model, DESIGN_INDEXES, DESIGN_SORTS, DesignRecord, session_factory),
+        SQLRepository(
+            interaction_model, INTERACTION_INDEXES, INTERACTION_SORTS, InteractionRecord, session_factory,
+            INTERACTION_PARTITIONS
+        ),
+        session_factory
+    )
@@ -0,0 +1,239 @@
+"""
+Resilience primitives for RED AI provider calls
+Retries with jittered exponential backoff for transient upstream failures,
+and circuit breakers that stop sending traffic to an upstream that keeps
+failing and let a single probe through once it may have recovered
+"""
+
+import os
+import time
+import random
+import asyncio
+from typing import Any, Awaitable, Callable, Dict, Mapping, Optional, Tuple, TypeVar
+
+import httpx
+
+from structured_logging import get_logger
+
+try:
+    import openai
+    OPENAI_AVAILABLE = True
+except ImportError:
+    OPENAI_AVAILABLE = False
+
+logger = get_logger("resilience")
+
+T = TypeVar("T")
+
+# Statuses worth another attempt: throttling, upstream timeouts and outages
+RETRYABLE_STATUS = {408, 429, 500, 502, 503, 504}
+
+def retry_after_seconds(headers: Mapping[str, str], default: Optional[float] = 10.0) -> Optional[float]:
+    """Back-off an upstream asks for in a 429 or 503 response"""
+    for name, scale in (("retry-after-ms", 0.001), ("retry-after", 1.0)):
+        value = headers.get(name)
+        if value:
+            try:
+                return float(value) * scale
+            except ValueError:
+                pass
+    return default
+
+def classify_error(error: BaseException) -> Tuple[bool, Optional[float]]:
+    """
+    Whether a failed call is worth retrying, and the Retry-After it carried
+
+    429, 408 and 5xx responses, connection errors and timeouts are transient;
+    anything else (bad request, auth, content policy) fails the same way again.
+    """
+    if isinstance(error, (asyncio.TimeoutError, httpx.TimeoutException)):
+        return True, None
+
+    response = getattr(error, "response", None)
+    status = getattr(error, "status_code", None) or getattr(error, "status", None)
+    if status is None and isinstance(response, httpx.Response):
+        status = response.status_code
+    if isinstance(status, int):
+        retry_after = None
+        if isinstance(response, httpx.Response):
+            retry_after = retry_after_seconds(response.headers, None)
+        return status in RETRYABLE_STATUS, retry_after
+
+    if isinstance(error, (httpx.TransportError, ConnectionError)):
+        return True, None
+    if OPENAI_AVAILABLE and isinstance(error, openai.APIConnectionError):
+        return True, None
+    return False, None
+
+class RetryPolicy:
+    """
+    Retries with full-jitter exponential backoff
+
+    The n-th retry waits a random time up to base_delay * 2^n, capped at
+    max_delay, so clients that failed together do not retry together. A
+    Retry-After from the upstream replaces the backoff; one longer than
+    max_retry_after ends the retries instead, since waiting it out would
+    outlast the request that is waiting on us.
+    """
+
+    def __init__(
+        self,
+        attempts: int = 3,
+        base_delay: float = 0.5,
+        max_delay: float = 8.0,
+        max_retry_after: float = 30.0
+    ):
+        self.attempts = max(1, attempts)
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.max_retry_after = max_retry_after
+        self.stats = {"calls": 0, "retries": 0, "recovered": 0, "exhausted": 0}
+
+    def delay(self, retry: int, retry_after: Optional[float] = None) -> Optional[float]:
+        """Seconds to wait before retry number `retry` (0-based), or None to give up"""
+        if retry_after is not None:
+            if retry_after > self.max_retry_after:
+                return None
+            return retry_after + random.uniform(0, self.base_delay)
+        return random.uniform(0, min(self.max_delay, self.base_delay * 2 ** retry))
+
+    async def run(
+        self,
+        operation: Callable[[], Awaitable[T]],
+        classify: Callable[[BaseException], Tuple[bool, Optional[float]]] = classify_error
+    ) -> T:
+        """Await operation(), calling it again after transient failures"""
+        self.stats["calls"] += 1
+        for attempt in range(self.attempts):
+            try:
+                result = await operation()
+            except Exception as e:
+                retryable, retry_after = classify(e)
+                delay = self.delay(attempt, retry_after) if retryable else None
+                if delay is None or attempt + 1 >= self.attempts:
+                    if retryable:
+                        self.stats["exhausted"] += 1
+                    raise
+                self.stats["retries"] += 1
+                logger.info("Retrying after transient error", extra={
+                    "error_type": type(e).__name__,
+                    "delay_seconds": round(delay, 2),
+                    "retry": attempt + 1,
+                    "max_retries": self.attempts - 1
+                })
+                await asyncio.sleep(delay)
+                continue
+            if attempt:
+                self.stats["recovered"] += 1
+            return result
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {"attempts": self.attempts, **self.stats}
+
+def create_retry_policy() -> RetryPolicy:
+    """Create a retry policy from AI_RETRY_* settings"""
+    return RetryPolicy(
+        attempts=int(os.getenv("AI_RETRY_ATTEMPTS", "3")),
+        base_delay=float(os.getenv("AI_RETRY_BASE_DELAY", "0.5")),
+        max_delay=float(os.getenv("AI_RETRY_MAX_DELAY", "8")),
+        max_retry_after=float(os.getenv("AI_RETRY_MAX_RETRY_AFTER", "30"))
+    )
+
+class CircuitOpenError(Exception):
+    """Upstream skipped because its circuit is open"""
+
+    def __init__(self, name: str, retry_after: float):
+        self.name = name
+        self.retry_after = retry_after
+        super().__init__(f"{name} is temporarily unavailable, retry in {retry_after:.0f}s")
+
+class CircuitBreaker:
+    """
+    Closed -> open after `failure_threshold` consecutive failures
+    Open -> half-open once `recovery_timeout` seconds have passed
+    Half-open -> one probe request; closed if it succeeds, open again if it fails
+    """
+
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+    def __init__(
+        self,
+        name: str,
+        failure_threshold: int = 5,
+        recovery_timeout: float = 30.0,
+        clock: Callable[[], float] = time.monotonic
+    ):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.recovery_timeout = recovery_timeout
+        self.clock = clock
+        self.failures = 0
+        self.opened_at: Optional[float] = None
+        self.probe_started: Optional[float] = None
+        self.stats = {"successes": 0, "failures": 0, "rejected": 0, "opened": 0}
+
+    @property
+    def state(self) -> str:
+        if self.opened_at is None:
+            return self.CLOSED
+        if self.clock() - self.opened_at >= self.recovery_timeout:
+            return self.HALF_OPEN
+        return self.OPEN
+
+    def retry_after(self) -> float:
+        """Seconds until the next probe may go out"""
+        if self.opened_at is None:
+            return 0.0
+        return max(0.0, self.opened_at + self.recovery_timeout - self.clock())
+
+    def allow_request(self) -> bool:
+        """Whether a call may go out now; in half-open state only the probe may"""
+        state = self.state
+        if state == self.CLOSED:
+            return True
+        if state == self.HALF_OPEN:
+            # A probe that never reported back (cancelled) does not block recovery forever
+            stale = self.probe_started is not None and self.clock() - self.probe_started >= self.recovery_timeout
+            if self.probe_started is None or stale:
+                self.probe_started = self.clock()
+                return True
+        self.stats["rejected"] += 1
+        return False
+
+    def release_probe(self, started: Optional[float]):
+        """Give back a probe slot whose request never went out (shed or cancelled before sending)"""
+        if started is not None and self.probe_started == started:
+            self.probe_started = None
+
+    def record_success(self):
+        self.stats["successes"] += 1
+        self.failures = 0
+        self.opened_at = None
+        self.probe_started = None
+
+    def record_failure(self):
+        self.stats["failures"] += 1
+        self.failures += 1
+        if self.probe_started is not None or self.failures >= self.failure_threshold:
+            if self.opened_at is None or self.probe_started is not None:
+                self.stats["opened"] += 1
+                logger.warning("Circuit opened", extra={"circuit": self.name, "failures": self.failures})
+            self.opened_at = self.clock()
+            self.probe_started = None
+
+    def trip(self):
+        """Open the circuit now, regardless of the failure count"""
+        if self.state == self.CLOSED:
+            self.stats["opened"] += 1
+        self.opened_at = self.clock()
+        self.probe_started = None
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            "state": self.state,
+            "consecutive_failures": self.failures,
+            "retry_after_seconds": round(self.retry_after(), 1),
+            **self.stats
+        }
@@ -0,0 +1,242 @@
+"""
+Response Cache for RED AI
+Content-addressed cache for AI responses with in-memory LRU and optional Redis backends
+"""
+
+import os
+import json
+import time
+import hashlib
+from collections import OrderedDict
+from contextvars import ContextVar
+from typing import Any, Awaitable, Callable, Dict, Optional, Tuple
+
+try:
+    import redis.asyncio as redis_asyncio
+    REDIS_AVAILABLE = True
+except ImportError:
+    REDIS_AVAILABLE = False
+
+from structured_logging import get_logger, redact_url
+
+logger = get_logger("response_cache")
+
+# Outcome of the latest cache lookup in the current request: "hit", "miss" or "bypass"
+cache_status: ContextVar[Optional[str]] = ContextVar("cache_status", default=None)
+
+def make_cache_key(
+    namespace: str,
+    deployment: str,
+    prompt: str,
+    params: Optional[Dict[str, Any]] = None,
+    image_bytes: Optional[bytes] = None
+) -> str:
+    """
+    Build a content-addressed cache key
+
+    Whitespace in the prompt is collapsed and params are serialized with
+    sorted keys, so formatting differences map to the same key. Image bytes
+    are hashed into the digest rather than embedded.
+    """
+    normalized = json.dumps(
+        {
+            "deployment": deployment,
+            "prompt": " ".join(prompt.split()),
+            "params": params or {}
+        },
+        sort_keys=True,
+        ensure_ascii=False,
+        default=str
+    )
+    digest = hashlib.sha256(normalized.encode("utf-8"))
+    if image_bytes is not None:
+        digest.update(hashlib.sha256(image_bytes).digest())
+    return f"{namespace}:{digest.hexdigest()}"
+
+class CacheBackend:
+    """Base class for cache storage backends"""
+
+    name = "base"
+
+    def __init__(self):
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.errors = 0
+
+    async def get(self, key: str) -> Optional[Any]:
+        raise NotImplementedError
+
+    async def set(self, key: str, value: Any, ttl: int) -> None:
+        raise NotImplementedError
+
+    async def delete(self, key: str) -> None:
+        raise NotImplementedError
+
+    async def close(self) -> None:
+        pass
+
+    def get_stats(self) -> Dict[str, Any]:
+        lookups = self.hits + self.misses
+        return {
+            "backend": self.name,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "errors": self.errors,
+            "hit_ratio": round(self.hits / lookups, 4) if lookups else 0.0
+        }
+
+class InMemoryLRUCache(CacheBackend):
+    """Process-local LRU cache with per-entry TTL"""
+
+    name = "memory"
+
+    def __init__(self, max_entries: int = 1024):
+        super().__init__()
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[str, Tuple[float, Any]]" = OrderedDict()
+
+    async def get(self, key: str) -> Optional[Any]:
+        entry = self._entries.get(key)
+        if entry is None:
+            self.misses += 1
+            return None
+
+        expires_at, value = entry
+        if expires_at <= time.monotonic():
+            del self._entries[key]
+            self.evictions += 1
+            self.misses += 1
+            return None
+
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return value
+
+    async def set(self, key: str, value: Any, ttl: int) -> None:
+        self._entries[key] = (time.monotonic() + ttl, value)
+        self._entries.move_to_end(key)
+
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+
+    async def delete(self, key: str) -> None:
+        self._entries.pop(key, None)
+
+    def get_stats(self) -> Dict[str, Any]:
+        stats = super().get_stats()
+        stats.update({"entries": len(self._entries), "max_entries": self.max_entries})
+        return stats
+
+class RedisCache(CacheBackend):
+    """Shared cache in Redis; values are stored as JSON with a server-side TTL"""
+
+    name = "redis"
+
+    def __init__(self, redis_url: str, prefix: str = "redai:cache:"):
+        super().__init__()
+        self.prefix = prefix
+        self.client = redis_asyncio.from_url(redis_url)
+
+    async def get(self, key: str) -> Optional[Any]:
+        raw = await self.client.get(self.prefix + key)
+        if raw is None:
+            self.misses += 1
+            return None
+
+        self.hits += 1
+        return json.loads(raw)
+
+    async def set(self, key: str, value: Any, ttl: int) -> None:
+        await self.client.set(self.prefix + key, json.dumps(value, ensure_ascii=False), ex=ttl)
+
+    async def delete(self, key: str) -> None:
+        await self.client.delete(self.prefix + key)
+
+    async def close(self) -> None:
+        await self.client.aclose()
+
+class ResponseCache:
+    """Read-through cache for AI responses"""
+
+    def __init__(self, backend: CacheBackend, ttl: int = 3600, enabled: bool = True):
+        self.backend = backend
+        self.ttl = ttl
+        self.enabled = enabled
+        self.bypassed = 0
+
+    async def get_or_compute(
+        self,
+        key: str,
+        compute: Callable[[], Awaitable[Optional[Any]]],
+        bypass: bool = False
+    ) -> Optional[Any]:
+        """
+        Return the cached value for key, or compute and store it
+
+        compute() returning None means the result must not be cached
+        (e.g. the upstream call failed and the caller will fall back).
+        Backend errors degrade to a miss instead of failing the request.
+        """
+        if bypass or not self.enabled:
+            self.bypassed += 1
+            cache_status.set("bypass")
+            return await compute()
+
+        try:
+            cached = await self.backend.get(key)
+        except Exception as e:
+            logger.warning("Cache read failed", extra={"error": str(e)})
+            self.backend.errors += 1
+            cached = None
+
+        if cached is not None:
+            cache_status.set("hit")
+            return cached
+
+        cache_status.set("miss")
+        value = await compute()
+
+        if value is not None:
+            try:
+                await self.backend.set(key, value, self.ttl)
+            except Exception as e:
+                logger.warning("Cache write failed", extra={"error": str(e)})
+                self.backend.errors += 1
+
+        return value
+
+    async def close(self) -> None:
+        await self.backend.close()
+
+    def get_stats(self) -> Dict[str, Any]:
+        stats = self.backend.get_stats()
+        stats.update({"enabled": self.enabled, "ttl": self.ttl, "bypassed": self.bypassed})
+        return stats
+
+# Factory function
+def create_response_cache(
+    backend: Optional[str] = None,
+    ttl: Optional[int] = None,
+    max_entries: Optional[int] = None,
+    redis_url: Optional[str] = None
+) -> ResponseCache:
+    """Create response cache from arguments or environment variables"""
+    backend = (backend or os.getenv("CACHE_BACKEND", "memory")).lower()
+    ttl = ttl if ttl is not None else int(os.getenv("CACHE_TTL_SECONDS", "3600"))
+    max_entries = max_entries if max_entries is not None else int(os.getenv("CACHE_MAX_ENTRIES", "1024"))
+    redis_url = redis_url or os.getenv("REDIS_URL", "redis://localhost:6379")
+
+    if backend == "none":
+        return ResponseCache(InMemoryLRUCache(max_entries), ttl, enabled=False)
+
+    if backend == "redis":
+        if REDIS_AVAILABLE:
+            logger.info("Response cache: Redis", extra={"redis_url": redact_url(redis_url)})
+            return ResponseCache(RedisCache(redis_url), ttl)
+        logger.warning("redis package not installed, falling back to in-memory response cache")
+
+    logger.info("Response cache: in-memory LRU", extra={"max_entries": max_entries, "ttl": ttl})
+    return ResponseCache(InMemoryLRUCache(max_entries), ttl)
@@ -0,0 +1,105 @@
+"""
+Single-flight request coalescing for RED AI
+Concurrent callers with the same request key share one upstream call
+"""
+
+import asyncio
+import threading
+import weakref
+from typing import Any, Awaitable, Callable, Dict, TypeVar
+
+T = TypeVar("T")
+
+class _LoopFlights:
+    """In-flight tasks of one event loop and how many callers await each"""
+
+    def __init__(self):
+        self.in_flight: Dict[str, asyncio.Task] = {}
+        self.waiters: Dict[str, int] = {}
+
+class SingleFlight:
+    """
+    Coalesces identical in-flight calls into one shared task
+
+    Calls are only shared within one event loop: a task cannot be awaited
+    from another loop, so each loop (e.g. a worker thread running its own)
+    gets its own table. Tables of closed loops are dropped with the loop.
+    """
+
+    def __init__(self, name: str):
+        self.name = name
+        self._loops: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, _LoopFlights]" = weakref.WeakKeyDictionary()
+        self._loops_lock = threading.Lock()
+        self.leaders = 0
+        self.coalesced = 0
+        self.abandoned = 0
+
+    async def do(self, key: str, fn: Callable[[], Awaitable[T]]) -> T:
+        """
+        Run fn() once per key at a time
+
+        The first caller starts the upstream call; callers that arrive while
+        it is running await the same result (or exception). The call is
+        cancelled only when every caller waiting on it has been cancelled.
+        """
+        flights = self._flights()
+        task = flights.in_flight.get(key)
+        if task is None:
+            self.leaders += 1
+            task = asyncio.ensure_future(fn())
+            flights.in_flight[key] = task
+            flights.waiters[key] = 0
+            task.add_done_callback(lambda done, key=key: self._forget(flights, key, done))
+        else:
+            self.coalesced += 1
+
+        flights.waiters[key] += 1
+        try:
+            return await asyncio.shield(task)
+        except asyncio.CancelledError:
+            if not task.done() and flights.waiters.get(key) == 1:
+                self.abandoned += 1
+                task.cancel()
+            raise
+        finally:
+            if flights.in_flight.get(key) is task:
+                flights.waiters[key] -= 1
+
+    def _flights(self) -> _LoopFlights:
+        loop = asyncio.get_running_loop()
+        with self._loops_lock:
+            flights = self._loops.get(loop)
+            if flights is None:
+                flights = self._loops[loop] = _LoopFlights()
+            return flights
+
+    def _forget(self, flights: _LoopFlights, key: str, task: asyncio.Task):
+        if flights.in_flight.get(key) is task:
+            del flights.in_flight[key]
+            del flights.waiters[key]
+        # Mark the exception as retrieved when every waiter was cancelled
+        if not task.cancelled():
+            task.exception()
+
+    def get_stats(self) -> Dict[str, Any]:
+        # Other threads add loops, and the GC drops them, while this reads the map
+        with self._loops_lock:
+            loop_flights = list(self._loops.values())
+        return {
+            "leaders": self.leaders,
+            "coalesced": self.coalesced,
+            "abandoned": self.abandoned,
+            "in_flight": sum(len(flights.in_flight) for flights in loop_flights)
+        }
+
+_groups: Dict[str, SingleFlight] = {}
+
+def get_single_flight(name: str) -> SingleFlight:
+    """Get the process-wide single-flight group for a provider"""
+    if name not in _groups:
+        _groups[name] = SingleFlight(name)
+    return _groups[name]
+
+def get_single_flight_stats() -> Dict[str, Dict[str, Any]]:
+    """Coalescing counters for every provider group"""
+    return {name: group.get_stats() for name, group in _groups.items()}
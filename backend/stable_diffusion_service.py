@@ -9,14 +9,28 @@ import base64
 import asyncio
 from typing import Dict, List, Optional, Any
 from datetime import datetime
-import requests
+import httpx
 from io import BytesIO
 
+from artifact_store import ArtifactStore, create_artifact_store
+from metrics import record_images
+from provider_dispatch import ProviderDispatcher
+from provider_health import HealthProber
+from resilience import RETRYABLE_STATUS, classify_error, create_retry_policy
+from response_cache import make_cache_key
+from single_flight import get_single_flight
+from structured_logging import get_logger, setup_logging
+
+logger = get_logger("stable_diffusion")
+
 class StableDiffusionService:
     """Stable Diffusion XL service for image generation"""
     
-    def __init__(self):
+    def __init__(self, artifact_store: Optional[ArtifactStore] = None):
         """Initialize Stable Diffusion service"""
+        # Generated images are stored as artifacts and returned by URL
+        self.artifacts = artifact_store or create_artifact_store()
+        
         # Hugging Face configuration
         self.hf_api_key = os.getenv("HUGGINGFACE_API_KEY", "")
         self.hf_endpoint = "https://api-inference.huggingface.co/models/stabilityai/stable-diffusion-xl-base-1.0"
@@ -27,31 +41,79 @@ class StableDiffusionService:
         # Local configuration
         self.local_endpoint = os.getenv("LOCAL_SD_ENDPOINT", "http://localhost:7860")
         
-        # Check available services
-        self.services_available = self._check_available_services()
+        # Identical concurrent requests share one generation
+        self.single_flight = get_single_flight("stable_diffusion")
         
-        print(f"🎨 Stable Diffusion Service initialized")
-        print(f"   Available services: {', '.join(self.services_available) if self.services_available else 'None'}")
-    
-    def _check_available_services(self) -> List[str]:
-        """Check which Stable Diffusion services are available"""
-        available = []
+        # Provider dispatch: sequential, hedged or race
+        self.dispatcher = ProviderDispatcher(
+            label="Stable Diffusion",
+            policy=os.getenv("SD_DISPATCH_POLICY", "sequential").lower(),
+            default_timeout=float(os.getenv("SD_TIMEOUT", "60")),
+            min_timeout=float(os.getenv("SD_MIN_TIMEOUT", "10")),
+            max_timeout=float(os.getenv("SD_MAX_TIMEOUT", "120")),
+            hedge_percentile=float(os.getenv("SD_HEDGE_PERCENTILE", "90")),
+            hedge_delay=float(os.getenv("SD_HEDGE_DELAY", "15")),
+            retry=create_retry_policy(),
+            failure_threshold=int(os.getenv("SD_BREAKER_FAILURES", "5")),
+            recovery_timeout=float(os.getenv("SD_BREAKER_RECOVERY", "30"))
+        )
         
+        # Async client so cancelled (hedged or raced) attempts close their connections;
+        # the dispatcher enforces the per-provider timeout
+        self.http_client = httpx.AsyncClient(timeout=self.dispatcher.max_timeout)
+        
+        # Availability is probed in the background, never on the request path
+        self.health = HealthProber(
+            interval=float(os.getenv("SD_HEALTH_INTERVAL", "30")),
+            jitter=float(os.getenv("SD_HEALTH_JITTER", "0.2")),
+            timeout=float(os.getenv("SD_HEALTH_TIMEOUT", "2"))
+        )
+        self._register_health_probes()
+        
+        logger.info("Stable Diffusion Service initialized", extra={
+            "providers": list(self.health.probes),
+            "dispatch_policy": self.dispatcher.policy
+        })
+    
+    def _register_health_probes(self):
+        """Register a probe for each configured provider, in preference order"""
         if self.hf_api_key:
-            available.append("Hugging Face")
+            self.health.register("Hugging Face", self._probe_huggingface)
         
         if self.replicate_api_key:
-            available.append("Replicate")
-        
-        # Check if local service is running
-        try:
-            response = requests.get(f"{self.local_endpoint}/api/v1/ping", timeout=2)
-            if response.status_code == 200:
-                available.append("Local")
-        except:
-            pass
+            self.health.register("Replicate", self._probe_replicate)
         
-        return available
+        if self.local_endpoint:
+            self.health.register("Local", self._probe_local)
+    
+    async def _probe_huggingface(self):
+        response = await self.http_client.get(
+            self.hf_endpoint,
+            headers={"Authorization": f"Bearer {self.hf_api_key}"}
+        )
+        # Any answer short of an auth or server error means the model endpoint is reachable
+        if response.status_code in (401, 403) or response.status_code >= 500:
+            raise RuntimeError(f"Hugging Face API error: {response.status_code}")
+    
+    async def _probe_replicate(self):
+        response = await self.http_client.get(
+            "https://api.replicate.com/v1/account",
+            headers={"Authorization": f"Bearer {self.replicate_api_key}"}
+        )
+        response.raise_for_status()
+    
+    async def _probe_local(self):
+        response = await self.http_client.get(f"{self.local_endpoint}/api/v1/ping")
+        response.raise_for_status()
+    
+    @property
+    def services_available(self) -> List[str]:
+        """Providers that passed their latest health check (or have not been checked yet)"""
+        return self.health.available()
+    
+    def start_health_checks(self):
+        """Start background probing; call from the application's event loop"""
+        self.health.start()
     
     def is_configured(self) -> bool:
         """Check if any Stable Diffusion service is configured"""
@@ -68,6 +130,28 @@ class StableDiffusionService:
         style: str = "realistic"
     ) -> Dict:
         """Generate image using Stable Diffusion XL"""
+        key = make_cache_key(
+            "sd_image",
+            "stable-diffusion-xl",
+            prompt,
+            {
+                "negative_prompt": " ".join(negative_prompt.split()),
+                "width": width,
+                "height": height,
+                "steps": steps,
+                "guidance_scale": guidance_scale
+            }
+        )
+        return await self.single_flight.do(
+            key,
+            lambda: self._generate_image(prompt, negative_prompt, width, height, steps, guidance_scale)
+        )
+    
+    async def _generate_image(
+        self, prompt: str, negative_prompt: str, width: int, height: int,
+        steps: int, guidance_scale: float
+    ) -> Dict:
+        """Dispatch to the available providers under the configured policy"""
         
         if not self.is_configured():
             return {
@@ -75,43 +159,24 @@ class StableDiffusionService:
                 "error": "No Stable Diffusion service configured. Please set up Hugging Face API key, Replicate API key, or local service."
             }
         
-        # Try Hugging Face first
-        if "Hugging Face" in self.services_available:
-            try:
-                result = await self._generate_with_huggingface(
-                    prompt, negative_prompt, width, height, steps, guidance_scale
-                )
-                if result.get("success"):
-                    return result
-            except Exception as e:
-                print(f"❌ Hugging Face generation failed: {e}")
-        
-        # Try Replicate as fallback
-        if "Replicate" in self.services_available:
-            try:
-                result = await self._generate_with_replicate(
-                    prompt, negative_prompt, width, height, steps, guidance_scale
-                )
-                if result.get("success"):
-                    return result
-            except Exception as e:
-                print(f"❌ Replicate generation failed: {e}")
+        generators = {
+            "Hugging Face": self._generate_with_huggingface,
+            "Replicate": self._generate_with_replicate,
+            "Local": self._generate_with_local
+        }
+        args = (prompt, negative_prompt, width, height, steps, guidance_scale)
         
-        # Try local service as final fallback
-        if "Local" in self.services_available:
-            try:
-                result = await self._generate_with_local(
-                    prompt, negative_prompt, width, height, steps, guidance_scale
-                )
-                if result.get("success"):
-                    return result
-            except Exception as e:
-                print(f"❌ Local generation failed: {e}")
+        # Preference order: Hugging Face, Replicate, then the local service
+        providers = [
+            (name, lambda generate=generate: generate(*args))
+            for name, generate in generators.items()
+            if name in self.services_available
+        ]
         
-        return {
-            "success": False,
-            "error": "All Stable Diffusion services failed"
-        }
+        result = await self.dispatcher.dispatch(providers)
+        if result.get("success"):
+            record_images(result.get("service", "unknown"))
+        return result
     
     async def _generate_with_huggingface(
         self, prompt: str, negative_prompt: str, width: int, height: int,
@@ -119,7 +184,7 @@ class StableDiffusionService:
     ) -> Dict:
         """Generate image using Hugging Face Inference API"""
         
-        print(f"🤗 Generating with Hugging Face...")
+        logger.debug("Generating image", extra={"provider": "Hugging Face", "prompt_chars": len(prompt)})
         
         headers = {
             "Authorization": f"Bearer {self.hf_api_key}",
@@ -138,24 +203,21 @@ class StableDiffusionService:
             }
         }
         
-        # Run in thread to avoid blocking
-        loop = asyncio.get_event_loop()
-        response = await loop.run_in_executor(
-            None, 
-            lambda: requests.post(self.hf_endpoint, headers=headers, json=payload, timeout=60)
-        )
+        response = await self.http_client.post(self.hf_endpoint, headers=headers, json=payload)
+        # Throttling and outages (including 503 while the model loads) are retried
+        if response.status_code in RETRYABLE_STATUS:
+            response.raise_for_status()
         
         if response.status_code == 200:
-            # Convert to base64
-            image_base64 = base64.b64encode(response.content).decode('utf-8')
-            image_url = f"data:image/png;base64,{image_base64}"
+            content_type = response.headers.get("content-type", "image/png").split(";")[0]
+            artifact = await self._store_image(response.content, content_type)
             
-            print(f"✅ Hugging Face generation successful!")
+            logger.debug("Image generated", extra={"provider": "Hugging Face"})
             
             return {
                 "success": True,
-                "image_url": image_url,
-                "image_base64": image_base64,
+                "image_url": artifact["url"],
+                "artifact": artifact,
                 "model": "Stable Diffusion XL",
                 "service": "Hugging Face",
                 "prompt": prompt,
@@ -175,13 +237,17 @@ class StableDiffusionService:
                 "service": "Hugging Face"
             }
     
+    async def _store_image(self, data: bytes, content_type: str) -> Dict:
+        """Write image bytes to the artifact store off the event loop"""
+        return await asyncio.to_thread(self.artifacts.put, data, content_type)
+    
     async def _generate_with_replicate(
         self, prompt: str, negative_prompt: str, width: int, height: int,
         steps: int, guidance_scale: float
     ) -> Dict:
         """Generate image using Replicate API"""
         
-        print(f"🔄 Generating with Replicate...")
+        logger.debug("Generating image", extra={"provider": "Replicate", "prompt_chars": len(prompt)})
         
         try:
             import replicate
@@ -195,7 +261,7 @@ class StableDiffusionService:
         os.environ["REPLICATE_API_TOKEN"] = self.replicate_api_key
         
         try:
-            output = replicate.run(
+            output = await replicate.async_run(
                 "stability-ai/sdxl:39ed52f2a78e934b3ba6e2a89f5b1c712de7dfea535525255b1aa35c5565e08b",
                 input={
                     "prompt": prompt,
@@ -210,9 +276,10 @@ class StableDiffusionService:
             
             # Get the first image URL
             if output and len(output) > 0:
-                image_url = output[0]
+                # Newer clients return FileOutput objects instead of plain URLs
+                image_url = str(getattr(output[0], "url", output[0]))
                 
-                print(f"✅ Replicate generation successful!")
+                logger.debug("Image generated", extra={"provider": "Replicate"})
                 
                 return {
                     "success": True,
@@ -228,7 +295,10 @@ class StableDiffusionService:
                     "service": "Replicate"
                 }
         
-except Exception as e:
+        except Exception as e:
+            retryable, _ = classify_error(e)
+            if retryable:
+                raise
             return {
                 "success": False,
                 "error": f"Replicate API error: {str(e)}",
@@ -241,7 +311,7 @@ except Exception as e:
     ) -> Dict:
         """Generate image using local Stable Diffusion service"""
         
-        print(f"🖥️ Generating with local service...")
+        logger.debug("Generating image", extra={"provider": "Local", "prompt_chars": len(prompt)})
         
         payload = {
             "prompt": prompt,
@@ -256,30 +326,22 @@ except Exception as e:
         }
         
         try:
-            # Run in thread to avoid blocking
-            loop = asyncio.get_event_loop()
-            response = await loop.run_in_executor(
-                None, 
-                lambda: requests.post(
-                    f"{self.local_endpoint}/sdapi/v1/txt2img", 
-                    json=payload, 
-                    timeout=60
-                )
-            )
+            response = await self.http_client.post(f"{self.local_endpoint}/sdapi/v1/txt2img", json=payload)
+            if response.status_code in RETRYABLE_STATUS:
+                response.raise_for_status()
             
             if response.status_code == 200:
                 result = response.json()
                 
                 if result.get("images") and len(result["images"]) > 0:
-                    image_base64 = result["images"][0]
-                    image_url = f"data:image/png;base64,{image_base64}"
+                    artifact = await self._store_image(base64.b64decode(result["images"][0]), "image/png")
                     
-                    print(f"✅ Local generation successful!")
+                    logger.debug("Image generated", extra={"provider": "Local"})
                     
                     return {
                         "success": True,
-                        "image_url": image_url,
-                        "image_base64": image_base64,
+                        "image_url": artifact["url"],
+                        "artifact": artifact,
                         "model": "Stable Diffusion XL",
                         "service": "Local",
                         "prompt": prompt,
@@ -298,6 +360,9 @@ except Exception as e:
                     "service": "Local"
                 }
         
+        except httpx.HTTPError:
+            # Connection errors and 5xx are left to the dispatcher's retries
+            raise
         except Exception as e:
             return {
                 "success": False,
@@ -313,13 +378,20 @@ except Exception as e:
             "huggingface_configured": bool(self.hf_api_key),
             "replicate_configured": bool(self.replicate_api_key),
             "local_available": "Local" in self.services_available,
-            "local_endpoint": self.local_endpoint
+            "local_endpoint": self.local_endpoint,
+            "dispatch": self.dispatcher.get_stats(),
+            "health": self.health.get_stats()
         }
+    
+    async def aclose(self):
+        """Stop health probing and close the HTTP connection pool"""
+        await self.health.stop()
+        await self.http_client.aclose()
 
 # Factory function
-def create_stable_diffusion_service() -> StableDiffusionService:
+def create_stable_diffusion_service(artifact_store: Optional[ArtifactStore] = None) -> StableDiffusionService:
     """Create Stable Diffusion service instance"""
-    return StableDiffusionService()
+    return StableDiffusionService(artifact_store=artifact_store)
 
 # Example usage
 async def test_stable_diffusion_service():
@@ -328,6 +400,7 @@ async def test_stable_diffusion_service():
     print("=" * 50)
     
     service = create_stable_diffusion_service()
+    await service.health.check_all()
     
     # Show configuration
     info = service.get_service_info()
@@ -366,6 +439,7 @@ async def test_stable_diffusion_service():
     print(f"\n✅ Testing completed!")
 
 if __name__ == "__main__":
+    setup_logging(log_format="text")
     print("🚀 Stable Diffusion Service for RED AI")
     print("=" * 50)
     
@@ -0,0 +1,238 @@
+"""
+Structured logging for RED AI
+JSON log records written by a background thread: callers only put records
+on a queue (QueueHandler) and a QueueListener formats and writes them, so a
+slow stdout or log collector never blocks the event loop. Request logs are
+sampled per route, and every record is gated by level before it is built.
+"""
+
+import os
+import sys
+import json
+import time
+import queue
+import random
+import atexit
+import logging
+from logging.handlers import QueueHandler, QueueListener
+from typing import Dict, Optional
+from urllib.parse import urlsplit, urlunsplit
+
+from pythonjsonlogger import jsonlogger
+
+from tracing import current_trace_ids
+
+LOGGER_NAME = "redai"
+
+_listener: Optional[QueueListener] = None
+_queue_handler: Optional["LogQueueHandler"] = None
+
+def get_logger(name: str) -> logging.Logger:
+    """Logger under the `redai` hierarchy that setup_logging configures"""
+    return logging.getLogger(f"{LOGGER_NAME}.{name}")
+
+def redact_url(url: str) -> str:
+    """URL with its password replaced by ***, safe to log"""
+    parts = urlsplit(url)
+    if parts.password is None:
+        return url
+    host = parts.hostname or ""
+    if ":" in host:
+        host = f"[{host}]"
+    if parts.port:
+        host += f":{parts.port}"
+    return urlunsplit(parts._replace(netloc=f"{parts.username or ''}:***@{host}"))
+
+class LogQueueHandler(QueueHandler):
+    """
+    Puts records on a bounded queue without ever blocking
+
+    Records are not formatted here; the listener thread does that. The
+    active trace and span ids are attached so logs can be joined to traces.
+    When the queue is full the record is dropped and counted instead of waiting.
+    """
+
+    def __init__(self, log_queue: queue.Queue):
+        super().__init__(log_queue)
+        self.dropped = 0
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        # Merge the arguments now, they may change after the call returns
+        record.msg = record.getMessage()
+        record.args = None
+        trace_ids = current_trace_ids()
+        if trace_ids and not hasattr(record, "trace_id"):
+            record.trace_id, record.span_id = trace_ids
+        if record.exc_info:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+    def enqueue(self, record: logging.LogRecord):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+class StdoutHandler(logging.StreamHandler):
+    """Writes to whatever sys.stdout is at emit time, like logging.lastResort does for stderr"""
+
+    @property
+    def stream(self):
+        return sys.stdout
+
+    @stream.setter
+    def stream(self, value):
+        pass
+
+def create_formatter(log_format: str) -> logging.Formatter:
+    if log_format == "text":
+        return logging.Formatter("%(asctime)s %(levelname)s %(name)s: %(message)s")
+    return jsonlogger.JsonFormatter(
+        "%(levelname)s %(name)s %(message)s",
+        rename_fields={"levelname": "level", "name": "logger"},
+        timestamp=True,
+        json_ensure_ascii=False
+    )
+
+def setup_logging(
+    level: Optional[str] = None,
+    log_format: Optional[str] = None,
+    queue_size: Optional[int] = None
+) -> QueueListener:
+    """
+    Route every `redai.*` logger through the queue to stdout
+
+    Settings not passed are read from LOG_LEVEL (INFO), LOG_FORMAT (json or
+    text) and LOG_QUEUE_SIZE (10000). Calling it again returns the running
+    listener.
+    """
+    global _listener, _queue_handler
+    if _listener is not None:
+        return _listener
+
+    level = (level or os.getenv("LOG_LEVEL", "INFO")).upper()
+    log_format = (log_format or os.getenv("LOG_FORMAT", "json")).lower()
+    queue_size = queue_size if queue_size is not None else int(os.getenv("LOG_QUEUE_SIZE", "10000"))
+
+    output = StdoutHandler()
+    output.setFormatter(create_formatter(log_format))
+
+    log_queue: queue.Queue = queue.Queue(maxsize=queue_size)
+    _queue_handler = LogQueueHandler(log_queue)
+
+    logger = logging.getLogger(LOGGER_NAME)
+    logger.setLevel(level)
+    logger.addHandler(_queue_handler)
+    logger.propagate = False
+
+    _listener = QueueListener(log_queue, output)
+    _listener.start()
+    atexit.register(shutdown_logging)
+    return _listener
+
+def shutdown_logging():
+    """Write out queued records and stop the listener thread"""
+    global _listener, _queue_handler
+    if _listener is None:
+        return
+    _listener.stop()
+    logger = logging.getLogger(LOGGER_NAME)
+    logger.removeHandler(_queue_handler)
+    logger.propagate = True
+    _listener = None
+    _queue_handler = None
+
+def get_logging_stats() -> Dict[str, int]:
+    if _queue_handler is None:
+        return {"queued": 0, "dropped": 0}
+    return {"queued": _queue_handler.queue.qsize(), "dropped": _queue_handler.dropped}
+
+class RouteSampler:
+    """
+    Decides which requests are logged
+
+    Each path prefix has a sample rate (the longest matching prefix wins,
+    otherwise default_rate). Server errors and requests slower than
+    slow_seconds are always logged.
+    """
+
+    def __init__(self, default_rate: float = 1.0, rates: Optional[Dict[str, float]] = None, slow_seconds: float = 1.0):
+        self.default_rate = default_rate
+        # Longest prefixes first so the most specific rule wins
+        self.rates = sorted((rates or {}).items(), key=lambda item: -len(item[0]))
+        self.slow_seconds = slow_seconds
+
+    def rate_for(self, path: str) -> float:
+        for prefix, rate in self.rates:
+            if path.startswith(prefix):
+                return rate
+        return self.default_rate
+
+    def should_log(self, path: str, status: int, duration: float) -> bool:
+        if status >= 500 or duration >= self.slow_seconds:
+            return True
+        rate = self.rate_for(path)
+        return rate >= 1 or random.random() < rate
+
+def create_route_sampler() -> RouteSampler:
+    """Sampler from LOG_SAMPLE_RATE, LOG_SAMPLE_RATES (JSON prefix -> rate) and LOG_SLOW_REQUEST_SECONDS"""
+    return RouteSampler(
+        default_rate=float(os.getenv("LOG_SAMPLE_RATE", "1.0")),
+        rates=json.loads(os.getenv("LOG_SAMPLE_RATES", '{"/health": 0, "/metrics": 0}')),
+        slow_seconds=float(os.getenv("LOG_SLOW_REQUEST_SECONDS", "1.0"))
+    )
+
+class RequestLoggingMiddleware:
+    """
+    ASGI middleware that logs one structured record per sampled HTTP request
+
+    Every request is wrapped: the INFO check only gates the sampled access
+    records, so server errors and unhandled exceptions are still logged at
+    ERROR when the level is raised to WARNING.
+    """
+
+    def __init__(self, app, sampler: Optional[RouteSampler] = None):
+        self.app = app
+        self.sampler = sampler or RouteSampler()
+        self.logger = get_logger("http")
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        status = 500
+        error = None
+        started = time.perf_counter()
+
+        async def send_with_status(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_status)
+        except Exception as e:
+            error = e
+            raise
+        finally:
+            duration = time.perf_counter() - started
+            level = logging.ERROR if error is not None or status >= 500 else logging.INFO
+            path = scope["path"]
+            if self.logger.isEnabledFor(level) and self.sampler.should_log(path, status, duration):
+                route = scope.get("route")
+                self.logger.log(
+                    level,
+                    "request failed" if error is not None else "request",
+                    exc_info=error,
+                    extra={
+                        "method": scope["method"],
+                        "path": path,
+                        "route": getattr(route, "path", None),
+                        "status": status,
+                        "duration_ms": round(duration * 1000, 2),
+                        "sample_rate": self.sampler.rate_for(path)
+                    }
+                )
@@ -0,0 +1,86 @@
+"""
+Tests for the generated image artifact store and its HTTP endpoint
+"""
+
+import os
+
+import httpx
+import pytest
+
+os.environ.setdefault("AZURE_OPENAI_API_KEY", "test-key")
+os.environ.setdefault("AZURE_OPENAI_ENDPOINT", "https://fake-azure.local")
+
+import main
+from artifact_store import LocalArtifactStore, etag_matches, parse_range
+
+IMAGE = b"\x89PNG\r\n\x1a\n" + bytes(range(256)) * 300
+
+
+@pytest.fixture
+def store(tmp_path, monkeypatch):
+    store = LocalArtifactStore(str(tmp_path))
+    monkeypatch.setattr(main, "artifact_store", store)
+    return store
+
+
+def test_put_is_content_addressed(store):
+    first = store.put(IMAGE, "image/png")
+    second = store.put(IMAGE, "image/png")
+
+    assert first == second
+    assert first["url"] == f"/api/artifacts/{first['id']}"
+    assert first["id"].endswith(".png")
+    assert b"".join(store.open(first["id"])) == IMAGE
+    assert store.stat("../../etc/passwd") is None
+
+
+def test_parse_range():
+    assert parse_range(None, 100) is None
+    assert parse_range("bytes=0-9", 100) == (0, 9)
+    assert parse_range("bytes=90-", 100) == (90, 99)
+    assert parse_range("bytes=-10", 100) == (90, 99)
+    assert parse_range("bytes=50-500", 100) == (50, 99)
+    with pytest.raises(ValueError):
+        parse_range("bytes=100-", 100)
+
+
+def test_etag_matches():
+    assert etag_matches('"abc"', '"abc"')
+    assert etag_matches('"x", W/"abc" ,"y"', '"abc"')
+    assert etag_matches("*", '"abc"')
+    assert not etag_matches(None, '"abc"')
+    # Whole tags only: a tag that merely contains the ETag is a different one
+    assert not etag_matches('"abcd", "xabc"', '"abc"')
+    assert not etag_matches('"ab"', '"abc"')
+
+
+@pytest.mark.asyncio
+async def test_artifact_endpoint_supports_etag_and_range(store):
+    artifact = store.put(IMAGE, "image/png")
+
+    async with httpx.AsyncClient(app=main.app, base_url="http://test") as client:
+        full = await client.get(artifact["url"])
+        assert full.status_code == 200
+        assert full.headers["content-type"] == "image/png"
+        assert full.content == IMAGE
+
+        etag = full.headers["etag"]
+        cached = await client.get(artifact["url"], headers={"If-None-Match": etag})
+        assert cached.status_code == 304
+        assert cached.content == b""
+
+        listed = await client.get(artifact["url"], headers={"If-None-Match": f'"other", W/{etag}'})
+        assert listed.status_code == 304
+        assert (await client.get(artifact["url"], headers={"If-None-Match": "*"})).status_code == 304
+        assert (await client.get(artifact["url"], headers={"If-None-Match": '"other"'})).status_code == 200
+
+        partial = await client.get(artifact["url"], headers={"Range": "bytes=8-15"})
+        assert partial.status_code == 206
+        assert partial.headers["content-range"] == f"bytes 8-15/{len(IMAGE)}"
+        assert partial.content == IMAGE[8:16]
+
+        beyond = await client.get(artifact["url"], headers={"Range": f"bytes={len(IMAGE)}-"})
+        assert beyond.status_code == 416
+
+        missing = await client.get("/api/artifacts/" + "0" * 64 + ".png")
+        assert missing.status_code == 404
@@ -0,0 +1,99 @@
+"""
+Load test for the async Azure OpenAI client path
+Runs concurrent chat and image requests against a local fake Azure endpoint
+"""
+
+import os
+import time
+import asyncio
+
+import httpx
+import pytest
+
+os.environ.setdefault("AZURE_OPENAI_API_KEY", "test-key")
+os.environ.setdefault("AZURE_OPENAI_ENDPOINT", "https://fake-azure.local")
+
+import main
+from azure_openai_service import AzureOpenAIService, create_http_client
+
+UPSTREAM_DELAY = 0.5
+CONCURRENT_REQUESTS = 10
+
+
+class FakeAzureEndpoint:
+    """In-process stand-in for the Azure OpenAI REST API"""
+
+    def __init__(self, delay: float):
+        self.delay = delay
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self.calls = 0
+
+    async def handle(self, request: httpx.Request) -> httpx.Response:
+        self.calls += 1
+        self.in_flight += 1
+        self.max_in_flight = max(self.max_in_flight, self.in_flight)
+        try:
+            await asyncio.sleep(self.delay)
+        finally:
+            self.in_flight -= 1
+
+        if request.url.path.endswith("/images/generations"):
+            return httpx.Response(200, json={
+                "created": 0,
+                "data": [{"url": "https://fake-azure.local/image.png", "revised_prompt": "fake"}]
+            })
+
+        return httpx.Response(200, json={
+            "id": "chatcmpl-fake",
+            "object": "chat.completion",
+            "created": 0,
+            "model": "gpt-4.1",
+            "choices": [{
+                "index": 0,
+                "message": {"role": "assistant", "content": "Светлые тона расширят пространство."},
+                "finish_reason": "stop"
+            }],
+            "usage": {"prompt_tokens": 10, "completion_tokens": 10, "total_tokens": 20}
+        })
+
+
+@pytest.fixture
+def fake_azure(monkeypatch):
+    """Point the backend services at the fake Azure endpoint"""
+    fake = FakeAzureEndpoint(UPSTREAM_DELAY)
+    http_client = create_http_client(transport=httpx.MockTransport(fake.handle))
+    service = AzureOpenAIService(http_client=http_client)
+
+    monkeypatch.setattr(main, "azure_service", service)
+    monkeypatch.setattr(main.ai_service, "azure_service", service)
+    return fake
+
+
+@pytest.mark.asyncio
+async def test_chat_and_image_requests_overlap(fake_azure):
+    """Concurrent chat and image calls should run in parallel on one worker"""
+    async with httpx.AsyncClient(app=main.app, base_url="http://test") as client:
+        image_requests = [
+            client.post("/api/ai/generate-image-azure", json={"prompt": f"Modern loft #{i}"})
+            for i in range(CONCURRENT_REQUESTS)
+        ]
+        chat_requests = [
+            client.post("/api/ai/chat", json={"message": f"Совет #{i}"})
+            for i in range(CONCURRENT_REQUESTS)
+        ]
+
+        started = time.perf_counter()
+        results = await asyncio.gather(*image_requests, *chat_requests)
+        elapsed = time.perf_counter() - started
+
+    assert all(response.status_code == 200 for response in results)
+    assert all(
+        response.json()["reply"] == "Светлые тона расширят пространство."
+        for response in results[CONCURRENT_REQUESTS:]
+    )
+    assert fake_azure.calls == 2 * CONCURRENT_REQUESTS
+
+    # Serial execution would take 2 * CONCURRENT_REQUESTS * UPSTREAM_DELAY
+    assert fake_azure.max_in_flight == 2 * CONCURRENT_REQUESTS
+    assert elapsed < UPSTREAM_DELAY * 3
@@ -0,0 +1,155 @@
+"""
+Tests for the Azure OpenAI client pool and circuit breakers
+"""
+
+import os
+import json
+from collections import Counter
+
+import httpx
+import pytest
+
+os.environ.setdefault("AZURE_OPENAI_API_KEY", "test-key")
+os.environ.setdefault("AZURE_OPENAI_ENDPOINT", "https://fake-azure.local")
+
+from azure_openai_service import AzureOpenAIService, create_http_client
+from azure_pool import AzureClientPool, PoolMember
+from quota_manager import QuotaExceededError, QuotaManager
+from resilience import CircuitBreaker, CircuitOpenError
+
+CHAT_RESPONSE = {
+    "id": "chatcmpl-fake",
+    "object": "chat.completion",
+    "created": 0,
+    "model": "gpt-4.1",
+    "choices": [{"index": 0, "message": {"role": "assistant", "content": "ok"}, "finish_reason": "stop"}],
+    "usage": {"prompt_tokens": 10, "completion_tokens": 10, "total_tokens": 20}
+}
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+def _member(name: str, weight: int = 1, clock=None) -> PoolMember:
+    return PoolMember(
+        name=name, client=None, endpoint=f"https://{name}.local",
+        chat_deployment="gpt-4.1", image_deployment="dall-e-3",
+        quota=QuotaManager(), breaker=CircuitBreaker(name, failure_threshold=2, recovery_timeout=10, clock=clock or FakeClock()),
+        weight=weight
+    )
+
+
+def test_breaker_opens_then_probes_once():
+    clock = FakeClock()
+    breaker = CircuitBreaker("x", failure_threshold=2, recovery_timeout=10, clock=clock)
+    breaker.record_failure()
+    assert breaker.allow_request()
+    breaker.record_failure()
+    assert breaker.state == CircuitBreaker.OPEN and not breaker.allow_request()
+
+    clock.now = 10
+    assert breaker.allow_request()
+    assert not breaker.allow_request()
+
+    # A failed probe reopens the circuit for another full timeout
+    breaker.record_failure()
+    assert breaker.state == CircuitBreaker.OPEN
+    clock.now = 20
+    assert breaker.allow_request()
+    breaker.record_success()
+    assert breaker.state == CircuitBreaker.CLOSED
+    assert breaker.stats["opened"] == 2
+
+
+@pytest.mark.asyncio
+async def test_weighted_round_robin_follows_weights():
+    pool = AzureClientPool([_member("a", 3), _member("b", 1)], strategy="weighted_round_robin")
+    picked = Counter()
+    for _ in range(8):
+        member = await pool.acquire("chat")
+        picked[member.name] += 1
+        pool.release(member, True)
+    assert picked == {"a": 6, "b": 2}
+
+
+@pytest.mark.asyncio
+async def test_least_outstanding_and_ejection():
+    clock = FakeClock()
+    a, b = _member("a", clock=clock), _member("b", clock=clock)
+    pool = AzureClientPool([a, b])
+
+    first = await pool.acquire("chat")
+    second = await pool.acquire("chat")
+    assert {first.name, second.name} == {"a", "b"}
+    pool.release(first, True)
+    pool.release(second, True)
+
+    a.breaker.trip()
+    assert {(await pool.acquire("chat")).name for _ in range(4)} == {"b"}
+
+    b.breaker.trip()
+    with pytest.raises(CircuitOpenError):
+        await pool.acquire("chat")
+
+    # Recovery: the half-open probe closes the circuit again
+    clock.now = 10
+    probe = await pool.acquire("chat")
+    pool.release(probe, True)
+    assert probe.breaker.state == CircuitBreaker.CLOSED
+
+
+@pytest.mark.asyncio
+async def test_shed_request_gives_back_the_probe_slot():
+    class SheddingOnce(QuotaManager):
+        shed = True
+
+        async def acquire(self, deployment, tokens=0):
+            if self.shed:
+                self.shed = False
+                raise QuotaExceededError(deployment, 5.0)
+
+    clock = FakeClock()
+    member = _member("a", clock=clock)
+    member.quota = SheddingOnce()
+    pool = AzureClientPool([member])
+    member.breaker.trip()
+    clock.now = 10
+
+    with pytest.raises(QuotaExceededError):
+        await pool.acquire("chat")
+    # The probe slot is still free for the next request
+    probe = await pool.acquire("chat")
+    pool.release(probe, True)
+    assert member.breaker.state == CircuitBreaker.CLOSED
+
+
+@pytest.mark.asyncio
+async def test_failing_endpoint_is_ejected(monkeypatch):
+    hosts = Counter()
+
+    async def handle(request: httpx.Request) -> httpx.Response:
+        hosts[request.url.host] += 1
+        if request.url.host == "down.local":
+            return httpx.Response(503, json={"error": {"message": "unavailable"}})
+        return httpx.Response(200, json=CHAT_RESPONSE)
+
+    monkeypatch.setenv("AZURE_OPENAI_POOL", json.dumps([
+        {"name": "down", "endpoint": "https://down.local", "api_key": "a"},
+        {"name": "up", "endpoint": "https://up.local", "api_key": "b"}
+    ]))
+    monkeypatch.setenv("AZURE_BREAKER_FAILURES", "2")
+    monkeypatch.setenv("AI_RETRY_BASE_DELAY", "0.01")
+    service = AzureOpenAIService(http_client=create_http_client(transport=httpx.MockTransport(handle)))
+
+    results = [await service.chat_completion([{"role": "user", "content": f"q{i}"}]) for i in range(10)]
+
+    # Requests that hit the failing member are retried on the healthy one
+    assert all(result["success"] for result in results)
+    assert hosts["down.local"] == 2
+    assert service.get_service_info()["retry"]["recovered"] == 2
+    assert service.get_service_info()["pool"]["members"]["down"]["circuit"]["state"] == "open"
@@ -0,0 +1,141 @@
+"""
+Tests for token streaming chat over SSE and WebSocket
+"""
+
+import os
+import json
+import asyncio
+
+import httpx
+import pytest
+from fastapi.testclient import TestClient
+
+os.environ.setdefault("AZURE_OPENAI_API_KEY", "test-key")
+os.environ.setdefault("AZURE_OPENAI_ENDPOINT", "https://fake-azure.local")
+
+import main
+from azure_openai_service import AzureOpenAIService, create_http_client
+
+TOKENS = ["Светлые ", "тона ", "расширят ", "пространство."]
+
+
+def _chunk(content: str) -> bytes:
+    chunk = {
+        "id": "chatcmpl-fake",
+        "object": "chat.completion.chunk",
+        "created": 0,
+        "model": "gpt-4.1",
+        "choices": [{"index": 0, "delta": {"content": content}, "finish_reason": None}]
+    }
+    return f"data: {json.dumps(chunk, ensure_ascii=False)}\n\n".encode()
+
+
+class _ClosableStream(httpx.AsyncByteStream):
+    """Response body that propagates close to the generator behind it"""
+
+    def __init__(self, body):
+        self._body = body
+
+    async def __aiter__(self):
+        async for chunk in self._body:
+            yield chunk
+
+    async def aclose(self):
+        await self._body.aclose()
+
+
+class FakeStreamingAzure:
+    """Fake Azure endpoint that streams chat completion chunks"""
+
+    def __init__(self, token_delay: float = 0.0):
+        self.token_delay = token_delay
+        self.tokens_sent = 0
+        self.stream_closed = False
+
+    async def _body(self):
+        try:
+            # Content filter results arrive first, without choices
+            yield b'data: {"id": "", "object": "", "created": 0, "model": "", "choices": []}\n\n'
+            for token in TOKENS:
+                await asyncio.sleep(self.token_delay)
+                self.tokens_sent += 1
+                yield _chunk(token)
+            yield b"data: [DONE]\n\n"
+        finally:
+            self.stream_closed = True
+
+    async def handle(self, request: httpx.Request) -> httpx.Response:
+        return httpx.Response(
+            200,
+            headers={"content-type": "text/event-stream"},
+            stream=_ClosableStream(self._body())
+        )
+
+
+def _use_fake_azure(monkeypatch, fake: FakeStreamingAzure) -> AzureOpenAIService:
+    http_client = create_http_client(transport=httpx.MockTransport(fake.handle))
+    service = AzureOpenAIService(http_client=http_client)
+    monkeypatch.setattr(main.ai_service, "azure_service", service)
+    return service
+
+
+def _parse_sse(body: str):
+    events = []
+    for block in body.strip().split("\n\n"):
+        event = "message"
+        data = None
+        for line in block.splitlines():
+            if line.startswith("event: "):
+                event = line[len("event: "):]
+            elif line.startswith("data: "):
+                data = json.loads(line[len("data: "):])
+        events.append((event, data))
+    return events
+
+
+@pytest.mark.asyncio
+async def test_sse_stream_forwards_tokens(monkeypatch):
+    _use_fake_azure(monkeypatch, FakeStreamingAzure())
+
+    async with httpx.AsyncClient(app=main.app, base_url="http://test") as client:
+        response = await client.post("/api/ai/chat/stream", json={"message": "Как расширить комнату?"})
+
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/event-stream")
+
+    events = _parse_sse(response.text)
+    assert [data["delta"] for event, data in events[:-1]] == TOKENS
+    assert events[-1] == ("done", {"done": True})
+
+
+@pytest.mark.asyncio
+async def test_closing_stream_stops_upstream(monkeypatch):
+    fake = FakeStreamingAzure(token_delay=0.05)
+    _use_fake_azure(monkeypatch, fake)
+
+    tokens = main.ai_service.stream_chat_with_ai("Как расширить комнату?")
+    assert await tokens.__anext__() == TOKENS[0]
+    await tokens.aclose()
+
+    assert fake.stream_closed
+    assert fake.tokens_sent < len(TOKENS)
+
+
+def test_websocket_stream(monkeypatch):
+    _use_fake_azure(monkeypatch, FakeStreamingAzure())
+
+    with TestClient(main.app).websocket_connect("/api/ai/chat/ws") as websocket:
+        websocket.send_json({"message": "Как расширить комнату?"})
+
+        deltas = []
+        while True:
+            frame = websocket.receive_json()
+            if frame["type"] != "delta":
+                break
+            deltas.append(frame["content"])
+
+        assert deltas == TOKENS
+        assert frame == {"type": "done"}
+
+        websocket.send_json({"context": "missing message"})
+        assert websocket.receive_json()["type"] == "error"
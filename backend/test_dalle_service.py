@@ -6,6 +6,14 @@ Test script for DALL·E service
 import requests
 import json
 import sys
+import threading
+import time
+from types import SimpleNamespace
+
+import pytest
+
+import dalle_service
+from dalle_service import DalleGenerator
 
 def test_health():
     """Test health endpoint"""
@@ -67,6 +75,82 @@ def test_history():
         print(f"History test failed: {e}")
         return False
 
+# ==================== Generator tests (stub OpenAI client, no server) ====================
+
+class StubImages:
+    """images.generate stand-in: later requests finish first, optionally held at a gate"""
+
+    def __init__(self, delays=(), gate=None):
+        self.delays = list(delays)
+        self.gate = gate
+        self.calls = 0
+        self.active = 0
+        self.max_active = 0
+        self._lock = threading.Lock()
+
+    def generate(self, **kwargs):
+        with self._lock:
+            call = self.calls
+            self.calls += 1
+            self.active += 1
+            self.max_active = max(self.max_active, self.active)
+        try:
+            if self.gate is not None and call > 0:
+                self.gate.wait(5)
+            time.sleep(self.delays[call] if call < len(self.delays) else 0)
+            return SimpleNamespace(data=[SimpleNamespace(url=f"https://images.local/{call}.png", revised_prompt=kwargs["prompt"])])
+        finally:
+            with self._lock:
+                self.active -= 1
+
+def _generator(images: StubImages, max_concurrency: int = 4) -> DalleGenerator:
+    return DalleGenerator(SimpleNamespace(images=images), max_concurrency=max_concurrency)
+
+def test_fan_out_runs_concurrently_and_keeps_request_order():
+    images = StubImages(delays=[0.15, 0.1, 0.05, 0])
+    result = _generator(images).generate_images("a loft", image_count=4)
+
+    assert result["success"]
+    assert images.max_active > 1
+    # Completion order was reversed; the response is back in request order
+    assert [image["index"] for image in result["generation"]["images"]] == [0, 1, 2, 3]
+    assert result["images"] == [f"https://images.local/{i}.png" for i in range(4)]
+
+def test_closing_the_stream_early_cancels_queued_generations():
+    gate = threading.Event()
+    images = StubImages(gate=gate)
+    generator = _generator(images, max_concurrency=1)
+
+    stream = generator.iter_images("a loft", 4, "standard", "vivid")
+    assert next(stream)["index"] == 0
+    stream.close()
+    gate.set()
+    generator.executor.shutdown(wait=True)
+
+    # At most the generation already running when the client left went upstream
+    assert images.calls <= 2
+
+def test_stream_endpoint_sends_ndjson(monkeypatch):
+    monkeypatch.setattr(dalle_service, "generator", _generator(StubImages(delays=[0.05, 0])))
+    client = dalle_service.app.test_client()
+
+    response = client.post("/generate/stream", json={"prompt": "a loft", "imageCount": "2"})
+    events = [json.loads(line) for line in response.get_data(as_text=True).splitlines()]
+
+    assert response.mimetype == "application/x-ndjson"
+    assert [event["type"] for event in events] == ["image", "image", "complete"]
+    assert [image["index"] for image in events[-1]["generation"]["images"]] == [0, 1]
+
+@pytest.mark.parametrize("image_count", ["two", [2], 2.5, True, None])
+def test_malformed_image_count_is_a_400(monkeypatch, image_count):
+    monkeypatch.setattr(dalle_service, "generator", _generator(StubImages()))
+    client = dalle_service.app.test_client()
+
+    for path in ("/generate", "/generate/stream"):
+        response = client.post(path, json={"prompt": "a loft", "imageCount": image_count})
+        assert response.status_code == 400
+        assert "Image count" in response.get_json()["error"]
+
 def main():
     """Run all tests"""
     print("Testing DALL·E Service...")
@@ -0,0 +1,99 @@
+"""
+Tests for incrementally maintained dashboard statistics
+"""
+
+from datetime import date, datetime, timedelta
+
+import pytest
+
+from main import DailyTask, DesignPreview, FavoriteClient, InteractionHistory
+from dashboard_stats import DashboardStatsAggregator
+from repositories import create_repositories
+
+TODAY = date(2024, 3, 14)
+
+
+@pytest.fixture(params=["memory", "sql"])
+def repositories(request):
+    return create_repositories(
+        DailyTask, FavoriteClient, DesignPreview, InteractionHistory,
+        backend=request.param,
+        database_url="sqlite://"
+    )
+
+
+def _design(days_ago: int) -> DesignPreview:
+    created_at = datetime.combine(TODAY, datetime.min.time()) - timedelta(days=days_ago)
+    return DesignPreview(id="", title="d", description="", image_url="/x.png", style="modern", room_type="living", created_at=created_at)
+
+
+def test_counters_follow_writes(repositories):
+    stats = DashboardStatsAggregator(repositories)
+
+    task = repositories.tasks.add("t1", DailyTask(id="", title="a", description=""))
+    repositories.tasks.add("t1", DailyTask(id="", title="b", description=""))
+    repositories.tasks.update("t1", task.id, task.model_copy(update={"completed": True}))
+    client = repositories.clients.add("t1", FavoriteClient(id="", name="Sarah", email="s@example.com", projects_count=3))
+    repositories.clients.add("t1", FavoriteClient(id="", name="Omar", email="o@example.com", projects_count=1))
+    repositories.clients.delete("t1", client.id)
+    for days_ago in (0, 1, 2, 8):
+        repositories.designs.add("t1", _design(days_ago))
+
+    snapshot = stats.snapshot("t1", today=TODAY)
+    assert snapshot["tasks"] == 2
+    assert snapshot["tasks_completed"] == 1
+    assert snapshot["clients"] == 1
+    assert snapshot["projects"] == 1
+    assert snapshot["designs"] == 4
+    assert snapshot["designs_this_week"] == 3
+    assert snapshot["weekly_growth"] == 200.0
+    assert stats.snapshot("t2", today=TODAY)["designs"] == 0
+
+    # Counters already match the data, so a full recount finds nothing to fix
+    assert stats.reconcile() == {}
+
+
+def test_reconcile_corrects_drift(repositories):
+    # Rows written before the aggregator subscribed are invisible to its counters
+    repositories.designs.add("t1", _design(0))
+    stats = DashboardStatsAggregator(repositories)
+    repositories.designs.add("t1", _design(1))
+    assert stats.snapshot("t1", today=TODAY)["designs"] == 1
+
+    drift = stats.reconcile()
+
+    assert drift["t1"]["designs"] == 1
+    assert stats.snapshot("t1", today=TODAY)["designs"] == 2
+
+
+def test_reconcile_keeps_writes_made_during_the_scan(repositories):
+    stats = DashboardStatsAggregator(repositories)
+    repositories.tasks.add("t1", DailyTask(id="", title="a", description=""))
+    scan = repositories.tasks.scan
+
+    def scan_then_write(tenant, batch_size=1000):
+        yield from scan(tenant, batch_size)
+        # Lands after the scan has read the tasks but before counters are corrected
+        repositories.tasks.add(tenant, DailyTask(id="", title="b", description=""))
+
+    repositories.tasks.scan = scan_then_write
+    assert stats.reconcile() == {}
+    assert stats.last_deferred == 0
+    assert stats.snapshot("t1", today=TODAY)["tasks"] == 2
+
+
+def test_sql_counters_are_shared_between_processes(tmp_path):
+    database_url = f"sqlite:///{tmp_path / 'stats.db'}"
+    # Two workers: separate engines and aggregators on the same database
+    first, second = (
+        create_repositories(DailyTask, FavoriteClient, DesignPreview, InteractionHistory, backend="sql", database_url=database_url)
+        for _ in range(2)
+    )
+    first_stats, second_stats = DashboardStatsAggregator(first), DashboardStatsAggregator(second)
+
+    first.designs.add("t1", _design(0))
+    second.designs.add("t1", _design(1))
+
+    assert first_stats.snapshot("t1", today=TODAY)["designs"] == 2
+    assert second_stats.snapshot("t1", today=TODAY)["designs_this_week"] == 2
+    assert first_stats.reconcile() == {}
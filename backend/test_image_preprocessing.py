@@ -0,0 +1,66 @@
+"""
+Tests for vision image preprocessing
+"""
+
+import io
+
+import pytest
+from PIL import Image
+
+from image_preprocessing import ImagePreprocessor, ImageValidationError, sniff_mime_type, vision_tokens
+from quota_manager import estimate_chat_tokens
+
+
+def _encode(image: Image.Image, image_format: str, **options) -> bytes:
+    output = io.BytesIO()
+    image.save(output, image_format, **options)
+    return output.getvalue()
+
+
+def test_phone_photo_downscaled_to_vision_tiles():
+    # Portrait photo stored sideways with an EXIF rotation, as phones write them
+    photo = Image.effect_noise((4000, 3000), 60).convert("RGB")
+    exif = Image.Exif()
+    exif[0x0112] = 6
+    data = _encode(photo, "JPEG", quality=95, exif=exif)
+
+    image = ImagePreprocessor(max_bytes=300_000).prepare(data)
+
+    assert (image.width, image.height) == (768, 1024)
+    assert image.mime_type == "image/jpeg" and image.detail == "high"
+    assert len(image.data) <= 300_000 < len(data) // 10
+    assert Image.open(io.BytesIO(image.data)).size == (768, 1024)
+    assert image.tokens == vision_tokens(4000, 3000, "high") == 765
+
+
+def test_small_images_pass_through_at_low_detail():
+    plan = _encode(Image.new("L", (400, 300), 255), "PNG")
+    image = ImagePreprocessor().prepare(plan)
+
+    assert image.data == plan and image.mime_type == "image/png"
+    assert image.detail == "low" and image.tokens == 85
+    assert sniff_mime_type(image.base64) == "image/png"
+
+    message = [{"role": "user", "content": [{"type": "image_url", "image_url": {"url": "", "detail": "low"}}]}]
+    assert estimate_chat_tokens(message) < 100
+
+
+def test_drawings_stay_png_and_transparency_is_flattened():
+    drawing = Image.new("RGBA", (3000, 1500), (0, 0, 0, 0))
+    image = ImagePreprocessor().prepare(_encode(drawing, "PNG"))
+    assert image.mime_type == "image/png" and (image.width, image.height) == (1536, 768)
+
+    noisy = Image.merge("RGBA", [Image.effect_noise((1200, 1200), 80)] * 4)
+    image = ImagePreprocessor(max_bytes=100_000).prepare(_encode(noisy, "PNG"))
+    assert image.mime_type == "image/jpeg" and len(image.data) <= 100_000
+
+
+@pytest.mark.parametrize("data", [b"", b"not an image", b"\x89PNG\r\n\x1a\n" + b"\x00" * 20])
+def test_non_images_rejected_before_decoding(data):
+    with pytest.raises(ImageValidationError):
+        ImagePreprocessor().prepare(data)
+
+
+def test_oversized_dimensions_rejected():
+    with pytest.raises(ImageValidationError):
+        ImagePreprocessor(max_pixels=1_000_000).prepare(_encode(Image.new("L", (2000, 1000)), "PNG"))
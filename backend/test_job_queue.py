@@ -0,0 +1,280 @@
+"""
+Tests for the background image generation job queue
+"""
+
+import os
+import uuid
+import asyncio
+
+import httpx
+import pytest
+from uvicorn.middleware.proxy_headers import ProxyHeadersMiddleware
+
+os.environ.setdefault("AZURE_OPENAI_API_KEY", "test-key")
+os.environ.setdefault("AZURE_OPENAI_ENDPOINT", "https://fake-azure.local")
+
+import main
+from job_queue import (
+    REDIS_AVAILABLE, InMemoryJobBackend, JobQueue, QueueFullError, WebhookURLError, resolve_webhook
+)
+
+
+async def _wait_for_status(queue: JobQueue, job_id: str, status: str):
+    for _ in range(100):
+        job = await queue.get(job_id)
+        if job["status"] == status:
+            return job
+        await asyncio.sleep(0.01)
+    raise AssertionError(f"job {job_id} never reached {status}")
+
+
+@pytest.fixture(params=["memory", "redis"])
+def make_backend(request):
+    """Backend factory; the Redis variant needs TEST_REDIS_URL pointing at a scratch server"""
+    if request.param == "memory":
+        return InMemoryJobBackend
+
+    redis_url = os.getenv("TEST_REDIS_URL")
+    if not REDIS_AVAILABLE or not redis_url:
+        pytest.skip("needs the redis package and TEST_REDIS_URL")
+    from job_queue import RedisJobBackend
+
+    prefix = f"redai:test:{uuid.uuid4().hex}:"
+    return lambda **kwargs: RedisJobBackend(redis_url, poll_interval=0.01, prefix=prefix, **kwargs)
+
+
+@pytest.mark.asyncio
+async def test_users_are_served_round_robin():
+    order = []
+
+    async def handler(params):
+        order.append(params["name"])
+        return {"success": True}
+
+    queue = JobQueue(InMemoryJobBackend(), {"image": handler}, workers=1)
+    for i in range(3):
+        await queue.submit("image", {"name": f"a{i}"}, user="alice")
+    await queue.submit("image", {"name": "b0"}, user="bob")
+    last = await queue.submit("image", {"name": "c0"}, user="carol")
+
+    queue.start()
+    try:
+        await _wait_for_status(queue, last["id"], "succeeded")
+        await asyncio.sleep(0.05)
+    finally:
+        await queue.stop()
+
+    assert order == ["a0", "b0", "c0", "a1", "a2"]
+
+
+@pytest.mark.asyncio
+async def test_pending_limit_per_user():
+    async def handler(params):
+        return {"success": True}
+
+    queue = JobQueue(InMemoryJobBackend(), {"image": handler}, max_pending_per_user=2)
+    await queue.submit("image", {}, user="alice")
+    await queue.submit("image", {}, user="alice")
+
+    with pytest.raises(QueueFullError):
+        await queue.submit("image", {}, user="alice")
+    await queue.submit("image", {}, user="bob")
+
+
+@pytest.mark.asyncio
+async def test_job_endpoints_and_webhook(monkeypatch):
+    delivered = []
+
+    def receive_webhook(request: httpx.Request) -> httpx.Response:
+        delivered.append(request.read())
+        return httpx.Response(204)
+
+    async def generate(params):
+        await asyncio.sleep(0.05)
+        return {"success": True, "image_url": "/api/artifacts/abc.png", "prompt": params["prompt"]}
+
+    queue = JobQueue(
+        InMemoryJobBackend(),
+        {"sd_image": generate},
+        webhook_client=httpx.AsyncClient(transport=httpx.MockTransport(receive_webhook)),
+        webhook_allowed_hosts=["hooks.local"]
+    )
+    monkeypatch.setattr(main, "job_queue", queue)
+    monkeypatch.setattr(main.sd_service.health, "available", lambda: ["Local"])
+    queue.start()
+
+    try:
+        async with httpx.AsyncClient(app=main.app, base_url="http://test") as client:
+            submitted = await client.post(
+                "/api/jobs/generate-image-sd",
+                json={"prompt": "scandinavian bedroom", "webhook_url": "https://hooks.local/done"}
+            )
+            assert submitted.status_code == 202
+            job_id = submitted.json()["job_id"]
+            assert submitted.headers["location"] == f"/api/jobs/{job_id}"
+
+            pending = (await client.get(f"/api/jobs/{job_id}")).json()
+            assert pending["status"] in ("queued", "running")
+
+            await _wait_for_status(queue, job_id, "succeeded")
+            done = (await client.get(f"/api/jobs/{job_id}")).json()
+            assert done["result"]["image_url"] == "/api/artifacts/abc.png"
+
+            assert (await client.get("/api/jobs/missing")).status_code == 404
+
+        await asyncio.sleep(0.05)
+        assert len(delivered) == 1
+        assert b'"status":"succeeded"' in delivered[0].replace(b" ", b"")
+    finally:
+        await queue.stop()
+
+
+@pytest.mark.asyncio
+async def test_clients_behind_the_proxy_get_separate_queues(monkeypatch):
+    async def generate(params):
+        return {"success": True}
+
+    queue = JobQueue(InMemoryJobBackend(), {"sd_image": generate}, max_pending_per_user=1)
+    monkeypatch.setattr(main, "job_queue", queue)
+    monkeypatch.setattr(main.sd_service.health, "available", lambda: ["Local"])
+    # What uvicorn --proxy-headers wraps the app in; nginx connects from 127.0.0.1 here
+    app = ProxyHeadersMiddleware(main.app, trusted_hosts="127.0.0.1")
+
+    async with httpx.AsyncClient(app=app, base_url="http://test") as client:
+        async def submit(client_ip):
+            return await client.post(
+                "/api/jobs/generate-image-sd",
+                json={"prompt": "loft"},
+                headers={"X-Forwarded-For": client_ip}
+            )
+
+        assert (await submit("203.0.113.7")).status_code == 202
+        assert (await submit("198.51.100.23")).status_code == 202
+        # The cap applies per client, not to everyone behind the proxy
+        assert (await submit("203.0.113.7")).status_code == 429
+
+    assert await queue.backend.pending_count("203.0.113.7") == 1
+    assert await queue.backend.pending_count("198.51.100.23") == 1
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("url", [
+    "http://hooks.example.com/done",
+    "https://127.0.0.1/admin",
+    "https://169.254.169.254/latest/meta-data/",
+    "https://[::ffff:10.0.0.5]/internal",
+    "https://localhost:8000/api/jobs"
+])
+async def test_webhooks_to_private_addresses_rejected(url):
+    async def handler(params):
+        return {"success": True}
+
+    queue = JobQueue(InMemoryJobBackend(), {"image": handler})
+    with pytest.raises(WebhookURLError):
+        await queue.submit("image", {}, user="alice", webhook_url=url)
+
+
+@pytest.mark.asyncio
+async def test_webhook_delivery_pinned_to_checked_address():
+    pinned, headers, extensions = await resolve_webhook("https://93.184.216.34:8443/hook?x=1")
+    assert pinned == "https://93.184.216.34:8443/hook?x=1"
+    assert headers == {"Host": "93.184.216.34:8443"} and extensions == {"sni_hostname": "93.184.216.34"}
+
+
+@pytest.mark.asyncio
+async def test_worker_survives_backend_errors():
+    class FlakyBackend(InMemoryJobBackend):
+        failures = 2
+
+        async def dequeue(self):
+            if self.failures:
+                self.failures -= 1
+                raise ConnectionError("redis connection reset")
+            return await super().dequeue()
+
+    async def handler(params):
+        return {"success": True}
+
+    queue = JobQueue(FlakyBackend(), {"image": handler}, workers=1, max_error_backoff=0.01)
+    job = await queue.submit("image", {}, user="alice")
+    queue.start()
+    try:
+        await _wait_for_status(queue, job["id"], "succeeded")
+        stats = await queue.get_stats()
+        assert stats["worker_errors"] == 2 and stats["workers_alive"] == 1
+    finally:
+        await queue.stop()
+
+
+@pytest.mark.asyncio
+async def test_job_of_crashed_worker_is_requeued(make_backend):
+    calls = []
+
+    async def handler(params):
+        calls.append(params)
+        return {"success": True}
+
+    backend = make_backend(lease_seconds=0.2)
+    queue = JobQueue(backend, {"image": handler}, workers=1)
+    job = await queue.submit("image", {"name": "a"}, user="alice")
+
+    # A worker takes the job, marks it running and dies without finishing it
+    assert await backend.dequeue() == job["id"]
+    job.update(status="running", attempts=1)
+    await backend.save(job)
+
+    queue.start()
+    try:
+        done = await _wait_for_status(queue, job["id"], "succeeded")
+    finally:
+        await queue.stop()
+
+    assert calls == [{"name": "a"}]
+    assert done["attempts"] == 2
+
+
+@pytest.mark.asyncio
+async def test_job_fails_after_too_many_crashes(make_backend):
+    async def handler(params):
+        raise AssertionError("must not run again")
+
+    backend = make_backend(lease_seconds=0.05)
+    queue = JobQueue(backend, {"image": handler}, workers=1, max_attempts=2)
+    job = await queue.submit("image", {}, user="alice")
+    assert await backend.dequeue() == job["id"]
+    job.update(status="running", attempts=2)
+    await backend.save(job)
+
+    queue.start()
+    try:
+        failed = await _wait_for_status(queue, job["id"], "failed")
+    finally:
+        await queue.stop()
+    assert failed["error"] == "Job was interrupted too many times"
+
+
+@pytest.mark.asyncio
+async def test_job_waiting_longer_than_result_ttl_still_runs(make_backend):
+    async def handler(params):
+        return {"success": True}
+
+    queue = JobQueue(make_backend(result_ttl=1), {"image": handler}, workers=1)
+    job = await queue.submit("image", {}, user="alice")
+    await asyncio.sleep(1.2)
+
+    queue.start()
+    try:
+        await _wait_for_status(queue, job["id"], "succeeded")
+    finally:
+        await queue.stop()
+
+
+@pytest.mark.asyncio
+async def test_finished_jobs_pruned_after_result_ttl():
+    backend = InMemoryJobBackend(result_ttl=0)
+    finished = {"id": "old", "user": "alice", "finished_at": "2024-01-01T00:00:00"}
+    await backend.save(finished)
+    await backend.save({"id": "new", "user": "alice", "finished_at": None})
+
+    assert await backend.get("old") is None
+    assert await backend.get("new") is not None
@@ -0,0 +1,55 @@
+"""
+Tests for the Prometheus metrics endpoint
+"""
+
+import asyncio
+
+import pytest
+from fastapi.testclient import TestClient
+from prometheus_client import REGISTRY
+
+import main
+from metrics import UpstreamCall
+from provider_dispatch import ProviderDispatcher
+
+
+def _sample(name: str, **labels) -> float:
+    return REGISTRY.get_sample_value(name, labels) or 0.0
+
+
+def test_requests_timed_by_route_template():
+    client = TestClient(main.app)
+    before = _sample("redai_http_request_duration_seconds_count", method="DELETE", route="/api/dashboard/tasks/{task_id}", status="404")
+
+    client.delete("/api/dashboard/tasks/missing-1")
+    client.delete("/api/dashboard/tasks/missing-2")
+
+    after = _sample("redai_http_request_duration_seconds_count", method="DELETE", route="/api/dashboard/tasks/{task_id}", status="404")
+    assert after - before == 2
+
+    response = client.get("/metrics")
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/plain")
+    for name in ("redai_http_requests_in_flight", "redai_cache_hit_ratio", "redai_job_queue_depth"):
+        assert name in response.text
+
+
+@pytest.mark.asyncio
+async def test_upstream_outcomes_and_images():
+    async def ok():
+        return {"success": True, "service": "fast"}
+
+    async def failed():
+        return {"success": False, "error": "bad prompt", "service": "broken"}
+
+    dispatcher = ProviderDispatcher(label="metrics-test")
+    await dispatcher.dispatch([("broken", failed), ("fast", ok)])
+
+    assert _sample("redai_upstream_request_duration_seconds_count", provider="broken", deployment="metrics-test", outcome="error") == 1
+    assert _sample("redai_upstream_request_duration_seconds_count", provider="fast", deployment="metrics-test", outcome="success") == 1
+    assert _sample("redai_upstream_requests_in_flight", provider="fast") == 0
+
+    with pytest.raises(asyncio.TimeoutError):
+        with UpstreamCall("slow", "metrics-test"):
+            await asyncio.wait_for(asyncio.sleep(1), 0.01)
+    assert _sample("redai_upstream_request_duration_seconds_count", provider="slow", deployment="metrics-test", outcome="timeout") == 1
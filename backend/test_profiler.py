@@ -0,0 +1,57 @@
+"""
+Tests for the sampling profiler
+"""
+
+import time
+
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+import main
+from profiler import ProfilingMiddleware, ProfilingService, SamplingProfiler
+
+
+def busy_loop(seconds: float):
+    deadline = time.perf_counter() + seconds
+    while time.perf_counter() < deadline:
+        sum(range(100))
+
+
+def test_collapsed_stacks_show_where_time_goes():
+    profiler = SamplingProfiler(interval=0.001).start()
+    busy_loop(0.2)
+    profiler.stop()
+
+    lines = profiler.collapsed().splitlines()
+    assert lines and profiler.samples > 0
+    stack, count = lines[0].rsplit(" ", 1)
+    # Root frame is the thread, leaf frames are innermost
+    assert stack.startswith("MainThread;") and "busy_loop (test_profiler.py:" in stack
+    assert int(count) > 0
+    assert not any("sampling-profiler" in line for line in lines)
+
+
+def test_profiling_hidden_unless_enabled():
+    client = TestClient(main.app)
+    assert client.post("/api/admin/profile?seconds=0.1").status_code == 404
+
+
+def test_request_profile_needs_admin_token():
+    profiling = ProfilingService("secret", interval=0.001)
+    app = FastAPI()
+    app.add_middleware(ProfilingMiddleware, profiling=profiling)
+
+    @app.get("/slow")
+    def slow():
+        busy_loop(0.1)
+        return {"ok": True}
+
+    client = TestClient(app)
+    assert "x-profile-id" not in client.get("/slow", headers={"X-Profile": "1", "X-Admin-Token": "wrong"}).headers
+    # Non-ASCII token is refused like any wrong one, not a 500
+    response = client.get("/slow", headers={"X-Profile": "1", "X-Admin-Token": "sécret".encode("utf-8")})
+    assert response.status_code == 200 and "x-profile-id" not in response.headers
+
+    response = client.get("/slow", headers={"X-Profile": "1", "X-Admin-Token": "secret"})
+    stacks = profiling.get_request_profile(response.headers["x-profile-id"])
+    assert "busy_loop (test_profiler.py:" in stacks
@@ -0,0 +1,147 @@
+"""
+Tests for sequential, hedged and race provider dispatch
+"""
+
+import time
+import asyncio
+
+import httpx
+import pytest
+
+from provider_dispatch import LatencyTracker, ProviderDispatcher
+from resilience import RetryPolicy, classify_error
+
+
+class FakeProvider:
+    """Provider that answers after a delay and records cancellation"""
+
+    def __init__(self, name: str, delay: float, success: bool = True):
+        self.name = name
+        self.delay = delay
+        self.success = success
+        self.started = False
+        self.cancelled = False
+
+    async def __call__(self):
+        self.started = True
+        try:
+            await asyncio.sleep(self.delay)
+        except asyncio.CancelledError:
+            self.cancelled = True
+            raise
+        if not self.success:
+            return {"success": False, "error": f"{self.name} failed", "service": self.name}
+        return {"success": True, "service": self.name}
+
+
+def _providers(*fakes):
+    return [(fake.name, fake) for fake in fakes]
+
+
+def test_latency_percentile_and_adaptive_timeout():
+    tracker = LatencyTracker(window=10)
+    assert tracker.percentile(95) is None
+    for seconds in range(1, 11):
+        tracker.record(float(seconds))
+    assert tracker.percentile(50) == 5.0
+    assert tracker.percentile(95) == 10.0
+
+    dispatcher = ProviderDispatcher(min_timeout=1, max_timeout=15, timeout_multiplier=2)
+    assert dispatcher.timeout_for("unknown") == dispatcher.default_timeout
+    dispatcher.trackers["slow"] = tracker
+    assert dispatcher.timeout_for("slow") == 15
+
+
+@pytest.mark.asyncio
+async def test_sequential_falls_back_after_failure():
+    first = FakeProvider("first", 0.01, success=False)
+    second = FakeProvider("second", 0.01)
+    dispatcher = ProviderDispatcher(policy="sequential")
+
+    result = await dispatcher.dispatch(_providers(first, second))
+
+    assert result["service"] == "second"
+
+
+@pytest.mark.asyncio
+async def test_hedged_starts_backup_and_cancels_stalled_provider():
+    stalled = FakeProvider("stalled", 5)
+    backup = FakeProvider("backup", 0.01)
+    unused = FakeProvider("unused", 0.01)
+    dispatcher = ProviderDispatcher(policy="hedged", hedge_delay=0.05)
+
+    started = time.perf_counter()
+    result = await dispatcher.dispatch(_providers(stalled, backup, unused))
+
+    assert result["service"] == "backup"
+    assert time.perf_counter() - started < 1
+    assert stalled.cancelled
+    assert not unused.started
+
+
+@pytest.mark.asyncio
+async def test_race_returns_fastest_and_cancels_losers():
+    slow = FakeProvider("slow", 5)
+    failing = FakeProvider("failing", 0, success=False)
+    fast = FakeProvider("fast", 0.02)
+    dispatcher = ProviderDispatcher(policy="race")
+
+    result = await dispatcher.dispatch(_providers(slow, failing, fast))
+
+    assert result["service"] == "fast"
+    assert slow.cancelled
+
+
+@pytest.mark.asyncio
+async def test_all_failures_are_reported():
+    dispatcher = ProviderDispatcher(label="Stable Diffusion", policy="race", default_timeout=0.05)
+
+    result = await dispatcher.dispatch(_providers(FakeProvider("a", 1), FakeProvider("b", 0, success=False)))
+
+    assert result["error"] == "All Stable Diffusion services failed"
+    assert {attempt["service"] for attempt in result["attempts"]} == {"a", "b"}
+
+
+@pytest.mark.asyncio
+async def test_transient_errors_retried_then_circuit_opens():
+    calls = {"flaky": 0, "down": 0}
+
+    async def flaky():
+        calls["flaky"] += 1
+        if calls["flaky"] == 1:
+            raise httpx.ConnectError("connection refused")
+        return {"success": True, "service": "flaky"}
+
+    async def down():
+        calls["down"] += 1
+        raise httpx.HTTPStatusError(
+            "503", request=httpx.Request("POST", "http://down.local"), response=httpx.Response(503)
+        )
+
+    dispatcher = ProviderDispatcher(
+        policy="sequential",
+        retry=RetryPolicy(attempts=3, base_delay=0.001),
+        failure_threshold=2
+    )
+    assert (await dispatcher.dispatch([("flaky", flaky)]))["success"] is True
+    assert calls["flaky"] == 2
+
+    for _ in range(3):
+        result = await dispatcher.dispatch([("down", down), ("flaky", flaky)])
+        assert result["service"] == "flaky"
+    # Two requests' worth of retries, then the open circuit skips the provider
+    assert calls["down"] == 6
+    assert dispatcher.get_stats()["circuits"]["down"]["state"] == "open"
+
+
+def test_retry_delay_honors_retry_after():
+    policy = RetryPolicy(base_delay=1, max_delay=4, max_retry_after=30)
+    assert all(0 <= policy.delay(5) <= 4 for _ in range(20))
+    assert 10 <= policy.delay(0, retry_after=10) <= 11
+    assert policy.delay(0, retry_after=60) is None
+
+    response = httpx.Response(429, headers={"retry-after": "7"})
+    error = httpx.HTTPStatusError("429", request=httpx.Request("GET", "http://x"), response=response)
+    assert classify_error(error) == (True, 7.0)
+    bad_request = httpx.HTTPStatusError("400", request=error.request, response=httpx.Response(400))
+    assert classify_error(bad_request) == (False, None)
@@ -0,0 +1,62 @@
+"""
+Tests for background provider health probing
+"""
+
+import asyncio
+
+import pytest
+
+from provider_health import HealthProber
+
+
+class FlakyProbe:
+    """Probe whose outcome the test switches between checks"""
+
+    def __init__(self):
+        self.up = False
+        self.calls = 0
+
+    async def __call__(self):
+        self.calls += 1
+        if not self.up:
+            raise ConnectionError("connection refused")
+
+
+@pytest.mark.asyncio
+async def test_provider_that_comes_up_later_is_picked_up():
+    local = FlakyProbe()
+    prober = HealthProber(interval=0.02, jitter=0.5, timeout=0.5)
+    prober.register("Hugging Face", FlakyProbe())
+    prober.register("Local", local)
+
+    # Unchecked providers are optimistically available
+    assert prober.available() == ["Hugging Face", "Local"]
+
+    prober.start()
+    try:
+        await asyncio.sleep(0.05)
+        assert prober.available() == []
+        assert prober.table["Local"]["last_error"] == "connection refused"
+
+        local.up = True
+        await asyncio.sleep(0.1)
+        assert prober.available() == ["Local"]
+        assert prober.table["Local"]["consecutive_failures"] == 0
+    finally:
+        await prober.stop()
+
+    calls = local.calls
+    await asyncio.sleep(0.05)
+    assert local.calls == calls
+
+
+@pytest.mark.asyncio
+async def test_slow_probe_times_out():
+    async def hang():
+        await asyncio.sleep(5)
+
+    prober = HealthProber(timeout=0.05)
+    prober.register("Replicate", hang)
+
+    assert await prober.check("Replicate") is False
+    assert "no response" in prober.table["Replicate"]["last_error"]
@@ -0,0 +1,86 @@
+"""
+Tests for Azure OpenAI quota admission
+"""
+
+import os
+import json
+import asyncio
+import time
+
+import httpx
+import pytest
+
+os.environ.setdefault("AZURE_OPENAI_API_KEY", "test-key")
+os.environ.setdefault("AZURE_OPENAI_ENDPOINT", "https://fake-azure.local")
+
+from azure_openai_service import AzureOpenAIService, create_http_client
+from quota_manager import DeploymentBudget, QuotaExceededError, estimate_chat_tokens
+
+CHAT_RESPONSE = {
+    "id": "chatcmpl-fake",
+    "object": "chat.completion",
+    "created": 0,
+    "model": "gpt-4.1",
+    "choices": [{"index": 0, "message": {"role": "assistant", "content": "ok"}, "finish_reason": "stop"}],
+    "usage": {"prompt_tokens": 10, "completion_tokens": 10, "total_tokens": 20}
+}
+
+
+def test_chat_estimate_counts_max_tokens():
+    messages = [{"role": "user", "content": "x" * 400}]
+    assert estimate_chat_tokens(messages, 500) > estimate_chat_tokens(messages, 0) + 499
+    assert estimate_chat_tokens(messages) >= 100
+
+
+@pytest.mark.asyncio
+async def test_requests_queue_then_shed():
+    # 600 RPM: one request every 0.1s once the burst of 600 is spent
+    budget = DeploymentBudget("gpt", requests_per_minute=600, max_wait=0.25)
+    budget.requests.level = 1
+
+    start = time.monotonic()
+    await budget.acquire()
+    await asyncio.gather(budget.acquire(), budget.acquire())
+    assert 0.15 < time.monotonic() - start < 0.5
+
+    results = await asyncio.gather(*(budget.acquire() for _ in range(4)), return_exceptions=True)
+    shed = [result for result in results if isinstance(result, QuotaExceededError)]
+    assert results[0] is None and shed
+    assert all(error.retry_after > 0.25 for error in shed)
+    assert budget.stats["shed"] == len(shed)
+
+
+@pytest.mark.asyncio
+async def test_budget_follows_response_headers():
+    budget = DeploymentBudget("gpt", tokens_per_minute=60000, max_wait=0.5)
+    await budget.acquire(1000)
+    assert 58000 < budget.tokens.level <= 59000
+
+    # Another client of the same deployment has used most of the quota
+    budget.record({"x-ratelimit-remaining-tokens": "100"})
+    with pytest.raises(QuotaExceededError):
+        await budget.acquire(5000)
+
+
+@pytest.mark.asyncio
+async def test_429_pauses_deployment(monkeypatch):
+    calls = []
+
+    async def handle(request: httpx.Request) -> httpx.Response:
+        calls.append(time.monotonic())
+        if len(calls) == 1:
+            return httpx.Response(429, headers={"retry-after-ms": "300"}, json={"error": {"code": "429", "message": "Too Many Requests"}})
+        return httpx.Response(200, headers={"x-ratelimit-remaining-tokens": "40000"}, json=CHAT_RESPONSE)
+
+    monkeypatch.setenv("AZURE_OPENAI_POOL", json.dumps([{"name": "main", "api_key": "k", "chat_deployment": "gpt-4.1", "tpm": 50000}]))
+    monkeypatch.setenv("AI_RETRY_BASE_DELAY", "0.01")
+    service = AzureOpenAIService(http_client=create_http_client(transport=httpx.MockTransport(handle)))
+
+    # The retry waits in the admission queue until the pause is over
+    result = await service.chat_completion([{"role": "user", "content": "hi"}])
+    assert result["success"] is True
+    assert calls[1] - calls[0] >= 0.25
+
+    quota = service.get_service_info()["pool"]["quota"]["main"]["gpt-4.1"]
+    assert quota["throttled"] == 1
+    assert quota["tokens_available"] <= 40000
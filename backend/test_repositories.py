@@ -0,0 +1,281 @@
+"""
+Tests for the dashboard repositories (in-memory and SQL backends)
+"""
+
+import os
+import threading
+from datetime import datetime, timedelta
+
+import pytest
+from fastapi.testclient import TestClient
+
+os.environ.setdefault("AZURE_OPENAI_API_KEY", "test-key")
+os.environ.setdefault("AZURE_OPENAI_ENDPOINT", "https://fake-azure.local")
+
+import main
+from main import DailyTask, DesignPreview, FavoriteClient, InteractionHistory
+from repositories import create_repositories
+
+
+def _repositories(backend: str):
+    return create_repositories(
+        DailyTask, FavoriteClient, DesignPreview, InteractionHistory,
+        backend=backend,
+        database_url="sqlite://"
+    )
+
+
+@pytest.fixture(params=["memory", "sql"])
+def repositories(request):
+    return _repositories(request.param)
+
+
+def _task(title: str, **fields) -> DailyTask:
+    return DailyTask(id="", title=title, description="", **fields)
+
+
+def test_ids_are_unique_after_delete(repositories):
+    first = repositories.tasks.add("t1", _task("first"))
+    second = repositories.tasks.add("t1", _task("second"))
+    repositories.tasks.delete("t1", first.id)
+    third = repositories.tasks.add("t1", _task("third"))
+
+    assert len({first.id, second.id, third.id}) == 3
+    assert repositories.tasks.get("t1", first.id) is None
+    assert repositories.tasks.get("t1", third.id).title == "third"
+
+
+def test_secondary_index_filters_follow_updates(repositories):
+    now = datetime.now()
+    design = repositories.tasks.add("t1", _task("design", category="design", priority="high", created_at=now))
+    repositories.tasks.add("t1", _task("client", category="client", priority="high", created_at=now + timedelta(seconds=1)))
+    repositories.tasks.add("t1", _task("low", category="design", priority="low", created_at=now + timedelta(seconds=2)))
+
+    assert [t.title for t in repositories.tasks.list("t1", priority="high")] == ["design", "client"]
+    assert [t.title for t in repositories.tasks.list("t1", category="design", priority="high")] == ["design"]
+
+    repositories.tasks.update("t1", design.id, design.model_copy(update={"priority": "low", "completed": True}))
+    assert [t.title for t in repositories.tasks.list("t1", priority="high")] == ["client"]
+    assert repositories.tasks.count("t1", priority="low") == 2
+    assert repositories.tasks.count("t1", completed=True) == 1
+
+    with pytest.raises(ValueError):
+        repositories.tasks.list("t1", title="design")
+
+
+def test_tenants_are_isolated(repositories):
+    task = repositories.tasks.add("t1", _task("private"))
+
+    assert repositories.tasks.get("t2", task.id) is None
+    assert repositories.tasks.delete("t2", task.id) is None
+    assert repositories.tasks.update("t2", task.id, task) is None
+    assert repositories.tasks.count("t2") == 0
+    assert repositories.tasks.count("t1") == 1
+
+
+def test_update_does_not_recreate_a_deleted_item(repositories):
+    task = repositories.tasks.add("t1", _task("draft"))
+    repositories.tasks.delete("t1", task.id)
+
+    assert repositories.tasks.update("t1", task.id, task.model_copy(update={"title": "final"})) is None
+    assert repositories.tasks.count("t1") == 0
+
+
+def test_sql_put_rejects_another_tenants_id():
+    repositories = _repositories("sql")
+    task = repositories.tasks.add("t1", _task("private"))
+
+    with pytest.raises(ValueError):
+        repositories.tasks.put("t2", task.model_copy(update={"title": "overwritten"}))
+    assert repositories.tasks.get("t1", task.id).title == "private"
+
+
+def test_in_memory_reads_during_writes():
+    repositories = _repositories("memory")
+    stop = threading.Event()
+
+    def write():
+        while not stop.is_set():
+            task = repositories.tasks.add("t1", _task("churn", category="client"))
+            repositories.tasks.delete("t1", task.id)
+
+    writer = threading.Thread(target=write)
+    writer.start()
+    try:
+        for _ in range(2000):
+            repositories.tasks.list("t1", category="client")
+            repositories.tasks.page("t1", limit=5, category="client")
+            repositories.tasks.count("t1", category="client")
+    finally:
+        stop.set()
+        writer.join()
+
+
+def test_dashboard_endpoints_use_repositories(monkeypatch):
+    repositories = _repositories("memory")
+    repositories.seed("default", tasks=main.mock_tasks, designs=main.mock_designs)
+    monkeypatch.setattr(main, "repositories", repositories)
+    client = TestClient(main.app)
+
+    created = client.post("/api/dashboard/tasks", json={"id": "", "title": "Call supplier", "description": "", "category": "client"}).json()
+    assert client.delete("/api/dashboard/tasks/1").status_code == 200
+    assert client.delete("/api/dashboard/tasks/1").status_code == 404
+
+    titles = [task["title"] for task in client.get("/api/dashboard/tasks", params={"category": "client"}).json()]
+    assert titles == ["Client meeting with Sarah Wilson", "Call supplier"]
+    monkeypatch.setitem(main.settings.TENANT_API_KEYS, "other-key", "other")
+    assert client.get("/api/dashboard/tasks", headers={"X-API-Key": "other-key"}).json() == []
+    # The tenant header alone, or with a key issued for another tenant, is not trusted
+    assert client.get("/api/dashboard/tasks", headers={"X-Tenant-Id": "other"}).status_code == 401
+    assert client.get("/api/dashboard/tasks", headers={"X-API-Key": "guess"}).status_code == 401
+    assert client.get("/api/dashboard/tasks", headers={"X-API-Key": "other-key", "X-Tenant-Id": "default"}).status_code == 403
+    assert client.put(f"/api/dashboard/tasks/{created['id']}", json={**created, "completed": True}).status_code == 200
+
+    favorite = client.post("/api/dashboard/designs/2/favorite").json()
+    assert favorite["is_favorite"] is True
+    assert len(client.get("/api/dashboard/designs", params={"is_favorite": True}).json()) == 2
+
+
+def test_keyset_pages_cover_collection_once(repositories):
+    start = datetime(2024, 1, 1)
+    for i in range(7):
+        # Two designs per timestamp, so ties are broken by id
+        repositories.designs.add("t1", DesignPreview(
+            id="", title=f"d{i}", description="", image_url="/x.png",
+            style="modern" if i % 2 else "loft", room_type="kitchen",
+            created_at=start + timedelta(days=i // 2)
+        ))
+
+    for sort in ("created_at", "-created_at", "title"):
+        seen, cursor = [], None
+        while True:
+            page = repositories.designs.page("t1", limit=3, cursor=cursor, sort=sort)
+            seen.extend(design.title for design in page.items)
+            cursor = page.next_cursor
+            if cursor is None:
+                break
+        assert sorted(seen) == [f"d{i}" for i in range(7)]
+        assert len(seen) == 7
+
+    newest = repositories.designs.page("t1", limit=2, sort="-created_at")
+    assert newest.items[0].title == "d6"
+    assert newest.items[1].title in ("d4", "d5")
+
+    modern = repositories.designs.page("t1", limit=10, style="modern", created_after=start + timedelta(days=1))
+    assert [d.title for d in modern.items] == ["d3", "d5"]
+
+    with pytest.raises(ValueError):
+        repositories.designs.page("t1", cursor=newest.next_cursor, sort="created_at")
+
+
+def test_list_endpoint_pagination_and_projection(monkeypatch):
+    repositories = _repositories("memory")
+    repositories.seed("default", interactions=main.mock_interactions)
+    monkeypatch.setattr(main, "repositories", repositories)
+    client = TestClient(main.app)
+
+    first = client.get("/api/dashboard/interactions", params={"limit": 1, "fields": "title"})
+    assert first.json() == [{"id": "1", "title": "Initial consultation"}]
+
+    second = client.get("/api/dashboard/interactions", params={"limit": 1, "cursor": first.headers["x-next-cursor"]})
+    assert second.json()[0]["id"] == "2"
+    assert "x-next-cursor" not in second.headers
+
+    assert client.get("/api/dashboard/interactions", params={"fields": "secret"}).status_code == 400
+    assert client.get("/api/dashboard/interactions", params={"cursor": "garbage"}).status_code == 400
+    assert client.get("/api/dashboard/clients", params={"sort": "email"}).status_code == 400
+
+
+def test_client_timeline_and_latest_summary(monkeypatch):
+    repositories = _repositories("memory")
+    start = datetime(2024, 1, 1)
+    for client_id in ("a", "b"):
+        repositories.clients.put("default", FavoriteClient(id=client_id, name=client_id, email=f"{client_id}@example.com"))
+        for day in range(5):
+            repositories.interactions.add("default", InteractionHistory(
+                id="", client_id=client_id, interaction_type="call",
+                title=f"{client_id}{day}", description="", created_at=start + timedelta(days=day)
+            ))
+    monkeypatch.setattr(main, "repositories", repositories)
+    client = TestClient(main.app)
+
+    timeline = client.get("/api/dashboard/clients/a/interactions", params={"limit": 2, "fields": "title"})
+    assert [item["title"] for item in timeline.json()] == ["a4", "a3"]
+    older = client.get("/api/dashboard/clients/a/interactions", params={"limit": 2, "cursor": timeline.headers["x-next-cursor"]})
+    assert [item["title"] for item in older.json()] == ["a2", "a1"]
+
+    before = client.get("/api/dashboard/clients/b/interactions", params={"before": "2024-01-03T00:00:00"})
+    assert [item["title"] for item in before.json()] == ["b1", "b0"]
+
+    latest = client.get("/api/dashboard/interactions/latest", params={"per_client": 2, "limit": 1}).json()
+    assert latest == [{"client_id": "a", "interactions": [
+        {**item, "client_id": "a"} for item in client.get("/api/dashboard/clients/a/interactions", params={"limit": 2}).json()
+    ]}]
+    by_id = client.get("/api/dashboard/interactions/latest", params={"client_ids": "b", "per_client": 1, "fields": "title"}).json()
+    assert by_id == [{"client_id": "b", "interactions": [{"id": by_id[0]["interactions"][0]["id"], "title": "b4"}]}]
+
+
+def test_partitioned_timeline_matches_across_backends(repositories):
+    start = datetime(2024, 1, 1)
+    for day in range(6):
+        repositories.interactions.add("t1", InteractionHistory(
+            id="", client_id="a" if day % 3 else "b", interaction_type="email",
+            title=str(day), description="", created_at=start + timedelta(days=day)
+        ))
+
+    page = repositories.interactions.page("t1", limit=2, sort="-created_at", client_id="a", created_before=start + timedelta(days=5))
+    assert [item.title for item in page.items] == ["4", "2"]
+    rest = repositories.interactions.page("t1", limit=2, sort="-created_at", cursor=page.next_cursor, client_id="a")
+    assert [item.title for item in rest.items] == ["1"]
+    assert rest.next_cursor is None
+
+
+def test_batch_writes_report_missing_ids(repositories):
+    notified = []
+    repositories.tasks.subscribe(lambda tenant, old, new: notified.append((old is not None, new is not None)))
+    first = repositories.tasks.add("t1", _task("first", priority="low"))
+    second = repositories.tasks.add("t1", _task("second", priority="low"))
+    other = repositories.tasks.add("t2", _task("other tenant"))
+    notified.clear()
+
+    updated = repositories.tasks.update_many("t1", {
+        item_id: lambda task: task.model_copy(update={"completed": True, "priority": "high"})
+        for item_id in (first.id, "missing", other.id)
+    })
+    assert updated[first.id].completed is True
+    assert updated["missing"] is None and updated[other.id] is None
+    assert repositories.tasks.count("t1", priority="high") == 1
+    assert repositories.tasks.get("t2", other.id).completed is False
+
+    deleted = repositories.tasks.delete_many("t1", [first.id, second.id, "missing"])
+    assert [task.title if task else None for task in deleted.values()] == ["first", "second", None]
+    assert repositories.tasks.count("t1") == 0
+    assert notified == [(True, True), (True, False), (True, False)]
+
+
+def test_batch_endpoints(monkeypatch):
+    repositories = _repositories("memory")
+    repositories.seed("default", tasks=main.mock_tasks, clients=main.mock_clients, designs=main.mock_designs)
+    monkeypatch.setattr(main, "repositories", repositories)
+    client = TestClient(main.app)
+
+    updated = client.post("/api/dashboard/tasks/batch-update", json={"updates": [
+        {"id": "1", "completed": True},
+        {"id": "2", "priority": "urgent", "title": None},
+        {"id": "404", "completed": True}
+    ]}).json()
+    assert (updated["succeeded"], updated["failed"]) == (2, 1)
+    assert updated["results"][0]["task"]["completed"] is True
+    assert updated["results"][1]["task"]["title"] == repositories.tasks.get("default", "2").title
+    assert updated["results"][2] == {"id": "404", "success": False, "error": "Task not found"}
+
+    deleted = client.post("/api/dashboard/tasks/batch-delete", json={"ids": ["1", "1", "2"]}).json()
+    assert [item["id"] for item in deleted["results"]] == ["1", "2"]
+    assert client.post("/api/dashboard/clients/batch-delete", json={"ids": ["1"]}).json()["succeeded"] == 1
+
+    favorites = client.post("/api/dashboard/designs/batch-favorite", json={"ids": ["1", "2"], "is_favorite": True}).json()
+    assert [item["design"]["is_favorite"] for item in favorites["results"]] == [True, True]
+    toggled = client.post("/api/dashboard/designs/batch-favorite", json={"ids": ["2"]}).json()
+    assert toggled["results"][0]["design"]["is_favorite"] is False
+
+    assert client.post("/api/dashboard/tasks/batch-delete", json={"ids": []}).status_code == 422
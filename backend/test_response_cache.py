@@ -0,0 +1,101 @@
+"""
+Tests for the AI response cache
+"""
+
+import io
+import json
+import asyncio
+
+import pytest
+from PIL import Image
+
+from ai_service import AIService
+from response_cache import (
+    InMemoryLRUCache,
+    ResponseCache,
+    cache_status,
+    make_cache_key
+)
+
+SUGGESTIONS = {"color_scheme": ["#FFFFFF"], "furniture": [], "materials": [], "total_estimate": 1, "layout_ideas": []}
+
+
+class CountingAzureService:
+    """Stub Azure service that counts upstream calls"""
+
+    deployment_name = "gpt-4.1"
+
+    def __init__(self):
+        self.calls = 0
+
+    async def chat_completion(self, messages, max_tokens=1000):
+        self.calls += 1
+        return {"success": True, "content": json.dumps(SUGGESTIONS), "tokens_used": 10}
+
+    async def analyze_image(self, image_base64, prompt, mime_type=None, detail="high"):
+        self.calls += 1
+        return {"success": False, "error": "Rate limit exceeded"}
+
+
+@pytest.fixture
+def ai_service():
+    service = AIService(cache=ResponseCache(InMemoryLRUCache(max_entries=16), ttl=60))
+    service.azure_service = CountingAzureService()
+    return service
+
+
+def test_cache_key_is_normalized():
+    key = make_cache_key("design", "gpt-4.1", "modern   kitchen\n", {"a": 1, "b": 2})
+
+    assert key == make_cache_key("design", "gpt-4.1", "modern kitchen", {"b": 2, "a": 1})
+    assert key != make_cache_key("design", "gpt-4o", "modern kitchen", {"a": 1, "b": 2})
+    assert make_cache_key("plan", "gpt-4.1", "p", image_bytes=b"1") != make_cache_key("plan", "gpt-4.1", "p", image_bytes=b"2")
+
+
+@pytest.mark.asyncio
+async def test_lru_eviction_and_ttl():
+    backend = InMemoryLRUCache(max_entries=2)
+    await backend.set("a", 1, ttl=60)
+    await backend.set("b", 2, ttl=60)
+    assert await backend.get("a") == 1  # "b" is now least recently used
+    await backend.set("c", 3, ttl=60)
+
+    assert await backend.get("b") is None
+    assert await backend.get("c") == 3
+
+    await backend.set("expired", 4, ttl=0)  # pushes out "a"
+    assert await backend.get("expired") is None
+
+    stats = backend.get_stats()
+    assert stats["entries"] == 1
+    assert stats["evictions"] == 3
+    assert stats["hits"] == 2
+    assert stats["misses"] == 2
+
+
+@pytest.mark.asyncio
+async def test_repeat_design_suggestions_hit_cache(ai_service):
+    first = await ai_service.generate_design_suggestions("Kitchen", "modern", 50000)
+    assert cache_status.get() == "miss"
+
+    second = await ai_service.generate_design_suggestions(" kitchen ", "Modern", 50000)
+    assert cache_status.get() == "hit"
+
+    assert first == second == SUGGESTIONS
+    assert ai_service.azure_service.calls == 1
+
+    await ai_service.generate_design_suggestions("kitchen", "modern", 50000, use_cache=False)
+    assert cache_status.get() == "bypass"
+    assert ai_service.azure_service.calls == 2
+
+
+@pytest.mark.asyncio
+async def test_failed_analysis_is_not_cached(ai_service):
+    plan = io.BytesIO()
+    Image.new("L", (64, 64), 255).save(plan, "PNG")
+    first = await ai_service.analyze_floor_plan(plan.getvalue(), "plan.png")
+    second = await ai_service.analyze_floor_plan(plan.getvalue(), "plan.png")
+
+    # Both fall back to the mock analysis and both retry upstream
+    assert first == second == ai_service._mock_analysis()
+    assert ai_service.azure_service.calls == 2
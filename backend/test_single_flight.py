@@ -0,0 +1,106 @@
+"""
+Tests for single-flight request coalescing
+"""
+
+import asyncio
+import threading
+
+import pytest
+
+from single_flight import SingleFlight
+
+
+class SlowUpstream:
+    def __init__(self, delay: float = 0.05, error: Exception = None):
+        self.delay = delay
+        self.error = error
+        self.calls = 0
+        self.cancelled = False
+
+    async def call(self, value):
+        self.calls += 1
+        try:
+            await asyncio.sleep(self.delay)
+        except asyncio.CancelledError:
+            self.cancelled = True
+            raise
+        if self.error:
+            raise self.error
+        return {"value": value}
+
+
+@pytest.mark.asyncio
+async def test_identical_calls_share_one_upstream_request():
+    group = SingleFlight("test")
+    upstream = SlowUpstream()
+
+    results = await asyncio.gather(
+        *(group.do("same", lambda: upstream.call("a")) for _ in range(10)),
+        group.do("other", lambda: upstream.call("b"))
+    )
+
+    assert results[:10] == [{"value": "a"}] * 10
+    assert results[10] == {"value": "b"}
+    assert upstream.calls == 2
+    assert group.get_stats() == {"leaders": 2, "coalesced": 9, "abandoned": 0, "in_flight": 0}
+
+
+@pytest.mark.asyncio
+async def test_errors_are_shared_and_not_remembered():
+    group = SingleFlight("test")
+    upstream = SlowUpstream(error=RuntimeError("upstream down"))
+
+    results = await asyncio.gather(
+        *(group.do("key", lambda: upstream.call("a")) for _ in range(3)),
+        return_exceptions=True
+    )
+    assert all(isinstance(result, RuntimeError) for result in results)
+    assert upstream.calls == 1
+
+    upstream.error = None
+    assert await group.do("key", lambda: upstream.call("a")) == {"value": "a"}
+    assert upstream.calls == 2
+
+
+@pytest.mark.asyncio
+async def test_upstream_cancelled_only_when_every_caller_leaves():
+    group = SingleFlight("test")
+    upstream = SlowUpstream(delay=0.2)
+
+    first = asyncio.create_task(group.do("key", lambda: upstream.call("a")))
+    second = asyncio.create_task(group.do("key", lambda: upstream.call("a")))
+    await asyncio.sleep(0.01)
+
+    first.cancel()
+    assert await second == {"value": "a"}
+    assert not upstream.cancelled
+
+    third = asyncio.create_task(group.do("key", lambda: upstream.call("a")))
+    await asyncio.sleep(0.01)
+    third.cancel()
+    await asyncio.sleep(0.01)
+
+    assert upstream.cancelled
+    assert group.get_stats()["abandoned"] == 1
+
+
+def test_groups_do_not_share_tasks_across_event_loops():
+    group = SingleFlight("test")
+    started, release = threading.Event(), threading.Event()
+
+    async def blocked():
+        started.set()
+        await asyncio.to_thread(release.wait, 5)
+        return "other loop"
+
+    other = threading.Thread(target=lambda: asyncio.run(group.do("key", blocked)))
+    other.start()
+    try:
+        assert started.wait(5)
+        # Same key while the other loop's call is in flight: a fresh call, not a foreign task
+        assert asyncio.run(group.do("key", lambda: SlowUpstream(0).call("this loop"))) == {"value": "this loop"}
+        assert group.get_stats()["in_flight"] == 1
+    finally:
+        release.set()
+        other.join()
+    assert group.get_stats()["leaders"] == 2
@@ -0,0 +1,100 @@
+"""
+Tests for the structured logging pipeline
+"""
+
+import io
+import asyncio
+import json
+import queue
+import logging
+from logging.handlers import QueueListener
+
+from structured_logging import LogQueueHandler, RequestLoggingMiddleware, RouteSampler, create_formatter, get_logger
+
+
+def test_route_sampling():
+    sampler = RouteSampler(default_rate=1.0, rates={"/health": 0, "/api/ai": 0.5, "/api/ai/chat": 0}, slow_seconds=1.0)
+    assert sampler.rate_for("/api/ai/chat/stream") == 0
+    assert sampler.rate_for("/api/ai/analyze") == 0.5
+    assert sampler.rate_for("/api/dashboard/tasks") == 1.0
+
+    assert not sampler.should_log("/health", 200, 0.01)
+    # Errors and slow requests are never sampled away
+    assert sampler.should_log("/health", 503, 0.01)
+    assert sampler.should_log("/api/ai/chat", 200, 2.5)
+    logged = sum(sampler.should_log("/api/ai/analyze", 200, 0.01) for _ in range(1000))
+    assert 350 < logged < 650
+
+
+def test_records_written_as_json_off_the_caller_thread():
+    log_queue = queue.Queue(maxsize=2)
+    handler = LogQueueHandler(log_queue)
+    logger = logging.getLogger("redai.test_pipeline")
+    logger.propagate = False
+    logger.setLevel(logging.INFO)
+    logger.addHandler(handler)
+
+    logger.debug("below the level", extra={"never": "built"})
+    logger.info("chat %s", "completed", extra={"deployment": "gpt-4.1", "tokens": 42})
+    try:
+        raise ValueError("boom")
+    except ValueError:
+        logger.exception("upstream failed")
+    # The queue holds two records; the next one is dropped instead of blocking
+    logger.warning("dropped")
+    assert handler.dropped == 1
+
+    output = io.StringIO()
+    writer = logging.StreamHandler(output)
+    writer.setFormatter(create_formatter("json"))
+    listener = QueueListener(log_queue, writer)
+    listener.start()
+    listener.stop()
+    logger.removeHandler(handler)
+
+    first, second = [json.loads(line) for line in output.getvalue().splitlines()]
+    assert first["message"] == "chat completed"
+    assert first["level"] == "INFO" and first["logger"] == "redai.test_pipeline"
+    assert first["deployment"] == "gpt-4.1" and first["tokens"] == 42
+    assert "timestamp" in first
+    assert second["level"] == "ERROR" and "ValueError: boom" in second["exc_info"]
+
+
+def test_server_errors_logged_when_info_is_disabled():
+    records = []
+
+    class Collect(logging.Handler):
+        def emit(self, record):
+            # The queue handler of the app logger clears exc_info once it has been formatted
+            records.append((record.levelno, record.status, record.exc_info and record.exc_info[0]))
+
+    async def app(scope, receive, send):
+        if scope["path"] == "/crash":
+            raise RuntimeError("handler crashed")
+        await send({"type": "http.response.start", "status": 503 if scope["path"] == "/down" else 200, "headers": []})
+        await send({"type": "http.response.body", "body": b""})
+
+    async def send(message):
+        pass
+
+    logger = get_logger("http")
+    handler = Collect()
+    logger.addHandler(handler)
+    level = logger.level
+    logger.setLevel(logging.WARNING)
+    middleware = RequestLoggingMiddleware(app, RouteSampler(default_rate=0))
+
+    async def run():
+        for path in ("/ok", "/down", "/crash"):
+            try:
+                await middleware({"type": "http", "method": "GET", "path": path}, None, send)
+            except RuntimeError:
+                pass
+
+    try:
+        asyncio.run(run())
+    finally:
+        logger.removeHandler(handler)
+        logger.setLevel(level)
+
+    assert records == [(logging.ERROR, 503, None), (logging.ERROR, 500, RuntimeError)]
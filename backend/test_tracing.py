@@ -0,0 +1,83 @@
+"""
+Tests for request tracing
+"""
+
+import io
+import json
+import base64
+import logging
+import queue
+
+from fastapi.testclient import TestClient
+from PIL import Image
+
+import main
+import tracing
+from structured_logging import LogQueueHandler
+from tracing import BatchSpanProcessor, FileSpanExporter, Tracer, parse_traceparent, start_span
+
+TRACE_ID = "4bf92f3577b34da6a3ce929d0e0e4736"
+TRACEPARENT = f"00-{TRACE_ID}-00f067aa0ba902b7-01"
+
+
+def test_traceparent_parsing():
+    assert parse_traceparent(TRACEPARENT) == (TRACE_ID, "00f067aa0ba902b7", True)
+    assert parse_traceparent(f"00-{TRACE_ID}-00f067aa0ba902b7-00")[2] is False
+    assert parse_traceparent("00-xyz-00f067aa0ba902b7-01") is None
+    assert parse_traceparent(f"00-{'0' * 32}-00f067aa0ba902b7-01") is None
+
+
+def test_floor_plan_stages_exported_as_one_trace(tmp_path, monkeypatch):
+    path = tmp_path / "traces.jsonl"
+    processor = BatchSpanProcessor(FileSpanExporter(str(path)), "redai-test", interval=60)
+    monkeypatch.setattr(tracing, "_tracer", Tracer(processor))
+
+    plan = io.BytesIO()
+    Image.new("L", (40, 40), 255).save(plan, "PNG")
+
+    client = TestClient(main.app)
+    response = client.post(
+        "/api/ai/analyze-floor-plan",
+        json={"image_data": base64.b64encode(plan.getvalue()).decode(), "filename": "plan.png"},
+        headers={"traceparent": TRACEPARENT, "X-Cache-Bypass": "1"}
+    )
+    assert response.status_code == 200
+    assert response.headers["x-trace-id"] == TRACE_ID
+    assert response.headers["traceparent"].startswith(f"00-{TRACE_ID}-")
+
+    processor.shutdown()
+    spans = {}
+    for line in path.read_text().splitlines():
+        for span in json.loads(line)["resourceSpans"][0]["scopeSpans"][0]["spans"]:
+            spans[span["name"]] = span
+
+    server = spans["POST /api/ai/analyze-floor-plan"]
+    assert server["parentSpanId"] == "00f067aa0ba902b7"
+    assert {span["traceId"] for span in spans.values()} == {TRACE_ID}
+    assert spans["decode_image"]["parentSpanId"] == server["spanId"]
+
+    analyze = spans["ai_service.analyze_floor_plan"]
+    attributes = {item["key"]: item["value"] for item in analyze["attributes"]}
+    assert attributes["image.bytes"] == {"intValue": str(len(plan.getvalue()))}
+    assert attributes["image.format"] == {"stringValue": "PNG"}
+    assert attributes["result.fallback"] == {"boolValue": True}
+    # Azure OpenAI is not configured here, so the analysis falls back to the mock
+    assert spans["ai_service.mock_fallback"]["parentSpanId"] == analyze["spanId"]
+
+
+def test_log_records_carry_trace_ids():
+    log_queue = queue.Queue()
+    handler = LogQueueHandler(log_queue)
+    logger = logging.getLogger("redai.test_tracing")
+    logger.propagate = False
+    logger.setLevel(logging.INFO)
+    logger.addHandler(handler)
+
+    with start_span("outer", traceparent=TRACEPARENT) as span:
+        logger.info("inside")
+    logger.info("outside")
+    logger.removeHandler(handler)
+
+    inside, outside = log_queue.get_nowait(), log_queue.get_nowait()
+    assert (inside.trace_id, inside.span_id) == (TRACE_ID, span.span_id)
+    assert not hasattr(outside, "trace_id")
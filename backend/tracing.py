@@ -0,0 +1,401 @@
+"""
+Request tracing for RED AI
+Lightweight spans for the stages of a request (decode, cache, provider call,
+parsing, fallback) with W3C trace context propagation. Finished spans are
+exported in the OTLP/JSON format by a background thread, either to a file
+(readable by the OpenTelemetry collector's otlpjsonfile receiver) or to an
+OTLP/HTTP collector endpoint.
+"""
+
+import os
+import json
+import time
+import queue
+import random
+import logging
+import threading
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+import httpx
+
+# Not structured_logging.get_logger: structured_logging imports this module
+logger = logging.getLogger("redai.tracing")
+
+# OTLP span kinds and status codes
+KIND_INTERNAL = 1
+KIND_SERVER = 2
+KIND_CLIENT = 3
+STATUS_UNSET = 0
+STATUS_OK = 1
+STATUS_ERROR = 2
+
+_current_span: ContextVar[Optional["Span"]] = ContextVar("current_span", default=None)
+
+def _new_id(bits: int) -> str:
+    return f"{random.getrandbits(bits):0{bits // 4}x}"
+
+def parse_traceparent(header: Optional[str]) -> Optional[Tuple[str, str, bool]]:
+    """(trace_id, parent span_id, sampled) from a W3C traceparent header, None if malformed"""
+    if not header:
+        return None
+    parts = header.strip().split("-")
+    if len(parts) < 4 or len(parts[1]) != 32 or len(parts[2]) != 16:
+        return None
+    version, trace_id, span_id, flags = parts[:4]
+    try:
+        int(trace_id, 16), int(span_id, 16)
+        sampled = bool(int(flags, 16) & 1)
+    except ValueError:
+        return None
+    if version == "ff" or trace_id == "0" * 32 or span_id == "0" * 16:
+        return None
+    return trace_id, span_id, sampled
+
+def _otlp_value(value: Any) -> Dict[str, Any]:
+    if isinstance(value, bool):
+        return {"boolValue": value}
+    if isinstance(value, int):
+        return {"intValue": str(value)}
+    if isinstance(value, float):
+        return {"doubleValue": value}
+    return {"stringValue": str(value)}
+
+def _otlp_attributes(attributes: Dict[str, Any]) -> List[Dict[str, Any]]:
+    return [{"key": key, "value": _otlp_value(value)} for key, value in attributes.items() if value is not None]
+
+class Span:
+    """One timed stage of a request; attributes follow OpenTelemetry naming"""
+
+    __slots__ = (
+        "name", "kind", "trace_id", "span_id", "parent_id", "sampled",
+        "attributes", "events", "status", "status_message", "start_ns", "end_ns"
+    )
+
+    def __init__(
+        self,
+        name: str,
+        trace_id: str,
+        parent_id: Optional[str] = None,
+        sampled: bool = True,
+        kind: int = KIND_INTERNAL,
+        attributes: Optional[Dict[str, Any]] = None
+    ):
+        self.name = name
+        self.kind = kind
+        self.trace_id = trace_id
+        self.span_id = _new_id(64)
+        self.parent_id = parent_id
+        self.sampled = sampled
+        self.attributes = dict(attributes or {})
+        self.events: List[Dict[str, Any]] = []
+        self.status = STATUS_UNSET
+        self.status_message = ""
+        self.start_ns = time.time_ns()
+        self.end_ns: Optional[int] = None
+
+    @property
+    def traceparent(self) -> str:
+        return f"00-{self.trace_id}-{self.span_id}-{'01' if self.sampled else '00'}"
+
+    def set_attribute(self, key: str, value: Any):
+        self.attributes[key] = value
+
+    def set_attributes(self, attributes: Dict[str, Any]):
+        self.attributes.update(attributes)
+
+    def set_error(self, message: str):
+        self.status = STATUS_ERROR
+        self.status_message = message
+
+    def record_exception(self, error: BaseException):
+        self.events.append({
+            "timeUnixNano": str(time.time_ns()),
+            "name": "exception",
+            "attributes": _otlp_attributes({
+                "exception.type": type(error).__name__,
+                "exception.message": str(error)
+            })
+        })
+        self.set_error(str(error))
+
+    def to_otlp(self) -> Dict[str, Any]:
+        span = {
+            "traceId": self.trace_id,
+            "spanId": self.span_id,
+            "name": self.name,
+            "kind": self.kind,
+            "startTimeUnixNano": str(self.start_ns),
+            "endTimeUnixNano": str(self.end_ns or time.time_ns()),
+            "attributes": _otlp_attributes(self.attributes),
+            "status": {"code": self.status, "message": self.status_message}
+        }
+        if self.parent_id:
+            span["parentSpanId"] = self.parent_id
+        if self.events:
+            span["events"] = self.events
+        return span
+
+class FileSpanExporter:
+    """Appends one OTLP/JSON ExportTraceServiceRequest per line"""
+
+    def __init__(self, path: str):
+        self.path = path
+
+    def export(self, payload: Dict[str, Any]):
+        with open(self.path, "a", encoding="utf-8") as f:
+            f.write(json.dumps(payload, ensure_ascii=False) + "\n")
+
+    def shutdown(self):
+        pass
+
+class OTLPHttpSpanExporter:
+    """POSTs OTLP/JSON to a collector's /v1/traces endpoint"""
+
+    def __init__(self, endpoint: str, timeout: float = 5.0):
+        self.url = endpoint.rstrip("/") + "/v1/traces"
+        self.client = httpx.Client(timeout=timeout)
+
+    def export(self, payload: Dict[str, Any]):
+        self.client.post(self.url, json=payload).raise_for_status()
+
+    def shutdown(self):
+        self.client.close()
+
+class BatchSpanProcessor:
+    """
+    Exports finished spans from a background thread
+
+    Ending a span only puts it on a bounded queue; when the queue is full the
+    span is dropped and counted, so a slow collector never holds up requests.
+    """
+
+    def __init__(
+        self,
+        exporter,
+        service_name: str,
+        max_queue: int = 2048,
+        batch_size: int = 256,
+        interval: float = 2.0
+    ):
+        self.exporter = exporter
+        self.resource = {"attributes": _otlp_attributes({"service.name": service_name})}
+        self.queue: queue.Queue = queue.Queue(maxsize=max_queue)
+        self.batch_size = batch_size
+        self.interval = interval
+        self.stats = {"exported": 0, "dropped": 0, "failed": 0}
+        self._stopped = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="span-exporter", daemon=True)
+        self._thread.start()
+
+    def on_end(self, span: Span):
+        try:
+            self.queue.put_nowait(span)
+        except queue.Full:
+            self.stats["dropped"] += 1
+
+    def _drain(self) -> List[Span]:
+        batch = []
+        while len(batch) < self.batch_size:
+            try:
+                batch.append(self.queue.get_nowait())
+            except queue.Empty:
+                break
+        return batch
+
+    def _export(self, batch: List[Span]):
+        payload = {"resourceSpans": [{
+            "resource": self.resource,
+            "scopeSpans": [{"scope": {"name": "redai"}, "spans": [span.to_otlp() for span in batch]}]
+        }]}
+        try:
+            self.exporter.export(payload)
+            self.stats["exported"] += len(batch)
+        except Exception as e:
+            self.stats["failed"] += len(batch)
+            logger.warning("Span export failed", extra={"error": str(e), "spans": len(batch)})
+
+    def _run(self):
+        while not self._stopped.wait(self.interval):
+            self.flush()
+
+    def flush(self):
+        batch = self._drain()
+        while batch:
+            self._export(batch)
+            batch = self._drain()
+
+    def shutdown(self):
+        self._stopped.set()
+        self._thread.join(timeout=self.interval + 1)
+        self.flush()
+        self.exporter.shutdown()
+
+class Tracer:
+    """
+    Creates spans as children of the span active in the current context
+
+    With enabled=False spans still carry ids (so logs and headers can refer
+    to the request) but nothing is recorded. Head sampling happens when a
+    trace starts; an incoming traceparent's sampled flag is honoured.
+    """
+
+    def __init__(
+        self,
+        processor: Optional[BatchSpanProcessor] = None,
+        sample_rate: float = 1.0,
+        enabled: bool = True
+    ):
+        self.processor = processor
+        self.sample_rate = sample_rate
+        self.enabled = enabled
+
+    @contextmanager
+    def span(
+        self,
+        name: str,
+        attributes: Optional[Dict[str, Any]] = None,
+        kind: int = KIND_INTERNAL,
+        traceparent: Optional[str] = None
+    ) -> Iterator[Span]:
+        """
+        Time the enclosed block as a span
+
+        `traceparent` continues a trace started by the caller of this service;
+        otherwise the span joins the active trace or starts a new one. An
+        exception marks the span as failed and propagates.
+        """
+        parent = _current_span.get()
+        remote = parse_traceparent(traceparent) if traceparent else None
+        if remote:
+            span = Span(name, remote[0], remote[1], remote[2], kind, attributes)
+        elif parent is not None:
+            span = Span(name, parent.trace_id, parent.span_id, parent.sampled, kind, attributes)
+        else:
+            sampled = self.enabled and random.random() < self.sample_rate
+            span = Span(name, _new_id(128), None, sampled, kind, attributes)
+
+        token = _current_span.set(span)
+        try:
+            yield span
+        except BaseException as e:
+            span.record_exception(e)
+            raise
+        finally:
+            _current_span.reset(token)
+            span.end_ns = time.time_ns()
+            if span.sampled and self.enabled and self.processor is not None:
+                self.processor.on_end(span)
+
+    def get_stats(self) -> Dict[str, Any]:
+        stats = {"enabled": self.enabled, "sample_rate": self.sample_rate}
+        if self.processor is not None:
+            stats.update(self.processor.stats, queued=self.processor.queue.qsize())
+        return stats
+
+    def shutdown(self):
+        if self.processor is not None:
+            self.processor.shutdown()
+
+_tracer = Tracer(enabled=False)
+
+def current_span() -> Optional[Span]:
+    return _current_span.get()
+
+def current_trace_ids() -> Optional[Tuple[str, str]]:
+    """(trace_id, span_id) of the active span, for correlating log records"""
+    span = _current_span.get()
+    return (span.trace_id, span.span_id) if span is not None else None
+
+def start_span(
+    name: str,
+    attributes: Optional[Dict[str, Any]] = None,
+    kind: int = KIND_INTERNAL,
+    traceparent: Optional[str] = None
+):
+    """Span from the tracer configured by setup_tracing (ids only until then)"""
+    return _tracer.span(name, attributes, kind, traceparent)
+
+def get_tracing_stats() -> Dict[str, Any]:
+    return _tracer.get_stats()
+
+def create_span_exporter(kind: str):
+    """Exporter from TRACING_EXPORTER: file (TRACING_FILE), otlp (TRACING_OTLP_ENDPOINT) or none"""
+    if kind == "file":
+        return FileSpanExporter(os.getenv("TRACING_FILE", "traces.jsonl"))
+    if kind == "otlp":
+        return OTLPHttpSpanExporter(os.getenv("TRACING_OTLP_ENDPOINT", "http://localhost:4318"))
+    return None
+
+def setup_tracing(service_name: str = "redai-backend") -> Tracer:
+    """
+    Configure the global tracer from TRACING_* settings
+
+    TRACING_ENABLED (true), TRACING_EXPORTER (none, file or otlp) and
+    TRACING_SAMPLE_RATE (1.0). Calling it again returns the configured tracer.
+    """
+    global _tracer
+    if _tracer.enabled:
+        return _tracer
+
+    enabled = os.getenv("TRACING_ENABLED", "true").lower() == "true"
+    exporter = create_span_exporter(os.getenv("TRACING_EXPORTER", "none").lower()) if enabled else None
+    processor = BatchSpanProcessor(exporter, service_name) if exporter is not None else None
+    _tracer = Tracer(processor, float(os.getenv("TRACING_SAMPLE_RATE", "1.0")), enabled)
+    return _tracer
+
+def shutdown_tracing():
+    """Export the spans still queued and stop the exporter thread"""
+    global _tracer
+    _tracer.shutdown()
+    _tracer = Tracer(enabled=False)
+
+class TracingMiddleware:
+    """
+    ASGI middleware that opens the server span of every HTTP request
+
+    Continues the caller's trace from its traceparent header and returns
+    the trace in X-Trace-Id and traceparent response headers.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        traceparent = None
+        for name, value in scope.get("headers", []):
+            if name == b"traceparent":
+                traceparent = value.decode("latin-1")
+                break
+
+        with start_span(f"{scope['method']} {scope['path']}", {
+            "http.request.method": scope["method"],
+            "url.path": scope["path"]
+        }, KIND_SERVER, traceparent) as span:
+
+            async def send_with_trace(message):
+                if message["type"] == "http.response.start":
+                    status = message["status"]
+                    span.set_attribute("http.response.status_code", status)
+                    if status >= 500:
+                        span.set_error(f"HTTP {status}")
+                    message["headers"] = [
+                        *message.get("headers", []),
+                        (b"x-trace-id", span.trace_id.encode()),
+                        (b"traceparent", span.traceparent.encode())
+                    ]
+                await send(message)
+
+            try:
+                await self.app(scope, receive, send_with_trace)
+            finally:
+                # The route template is known once routing has run
+                route = getattr(scope.get("route"), "path", None)
+                if route:
+                    span.name = f"{scope['method']} {route}"
+                    span.set_attribute("http.route", route)
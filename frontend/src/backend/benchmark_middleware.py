@@ -0,0 +1,146 @@
+#!/usr/bin/env python3
+"""
+Red.AI Backend - Middleware Benchmark
+Запросов в секунду на /health через полный стек middleware:
+BaseHTTPMiddleware (как было) против чистых ASGI middleware
+
+Запросы передаются приложению напрямую через ASGI, без сети и HTTP-клиента,
+поэтому разница показывает только накладные расходы middleware.
+Запуск из каталога frontend: python -m src.backend.benchmark_middleware
+"""
+import argparse
+import asyncio
+import logging
+import time
+from typing import Callable, Dict, Type
+
+from fastapi import FastAPI, Request, Response
+from fastapi.middleware.cors import CORSMiddleware
+from fastapi.middleware.trustedhost import TrustedHostMiddleware
+from starlette.middleware.base import BaseHTTPMiddleware
+from starlette.middleware.gzip import GZipMiddleware
+
+from src.backend.core.middleware import LoggingMiddleware, SecurityHeadersMiddleware
+
+class LegacyLoggingMiddleware(BaseHTTPMiddleware):
+    """Прежняя реализация LoggingMiddleware"""
+    
+    async def dispatch(self, request: Request, call_next: Callable) -> Response:
+        start_time = time.time()
+        logging.getLogger(__name__).info(f"🔄 {request.method} {request.url.path} - Started")
+        response = await call_next(request)
+        process_time = time.time() - start_time
+        logging.getLogger(__name__).info(
+            f"✅ {request.method} {request.url.path} - "
+            f"Status: {response.status_code} - "
+            f"Time: {process_time:.2f}s"
+        )
+        response.headers["X-Process-Time"] = str(process_time)
+        return response
+
+class LegacySecurityHeadersMiddleware(BaseHTTPMiddleware):
+    """Прежняя реализация SecurityHeadersMiddleware"""
+    
+    async def dispatch(self, request: Request, call_next: Callable) -> Response:
+        response = await call_next(request)
+        response.headers["X-Content-Type-Options"] = "nosniff"
+        response.headers["X-Frame-Options"] = "DENY"
+        response.headers["X-XSS-Protection"] = "1; mode=block"
+        response.headers["Strict-Transport-Security"] = "max-age=31536000; includeSubDomains"
+        response.headers["Referrer-Policy"] = "strict-origin-when-cross-origin"
+        return response
+
+def create_app(logging_middleware: Type, security_middleware: Type) -> FastAPI:
+    """Приложение с тем же стеком, что собирает setup_middleware"""
+    app = FastAPI()
+    
+    @app.get("/health")
+    async def health_check():
+        return {"status": "healthy", "service": "red-ai-backend"}
+    
+    app.add_middleware(CORSMiddleware, allow_origins=["http://localhost:3000"], allow_credentials=True,
+                       allow_methods=["*"], allow_headers=["*"])
+    app.add_middleware(TrustedHostMiddleware, allowed_hosts=["redai.app", "*.redai.app", "localhost"])
+    app.add_middleware(GZipMiddleware, minimum_size=1000)
+    app.add_middleware(security_middleware)
+    app.add_middleware(logging_middleware)
+    return app
+
+async def call(app: FastAPI) -> int:
+    """Один GET /health напрямую через ASGI; возвращает статус ответа"""
+    scope = {
+        "type": "http", "asgi": {"version": "3.0"}, "http_version": "1.1",
+        "method": "GET", "scheme": "http", "path": "/health", "raw_path": b"/health",
+        "root_path": "", "query_string": b"", "server": ("localhost", 8000), "client": ("127.0.0.1", 50000),
+        "headers": [(b"host", b"localhost"), (b"origin", b"http://localhost:3000"), (b"accept-encoding", b"gzip")],
+    }
+    status = 0
+    request_sent = False
+    disconnected = asyncio.Event()
+    
+    async def receive():
+        nonlocal request_sent
+        if not request_sent:
+            request_sent = True
+            return {"type": "http.request", "body": b"", "more_body": False}
+        # Клиент остаётся подключённым до конца ответа
+        await disconnected.wait()
+        return {"type": "http.disconnect"}
+    
+    async def send(message):
+        nonlocal status
+        if message["type"] == "http.response.start":
+            status = message["status"]
+    
+    await app(scope, receive, send)
+    disconnected.set()
+    return status
+
+async def measure(app: FastAPI, requests: int, concurrency: int) -> float:
+    """Запросов в секунду при заданном числе одновременных клиентов"""
+    for _ in range(100):
+        await call(app)
+    
+    per_client = requests // concurrency
+    
+    async def client():
+        for _ in range(per_client):
+            assert await call(app) == 200
+    
+    started = time.perf_counter()
+    await asyncio.gather(*(client() for _ in range(concurrency)))
+    return per_client * concurrency / (time.perf_counter() - started)
+
+async def benchmark(requests: int, concurrency: int, rounds: int) -> Dict[str, float]:
+    apps = {
+        "before (BaseHTTPMiddleware)": create_app(LegacyLoggingMiddleware, LegacySecurityHeadersMiddleware),
+        "after (pure ASGI)": create_app(LoggingMiddleware, SecurityHeadersMiddleware),
+    }
+    # Лучший из нескольких прогонов, чередуя варианты, чтобы сгладить шум
+    results = {name: 0.0 for name in apps}
+    for _ in range(rounds):
+        for name, app in apps.items():
+            results[name] = max(results[name], await measure(app, requests, concurrency))
+    return results
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark /health through the middleware stack")
+    parser.add_argument("--requests", type=int, default=5000, help="Requests per run")
+    parser.add_argument("--concurrency", type=int, default=10, help="Concurrent clients")
+    parser.add_argument("--rounds", type=int, default=3, help="Runs per variant; the best is reported")
+    args = parser.parse_args()
+    
+    # Как в production: INFO-логи запросов пишутся
+    logging.basicConfig(level=logging.INFO, handlers=[logging.NullHandler()])
+    
+    results = asyncio.run(benchmark(args.requests, args.concurrency, args.rounds))
+    
+    print(f"\n📊 GET /health, {args.requests} requests, {args.concurrency} concurrent clients")
+    print(f"{'middleware':<30}{'req/s':>12}")
+    for name, rps in results.items():
+        print(f"{name:<30}{rps:>12.0f}")
+    before, after = results.values()
+    print(f"{'speedup':<30}{after / before:>11.2f}x")
+
+if __name__ == "__main__":
+    main()
@@ -2,55 +2,94 @@
 Red.AI Backend - Middleware Configuration
 Настройка middleware для CORS, логирования, аутентификации
 """
-from fastapi import FastAPI, Request, Response
+from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.middleware.trustedhost import TrustedHostMiddleware
-from starlette.middleware.base import BaseHTTPMiddleware
 from starlette.middleware.gzip import GZipMiddleware
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
 import time
 import logging
-from typing import Callable
 
 from src.backend.core.config import settings
 
 logger = logging.getLogger(__name__)
 
-class LoggingMiddleware(BaseHTTPMiddleware):
-    """Middleware для логирования запросов"""
+# Чистые ASGI middleware: без BaseHTTPMiddleware нет лишней задачи на запрос
+# и буферизации тела ответа, поэтому потоковые ответы проходят без задержек.
+# Заголовки добавляются в сообщение http.response.start.
+
+class LoggingMiddleware:
+    """Middleware для логирования запросов и заголовка X-Process-Time"""
     
-    async def dispatch(self, request: Request, call_next: Callable) -> Response:
-        start_time = time.time()
-        
-        # Логирование входящего запроса
-        logger.info(f"🔄 {request.method} {request.url.path} - Started")
+    def __init__(self, app: ASGIApp):
+        self.app = app
+    
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
         
-        response = await call_next(request)
+        start_time = time.perf_counter()
+        status_code = 500
         
-        # Логирование завершения
-        process_time = time.time() - start_time
-        logger.info(
-            f"✅ {request.method} {request.url.path} - "
-            f"Status: {response.status_code} - "
-            f"Time: {process_time:.2f}s"
-        )
+        async def send_with_timing(message: Message) -> None:
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+                # Время до начала ответа: тело потокового ответа ещё не отправлено
+                process_time = time.perf_counter() - start_time
+                message["headers"] = [
+                    *message.get("headers", []),
+                    (b"x-process-time", f"{process_time:.6f}".encode())
+                ]
+            await send(message)
         
-        response.headers["X-Process-Time"] = str(process_time)
-        return response
+        try:
+            await self.app(scope, receive, send_with_timing)
+        finally:
+            # Одна запись на запрос, включая отправку тела; при уровне выше
+            # INFO запись не создаётся вовсе
+            if logger.isEnabledFor(logging.INFO):
+                logger.info(
+                    "request",
+                    extra={
+                        "method": scope["method"],
+                        "path": scope["path"],
+                        "status": status_code,
+                        "duration_ms": round((time.perf_counter() - start_time) * 1000, 2)
+                    }
+                )
 
-class SecurityHeadersMiddleware(BaseHTTPMiddleware):
+class SecurityHeadersMiddleware:
     """Middleware для добавления security headers"""
     
-    async def dispatch(self, request: Request, call_next: Callable) -> Response:
-        response = await call_next(request)
+    HEADERS = [
+        (b"x-content-type-options", b"nosniff"),
+        (b"x-frame-options", b"DENY"),
+        (b"x-xss-protection", b"1; mode=block"),
+        (b"strict-transport-security", b"max-age=31536000; includeSubDomains"),
+        (b"referrer-policy", b"strict-origin-when-cross-origin"),
+    ]
+    NAMES = {name for name, _ in HEADERS}
+    
+    def __init__(self, app: ASGIApp):
+        self.app = app
+    
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
         
-        # Добавление security headers
-        response.headers["X-Content-Type-Options"] = "nosniff"
-        response.headers["X-Frame-Options"] = "DENY"
-        response.headers["X-XSS-Protection"] = "1; mode=block"
-        response.headers["Strict-Transport-Security"] = "max-age=31536000; includeSubDomains"
-        response.headers["Referrer-Policy"] = "strict-origin-when-cross-origin"
+        async def send_with_headers(message: Message) -> None:
+            if message["type"] == "http.response.start":
+                # Заголовки ответа заменяются, как и раньше при response.headers[...] = ...
+                message["headers"] = [
+                    *(header for header in message.get("headers", []) if header[0].lower() not in self.NAMES),
+                    *self.HEADERS
+                ]
+            await send(message)
         
-        return response
+        await self.app(scope, receive, send_with_headers)
 
 def setup_middleware(app: FastAPI) -> None:
     """Настройка всех middleware"""
@@ -0,0 +1,97 @@
+"""
+Tests for ASGI Middleware
+Тесты для LoggingMiddleware и SecurityHeadersMiddleware
+"""
+
+import os
+
+import pytest
+from fastapi import FastAPI
+from fastapi.responses import JSONResponse
+from fastapi.testclient import TestClient
+
+# Обязательные поля Settings: конфигурация читается при импорте модуля
+for name in ("DATABASE_URL", "POSTGRES_USER", "POSTGRES_PASSWORD", "POSTGRES_DB", "SECRET_KEY", "OPENAI_API_KEY"):
+    os.environ.setdefault(name, "test")
+
+from src.backend.core.middleware import LoggingMiddleware, SecurityHeadersMiddleware
+
+
+def _app() -> FastAPI:
+    """Приложение с теми же middleware, что подключает setup_middleware"""
+    app = FastAPI()
+
+    @app.get("/ping")
+    async def ping():
+        return {"ok": True}
+
+    @app.get("/framed")
+    async def framed():
+        return JSONResponse({"ok": True}, headers={"X-Frame-Options": "SAMEORIGIN", "X-Custom": "kept"})
+
+    app.add_middleware(SecurityHeadersMiddleware)
+    app.add_middleware(LoggingMiddleware)
+    return app
+
+
+class TestHeaders:
+    """Тесты заголовков ответа"""
+
+    def test_process_time_header(self):
+        response = TestClient(_app()).get("/ping")
+        assert response.status_code == 200
+        assert float(response.headers["x-process-time"]) >= 0
+
+    def test_security_headers_replace_existing(self):
+        response = TestClient(_app()).get("/framed")
+        # Заголовок приложения заменяется, а не дублируется
+        assert response.headers.get_list("x-frame-options") == ["DENY"]
+        assert response.headers["x-content-type-options"] == "nosniff"
+        assert response.headers["x-custom"] == "kept"
+
+
+class TestPassThrough:
+    """Тесты потоковых ответов и не-HTTP соединений"""
+
+    @pytest.mark.asyncio
+    async def test_streaming_body_is_not_buffered(self):
+        sent = []
+        seen_by_app = []
+
+        async def app(scope, receive, send):
+            await send({"type": "http.response.start", "status": 200, "headers": []})
+            await send({"type": "http.response.body", "body": b"first", "more_body": True})
+            # Первый фрагмент уже ушёл клиенту, пока приложение ещё формирует ответ
+            seen_by_app.extend(message.get("body") for message in sent)
+            await send({"type": "http.response.body", "body": b"second"})
+
+        async def send(message):
+            sent.append(message)
+
+        middleware = LoggingMiddleware(SecurityHeadersMiddleware(app))
+        await middleware({"type": "http", "method": "GET", "path": "/stream", "headers": []}, None, send)
+
+        assert seen_by_app == [None, b"first"]
+        assert [message.get("body") for message in sent[1:]] == [b"first", b"second"]
+        headers = dict(sent[0]["headers"])
+        assert b"x-process-time" in headers and headers[b"x-frame-options"] == b"DENY"
+
+    @pytest.mark.asyncio
+    @pytest.mark.parametrize("scope_type", ["websocket", "lifespan"])
+    async def test_non_http_scopes_pass_through(self, scope_type):
+        calls = []
+
+        async def app(scope, receive, send):
+            calls.append((scope, receive, send))
+
+        async def receive():
+            return {}
+
+        async def send(message):
+            pass
+
+        scope = {"type": scope_type, "path": "/ws"}
+        await LoggingMiddleware(SecurityHeadersMiddleware(app))(scope, receive, send)
+
+        # Тот же scope и те же receive/send, без обёрток
+        assert calls == [(scope, receive, send)]
@@ -14,7 +14,9 @@ from dataclasses import dataclass
 
 from ..base.ai_service import BaseAIService
 from ...backend.core.config import settings
-from ...backend.core.exceptions import AIServiceError, QuotaExceededError
+from ...backend.core.exceptions import AIServiceError, QuotaExceededError, ServiceUnavailableError
+from ...backend.core.metrics import UpstreamCall, record_images
+from ...backend.core.resilience import create_retry_policy, get_circuit_breaker
 
 
 @dataclass
@@ -44,6 +46,9 @@ class DALLEService(BaseAIService):
     def __init__(self):
         super().__init__("dalle")
         self.client = None
+        # Временные ошибки повторяются с задержкой; при серии ошибок DALL-E временно не вызывается
+        self.retry = create_retry_policy()
+        self.breaker = get_circuit_breaker("DALL-E")
         self.setup_client()
     
     def setup_client(self):
@@ -53,6 +58,8 @@ class DALLEService(BaseAIService):
                 openai.api_key = settings.OPENAI_API_KEY
                 if settings.OPENAI_ORG_ID:
                     openai.organization = settings.OPENAI_ORG_ID
+                # Повторами управляет self.retry
+                openai.max_retries = 0
                 self.client = openai
                 self.is_available = True
             else:
@@ -130,18 +137,16 @@ class DALLEService(BaseAIService):
         n: int = 1,
         response_format: str = "url"
     ) -> Dict[str, Any]:
-        """Выполнение запроса к DALL-E API"""
+        """Выполнение запроса к DALL-E API с повторами временных ошибок"""
         try:
-            response = await asyncio.to_thread(
-                self.client.images.generate,
-                model="dall-e-3",
-                prompt=prompt,
-                size=size,
-                quality=quality,
-                n=n,
-                response_format=response_format
+            response = await self.retry.run(
+                lambda: self._generate(prompt, size, quality, n, response_format),
+                breaker=self.breaker
             )
+            record_images("dall-e", len(response.data or []))
             return response.model_dump()
+        except ServiceUnavailableError:
+            raise
         except openai.RateLimitError as e:
             raise QuotaExceededError("DALL-E", 0, 0)
         except openai.AuthenticationError as e:
@@ -149,6 +154,19 @@ class DALLEService(BaseAIService):
         except Exception as e:
             raise AIServiceError("DALL-E", str(e))
     
+    async def _generate(self, prompt: str, size: str, quality: str, n: int, response_format: str):
+        """Одна попытка запроса к DALL-E; повторы замеряются отдельно"""
+        with UpstreamCall("openai", "dall-e-3"):
+            return await asyncio.to_thread(
+                self.client.images.generate,
+                model="dall-e-3",
+                prompt=prompt,
+                size=size,
+                quality=quality,
+                n=n,
+                response_format=response_format
+            )
+    
     def _enhance_prompt(self, prompt: str, style: str) -> str:
         """Улучшение промпта для дизайна интерьера"""
         style_modifiers = {
@@ -194,6 +212,8 @@ class DALLEService(BaseAIService):
             "service": "dall-e-3",
             "model": "dall-e-3",
             "available": self.is_available,
+            "circuit": self.breaker.get_stats(),
+            "retry": self.retry.get_stats(),
             "features": [
                 "High-quality image generation",
                 "Interior design optimization",
@@ -5,7 +5,7 @@ Red.AI Backend Configuration
 
 import os
 from pydantic_settings import BaseSettings
-from typing import List, Optional
+from typing import Dict, List, Optional
 
 
 class Settings(BaseSettings):
@@ -37,10 +37,20 @@ class Settings(BaseSettings):
     AZURE_OPENAI_ENDPOINT: Optional[str] = None
     AZURE_OPENAI_API_VERSION: str = "2023-12-01-preview"
     
+    # Повторы и circuit breaker для вызовов AI-провайдеров
+    AI_RETRY_ATTEMPTS: int = 3
+    AI_RETRY_BASE_DELAY: float = 0.5  # секунды; ожидание перед n-м повтором — случайное до BASE * 2^n
+    AI_RETRY_MAX_DELAY: float = 8.0
+    AI_RETRY_MAX_RETRY_AFTER: float = 30.0  # более долгий Retry-After не ждём, а возвращаем ошибку
+    AI_BREAKER_FAILURES: int = 5
+    AI_BREAKER_RECOVERY: float = 30.0
+    
     # Аутентификация
     JWT_SECRET_KEY: str = "your-secret-key-here"
     JWT_ALGORITHM: str = "HS256"
     JWT_EXPIRE_MINUTES: int = 30
+    # Выданные API-ключи (X-API-Key); неизвестные ключи лимитируются по IP
+    API_KEYS: List[str] = []
     
     # CORS
     ALLOWED_ORIGINS: List[str] = [
@@ -60,11 +70,24 @@ class Settings(BaseSettings):
     # Rate Limiting
     RATE_LIMIT_REQUESTS: int = 100
     RATE_LIMIT_PERIOD: int = 60
+    RATE_LIMIT_BACKEND: str = "memory"  # memory | redis (общие лимиты для всех инстансов)
+    # Лимиты по классам маршрутов (chat, image); остальные маршруты — RATE_LIMIT_REQUESTS
+    RATE_LIMIT_ROUTE_LIMITS: Dict[str, int] = {"chat": 30, "image": 10}
+    # Префикс пути -> класс маршрута; None — ROUTE_CLASSES из core/rate_limit.py
+    RATE_LIMIT_ROUTE_CLASSES: Optional[Dict[str, str]] = None
+    # Переопределения для клиентов: {"user:<id>" | "key:<выданный ключ>" | "ip:<адрес>": {класс: лимит}}
+    RATE_LIMIT_OVERRIDES: Dict[str, Dict[str, int]] = {}
     
     # Логирование
     LOG_LEVEL: str = "INFO"
     LOG_FILE: str = "logs/app.log"
     
+    # Профилирование (/admin/profile и заголовок X-Profile); нужен токен администратора
+    PROFILING_ENABLED: bool = False
+    PROFILING_TOKEN: Optional[str] = None
+    PROFILING_MAX_SECONDS: float = 60.0
+    PROFILING_INTERVAL_MS: float = 5.0
+    
     # Email
     EMAIL_HOST: Optional[str] = None
     EMAIL_PORT: int = 587
@@ -3,6 +3,7 @@ Red.AI Backend Exceptions
 Кастомные исключения для приложения
 """
 
+import math
 from fastapi import HTTPException
 from typing import Any, Dict, Optional
 
@@ -87,11 +88,14 @@ class ConflictError(RedAIException):
 class RateLimitError(RedAIException):
     """Ошибка превышения лимита запросов"""
     
-    def __init__(self, message: str = "Rate limit exceeded"):
+    def __init__(self, message: str = "Rate limit exceeded", retry_after: Optional[float] = None):
+        self.retry_after = retry_after
         super().__init__(
             message=message,
             status_code=429,
-            detail="Too many requests. Please try again later."
+            detail="Too many requests. Please try again later.",
+            # Retry-After принимает только целые секунды
+            headers={"Retry-After": str(max(1, math.ceil(retry_after)))} if retry_after is not None else None
         )
 
 
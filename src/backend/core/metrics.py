@@ -0,0 +1,134 @@
+"""
+Red.AI Metrics
+Метрики Prometheus: задержка запросов по маршрутам, задержка вызовов
+AI-провайдеров, токены, сгенерированные изображения и запросы в обработке.
+Отдаются на /metrics для scrape job ai-processor из docker/prometheus.yml.
+"""
+
+import asyncio
+import time
+from typing import Any
+
+from prometheus_client import CONTENT_TYPE_LATEST, REGISTRY, Counter, Gauge, Histogram, generate_latest
+
+# Генерация изображений занимает десятки секунд, поэтому корзины шире стандартных
+LATENCY_BUCKETS = (0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 20, 30, 60, 120)
+
+HTTP_REQUEST_DURATION = Histogram(
+    "redai_http_request_duration_seconds",
+    "Время обработки HTTP-запроса, включая потоковое тело ответа",
+    ["method", "route", "status"],
+    buckets=LATENCY_BUCKETS
+)
+HTTP_REQUESTS_IN_FLIGHT = Gauge(
+    "redai_http_requests_in_flight",
+    "HTTP-запросы в обработке"
+)
+UPSTREAM_REQUEST_DURATION = Histogram(
+    "redai_upstream_request_duration_seconds",
+    "Время одного вызова AI-провайдера",
+    ["provider", "deployment", "outcome"],
+    buckets=LATENCY_BUCKETS
+)
+UPSTREAM_REQUESTS_IN_FLIGHT = Gauge(
+    "redai_upstream_requests_in_flight",
+    "Вызовы AI-провайдеров, ожидающие ответа",
+    ["provider"]
+)
+AI_TOKENS = Counter(
+    "redai_ai_tokens",
+    "Токены, учтённые провайдером (usage.total_tokens)",
+    ["provider", "deployment"]
+)
+IMAGES_GENERATED = Counter(
+    "redai_images_generated",
+    "Изображения, полученные от провайдеров генерации",
+    ["provider"]
+)
+
+
+def _route(scope) -> str:
+    # Шаблон маршрута вместо пути: идентификаторы в путях раздувают число серий
+    route = scope.get("route")
+    return getattr(route, "path", None) or "<unmatched>"
+
+
+class MetricsMiddleware:
+    """ASGI middleware: время каждого HTTP-запроса по шаблону маршрута"""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        status = 500
+        started = time.perf_counter()
+
+        async def send_with_status(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        HTTP_REQUESTS_IN_FLIGHT.inc()
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            HTTP_REQUESTS_IN_FLIGHT.dec()
+            HTTP_REQUEST_DURATION.labels(scope["method"], _route(scope), str(status)).observe(
+                time.perf_counter() - started
+            )
+
+
+def _outcome(error: BaseException) -> str:
+    if isinstance(error, asyncio.CancelledError):
+        return "cancelled"
+    if isinstance(error, asyncio.TimeoutError):
+        return "timeout"
+    if getattr(error, "status_code", None) == 429:
+        return "throttled"
+    return "error"
+
+
+class UpstreamCall:
+    """
+    Замер одного вызова провайдера: `with UpstreamCall(provider, deployment):`
+
+    Исключение определяет исход вызова (error, timeout, throttled, cancelled).
+    """
+
+    def __init__(self, provider: str, deployment: str = ""):
+        self.provider = provider
+        self.deployment = deployment
+        self.outcome = "success"
+
+    def __enter__(self) -> "UpstreamCall":
+        UPSTREAM_REQUESTS_IN_FLIGHT.labels(self.provider).inc()
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc is not None:
+            self.outcome = _outcome(exc)
+        UPSTREAM_REQUESTS_IN_FLIGHT.labels(self.provider).dec()
+        UPSTREAM_REQUEST_DURATION.labels(self.provider, self.deployment, self.outcome).observe(
+            time.perf_counter() - self.started
+        )
+
+
+def record_usage(provider: str, deployment: str, usage: Any):
+    """Учёт токенов из объекта usage ответа OpenAI, если он есть"""
+    total = getattr(usage, "total_tokens", None)
+    if total:
+        AI_TOKENS.labels(provider, deployment).inc(total)
+
+
+def record_images(provider: str, count: int = 1):
+    IMAGES_GENERATED.labels(provider).inc(count)
+
+
+def render_metrics() -> bytes:
+    return generate_latest(REGISTRY)
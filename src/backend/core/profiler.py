@@ -0,0 +1,188 @@
+"""
+Red.AI Profiler
+Сэмплирующий профилировщик по запросу: фоновый поток снимает стеки Python
+всех потоков и возвращает их в свёрнутом виде (`поток;внешняя;...;внутренняя N`),
+который понимают flamegraph.pl, speedscope и inferno. Пока профиль не
+запрошен, ничего не выполняется; при выключенном профилировании эндпоинты
+и middleware не подключаются.
+"""
+
+import asyncio
+import logging
+import os
+import secrets
+import sys
+import threading
+import uuid
+from collections import Counter, OrderedDict
+from typing import Any, Dict, Optional
+
+from .config import settings
+
+logger = logging.getLogger(__name__)
+
+# Листовые функции заблокированных потоков: цикл событий в select(),
+# простаивающие воркеры пулов, потоки записи логов
+IDLE_FUNCTIONS = {"select", "poll", "wait", "_wait_for_tstate_lock", "accept"}
+
+
+class ProfilerBusyError(Exception):
+    """Профиль всего процесса уже снимается"""
+
+
+class SamplingProfiler:
+    """
+    Подсчёт стеков всех потоков каждые `interval` секунд
+
+    sys._current_frames() читается из фонового потока, код не
+    инструментируется; стоимость — доля GIL потока-сэмплера, пока идёт профиль.
+    """
+
+    def __init__(self, interval: float = 0.005, include_idle: bool = False):
+        self.interval = interval
+        self.include_idle = include_idle
+        self.stacks: Counter = Counter()
+        self.samples = 0
+        self._names: Dict[Any, str] = {}
+        self._stopped = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def _frame_name(self, code) -> str:
+        name = self._names.get(code)
+        if name is None:
+            name = f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})"
+            self._names[code] = name
+        return name
+
+    def sample(self):
+        own = threading.get_ident()
+        threads = {thread.ident: thread.name for thread in threading.enumerate()}
+        for ident, frame in sys._current_frames().items():
+            if ident == own:
+                continue
+            if not self.include_idle and frame.f_code.co_name in IDLE_FUNCTIONS:
+                continue
+            frames = []
+            while frame is not None:
+                frames.append(self._frame_name(frame.f_code))
+                frame = frame.f_back
+            frames.append(threads.get(ident, str(ident)))
+            self.stacks[";".join(reversed(frames))] += 1
+        self.samples += 1
+
+    def _run(self):
+        while not self._stopped.wait(self.interval):
+            self.sample()
+
+    def start(self) -> "SamplingProfiler":
+        self._thread = threading.Thread(target=self._run, name="sampling-profiler", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self) -> "SamplingProfiler":
+        self._stopped.set()
+        if self._thread is not None:
+            self._thread.join()
+        return self
+
+    def collapsed(self) -> str:
+        """Свёрнутые стеки, самые частые первыми"""
+        return "".join(f"{stack} {count}\n" for stack, count in self.stacks.most_common())
+
+
+class ProfilingService:
+    """
+    Профилирование только для администратора: весь процесс на N секунд
+    и отдельные запросы с заголовком X-Profile
+
+    Профиль запроса включает все потоки, пока запрос выполняется, поэтому
+    в него попадают и параллельные запросы; корень стека — имя потока.
+    """
+
+    def __init__(self, token: str, max_seconds: float = 60.0, interval: float = 0.005, keep_request_profiles: int = 20):
+        self.token = token
+        self.max_seconds = max_seconds
+        self.interval = interval
+        self.keep_request_profiles = keep_request_profiles
+        self.request_profiles: "OrderedDict[str, str]" = OrderedDict()
+        self._lock = asyncio.Lock()
+
+    def authorized(self, token: Optional[str]) -> bool:
+        return bool(token) and secrets.compare_digest(token, self.token)
+
+    async def profile(self, seconds: float, interval: Optional[float] = None, include_idle: bool = False) -> str:
+        """Сэмплирование всего процесса в течение `seconds` (не дольше max_seconds)"""
+        if self._lock.locked():
+            raise ProfilerBusyError("Профиль уже снимается")
+        async with self._lock:
+            seconds = max(0.1, min(seconds, self.max_seconds))
+            profiler = SamplingProfiler(interval or self.interval, include_idle).start()
+            try:
+                await asyncio.sleep(seconds)
+            finally:
+                profiler.stop()
+            logger.info(f"🔥 Profile captured: {seconds:.1f}s, {profiler.samples} samples")
+            return profiler.collapsed()
+
+    def start_request_profile(self) -> SamplingProfiler:
+        return SamplingProfiler(self.interval).start()
+
+    def finish_request_profile(self, profile_id: str, profiler: SamplingProfiler):
+        self.request_profiles[profile_id] = profiler.stop().collapsed()
+        while len(self.request_profiles) > self.keep_request_profiles:
+            self.request_profiles.popitem(last=False)
+
+    def get_request_profile(self, profile_id: str) -> Optional[str]:
+        return self.request_profiles.get(profile_id)
+
+
+def create_profiling_service() -> Optional[ProfilingService]:
+    """Профилирование из PROFILING_ENABLED и PROFILING_TOKEN; None, если выключено"""
+    if not settings.PROFILING_ENABLED:
+        return None
+    if not settings.PROFILING_TOKEN:
+        logger.warning("⚠️ PROFILING_ENABLED задан без PROFILING_TOKEN, профилирование выключено")
+        return None
+    return ProfilingService(
+        settings.PROFILING_TOKEN,
+        max_seconds=settings.PROFILING_MAX_SECONDS,
+        interval=settings.PROFILING_INTERVAL_MS / 1000
+    )
+
+
+class ProfilingMiddleware:
+    """
+    ASGI middleware: профилирует запросы с `X-Profile: 1` и верным X-Admin-Token
+
+    Ответ содержит X-Profile-Id; свёрнутые стеки доступны после завершения
+    запроса на /admin/profile/requests/{id}.
+    """
+
+    def __init__(self, app, profiling: ProfilingService):
+        self.app = app
+        self.profiling = profiling
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        headers = dict(scope.get("headers", []))
+        if headers.get(b"x-profile") != b"1" or not self.profiling.authorized(
+            headers.get(b"x-admin-token", b"").decode("latin-1")
+        ):
+            await self.app(scope, receive, send)
+            return
+
+        profile_id = uuid.uuid4().hex
+
+        async def send_with_profile_id(message):
+            if message["type"] == "http.response.start":
+                message["headers"] = [*message.get("headers", []), (b"x-profile-id", profile_id.encode())]
+            await send(message)
+
+        profiler = self.profiling.start_request_profile()
+        try:
+            await self.app(scope, receive, send_with_profile_id)
+        finally:
+            self.profiling.finish_request_profile(profile_id, profiler)
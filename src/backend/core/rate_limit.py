@@ -0,0 +1,332 @@
+"""
+Red.AI Rate Limiting
+Ограничение частоты запросов: ASGI middleware с in-memory и Redis бэкендами
+
+Алгоритм — GCRA (эквивалент token bucket): для каждого ключа хранится одно
+число, "теоретическое время прибытия" (TAT) следующего запроса. Лимит
+N запросов за период P допускает всплеск до N запросов, после чего запросы
+проходят не чаще одного в P / N секунд.
+"""
+
+import hashlib
+import json
+import logging
+import time
+from dataclasses import dataclass
+from typing import Dict, List, Optional, Tuple
+
+from .config import settings
+from .exceptions import RateLimitError
+
+try:
+    import redis.asyncio as redis_asyncio
+    REDIS_AVAILABLE = True
+except ImportError:
+    REDIS_AVAILABLE = False
+
+try:
+    from jose import JWTError, jwt
+    JWT_AVAILABLE = True
+except ImportError:
+    JWT_AVAILABLE = False
+
+logger = logging.getLogger(__name__)
+
+# Классы маршрутов по умолчанию: префикс пути -> класс, по эндпоинтам из
+# docs/api-docs.md (/chat/message, /generate/image, /analyze/room под /api/v1).
+# Переопределяются RATE_LIMIT_ROUTE_CLASSES; остальные пути относятся к "default"
+ROUTE_CLASSES: Dict[str, str] = {
+    "/api/v1/chat": "chat",
+    "/api/v1/generate": "image",
+    "/api/v1/analyze": "image",
+}
+
+# Пути без ограничений
+EXEMPT_PREFIXES = ("/health", "/metrics", "/docs", "/redoc", "/openapi.json", "/static")
+
+
+@dataclass
+class RateLimitDecision:
+    """Результат проверки лимита"""
+    allowed: bool
+    limit: int
+    remaining: int
+    retry_after: float  # секунды до следующего разрешённого запроса; 0 если разрешён
+    reset_after: float  # секунды до полного восстановления лимита
+
+
+def gcra(tat: Optional[float], now: float, limit: int, period: float) -> Tuple[Optional[float], RateLimitDecision]:
+    """
+    Один шаг GCRA
+
+    Возвращает новый TAT (None если запрос отклонён и состояние не меняется)
+    и решение по запросу.
+    """
+    interval = period / limit
+    tat = max(tat or now, now)
+    new_tat = tat + interval
+    allow_at = new_tat - period
+
+    if allow_at > now:
+        return None, RateLimitDecision(False, limit, 0, allow_at - now, tat - now)
+
+    remaining = int((period - (new_tat - now)) / interval + 1e-9)
+    return new_tat, RateLimitDecision(True, limit, remaining, 0.0, new_tat - now)
+
+
+class RateLimitBackend:
+    """Хранилище состояния лимитов"""
+
+    async def hit(self, key: str, limit: int, period: float) -> RateLimitDecision:
+        raise NotImplementedError
+
+    async def close(self):
+        pass
+
+
+class InMemoryRateLimitBackend(RateLimitBackend):
+    """
+    Лимиты в памяти процесса
+
+    Подходит для одного воркера. Проверка выполняется без await,
+    поэтому атомарна в рамках event loop.
+    """
+
+    def __init__(self, max_keys: int = 100_000):
+        self.max_keys = max_keys
+        self._tats: Dict[str, float] = {}
+
+    async def hit(self, key: str, limit: int, period: float) -> RateLimitDecision:
+        now = time.monotonic()
+        new_tat, decision = gcra(self._tats.get(key), now, limit, period)
+        if new_tat is not None:
+            self._tats[key] = new_tat
+            if len(self._tats) > self.max_keys:
+                self._evict(now)
+        return decision
+
+    def _evict(self, now: float):
+        """Удаление ключей, лимит которых полностью восстановился"""
+        self._tats = {key: tat for key, tat in self._tats.items() if tat > now}
+
+
+class RedisRateLimitBackend(RateLimitBackend):
+    """
+    Общие лимиты для всех воркеров и инстансов через Redis
+
+    Проверка и обновление выполняются одним Lua-скриптом, атомарно
+    и за один round trip. Время берётся с сервера Redis, чтобы
+    расхождение часов между инстансами не влияло на лимиты.
+    """
+
+    GCRA_SCRIPT = """
+    local limit = tonumber(ARGV[1])
+    local period = tonumber(ARGV[2])
+    local interval = period / limit
+    local time = redis.call('TIME')
+    local now = tonumber(time[1]) + tonumber(time[2]) / 1000000
+
+    local tat = tonumber(redis.call('GET', KEYS[1]) or now)
+    if tat < now then
+        tat = now
+    end
+    local new_tat = tat + interval
+    local allow_at = new_tat - period
+
+    if allow_at > now then
+        return {0, 0, tostring(allow_at - now), tostring(tat - now)}
+    end
+
+    redis.call('SET', KEYS[1], tostring(new_tat), 'PX', math.ceil((new_tat - now) * 1000))
+    local remaining = math.floor((period - (new_tat - now)) / interval + 1e-9)
+    return {1, remaining, '0', tostring(new_tat - now)}
+    """
+
+    def __init__(self, redis_url: str, password: Optional[str] = None, prefix: str = "redai:ratelimit:"):
+        if not REDIS_AVAILABLE:
+            raise RuntimeError("redis package is not installed")
+        self.prefix = prefix
+        self.client = redis_asyncio.from_url(redis_url, password=password)
+        self.script = self.client.register_script(self.GCRA_SCRIPT)
+
+    async def hit(self, key: str, limit: int, period: float) -> RateLimitDecision:
+        allowed, remaining, retry_after, reset_after = await self.script(
+            keys=[self.prefix + key],
+            args=[limit, period]
+        )
+        return RateLimitDecision(bool(allowed), limit, int(remaining), float(retry_after), float(reset_after))
+
+    async def close(self):
+        await self.client.close()
+
+
+class RateLimiter:
+    """
+    Лимиты по пользователю, API-ключу и классу маршрута
+
+    Клиент определяется по заголовку X-API-Key, если ключ выдан (есть
+    в api_keys), затем по JWT с проверенной подписью (поле sub), затем
+    по IP. Неизвестный ключ считается по IP: иначе каждый новый ключ
+    получал бы свежий лимит. Лимит берётся из переопределений для
+    клиента, затем из лимита класса маршрута, затем RATE_LIMIT_REQUESTS.
+    Preflight-запросы OPTIONS не ограничиваются.
+    """
+
+    def __init__(
+        self,
+        backend: RateLimitBackend,
+        default_limit: int = 100,
+        period: float = 60,
+        route_limits: Optional[Dict[str, int]] = None,
+        overrides: Optional[Dict[str, Dict[str, int]]] = None,
+        fail_open: bool = True,
+        api_keys: Optional[List[str]] = None,
+        route_classes: Optional[Dict[str, str]] = None
+    ):
+        self.backend = backend
+        self.default_limit = default_limit
+        self.period = period
+        self.route_limits = route_limits or {}
+        self.overrides = overrides or {}
+        self.fail_open = fail_open
+        self.api_keys = set(api_keys or [])
+        # Самый длинный префикс первым, чтобы более точное правило выигрывало
+        self.route_classes: List[Tuple[str, str]] = sorted(
+            (route_classes if route_classes is not None else ROUTE_CLASSES).items(),
+            key=lambda item: -len(item[0])
+        )
+
+    def route_class(self, path: str) -> Optional[str]:
+        """Класс маршрута, или None для путей без ограничений"""
+        if path.startswith(EXEMPT_PREFIXES):
+            return None
+        for prefix, route_class in self.route_classes:
+            if path.startswith(prefix):
+                return route_class
+        return "default"
+
+    def identify(self, scope) -> str:
+        """Идентификатор клиента: key:<ключ>, user:<id> или ip:<адрес>"""
+        headers = dict(scope.get("headers") or [])
+
+        api_key = headers.get(b"x-api-key", b"").decode("latin-1")
+        if api_key and api_key in self.api_keys:
+            return "key:" + api_key
+
+        authorization = headers.get(b"authorization", b"").decode("latin-1")
+        if JWT_AVAILABLE and authorization[:7].lower() == "bearer ":
+            try:
+                payload = jwt.decode(
+                    authorization[7:],
+                    settings.JWT_SECRET_KEY,
+                    algorithms=[settings.JWT_ALGORITHM]
+                )
+                if payload.get("sub"):
+                    return f"user:{payload['sub']}"
+            except JWTError:
+                # Неверный токен отклонит аутентификация; лимит считаем по IP
+                pass
+
+        client = scope.get("client")
+        return f"ip:{client[0] if client else 'unknown'}"
+
+    def limit_for(self, identity: str, route_class: str) -> int:
+        override = self.overrides.get(identity, {})
+        if route_class in override:
+            return override[route_class]
+        return self.route_limits.get(route_class, self.default_limit)
+
+    async def check(self, scope) -> Optional[RateLimitDecision]:
+        """Учесть запрос; None если путь не ограничивается"""
+        route_class = self.route_class(scope["path"])
+        if route_class is None or scope["method"] == "OPTIONS":
+            return None
+
+        identity = self.identify(scope)
+        limit = self.limit_for(identity, route_class)
+        # Ключи и токены не должны попадать в хранилище в открытом виде
+        digest = hashlib.sha256(identity.encode()).hexdigest()[:32]
+
+        try:
+            return await self.backend.hit(f"{route_class}:{digest}", limit, self.period)
+        except Exception as e:
+            if not self.fail_open:
+                raise
+            logger.warning(
+                "Rate limit backend unavailable, request allowed",
+                extra={"error": str(e), "error_type": type(e).__name__, "route_class": route_class}
+            )
+            return None
+
+
+class RateLimitMiddleware:
+    """
+    ASGI middleware: 429 с Retry-After при превышении лимита,
+    заголовки X-RateLimit-* на остальных ответах
+    """
+
+    def __init__(self, app, limiter: RateLimiter):
+        self.app = app
+        self.limiter = limiter
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        decision = await self.limiter.check(scope)
+        if decision is None:
+            await self.app(scope, receive, send)
+            return
+
+        if not decision.allowed:
+            await self._reject(decision, send)
+            return
+
+        rate_headers = self._headers(decision)
+
+        async def send_with_headers(message):
+            if message["type"] == "http.response.start":
+                message["headers"] = list(message.get("headers", [])) + rate_headers
+            await send(message)
+
+        await self.app(scope, receive, send_with_headers)
+
+    @staticmethod
+    def _headers(decision: RateLimitDecision) -> List[Tuple[bytes, bytes]]:
+        return [
+            (b"x-ratelimit-limit", str(decision.limit).encode()),
+            (b"x-ratelimit-remaining", str(decision.remaining).encode()),
+            (b"x-ratelimit-reset", str(int(decision.reset_after + 0.999)).encode()),
+        ]
+
+    async def _reject(self, decision: RateLimitDecision, send):
+        error = RateLimitError(retry_after=decision.retry_after)
+        body = json.dumps({"detail": error.detail}).encode()
+        headers = [
+            (b"content-type", b"application/json"),
+            (b"content-length", str(len(body)).encode()),
+        ]
+        headers += [(name.lower().encode(), value.encode()) for name, value in error.headers.items()]
+        headers += self._headers(decision)
+
+        await send({"type": "http.response.start", "status": error.status_code, "headers": headers})
+        await send({"type": "http.response.body", "body": body})
+
+
+def create_rate_limiter() -> RateLimiter:
+    """Создание лимитера по настройкам приложения"""
+    if settings.RATE_LIMIT_BACKEND == "redis":
+        backend = RedisRateLimitBackend(settings.REDIS_URL, settings.REDIS_PASSWORD)
+    else:
+        backend = InMemoryRateLimitBackend()
+
+    return RateLimiter(
+        backend,
+        default_limit=settings.RATE_LIMIT_REQUESTS,
+        period=settings.RATE_LIMIT_PERIOD,
+        route_limits=settings.RATE_LIMIT_ROUTE_LIMITS,
+        overrides=settings.RATE_LIMIT_OVERRIDES,
+        api_keys=settings.API_KEYS,
+        route_classes=settings.RATE_LIMIT_ROUTE_CLASSES
+    )
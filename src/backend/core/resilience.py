@@ -0,0 +1,255 @@
+"""
+Red.AI Resilience
+Повторы с экспоненциальной задержкой и circuit breaker для вызовов AI-провайдеров
+
+Повторяются только временные ошибки: 429, 408, 5xx, таймауты и ошибки
+соединения. Задержка — "full jitter": случайная в пределах BASE * 2^n,
+чтобы клиенты, получившие ошибку одновременно, не повторяли запрос
+одновременно. Circuit breaker после серии ошибок перестаёт обращаться к
+провайдеру и через RECOVERY секунд пропускает один пробный запрос.
+"""
+
+import asyncio
+import logging
+import random
+import time
+from typing import Any, Awaitable, Callable, Dict, Mapping, Optional, Tuple, TypeVar
+
+import httpx
+
+from .config import settings
+from .exceptions import ServiceUnavailableError
+
+try:
+    import openai
+    OPENAI_AVAILABLE = True
+except ImportError:
+    OPENAI_AVAILABLE = False
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+# Статусы, при которых имеет смысл повторить запрос
+RETRYABLE_STATUS = {408, 429, 500, 502, 503, 504}
+
+
+def retry_after_seconds(headers: Mapping[str, str]) -> Optional[float]:
+    """Задержка из заголовков retry-after-ms / Retry-After, если она указана"""
+    for name, scale in (("retry-after-ms", 0.001), ("retry-after", 1.0)):
+        value = headers.get(name)
+        if value:
+            try:
+                return float(value) * scale
+            except ValueError:
+                pass
+    return None
+
+
+def classify_error(error: BaseException) -> Tuple[bool, Optional[float]]:
+    """Можно ли повторить запрос после ошибки, и Retry-After из ответа"""
+    if isinstance(error, (asyncio.TimeoutError, httpx.TimeoutException)):
+        return True, None
+
+    response = getattr(error, "response", None)
+    status = getattr(error, "status_code", None)
+    if status is None and isinstance(response, httpx.Response):
+        status = response.status_code
+    if isinstance(status, int):
+        retry_after = retry_after_seconds(response.headers) if isinstance(response, httpx.Response) else None
+        return status in RETRYABLE_STATUS, retry_after
+
+    if isinstance(error, (httpx.TransportError, ConnectionError)):
+        return True, None
+    if OPENAI_AVAILABLE and isinstance(error, openai.APIConnectionError):
+        return True, None
+    return False, None
+
+
+class CircuitBreaker:
+    """
+    Circuit breaker одного провайдера
+
+    closed -> open после failure_threshold ошибок подряд;
+    open -> half_open через recovery_timeout секунд;
+    half_open -> один пробный запрос: closed при успехе, open при ошибке.
+    """
+
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+    def __init__(
+        self,
+        name: str,
+        failure_threshold: int = 5,
+        recovery_timeout: float = 30.0,
+        clock: Callable[[], float] = time.monotonic
+    ):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.recovery_timeout = recovery_timeout
+        self.clock = clock
+        self.failures = 0
+        self.opened_at: Optional[float] = None
+        self.probe_started: Optional[float] = None
+        self.stats = {"successes": 0, "failures": 0, "rejected": 0, "opened": 0}
+
+    @property
+    def state(self) -> str:
+        if self.opened_at is None:
+            return self.CLOSED
+        if self.clock() - self.opened_at >= self.recovery_timeout:
+            return self.HALF_OPEN
+        return self.OPEN
+
+    def retry_after(self) -> float:
+        """Секунды до следующего пробного запроса"""
+        if self.opened_at is None:
+            return 0.0
+        return max(0.0, self.opened_at + self.recovery_timeout - self.clock())
+
+    def allow_request(self) -> bool:
+        """Можно ли отправить запрос сейчас; в half_open — только пробный"""
+        state = self.state
+        if state == self.CLOSED:
+            return True
+        if state == self.HALF_OPEN:
+            # Пробный запрос, не вернувший результат (отменён), не блокирует восстановление
+            stale = self.probe_started is not None and self.clock() - self.probe_started >= self.recovery_timeout
+            if self.probe_started is None or stale:
+                self.probe_started = self.clock()
+                return True
+        self.stats["rejected"] += 1
+        return False
+
+    def record_success(self):
+        self.stats["successes"] += 1
+        self.failures = 0
+        self.opened_at = None
+        self.probe_started = None
+
+    def record_failure(self):
+        self.stats["failures"] += 1
+        self.failures += 1
+        if self.probe_started is not None or self.failures >= self.failure_threshold:
+            if self.opened_at is None or self.probe_started is not None:
+                self.stats["opened"] += 1
+                logger.warning(f"⚡ Circuit for {self.name} opened after {self.failures} failure(s)")
+            self.opened_at = self.clock()
+            self.probe_started = None
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            "state": self.state,
+            "consecutive_failures": self.failures,
+            "retry_after_seconds": round(self.retry_after(), 1),
+            **self.stats
+        }
+
+
+class RetryPolicy:
+    """
+    Повторы с экспоненциальной задержкой и jitter
+
+    Retry-After от провайдера заменяет вычисленную задержку; если он
+    больше max_retry_after, повторы прекращаются.
+    """
+
+    def __init__(
+        self,
+        attempts: int = 3,
+        base_delay: float = 0.5,
+        max_delay: float = 8.0,
+        max_retry_after: float = 30.0
+    ):
+        self.attempts = max(1, attempts)
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.max_retry_after = max_retry_after
+        self.stats = {"calls": 0, "retries": 0, "recovered": 0, "exhausted": 0}
+
+    def delay(self, retry: int, retry_after: Optional[float] = None) -> Optional[float]:
+        """Задержка перед повтором номер retry (с нуля); None — не повторять"""
+        if retry_after is not None:
+            if retry_after > self.max_retry_after:
+                return None
+            return retry_after + random.uniform(0, self.base_delay)
+        return random.uniform(0, min(self.max_delay, self.base_delay * 2 ** retry))
+
+    async def run(
+        self,
+        operation: Callable[[], Awaitable[T]],
+        breaker: Optional[CircuitBreaker] = None,
+        classify: Callable[[BaseException], Tuple[bool, Optional[float]]] = classify_error
+    ) -> T:
+        """
+        Выполнение operation() с повторами
+
+        С breaker: при открытом контуре сразу ServiceUnavailableError,
+        каждая временная ошибка учитывается в breaker. Ошибки запроса
+        (400, 401 и т.п.) не повторяются и не открывают контур.
+        """
+        self.stats["calls"] += 1
+        for attempt in range(self.attempts):
+            if breaker is not None and not breaker.allow_request():
+                raise ServiceUnavailableError(
+                    breaker.name,
+                    f"{breaker.name} is temporarily unavailable, retry in {breaker.retry_after():.0f}s"
+                )
+            try:
+                result = await operation()
+            except Exception as e:
+                retryable, retry_after = classify(e)
+                if breaker is not None:
+                    if retryable:
+                        breaker.record_failure()
+                    else:
+                        breaker.record_success()
+                delay = self.delay(attempt, retry_after) if retryable else None
+                if delay is None or attempt + 1 >= self.attempts:
+                    if retryable:
+                        self.stats["exhausted"] += 1
+                    raise
+                self.stats["retries"] += 1
+                logger.info(f"🔁 Retrying after {type(e).__name__} in {delay:.1f}s ({attempt + 1}/{self.attempts - 1})")
+                await asyncio.sleep(delay)
+                continue
+            if breaker is not None:
+                breaker.record_success()
+            if attempt:
+                self.stats["recovered"] += 1
+            return result
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {"attempts": self.attempts, **self.stats}
+
+
+def create_retry_policy() -> RetryPolicy:
+    """Создание политики повторов по настройкам приложения"""
+    return RetryPolicy(
+        attempts=settings.AI_RETRY_ATTEMPTS,
+        base_delay=settings.AI_RETRY_BASE_DELAY,
+        max_delay=settings.AI_RETRY_MAX_DELAY,
+        max_retry_after=settings.AI_RETRY_MAX_RETRY_AFTER
+    )
+
+
+# Один breaker на провайдера в процессе, чтобы все сервисы видели его состояние
+_breakers: Dict[str, CircuitBreaker] = {}
+
+
+def get_circuit_breaker(name: str) -> CircuitBreaker:
+    """Circuit breaker провайдера; создаётся при первом обращении"""
+    if name not in _breakers:
+        _breakers[name] = CircuitBreaker(
+            name,
+            failure_threshold=settings.AI_BREAKER_FAILURES,
+            recovery_timeout=settings.AI_BREAKER_RECOVERY
+        )
+    return _breakers[name]
+
+
+def get_resilience_stats() -> Dict[str, Any]:
+    """Состояние circuit breaker всех провайдеров (для /health)"""
+    return {name: breaker.get_stats() for name, breaker in _breakers.items()}
@@ -3,9 +3,9 @@ Red.AI Backend - FastAPI Application
 Главный файл для запуска API сервера
 """
 
-from fastapi import FastAPI, HTTPException, Depends
+from fastapi import FastAPI, HTTPException, Depends, Header, Query
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import RedirectResponse
+from fastapi.responses import PlainTextResponse, RedirectResponse, Response
 from fastapi.staticfiles import StaticFiles
 import uvicorn
 import os
@@ -16,6 +16,10 @@ from core.config import settings
 from core.database import get_db
 from core.exceptions import RedAIException
 from core.middleware import setup_middleware
+from core.metrics import CONTENT_TYPE_LATEST, MetricsMiddleware, render_metrics
+from core.profiler import ProfilerBusyError, ProfilingMiddleware, ProfilingService, create_profiling_service
+from core.rate_limit import RateLimitMiddleware, create_rate_limiter
+from core.resilience import get_resilience_stats
 from api.v1.router import api_router
 
 # Создание приложения FastAPI
@@ -27,6 +31,11 @@ app = FastAPI(
     redoc_url="/redoc"
 )
 
+# Ограничение частоты запросов. Добавлен до CORS, поэтому выполняется внутри него:
+# ответы 429 получают заголовки Access-Control-*, а preflight отвечает CORS
+rate_limiter = create_rate_limiter()
+app.add_middleware(RateLimitMiddleware, limiter=rate_limiter)
+
 # Настройка CORS
 app.add_middleware(
     CORSMiddleware,
@@ -39,6 +48,18 @@ app.add_middleware(
 # Подключение middleware
 setup_middleware(app)
 
+# Метрики снаружи лимитера, чтобы учитывались и отклонённые запросы
+app.add_middleware(MetricsMiddleware)
+
+# Профилирование запросов по X-Profile; без PROFILING_ENABLED не подключается
+profiling = create_profiling_service()
+if profiling is not None:
+    app.add_middleware(ProfilingMiddleware, profiling=profiling)
+
+@app.on_event("shutdown")
+async def close_rate_limiter():
+    await rate_limiter.backend.close()
+
 # Подключение роутеров
 app.include_router(api_router, prefix="/api/v1")
 
@@ -56,9 +77,44 @@ async def health_check():
     return {
         "status": "healthy",
         "version": "1.0.0",
-        "environment": settings.ENVIRONMENT
+        "environment": settings.ENVIRONMENT,
+        "circuits": get_resilience_stats()
     }
 
+@app.get("/metrics", include_in_schema=False)
+async def metrics():
+    """Метрики Prometheus"""
+    return Response(content=render_metrics(), media_type=CONTENT_TYPE_LATEST)
+
+def require_profiling(x_admin_token: Optional[str] = Header(None)) -> ProfilingService:
+    """Доступ администратора к профилированию; при выключенном — 404"""
+    if profiling is None:
+        raise HTTPException(status_code=404, detail="Not Found")
+    if not profiling.authorized(x_admin_token):
+        raise HTTPException(status_code=403, detail="Admin token required")
+    return profiling
+
+@app.post("/admin/profile", include_in_schema=False, response_class=PlainTextResponse)
+async def capture_profile(
+    seconds: float = Query(10, gt=0),
+    interval_ms: Optional[float] = Query(None, gt=0),
+    include_idle: bool = False,
+    service: ProfilingService = Depends(require_profiling)
+):
+    """Профиль всего процесса за N секунд в виде свёрнутых стеков"""
+    try:
+        return await service.profile(seconds, interval_ms / 1000 if interval_ms else None, include_idle)
+    except ProfilerBusyError as e:
+        raise HTTPException(status_code=409, detail=str(e))
+
+@app.get("/admin/profile/requests/{profile_id}", include_in_schema=False, response_class=PlainTextResponse)
+async def get_request_profile(profile_id: str, service: ProfilingService = Depends(require_profiling)):
+    """Свёрнутые стеки запроса, отправленного с X-Profile: 1"""
+    stacks = service.get_request_profile(profile_id)
+    if stacks is None:
+        raise HTTPException(status_code=404, detail="Profile not found")
+    return stacks
+
 @app.get("/info")
 async def app_info():
     """Информация о приложении"""
@@ -0,0 +1,111 @@
+"""
+Tests for API Rate Limiting
+Тесты для ограничения частоты запросов
+"""
+
+import pytest
+from fastapi import FastAPI
+from fastapi.middleware.cors import CORSMiddleware
+from fastapi.testclient import TestClient
+
+from src.backend.core.rate_limit import (
+    InMemoryRateLimitBackend,
+    RateLimitBackend,
+    RateLimitMiddleware,
+    RateLimiter,
+    gcra
+)
+
+
+def _scope(path="/api/v1/projects", method="GET", headers=None, client=("10.0.0.1", 5000)):
+    return {"type": "http", "path": path, "method": method, "headers": headers or [], "client": client}
+
+
+def _app(limiter: RateLimiter) -> FastAPI:
+    """Приложение с тем же порядком middleware, что и в src/backend/main.py"""
+    app = FastAPI()
+
+    @app.get("/api/v1/generate/image")
+    async def generate():
+        return {"ok": True}
+
+    app.add_middleware(RateLimitMiddleware, limiter=limiter)
+    app.add_middleware(CORSMiddleware, allow_origins=["https://red-ai.vercel.app"], allow_methods=["*"], allow_headers=["*"])
+    return app
+
+
+class TestGCRA:
+    """Тесты алгоритма GCRA"""
+
+    def test_burst_then_steady_rate(self):
+        """Всплеск до лимита, затем один запрос в period / limit"""
+        tat = None
+        for expected_remaining in (2, 1, 0):
+            tat, decision = gcra(tat, 100.0, limit=3, period=60)
+            assert decision.allowed and decision.remaining == expected_remaining
+
+        new_tat, decision = gcra(tat, 100.0, limit=3, period=60)
+        assert new_tat is None and not decision.allowed
+        assert decision.retry_after == pytest.approx(20.0)
+
+        _, decision = gcra(tat, 120.0, limit=3, period=60)
+        assert decision.allowed
+
+
+class TestRateLimiter:
+    """Тесты определения клиента и классов маршрутов"""
+
+    def test_route_classes(self):
+        limiter = RateLimiter(InMemoryRateLimitBackend())
+        # Эндпоинты из docs/api-docs.md
+        assert limiter.route_class("/api/v1/chat/message") == "chat"
+        assert limiter.route_class("/api/v1/generate/image") == "image"
+        assert limiter.route_class("/api/v1/analyze/room") == "image"
+        assert limiter.route_class("/api/v1/projects") == "default"
+        assert limiter.route_class("/health") is None
+
+        custom = RateLimiter(InMemoryRateLimitBackend(), route_classes={"/api/v1/generate": "image", "/api/v1/generate/styles": "default"})
+        assert custom.route_class("/api/v1/generate/styles") == "default"
+
+    def test_unknown_api_keys_share_the_ip_bucket(self):
+        limiter = RateLimiter(InMemoryRateLimitBackend(), api_keys=["issued-key"])
+        assert limiter.identify(_scope(headers=[(b"x-api-key", b"issued-key")])) == "key:issued-key"
+        assert limiter.identify(_scope(headers=[(b"x-api-key", b"random-1")])) == "ip:10.0.0.1"
+        assert limiter.identify(_scope(headers=[(b"x-api-key", b"random-2")])) == "ip:10.0.0.1"
+
+    @pytest.mark.asyncio
+    async def test_fail_open(self):
+        class BrokenBackend(RateLimitBackend):
+            async def hit(self, key, limit, period):
+                raise ConnectionError("redis is down")
+
+        assert await RateLimiter(BrokenBackend()).check(_scope()) is None
+        with pytest.raises(ConnectionError):
+            await RateLimiter(BrokenBackend(), fail_open=False).check(_scope())
+
+
+class TestRateLimitMiddleware:
+    """Тесты ответов middleware"""
+
+    def test_429_with_retry_after_and_cors_headers(self):
+        client = TestClient(_app(RateLimiter(InMemoryRateLimitBackend(), route_limits={"image": 2})))
+        origin = {"Origin": "https://red-ai.vercel.app"}
+
+        # Preflight отвечает CORS и не расходует лимит
+        for _ in range(3):
+            preflight = client.options(
+                "/api/v1/generate/image",
+                headers={**origin, "Access-Control-Request-Method": "GET"}
+            )
+            assert preflight.status_code == 200
+
+        first = client.get("/api/v1/generate/image", headers=origin)
+        assert first.status_code == 200
+        assert first.headers["x-ratelimit-limit"] == "2"
+        assert first.headers["x-ratelimit-remaining"] == "1"
+        assert client.get("/api/v1/generate/image", headers=origin).status_code == 200
+
+        rejected = client.get("/api/v1/generate/image", headers=origin)
+        assert rejected.status_code == 429
+        assert int(rejected.headers["retry-after"]) >= 1
+        assert rejected.headers["access-control-allow-origin"] == "https://red-ai.vercel.app"